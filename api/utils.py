@@ -155,11 +155,14 @@ def format_response(data, success=True, message=None, **kwargs):
     return response
 
 def log_query_time(func):
-    """Decorador para medir tiempo de ejecución de consultas"""
+    """Decorador para medir tiempo de ejecución de consultas (fase con el nombre de la función en /metrics)"""
+    from dashboard.metrics import phase
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
-        result = func(*args, **kwargs)
+        with phase(func.__name__):
+            result = func(*args, **kwargs)
         end_time = time.time()
         
         execution_time = end_time - start_time
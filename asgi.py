@@ -0,0 +1,14 @@
+"""
+SugarBI - Punto de entrada ASGI
+Con CHAT_ENGINE='agent' atiende POST /api/chat con el pipeline asíncrono (misma respuesta,
+límite de /api/* y métricas que la ruta Flask); el motor 'parser', que no tiene versión
+asíncrona, y el resto de rutas pasan a la aplicación Flask
+
+Uso:
+    uvicorn asgi:application --host 0.0.0.0 --port 5001 --workers 1
+"""
+
+from app_unified import app as flask_app, entity_index
+from server.asgi import SugarBIASGI
+
+application = SugarBIASGI(flask_app, flask_app.config['SQLALCHEMY_DATABASE_URI'], entity_index)
@@ -0,0 +1,205 @@
+"""
+Escritura asíncrona y por lotes de la auditoría de SugarBI
+audit_log hacía un INSERT y un commit por cada petición auditada, y los eventos de
+seguridad se escribían en logs/security.log dentro de la petición. Aquí las filas de
+auditoría van a una cola acotada en memoria y un hilo las inserta en lotes (un INSERT de
+varias filas por transacción) cuando se junta AUDIT_BATCH_SIZE o pasa AUDIT_FLUSH_SECONDS.
+Si la cola se llena, las filas nuevas se descartan y se cuentan: la auditoría nunca frena
+una petición
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from auth.models import AuditLog
+
+# Filas por INSERT
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+# Segundos máximos que una fila espera en la cola antes de escribirse
+AUDIT_FLUSH_SECONDS = float(os.getenv('AUDIT_FLUSH_SECONDS', 1.0))
+# Filas en espera antes de descartar
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', 10000))
+# Eventos de seguridad en espera de escribirse en el archivo
+SECURITY_LOG_QUEUE_SIZE = int(os.getenv('SECURITY_LOG_QUEUE_SIZE', 10000))
+
+EXTENSION_KEY = 'audit_writer'
+
+logger = logging.getLogger('sugarbi.audit')
+
+_STOP = object()
+
+
+class AuditWriter:
+    """Cola acotada de filas de auditoría con un hilo que las inserta por lotes"""
+
+    def __init__(self, engine_source: Callable[[], Any], batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_SECONDS, max_queue: int = AUDIT_QUEUE_SIZE):
+        """
+        Args:
+            engine_source: Función que retorna el engine de SQLAlchemy (se llama en el hilo escritor)
+            batch_size: Filas máximas por INSERT
+            flush_interval: Segundos máximos entre escrituras con filas pendientes
+            max_queue: Filas en espera antes de descartar
+        """
+        self.engine_source = engine_source
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, user_id: Optional[int], action: str, resource: Optional[str] = None,
+               details: Optional[Dict[str, Any]] = None, ip_address: Optional[str] = None,
+               user_agent: Optional[str] = None) -> bool:
+        """
+        Encola una fila de auditoría sin bloquear
+
+        Returns:
+            False si la cola estaba llena y la fila se descartó
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait({
+                "user_id": user_id,
+                "action": action,
+                "resource": resource,
+                "details": details,
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+                "timestamp": datetime.utcnow()
+            })
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            # Se avisa en las potencias de dos y cada mil descartes, para no inundar el log
+            if dropped & (dropped - 1) == 0 or dropped % 1000 == 0:
+                logger.warning("Cola de auditoría llena: %s filas descartadas", dropped)
+            return False
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+
+            if row is _STOP:
+                self._write(batch)
+                return
+            if row is not None:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            with self.engine_source().begin() as connection:
+                connection.execute(AuditLog.__table__.insert(), batch)
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            logger.error("No se pudo escribir un lote de auditoría (%s filas): %s", len(batch), e)
+
+    def flush(self, timeout: float = 10.0):
+        """Escribe lo pendiente y detiene el hilo (se vuelve a crear con el siguiente submit)"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("No se pudo vaciar la cola de auditoría: sigue llena")
+            return
+        thread.join(timeout)
+
+    def after_fork(self):
+        """Descarta el hilo y la cola heredados: cada worker escribe solo sus propias filas"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(self.max_queue)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del escritor"""
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler con cola acotada: si se llena, descarta el registro y lo cuenta"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def queue_file_handler(handler: logging.Handler, max_queue: int = SECURITY_LOG_QUEUE_SIZE):
+    """
+    Envuelve un handler (p. ej. FileHandler) para que la escritura ocurra en otro hilo
+
+    Returns:
+        Tupla (handler para el logger, QueueListener ya iniciado)
+    """
+    log_queue: queue.Queue = queue.Queue(max_queue)
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.setLevel(handler.level)
+    return queue_handler, listener
+
+
+def init_audit_writer(app, engine_source: Callable[[], Any]) -> AuditWriter:
+    """Registra el escritor de auditoría de la aplicación"""
+    writer = AuditWriter(engine_source)
+    app.extensions[EXTENSION_KEY] = writer
+    return writer
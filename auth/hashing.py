@@ -0,0 +1,132 @@
+"""
+Hash de contraseñas con bcrypt para SugarBI
+El costo se configura con BCRYPT_ROUNDS y los cálculos corren en un pool acotado de hilos
+(HASH_WORKERS): un pico de logins no ocupa todos los hilos de un worker con trabajo de CPU.
+Los hashes heredados de werkzeug (pbkdf2/scrypt) se siguen verificando y se reemplazan en el
+siguiente login correcto, igual que los bcrypt con un costo distinto al configurado
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+from werkzeug.security import check_password_hash
+
+# Costo de bcrypt (2^rounds iteraciones); 12 ≈ 0.2-0.3 s por hash en un núcleo actual
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+# Hashes simultáneos por proceso
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 2))
+# Verificaciones en espera antes de rechazar con HashingBusyError
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', HASH_WORKERS * 16))
+# Segundos máximos esperando un resultado del pool
+HASH_TIMEOUT_SECONDS = float(os.getenv('HASH_TIMEOUT_SECONDS', 10))
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+class HashingBusyError(RuntimeError):
+    """El pool de hash está saturado; el login debe reintentarse más tarde"""
+
+
+def _prehash(password: str) -> bytes:
+    # bcrypt solo usa los primeros 72 bytes: se resume la contraseña con SHA-256 (en base64)
+    return base64.b64encode(hashlib.sha256(password.encode('utf-8')).digest())
+
+
+class PasswordHasher:
+    """Calcula y verifica hashes de contraseñas en un pool acotado de hilos"""
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, workers: int = HASH_WORKERS,
+                 max_pending: int = HASH_MAX_PENDING, timeout: float = HASH_TIMEOUT_SECONDS):
+        self.rounds = rounds
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._dummy_hash: Optional[str] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError("Demasiados logins simultáneos")
+        try:
+            return self._get_executor().submit(func, *args).result(timeout=self.timeout)
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """
+        Calcula el hash bcrypt de una contraseña con el costo configurado
+
+        Raises:
+            HashingBusyError: Si el pool está saturado
+        """
+        return self._run(self._hash_now, password)
+
+    def _hash_now(self, password: str) -> str:
+        return bcrypt.hashpw(_prehash(password), bcrypt.gensalt(self.rounds)).decode('ascii')
+
+    def verify(self, password: str, stored_hash: Optional[str]) -> bool:
+        """
+        Verifica una contraseña contra un hash bcrypt o uno heredado de werkzeug
+
+        Con stored_hash=None se compara contra un hash ficticio para que un usuario
+        inexistente tarde lo mismo que una contraseña incorrecta
+
+        Raises:
+            HashingBusyError: Si el pool está saturado
+        """
+        if stored_hash is None:
+            stored_hash = self.dummy_hash()
+            self._run(self._verify_now, password, stored_hash)
+            return False
+        return self._run(self._verify_now, password, stored_hash)
+
+    @staticmethod
+    def _verify_now(password: str, stored_hash: str) -> bool:
+        if stored_hash.startswith(BCRYPT_PREFIXES):
+            try:
+                return bcrypt.checkpw(_prehash(password), stored_hash.encode('ascii'))
+            except ValueError:
+                return False
+        return check_password_hash(stored_hash, password)
+
+    def needs_rehash(self, stored_hash: str) -> bool:
+        """True si el hash es heredado o usa un costo distinto de self.rounds"""
+        if not stored_hash.startswith(BCRYPT_PREFIXES):
+            return True
+        try:
+            return int(stored_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def dummy_hash(self) -> str:
+        """Hash ficticio con el costo actual (se calcula una vez)"""
+        if self._dummy_hash is None or self.needs_rehash(self._dummy_hash):
+            self._dummy_hash = self._hash_now(os.urandom(16).hex())
+        return self._dummy_hash
+
+    def after_fork(self):
+        """Descarta el pool heredado del proceso maestro (sus hilos no existen en el hijo)"""
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def shutdown(self):
+        """Detiene el pool (se vuelve a crear en el siguiente uso, p. ej. tras un fork)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
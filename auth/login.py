@@ -0,0 +1,85 @@
+"""
+Flujo de login compartido por las rutas JSON y las páginas web
+Una sola consulta (usuario con su rol) y un solo commit por intento
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import joinedload
+
+from auth.hashing import password_hasher
+from auth.models import User, db
+
+# Motivos de rechazo
+INVALID = 'invalid_password'
+NOT_FOUND = 'user_not_found'
+LOCKED = 'account_locked'
+INACTIVE = 'account_inactive'
+
+
+@dataclass
+class LoginAttempt:
+    """Resultado de authenticate: user es None si no existe; reason es None si el login es válido"""
+    user: Optional[User]
+    reason: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.reason is None
+
+
+def find_user(username: str) -> Optional[User]:
+    """Busca un usuario con su rol cargado en la misma consulta"""
+    return User.query.options(joinedload(User.role)).filter_by(username=username).first()
+
+
+def authenticate(username: str, password: str) -> LoginAttempt:
+    """
+    Verifica credenciales y estado de la cuenta
+
+    Un intento fallido se guarda de inmediato (un commit). Un intento válido deja los
+    cambios pendientes (intentos reiniciados, último login y, si hace falta, el hash
+    actualizado) para que el llamador los guarde con record_login
+
+    Args:
+        username: Nombre de usuario
+        password: Contraseña en texto plano
+
+    Returns:
+        LoginAttempt con el usuario y el motivo del rechazo (si lo hay)
+
+    Raises:
+        HashingBusyError: Si el pool de hash está saturado
+    """
+    user = find_user(username)
+
+    if user is None:
+        # Mismo costo que una contraseña incorrecta: no revela qué usuarios existen
+        password_hasher.verify(password, None)
+        return LoginAttempt(None, NOT_FOUND)
+
+    if not user.check_password(password):
+        user.increment_login_attempts()
+        db.session.commit()
+        return LoginAttempt(user, INVALID)
+
+    if user.is_locked():
+        return LoginAttempt(user, LOCKED)
+
+    if not user.is_active:
+        return LoginAttempt(user, INACTIVE)
+
+    user.reset_login_attempts()
+    user.rehash_password_if_needed(password)
+    return LoginAttempt(user)
+
+
+def record_login(user: User):
+    """
+    Guarda un login válido (intentos, último login y hash actualizado) en un solo commit
+
+    La sesión vive en la cookie firmada de Flask o en un JWT (auth/tokens.py): ya no se
+    inserta una fila en session_tokens por login
+    """
+    db.session.commit()
@@ -4,10 +4,11 @@ Modelos de autenticación y autorización
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import secrets
 
+from auth.hashing import password_hasher
+
 db = SQLAlchemy()
 
 class Role(db.Model):
@@ -52,12 +53,19 @@ class User(UserMixin, db.Model):
     session_tokens = db.relationship('SessionToken', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Establecer contraseña hasheada"""
-        self.password_hash = generate_password_hash(password)
+        """Establecer contraseña hasheada (bcrypt con el costo de BCRYPT_ROUNDS)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
         """Verificar contraseña"""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(password, self.password_hash)
+    
+    def rehash_password_if_needed(self, password):
+        """Reemplaza un hash heredado o con otro costo; se guarda con el siguiente commit"""
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+            return True
+        return False
     
     def is_locked(self):
         """Verificar si la cuenta está bloqueada"""
@@ -66,18 +74,16 @@ class User(UserMixin, db.Model):
         return False
     
     def increment_login_attempts(self):
-        """Incrementar intentos de login"""
+        """Incrementar intentos de login (el llamador hace el commit)"""
         self.login_attempts += 1
         if self.login_attempts >= 5:  # Bloquear después de 5 intentos
             self.locked_until = datetime.utcnow() + timedelta(minutes=30)
-        db.session.commit()
     
     def reset_login_attempts(self):
-        """Resetear intentos de login"""
+        """Resetear intentos de login (el llamador hace el commit)"""
         self.login_attempts = 0
         self.locked_until = None
         self.last_login = datetime.utcnow()
-        db.session.commit()
     
     def has_permission(self, permission):
         """Verificar si el usuario tiene un permiso específico"""
@@ -97,7 +103,8 @@ class SessionToken(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     token = db.Column(db.String(255), unique=True, nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    # Índice para purgar los vencidos en lotes (auth/retention.py)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_used = db.Column(db.DateTime, default=datetime.utcnow)
     ip_address = db.Column(db.String(45))  # IPv6 compatible
@@ -122,8 +129,16 @@ class SessionToken(db.Model):
         return f'<SessionToken {self.token[:10]}...>'
 
 class AuditLog(db.Model):
-    """Modelo de log de auditoría"""
+    """
+    Modelo de log de auditoría
+
+    En MySQL la tabla se particiona por mes (auth/retention.py): la llave primaria pasa a
+    ser (id, timestamp) y se elimina la llave foránea de user_id, que las tablas
+    particionadas no admiten. El modelo conserva id como identidad y la relación con users
+    """
     __tablename__ = 'audit_logs'
+    # Listado del visor (orden por fecha, paginación por llave) y purga por fecha
+    __table_args__ = (db.Index('ix_audit_logs_timestamp_user', 'timestamp', 'user_id'),)
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
@@ -0,0 +1,259 @@
+"""
+Caché de usuarios y permisos por proceso
+load_user de Flask-Login consultaba el usuario en cada petición autenticada y
+has_permission cargaba después el rol (dos consultas). Aquí se guarda por user_id una
+vista de solo lectura del usuario (activo, rol y permisos como frozenset) con un TTL
+corto. Los cambios a usuarios o roles hechos con el ORM en este proceso la invalidan al
+confirmarse (y revocan los tokens de los usuarios afectados), sin importar la ruta o el
+script que los haga; los hechos por otro proceso se ven al vencer el TTL
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, joinedload
+
+from auth.models import Role, User, db
+
+# Segundos que un usuario cacheado se considera vigente (cambios hechos por otro proceso)
+PERMISSION_CACHE_TTL = float(os.getenv('PERMISSION_CACHE_TTL', 30))
+# Usuarios guardados por proceso (LRU)
+PERMISSION_CACHE_SIZE = int(os.getenv('PERMISSION_CACHE_SIZE', 10000))
+
+EXTENSION_KEY = 'permission_cache'
+# Campos que están en CachedUser o en los claims del token de acceso
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'is_active', 'is_admin', 'role_id')
+TOKEN_USER_FIELDS = ('username', 'email', 'is_active', 'is_admin', 'role_id')
+ROLE_FIELDS = ('name', 'permissions')
+_CHANGES_KEY = 'permission_cache_changes'
+
+
+class CachedRole:
+    """Rol de un usuario cacheado"""
+
+    __slots__ = ('id', 'name', 'permissions')
+
+    def __init__(self, id: int, name: str, permissions: FrozenSet[str]):
+        self.id = id
+        self.name = name
+        self.permissions = permissions
+
+
+class CachedUser(UserMixin):
+    """
+    Vista de solo lectura del usuario autenticado (current_user)
+
+    Tiene lo que usan las peticiones: identidad, estado, rol y permisos. Para modificar
+    el usuario se obtiene el modelo con model()
+    """
+
+    def __init__(self, id: int, username: str, email: Optional[str] = None, is_active: bool = True,
+                 is_admin: bool = False, role: Optional[CachedRole] = None,
+                 first_name: Optional[str] = None, last_name: Optional[str] = None):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_admin = is_admin
+        self._active = is_active
+        self.role = role
+        self.role_id = role.id if role else None
+        self.permissions: FrozenSet[str] = role.permissions if role else frozenset()
+
+    @classmethod
+    def from_model(cls, user: User) -> 'CachedUser':
+        """Vista de un usuario del ORM (con el rol ya cargado)"""
+        role = CachedRole(user.role.id, user.role.name, frozenset(user.role.permissions or ())) if user.role else None
+        return cls(user.id, user.username, user.email, bool(user.is_active), bool(user.is_admin), role,
+                   user.first_name, user.last_name)
+
+    @property
+    def is_active(self):
+        return self._active
+
+    def has_permission(self, permission: str) -> bool:
+        """Verificar si el usuario tiene un permiso específico (búsqueda O(1))"""
+        return self.is_admin or permission in self.permissions
+
+    def model(self) -> Optional[User]:
+        """Usuario del ORM (una consulta) para leer o modificar campos no cacheados"""
+        return db.session.get(User, self.id)
+
+    def check_password(self, password: str) -> bool:
+        user = self.model()
+        return user is not None and user.check_password(password)
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class PermissionCache:
+    """LRU de usuarios autenticados con TTL, seguro para varios hilos"""
+
+    def __init__(self, ttl: float = PERMISSION_CACHE_TTL, max_size: int = PERMISSION_CACHE_SIZE):
+        """
+        Args:
+            ttl: Segundos de vigencia de cada entrada
+            max_size: Número máximo de usuarios guardados
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: 'OrderedDict[int, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_user(self, user_id: int) -> Optional[CachedUser]:
+        """
+        Usuario activo con su rol y permisos, consultándolo solo si no está en caché
+
+        Returns:
+            CachedUser, o None si el usuario no existe o está desactivado
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        user = User.query.options(joinedload(User.role)).filter_by(id=user_id).first()
+        cached = CachedUser.from_model(user) if user is not None and user.is_active else None
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, cached)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id: int):
+        """Descarta un usuario (tras editarlo, desactivarlo o cerrar su sesión)"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_role(self, role_id: int):
+        """Descarta los usuarios de un rol (tras cambiar sus permisos)"""
+        with self._lock:
+            stale = [user_id for user_id, (_, cached) in self._entries.items()
+                     if cached is None or cached.role_id == role_id]
+            for user_id in stale:
+                del self._entries[user_id]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Vacía la caché (los contadores se conservan)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def _changed(instance, fields) -> bool:
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _collect_changes(session, flush_context):
+    """after_flush: anota usuarios y roles cuyos campos cacheados cambiaron en la transacción"""
+    users, token_users, roles = session.info.setdefault(_CHANGES_KEY, (set(), set(), set()))
+    for instance in session.dirty | session.deleted:
+        if isinstance(instance, User) and instance.id is not None:
+            deleted = instance in session.deleted
+            if deleted or _changed(instance, USER_FIELDS):
+                users.add(instance.id)
+            if deleted or _changed(instance, TOKEN_USER_FIELDS):
+                token_users.add(instance.id)
+        elif isinstance(instance, Role) and instance.id is not None:
+            if instance in session.deleted or _changed(instance, ROLE_FIELDS):
+                roles.add(instance.id)
+    if roles:
+        # Los tokens llevan el rol y sus permisos: se revocan los de sus usuarios
+        token_users.update(session.connection().execute(
+            select(User.id).where(User.role_id.in_(roles))).scalars())
+
+
+def _apply_changes(session):
+    """after_commit: invalida la caché y revoca tokens de lo anotado"""
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if not changes:
+        return
+    users, token_users, roles = changes
+    for user_id in users:
+        invalidate_user(user_id)
+    for role_id in roles:
+        invalidate_role(role_id)
+    from auth.tokens import revoke_user_tokens
+    for user_id in token_users:
+        revoke_user_tokens(user_id)
+
+
+def _discard_changes(session, previous_transaction=None):
+    session.info.pop(_CHANGES_KEY, None)
+
+
+def install_change_hooks():
+    """Escucha los commits del ORM (una vez por proceso) para invalidar usuarios y roles editados"""
+    if event.contains(Session, 'after_commit', _apply_changes):
+        return
+    event.listen(Session, 'after_flush', _collect_changes)
+    event.listen(Session, 'after_commit', _apply_changes)
+    event.listen(Session, 'after_rollback', _discard_changes)
+
+
+def init_permission_cache(app, login_manager) -> PermissionCache:
+    """Registra la caché en la aplicación y la usa como user_loader de Flask-Login"""
+    install_change_hooks()
+    cache = PermissionCache()
+    app.extensions[EXTENSION_KEY] = cache
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return cache.get_user(int(user_id))
+
+    return cache
+
+
+def get_permission_cache() -> Optional[PermissionCache]:
+    """Caché de la aplicación activa (None fuera de una aplicación o si no se registró)"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def invalidate_user(user_id: int):
+    """Invalida un usuario en la caché de la aplicación activa"""
+    cache = get_permission_cache()
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+def invalidate_role(role_id: int):
+    """Invalida los usuarios de un rol en la caché de la aplicación activa"""
+    cache = get_permission_cache()
+    if cache is not None:
+        cache.invalidate_role(role_id)
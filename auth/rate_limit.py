@@ -0,0 +1,292 @@
+"""
+Límites de peticiones compartidos entre workers
+flask_limiter guardaba los contadores en la memoria de cada worker: con N workers de
+gunicorn cada límite valía N veces, y cada verificación tomaba el bloqueo del
+almacenamiento. Aquí los contadores de ventana fija viven en un backend compartido
+(Redis; en memoria para un solo proceso y las pruebas) y cada worker le pide lotes de
+permisos que después gasta localmente sin volver al backend. El lote se achica a medida
+que se agota la ventana, así que entre todos los workers nunca se admite más que el
+límite; los permisos que un worker no alcanzó a gastar se pierden al cerrar la ventana.
+
+Presupuestos (config/security_config.py): RATE_LIMIT_LOGIN para los POST de login,
+RATE_LIMIT_API para /api/* y RATE_LIMIT_DEFAULT para el resto
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import jsonify, request
+from flask_limiter.util import get_remote_address
+from limits import RateLimitItem, parse_many
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependencia opcional
+    redis = None
+
+# Permisos máximos que un worker toma del backend en una sola ida
+RATE_LIMIT_LEASE = int(os.getenv('RATE_LIMIT_LEASE', 20))
+# Un lote no supera 1/RATE_LIMIT_LEASE_SHARE de lo que queda en la ventana
+RATE_LIMIT_LEASE_SHARE = int(os.getenv('RATE_LIMIT_LEASE_SHARE', 8))
+# Claves (scope, cliente, límite) guardadas por proceso antes de descartar las vencidas
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 50000))
+
+EXTENSION_KEY = 'rate_limiter'
+
+# Endpoints cuyo POST usa el presupuesto de login
+LOGIN_ENDPOINTS = frozenset({'auth.login', 'auth.api_login', 'auth.api_token', 'web.login'})
+# Sondas y métricas no cuentan contra ningún límite
+EXEMPT_BLUEPRINTS = frozenset({'health'})
+EXEMPT_PATHS = frozenset({'/metrics'})
+
+logger = logging.getLogger('sugarbi.ratelimit')
+
+TOO_MANY_REQUESTS_MESSAGE = "Demasiadas peticiones, intenta de nuevo más tarde"
+
+
+class MemoryBackend:
+    """Contadores en la memoria del proceso (un solo worker o pruebas)"""
+
+    # Cada cuántos incrementos se eliminan las ventanas vencidas
+    PRUNE_EVERY = 1024
+
+    def __init__(self):
+        self._counts: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._since_prune = 0
+
+    def incr(self, key: str, amount: int, expiry: int) -> int:
+        """Suma amount al contador de key (que vence en expiry segundos) y retorna el total"""
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counts.get(key, (0, 0.0))
+            if expires_at <= now:
+                count, expires_at = 0, now + expiry
+            count += amount
+            self._counts[key] = (count, expires_at)
+            self._since_prune += 1
+            if self._since_prune >= self.PRUNE_EVERY:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+                self._since_prune = 0
+        return count
+
+
+class RedisBackend:
+    """Contadores en Redis, compartidos por todos los workers y servidores"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisBackend':
+        """
+        Raises:
+            RuntimeError: Si el paquete redis no está instalado
+        """
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_STORAGE_URL apunta a Redis pero el paquete redis no está instalado")
+        return cls(redis.Redis.from_url(url))
+
+    def incr(self, key: str, amount: int, expiry: int) -> int:
+        """INCRBY y EXPIRE en una sola ida (la clave incluye la ventana: renovar el TTL no la alarga)"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incrby(key, amount)
+        pipe.expire(key, expiry)
+        count, _ = pipe.execute()
+        return int(count)
+
+
+def backend_from_url(url: str):
+    """
+    Backend de contadores según RATE_LIMIT_STORAGE_URL ('memory://' o 'redis://...')
+
+    Raises:
+        ValueError: Si el esquema no es conocido
+    """
+    if url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend.from_url(url)
+    raise ValueError(f"RATE_LIMIT_STORAGE_URL no soportada: {url}")
+
+
+class _Lease:
+    """Permisos tomados del backend para una clave y ventana"""
+
+    __slots__ = ('window', 'expiry', 'tokens', 'remaining', 'lock')
+
+    def __init__(self, expiry: int):
+        self.window = -1
+        self.expiry = expiry
+        self.tokens = 0
+        self.remaining = 0
+        self.lock = threading.Lock()
+
+
+class RateLimiter:
+    """Límites de ventana fija con contadores compartidos y lotes de permisos por worker"""
+
+    def __init__(self, backend, budgets: Optional[Dict[str, List[RateLimitItem]]] = None,
+                 lease: int = RATE_LIMIT_LEASE, lease_share: int = RATE_LIMIT_LEASE_SHARE,
+                 max_keys: int = RATE_LIMIT_MAX_KEYS, prefix: str = 'sugarbi:rl'):
+        """
+        Args:
+            backend: MemoryBackend, RedisBackend o cualquier objeto con incr(key, amount, expiry)
+            budgets: Límites por scope ('default', 'login', 'api')
+            lease: Permisos máximos por ida al backend
+            lease_share: Fracción máxima (1/lease_share) de lo restante que toma un lote
+            max_keys: Claves locales antes de descartar las de ventanas cerradas
+            prefix: Prefijo de las claves en el backend
+        """
+        self.backend = backend
+        self.budgets = budgets or {}
+        self.lease = lease
+        self.lease_share = lease_share
+        self.max_keys = max_keys
+        self.prefix = prefix
+        self._leases: Dict[Tuple[str, str, int, int], _Lease] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.allowed = 0
+        self.rejected = 0
+        self.backend_calls = 0
+        self.backend_errors = 0
+
+    def hit(self, scope: str, key: str, limits: Optional[Sequence[RateLimitItem]] = None) -> Optional[int]:
+        """
+        Consume un permiso de cada límite del scope para un cliente
+
+        Args:
+            scope: Presupuesto ('default', 'login', 'api' o el de un endpoint)
+            key: Identificador del cliente (IP)
+            limits: Límites a aplicar; por defecto los de budgets[scope]
+
+        Returns:
+            None si la petición se admite; si no, segundos hasta que se abra la ventana
+        """
+        now = time.time()
+        for item in (self.budgets.get(scope, ()) if limits is None else limits):
+            retry_after = self._take(scope, key, item, now)
+            if retry_after is not None:
+                self.rejected += 1
+                return retry_after
+        self.allowed += 1
+        return None
+
+    def _take(self, scope: str, key: str, item: RateLimitItem, now: float) -> Optional[int]:
+        expiry = item.get_expiry()
+        window = int(now // expiry)
+        lease_key = (scope, key, item.amount, expiry)
+        # Lectura sin bloqueo: atómica en CPython
+        lease = self._leases.get(lease_key)
+        if lease is None:
+            with self._lock:
+                if len(self._leases) >= self.max_keys:
+                    self._prune(now)
+                lease = self._leases.setdefault(lease_key, _Lease(expiry))
+
+        with lease.lock:
+            if lease.window != window:
+                lease.window = window
+                lease.tokens = 0
+                lease.remaining = item.amount
+
+            if lease.tokens == 0:
+                # Ventana agotada según la última ida al backend: se rechaza sin volver
+                if lease.remaining <= 0:
+                    return int((window + 1) * expiry - now) + 1
+                size = max(1, min(self.lease, lease.remaining // self.lease_share))
+                try:
+                    count = self.backend.incr(f"{self.prefix}:{scope}:{key}:{item.amount}/{expiry}:{window}",
+                                              size, expiry)
+                except Exception as e:
+                    # Sin backend no se limita: un fallo de Redis no debe tumbar la aplicación
+                    self.backend_errors += 1
+                    if self.backend_errors & (self.backend_errors - 1) == 0:
+                        logger.warning("Backend de límites no disponible (%s errores): %s", self.backend_errors, e)
+                    return None
+                self.backend_calls += 1
+                lease.remaining = item.amount - count
+                lease.tokens = size if count <= item.amount else max(0, size - (count - item.amount))
+                if lease.tokens == 0:
+                    return int((window + 1) * expiry - now) + 1
+
+            lease.tokens -= 1
+            return None
+
+    def _prune(self, now: float):
+        self._leases = {k: lease for k, lease in self._leases.items()
+                        if (lease.window + 1) * lease.expiry > now}
+
+    def after_fork(self):
+        """Descarta los permisos heredados: gastarlos en cada worker superaría el límite"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._leases = {}
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores del limitador"""
+        return {
+            "keys": len(self._leases),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "backend_calls": self.backend_calls,
+            "backend_errors": self.backend_errors
+        }
+
+
+def request_scope() -> Optional[str]:
+    """Presupuesto de la petición actual (None si no se limita)"""
+    if request.method == 'OPTIONS' or request.blueprint in EXEMPT_BLUEPRINTS or request.path in EXEMPT_PATHS:
+        return None
+    if request.endpoint in LOGIN_ENDPOINTS and request.method == 'POST':
+        return 'login'
+    if request.path.startswith('/api/'):
+        return 'api'
+    return 'default'
+
+
+def too_many_requests(retry_after: int):
+    """Respuesta 429 con Retry-After"""
+    response = jsonify({"success": False, "error": TOO_MANY_REQUESTS_MESSAGE})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def init_rate_limits(app) -> Optional[RateLimiter]:
+    """
+    Registra el limitador de la aplicación y lo aplica antes de cada petición
+
+    Usa RATELIMIT_ENABLED, RATE_LIMIT_STORAGE_URL y los presupuestos RATE_LIMIT_DEFAULT,
+    RATE_LIMIT_LOGIN y RATE_LIMIT_API de app.config
+
+    Returns:
+        El limitador, o None si los límites están desactivados
+    """
+    if not app.config.get('RATELIMIT_ENABLED', True):
+        return None
+
+    limiter = RateLimiter(backend_from_url(app.config.get('RATE_LIMIT_STORAGE_URL', 'memory://')), {
+        'default': parse_many(app.config['RATE_LIMIT_DEFAULT']),
+        'login': parse_many(app.config['RATE_LIMIT_LOGIN']),
+        'api': parse_many(app.config['RATE_LIMIT_API'])
+    })
+    app.extensions[EXTENSION_KEY] = limiter
+
+    @app.before_request
+    def check_rate_limit():
+        scope = request_scope()
+        if scope is None:
+            return None
+        retry_after = limiter.hit(scope, get_remote_address())
+        if retry_after is not None:
+            return too_many_requests(retry_after)
+        return None
+
+    return limiter
@@ -0,0 +1,393 @@
+"""
+Retención de auditoría y tokens de sesión
+audit_logs y session_tokens solo crecían. Este módulo:
+
+- Particiona audit_logs por mes en MySQL (RANGE sobre TO_DAYS(timestamp)), de modo que
+  borrar un mes viejo es un DROP PARTITION instantáneo en vez de millones de DELETE
+- Purga en lotes acotados (transacciones cortas) las filas que quedan fuera de la
+  retención y los tokens de sesión vencidos o inactivos
+- Pagina el visor de auditoría por llave (timestamp, id) sobre el índice
+  (timestamp, user_id): cada página cuesta lo mismo sin importar cuántas filas haya
+
+El trabajo se programa con cron (python -m auth.retention) o dentro de la aplicación
+con RETENTION_INTERVAL_SECONDS; en MySQL un GET_LOCK evita que dos workers lo corran a la vez
+"""
+
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, text
+
+from auth.models import AuditLog, SessionToken
+
+# Días que se conserva la auditoría
+AUDIT_RETENTION_DAYS = int(os.getenv('AUDIT_RETENTION_DAYS', 365))
+# Días que se conserva un token de sesión después de vencer
+SESSION_TOKEN_GRACE_DAYS = int(os.getenv('SESSION_TOKEN_GRACE_DAYS', 1))
+# Filas por DELETE y lotes máximos por ejecución
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+RETENTION_MAX_BATCHES = int(os.getenv('RETENTION_MAX_BATCHES', 500))
+# Pausa entre lotes para no acaparar el disco ni la réplica
+RETENTION_BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', 0.05))
+# Particiones mensuales que se crean por adelantado
+AUDIT_PARTITIONS_AHEAD = int(os.getenv('AUDIT_PARTITIONS_AHEAD', 3))
+# Segundos entre ejecuciones dentro de la aplicación (0: solo con cron)
+RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', 0))
+
+# Partición que recibe todo lo posterior a la última mensual
+FUTURE_PARTITION = 'p_future'
+# Bloqueo con nombre de MySQL: una sola ejecución a la vez entre workers y servidores
+LOCK_NAME = 'sugarbi_retention'
+
+EXTENSION_KEY = 'retention'
+
+logger = logging.getLogger('sugarbi.retention')
+
+
+def _month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"p{month.year:04d}{month.month:02d}"
+
+
+def _partition_month(name: str) -> Optional[date]:
+    """Mes de una partición pYYYYMM (None para p_future u otros nombres)"""
+    if len(name) == 7 and name[0] == 'p' and name[1:].isdigit():
+        return date(int(name[1:5]), int(name[5:7]), 1)
+    return None
+
+
+def monthly_partitions(first: date, last: date) -> List[str]:
+    """
+    Cláusulas PARTITION de los meses entre first y last (incluidos)
+
+    Cada partición pYYYYMM guarda las filas con timestamp anterior al mes siguiente
+    """
+    clauses = []
+    month = _month_start(first)
+    while month <= last:
+        upper = _add_months(month, 1)
+        clauses.append(f"PARTITION {_partition_name(month)} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))")
+        month = upper
+    return clauses
+
+
+def _is_mysql(engine) -> bool:
+    return engine.dialect.name in ('mysql', 'mariadb')
+
+
+def audit_partitions(connection) -> List[str]:
+    """Nombres de las particiones de audit_logs en orden (vacía si no está particionada)"""
+    rows = connection.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_logs' AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ))
+    return [row[0] for row in rows]
+
+
+def ensure_indexes(engine):
+    """Crea los índices de retención que falten en tablas creadas antes de este módulo"""
+    for table in (AuditLog.__table__, SessionToken.__table__):
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def partition_audit_logs(engine, now: Optional[datetime] = None) -> bool:
+    """
+    Particiona audit_logs por mes (migración única, solo MySQL)
+
+    Se elimina la llave foránea de user_id y la llave primaria pasa a (id, timestamp):
+    MySQL exige que la columna de partición esté en todas las llaves únicas
+
+    Returns:
+        True si se particionó; False si no es MySQL o ya estaba particionada
+    """
+    if not _is_mysql(engine):
+        return False
+    today = (now or datetime.utcnow()).date()
+    with engine.begin() as connection:
+        if audit_partitions(connection):
+            return False
+        oldest = connection.execute(text("SELECT MIN(timestamp) FROM audit_logs")).scalar()
+        foreign_keys = connection.execute(text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'audit_logs'"
+        )).scalars().all()
+
+    first = oldest.date() if oldest else today
+    partitions = monthly_partitions(first, _add_months(_month_start(today), AUDIT_PARTITIONS_AHEAD))
+    partitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+
+    # DDL de MySQL: cada sentencia confirma por sí sola
+    with engine.connect() as connection:
+        connection.execute(text("UPDATE audit_logs SET timestamp = UTC_TIMESTAMP() WHERE timestamp IS NULL"))
+        for name in foreign_keys:
+            connection.execute(text(f"ALTER TABLE audit_logs DROP FOREIGN KEY `{name}`"))
+        connection.execute(text(
+            "ALTER TABLE audit_logs MODIFY timestamp DATETIME NOT NULL, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"
+        ))
+        connection.execute(text(
+            f"ALTER TABLE audit_logs PARTITION BY RANGE (TO_DAYS(timestamp)) ({', '.join(partitions)})"
+        ))
+        connection.commit()
+    logger.info("audit_logs particionada en %s particiones", len(partitions))
+    return True
+
+
+def ensure_future_partitions(connection, partitions: List[str], today: date) -> int:
+    """Divide p_future para que existan las particiones de los próximos meses"""
+    months = [month for month in map(_partition_month, partitions) if month is not None]
+    if not months or FUTURE_PARTITION not in partitions:
+        return 0
+    first = _add_months(max(months), 1)
+    last = _add_months(_month_start(today), AUDIT_PARTITIONS_AHEAD)
+    new = monthly_partitions(first, last)
+    if new:
+        connection.execute(text(
+            f"ALTER TABLE audit_logs REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+            f"({', '.join(new)}, PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE)"
+        ))
+    return len(new)
+
+
+def drop_expired_partitions(connection, partitions: List[str], cutoff: datetime) -> List[str]:
+    """Elimina las particiones cuyo mes completo es anterior a cutoff"""
+    limit = _month_start(cutoff.date())
+    expired = [name for name in partitions
+               if (month := _partition_month(name)) is not None and month < limit]
+    # Siempre queda al menos una partición mensual
+    if expired and len(expired) == len([p for p in partitions if _partition_month(p)]):
+        expired = expired[:-1]
+    if expired:
+        connection.execute(text(f"ALTER TABLE audit_logs DROP PARTITION {', '.join(expired)}"))
+    return expired
+
+
+def purge_in_batches(engine, table, condition, order_column, batch_size: int = RETENTION_BATCH_SIZE,
+                     max_batches: int = RETENTION_MAX_BATCHES, pause: float = RETENTION_BATCH_PAUSE) -> int:
+    """
+    Borra las filas que cumplen condition en lotes, cada uno en su propia transacción
+
+    Returns:
+        Filas borradas
+    """
+    deleted = 0
+    for batch in range(max_batches):
+        with engine.begin() as connection:
+            ids = connection.execute(
+                select(table.c.id).where(condition).order_by(order_column).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            # Repetir la condición permite a MySQL descartar particiones
+            connection.execute(table.delete().where(condition, table.c.id.in_(ids)))
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+class RetentionJob:
+    """Purga de auditoría y tokens con un hilo opcional que la repite cada cierto tiempo"""
+
+    def __init__(self, engine_source: Callable[[], Any], audit_days: int = AUDIT_RETENTION_DAYS,
+                 token_grace_days: int = SESSION_TOKEN_GRACE_DAYS, batch_size: int = RETENTION_BATCH_SIZE,
+                 interval: int = RETENTION_INTERVAL_SECONDS):
+        """
+        Args:
+            engine_source: Función que retorna el engine de SQLAlchemy
+            audit_days: Días de auditoría que se conservan
+            token_grace_days: Días que se conserva un token vencido
+            batch_size: Filas por DELETE
+            interval: Segundos entre ejecuciones del hilo (0: sin hilo)
+        """
+        self.engine_source = engine_source
+        self.audit_days = audit_days
+        self.token_grace_days = token_grace_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Ejecuta una pasada de retención
+
+        Returns:
+            Resumen: particiones creadas y eliminadas, filas de auditoría y tokens purgados
+            (skipped=True si otro proceso tiene el bloqueo)
+        """
+        now = now or datetime.utcnow()
+        engine = self.engine_source()
+        start = time.perf_counter()
+        summary: Dict[str, Any] = {"started_at": now.isoformat(), "partitions_added": 0,
+                                   "partitions_dropped": [], "audit_rows": 0, "tokens": 0, "skipped": False}
+
+        lock_connection = None
+        if _is_mysql(engine):
+            lock_connection = engine.connect()
+            if not lock_connection.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME}).scalar():
+                lock_connection.close()
+                summary["skipped"] = True
+                return summary
+
+        try:
+            cutoff = now - timedelta(days=self.audit_days)
+            if lock_connection is not None:
+                partitions = audit_partitions(lock_connection)
+                if partitions:
+                    summary["partitions_added"] = ensure_future_partitions(lock_connection, partitions, now.date())
+                    summary["partitions_dropped"] = drop_expired_partitions(lock_connection, partitions, cutoff)
+                lock_connection.commit()
+
+            # Lo que queda del mes límite (o toda la tabla si no está particionada)
+            audit = AuditLog.__table__
+            summary["audit_rows"] = purge_in_batches(
+                engine, audit, audit.c.timestamp < cutoff, audit.c.timestamp, self.batch_size)
+
+            tokens = SessionToken.__table__
+            summary["tokens"] = purge_in_batches(
+                engine, tokens, tokens.c.expires_at < now - timedelta(days=self.token_grace_days),
+                tokens.c.expires_at, self.batch_size)
+            summary["tokens"] += purge_in_batches(
+                engine, tokens, tokens.c.is_active.is_(False), tokens.c.id, self.batch_size)
+        finally:
+            if lock_connection is not None:
+                lock_connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+                lock_connection.close()
+
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+        self.last_run = summary
+        logger.info("Retención: %s", summary)
+        return summary
+
+    def ensure_started(self):
+        """Inicia el hilo programado si hay intervalo y aún no corre en este proceso"""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='retention', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        # Desfase aleatorio: los workers no despiertan todos a la vez
+        while not self._stop.wait(self.interval * random.uniform(0.9, 1.1)):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Falló la retención de auditoría y tokens: %s", e)
+
+    def stop(self, timeout: float = 5.0):
+        """Detiene el hilo programado (una pasada en curso termina su lote actual)"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def after_fork(self):
+        """El hilo del maestro no existe en el worker: se vuelve a crear en la próxima petición"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+
+def audit_log_page(cursor: Optional[str] = None, per_page: int = 50,
+                   user_id: Optional[int] = None) -> Tuple[List[AuditLog], Optional[str]]:
+    """
+    Una página del visor de auditoría, de la más reciente a la más antigua
+
+    Paginación por llave: la página siguiente empieza después de (timestamp, id) de la
+    última fila, así que no hay OFFSET que recorra las páginas anteriores
+
+    Args:
+        cursor: Valor next_cursor de la página anterior ('<timestamp ISO>|<id>')
+        per_page: Filas por página
+        user_id: Filtrar por usuario
+
+    Returns:
+        Tupla (filas, cursor de la página siguiente o None si es la última)
+
+    Raises:
+        ValueError: Si el cursor está mal formado
+    """
+    query = AuditLog.query
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if cursor:
+        stamp, _, last_id = cursor.partition('|')
+        stamp, last_id = datetime.fromisoformat(stamp), int(last_id)
+        query = query.filter(or_(AuditLog.timestamp < stamp,
+                                 and_(AuditLog.timestamp == stamp, AuditLog.id < last_id)))
+    rows = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, f"{rows[-1].timestamp.isoformat()}|{rows[-1].id}"
+
+
+def init_retention(app, engine_source: Callable[[], Any]) -> RetentionJob:
+    """
+    Registra el trabajo de retención de la aplicación
+
+    Con RETENTION_INTERVAL_SECONDS > 0 el hilo arranca en la primera petición de cada worker
+    """
+    job = RetentionJob(engine_source, interval=int(app.config.get('RETENTION_INTERVAL_SECONDS',
+                                                                   RETENTION_INTERVAL_SECONDS)))
+    app.extensions[EXTENSION_KEY] = job
+    if job.interval > 0:
+        app.before_request(job.ensure_started)
+    return job
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retención de auditoría y tokens de sesión de SugarBI")
+    parser.add_argument('--migrate', action='store_true',
+                        help='Crear índices faltantes y particionar audit_logs (MySQL) antes de purgar')
+    parser.add_argument('--days', type=int, default=AUDIT_RETENTION_DAYS, help='Días de auditoría a conservar')
+    args = parser.parse_args()
+
+    from server import create_app
+    from server.services import get_services
+
+    app = create_app(('auth',))
+    engine = get_services(app).get_engine()
+    if args.migrate:
+        ensure_indexes(engine)
+        if partition_audit_logs(engine):
+            print("🗂️  audit_logs particionada por mes")
+    summary = RetentionJob(lambda: engine, audit_days=args.days).run_once()
+    if summary["skipped"]:
+        print("⏭️  Otra ejecución de retención está en curso")
+        return
+    print(f"🧹 Auditoría: {summary['audit_rows']} filas y {len(summary['partitions_dropped'])} particiones "
+          f"eliminadas, {summary['partitions_added']} creadas; tokens purgados: {summary['tokens']} "
+          f"({summary['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
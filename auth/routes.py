@@ -5,10 +5,11 @@ Rutas de autenticación y gestión de usuarios
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.urls import url_parse
-from auth.models import db, User, Role, SessionToken, AuditLog
+from auth.models import db, User, Role, AuditLog
 from auth.forms import LoginForm, RegisterForm, ChangePasswordForm, UserEditForm, RoleForm
 from auth.security import security_manager, require_auth, require_permission, audit_log
-from datetime import datetime, timedelta
+from auth.retention import audit_log_page
+from auth.tokens import TokenError, get_token_service
 import logging
 
 # Crear blueprint de autenticación
@@ -31,6 +32,7 @@ def login():
                 # Incrementar intentos de login
                 if user:
                     user.increment_login_attempts()
+                    db.session.commit()
                     security_manager.log_security_event('FAILED_LOGIN', {
                         'username': form.username.data,
                         'reason': 'invalid_password'
@@ -66,19 +68,7 @@ def login():
             login_user(user, remember=form.remember_me.data)
             user.reset_login_attempts()
             
-            # Crear token de sesión
-            token = SessionToken.generate_token()
-            session_token = SessionToken(
-                token=token,
-                user_id=user.id,
-                expires_at=datetime.utcnow() + timedelta(days=30),
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent')
-            )
-            db.session.add(session_token)
-            db.session.commit()
-            
-            # Registrar en log de auditoría
+            # Registrar en log de auditoría (mismo commit que el reinicio de intentos)
             audit_entry = AuditLog(
                 user_id=user.id,
                 action='LOGIN',
@@ -194,6 +184,7 @@ def edit_user(user_id):
             user.role_id = form.role_id.data
             user.is_active = form.is_active.data
             
+            # Al confirmar, la caché de permisos y los tokens del usuario se invalidan solos
             db.session.commit()
             
             # Registrar en auditoría
@@ -226,7 +217,7 @@ def change_password():
     
     if form.validate_on_submit():
         try:
-            current_user.set_password(form.new_password.data)
+            current_user.model().set_password(form.new_password.data)
             db.session.commit()
             
             # Registrar en auditoría
@@ -307,12 +298,13 @@ def create_role():
 @auth_bp.route('/audit-logs')
 @require_permission('system.admin')
 def audit_logs():
-    """Logs de auditoría"""
-    page = request.args.get('page', 1, type=int)
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).paginate(
-        page=page, per_page=50, error_out=False
-    )
-    return render_template('auth/audit_logs.html', logs=logs)
+    """Logs de auditoría (paginación por llave: ?cursor=<next_cursor>)"""
+    try:
+        logs, next_cursor = audit_log_page(request.args.get('cursor'), per_page=50,
+                                           user_id=request.args.get('user_id', type=int))
+    except ValueError:
+        logs, next_cursor = audit_log_page(None, per_page=50)
+    return render_template('auth/audit_logs.html', logs=logs, next_cursor=next_cursor)
 
 # API endpoints para autenticación
 @auth_bp.route('/api/login', methods=['POST'])
@@ -329,17 +321,15 @@ def api_login():
         if user and user.check_password(data['password']) and user.is_active and not user.is_locked():
             login_user(user)
             user.reset_login_attempts()
+            db.session.commit()
             
-            # Crear token JWT
-            import jwt
-            token = jwt.encode({
-                'user_id': user.id,
-                'exp': datetime.utcnow() + timedelta(hours=24)
-            }, current_app.config['SECRET_KEY'], algorithm='HS256')
+            # Crear tokens JWT (acceso sin estado + refresco)
+            tokens = get_token_service().issue(user)
             
             return jsonify({
                 'success': True,
-                'token': token,
+                'token': tokens['access_token'],
+                'refresh_token': tokens['refresh_token'],
                 'user': {
                     'id': user.id,
                     'username': user.username,
@@ -350,6 +340,7 @@ def api_login():
         else:
             if user:
                 user.increment_login_attempts()
+                db.session.commit()
                 security_manager.log_security_event('API_FAILED_LOGIN', {
                     'username': data['username'],
                     'reason': 'invalid_credentials'
@@ -378,32 +369,16 @@ def api_verify_token():
         return jsonify({'error': 'Token requerido'}), 400
     
     try:
-        import jwt
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        user = User.query.get(payload['user_id'])
-        
-        if user and user.is_active:
-            return jsonify({
-                'valid': True,
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'role': user.role.name if user.role else None
-                }
-            })
-        else:
-            return jsonify({'valid': False}), 401
-            
-    except jwt.ExpiredSignatureError:
-        return jsonify({'valid': False, 'error': 'Token expirado'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'valid': False, 'error': 'Token inválido'}), 401
-    except Exception as e:
-        logging.error(f"Error verificando token: {str(e)}")
-        return jsonify({'error': 'Error interno del servidor'}), 500
-
-
-
-
-
+        # Verificación sin estado: el token trae usuario, rol y permisos firmados
+        user = get_token_service().user_from_token(token)
+        return jsonify({
+            'valid': True,
+            'user': {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'role': user.role.name if user.role else None
+            }
+        })
+    except TokenError as e:
+        return jsonify({'valid': False, 'error': str(e)}), 401
@@ -6,16 +6,81 @@ import re
 import bleach
 import validators
 from flask import request, current_app
-from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from functools import wraps
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 from datetime import datetime, timedelta
 import hashlib
 import secrets
 
 # Configurar logging de seguridad
 security_logger = logging.getLogger('security')
+# Hilo que escribe SECURITY_LOG_FILE (uno por proceso), su handler de cola y proceso que lo creó
+_security_listener = None
+_security_queue_handler = None
+_security_listener_pid = None
+
+
+def stop_security_logging():
+    """Escribe los eventos pendientes y detiene el hilo del archivo de seguridad"""
+    global _security_listener
+    if _security_listener is not None:
+        _security_listener.stop()
+        _security_listener = None
+
+
+def restart_security_logging():
+    """
+    Vuelve a crear el hilo del archivo de seguridad en un proceso hijo (tras un fork)
+
+    La cola también se reemplaza: la heredada puede tener registrado como esperando al
+    hilo del maestro, que no existe en el hijo, y se tragaría las notificaciones
+    """
+    global _security_listener, _security_listener_pid
+    if _security_listener is not None and _security_listener_pid != os.getpid():
+        from auth.audit_writer import SECURITY_LOG_QUEUE_SIZE
+
+        log_queue = queue.Queue(SECURITY_LOG_QUEUE_SIZE)
+        _security_queue_handler.queue = log_queue
+        _security_listener = logging.handlers.QueueListener(
+            log_queue, *_security_listener.handlers, respect_handler_level=True
+        )
+        _security_listener.start()
+        _security_listener_pid = os.getpid()
+
+# Patrones de inyección SQL y XSS; se compilan una vez al importar el módulo
+SQL_PATTERNS = (
+    r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)",
+    r"(--|#|/\*|\*/)",
+    r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
+    r"(\b(OR|AND)\s+'.*'\s*=\s*'.*')",
+)
+XSS_PATTERNS = (
+    r"<script[^>]*>.*?</script>",
+    r"javascript:",
+    r"on\w+\s*=",
+    r"<iframe[^>]*>",
+    r"<object[^>]*>",
+    r"<embed[^>]*>",
+)
+HTML_ALLOWED_TAGS = ['b', 'i', 'em', 'strong', 'p', 'br']
+
+# Una sola expresión con todas las alternativas: el caso normal (sin coincidencias) es una pasada
+_SUSPICIOUS_RE = re.compile('|'.join(f"(?:{pattern})" for pattern in SQL_PATTERNS + XSS_PATTERNS), re.IGNORECASE)
+_SQL_KEYWORD_RE = re.compile(SQL_PATTERNS[0], re.IGNORECASE)
+# Sin '-', '#', '/', '*', '=', comillas simples, '<', '>' ni ':' solo puede coincidir SQL_PATTERNS[0]
+_PLAIN_TEXT_RE = re.compile(r'[\w\s¿?¡!.,;()%"]*')
+_HTML_SPECIAL_RE = re.compile(r'[<>&]')
+_PATTERN_GROUPS = (
+    ('SQL_INJECTION_ATTEMPT', tuple((p, re.compile(p, re.IGNORECASE)) for p in SQL_PATTERNS),
+     "Input contiene patrones sospechosos"),
+    ('XSS_ATTEMPT', tuple((p, re.compile(p, re.IGNORECASE)) for p in XSS_PATTERNS),
+     "Input contiene patrones XSS"),
+)
 
 class SecurityManager:
     """Gestor de seguridad para la aplicación"""
@@ -30,12 +95,9 @@ class SecurityManager:
         """Inicializar la aplicación con medidas de seguridad"""
         self.app = app
         
-        # Configurar rate limiting
-        self.limiter = Limiter(
-            app=app,
-            key_func=get_remote_address,
-            default_limits=["1000 per hour", "100 per minute"]
-        )
+        # Configurar rate limiting (contadores compartidos entre workers)
+        from auth.rate_limit import init_rate_limits
+        self.limiter = init_rate_limits(app)
         
         # Configurar headers de seguridad
         self.setup_security_headers()
@@ -78,15 +140,27 @@ class SecurityManager:
             return response
     
     def setup_security_logging(self):
-        """Configurar logging de seguridad"""
-        if not self.app.debug:
-            security_handler = logging.FileHandler('logs/security.log')
+        """
+        Configurar logging de seguridad
+
+        El archivo (SECURITY_LOG_FILE) se escribe en un hilo aparte (cola acotada):
+        log_security_event no espera al disco. Se configura una vez por proceso aunque
+        se creen varias apps; en depuración y en pruebas no se escribe
+        """
+        global _security_listener, _security_queue_handler, _security_listener_pid
+        if not (self.app.debug or self.app.testing) and _security_listener is None:
+            from auth.audit_writer import queue_file_handler
+
+            security_handler = logging.FileHandler(self.app.config.get('SECURITY_LOG_FILE', 'logs/security.log'))
             security_handler.setLevel(logging.WARNING)
             formatter = logging.Formatter(
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
             security_handler.setFormatter(formatter)
-            security_logger.addHandler(security_handler)
+            _security_queue_handler, _security_listener = queue_file_handler(security_handler)
+            _security_listener_pid = os.getpid()
+            security_logger.addHandler(_security_queue_handler)
+            atexit.register(stop_security_logging)
     
     def log_security_event(self, event_type, details, user_id=None, ip_address=None):
         """Registrar evento de seguridad"""
@@ -101,15 +175,34 @@ class SecurityManager:
         
         security_logger.warning(f"Security Event: {log_data}")
     
+    def _check_patterns(self, data, field=None):
+        """Lanza ValueError si el texto contiene un patrón de inyección SQL o XSS"""
+        # Texto llano (palabras, espacios y puntuación común): solo pueden aparecer palabras clave SQL
+        if _PLAIN_TEXT_RE.fullmatch(data):
+            if _SQL_KEYWORD_RE.search(data) is None:
+                return
+        elif _SUSPICIOUS_RE.search(data) is None:
+            return
+
+        # Camino raro: identificar el patrón para el registro (SQL tiene prioridad sobre XSS)
+        for event_type, patterns, message in _PATTERN_GROUPS:
+            for pattern, compiled in patterns:
+                if compiled.search(data):
+                    details = {'input': data, 'pattern': pattern}
+                    if field is not None:
+                        details['field'] = field
+                    self.log_security_event(event_type, details)
+                    raise ValueError(message)
+
     def validate_input(self, data, input_type='text'):
-        """Validar y sanitizar input del usuario"""
+        """Validar y sanitizar input del usuario (patrones compilados una sola vez)"""
         if not data:
             return None
         
-        # Sanitizar HTML
+        # Sanitizar HTML (sin '<', '>' ni '&' bleach no cambiaría nada)
         if input_type == 'html':
-            allowed_tags = ['b', 'i', 'em', 'strong', 'p', 'br']
-            data = bleach.clean(data, tags=allowed_tags, strip=True)
+            if _HTML_SPECIAL_RE.search(data):
+                data = bleach.clean(data, tags=HTML_ALLOWED_TAGS, strip=True)
         
         # Validar email
         elif input_type == 'email':
@@ -121,42 +214,42 @@ class SecurityManager:
             if not validators.url(data):
                 raise ValueError("URL inválida")
         
-        # Validar SQL injection patterns
-        sql_patterns = [
-            r"(\b(SELECT|INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|EXEC|UNION|SCRIPT)\b)",
-            r"(--|#|/\*|\*/)",
-            r"(\b(OR|AND)\s+\d+\s*=\s*\d+)",
-            r"(\b(OR|AND)\s+'.*'\s*=\s*'.*')",
-        ]
-        
-        for pattern in sql_patterns:
-            if re.search(pattern, data, re.IGNORECASE):
-                self.log_security_event('SQL_INJECTION_ATTEMPT', {
-                    'input': data,
-                    'pattern': pattern
-                })
-                raise ValueError("Input contiene patrones sospechosos")
-        
-        # Validar XSS patterns
-        xss_patterns = [
-            r"<script[^>]*>.*?</script>",
-            r"javascript:",
-            r"on\w+\s*=",
-            r"<iframe[^>]*>",
-            r"<object[^>]*>",
-            r"<embed[^>]*>",
-        ]
-        
-        for pattern in xss_patterns:
-            if re.search(pattern, data, re.IGNORECASE):
-                self.log_security_event('XSS_ATTEMPT', {
-                    'input': data,
-                    'pattern': pattern
-                })
-                raise ValueError("Input contiene patrones XSS")
+        self._check_patterns(data)
         
         return data.strip()
     
+    def validate_json(self, payload, path='$'):
+        """
+        Valida en una sola pasada todos los textos de un cuerpo JSON (claves y valores)
+
+        Args:
+            payload: Cuerpo ya decodificado (dict, list o escalar)
+            path: Ruta del nodo, para indicar el campo rechazado
+
+        Returns:
+            El mismo payload, sin modificar
+
+        Raises:
+            ValueError: Con la ruta ($.campo[índice]) de un campo sospechoso
+        """
+        stack = [(path, payload)]
+        while stack:
+            node_path, node = stack.pop()
+            if isinstance(node, str):
+                try:
+                    self._check_patterns(node, node_path)
+                except ValueError as e:
+                    raise ValueError(f"{e} ({node_path})")
+            elif isinstance(node, dict):
+                for key, value in node.items():
+                    child_path = f"{node_path}.{key}"
+                    if isinstance(key, str):
+                        stack.append((child_path, key))
+                    stack.append((child_path, value))
+            elif isinstance(node, (list, tuple)):
+                stack.extend((f"{node_path}[{index}]", value) for index, value in enumerate(node))
+        return payload
+
     def generate_csrf_token(self):
         """Generar token CSRF"""
         return secrets.token_urlsafe(32)
@@ -191,11 +284,19 @@ def require_permission(permission):
     return decorator
 
 def rate_limit(limit):
-    """Decorador para rate limiting personalizado"""
+    """Decorador para un límite propio del endpoint (p. ej. '10 per minute'), además del general"""
+    from limits import parse_many
+    from auth.rate_limit import EXTENSION_KEY, too_many_requests
+    limits = parse_many(limit)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Implementar rate limiting personalizado si es necesario
+            limiter = current_app.extensions.get(EXTENSION_KEY)
+            if limiter is not None:
+                retry_after = limiter.hit(f"endpoint:{request.endpoint}", get_remote_address(), limits)
+                if retry_after is not None:
+                    return too_many_requests(retry_after)
             return f(*args, **kwargs)
         return decorated_function
     return decorator
@@ -210,17 +311,23 @@ def audit_log(action, resource=None):
             
             result = f(*args, **kwargs)
             
-            # Registrar en log de auditoría
+            # Registrar en log de auditoría (en lote, fuera de la petición, si hay escritor)
             if current_user.is_authenticated:
-                audit_entry = AuditLog(
-                    user_id=current_user.id,
-                    action=action,
-                    resource=resource,
-                    ip_address=get_remote_address(),
-                    user_agent=request.headers.get('User-Agent')
-                )
-                db.session.add(audit_entry)
-                db.session.commit()
+                writer = current_app.extensions.get('audit_writer')
+                if writer is not None:
+                    writer.submit(current_user.id, action, resource,
+                                  ip_address=get_remote_address(),
+                                  user_agent=request.headers.get('User-Agent'))
+                else:
+                    audit_entry = AuditLog(
+                        user_id=current_user.id,
+                        action=action,
+                        resource=resource,
+                        ip_address=get_remote_address(),
+                        user_agent=request.headers.get('User-Agent')
+                    )
+                    db.session.add(audit_entry)
+                    db.session.commit()
             
             return result
         return decorated_function
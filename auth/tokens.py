@@ -0,0 +1,228 @@
+"""
+Tokens de acceso sin estado (JWT) para la API de SugarBI
+El token de acceso lleva el rol y los permisos firmados, así que verificarlo no consulta
+la base de datos (decenas de microsegundos con HS256). Es de vida corta y se renueva con
+un token de refresco, que sí vuelve a leer el usuario para recoger cambios de rol o de
+estado. Las revocaciones (logout, rotación de refresco, usuario editado) se guardan en
+memoria solo hasta que expira el token revocado.
+
+La lista de revocados es por proceso: en otro worker un token revocado sigue valiendo
+hasta su expiración (ACCESS_TOKEN_MINUTES acota esa ventana)
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import jwt
+from flask import current_app, has_app_context
+from sqlalchemy.orm import joinedload
+
+from auth.models import User
+from auth.permission_cache import CachedRole, CachedUser
+
+# Vida de los tokens
+ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', 15))
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', 7))
+JWT_ALGORITHM = 'HS256'
+# Tolerancia de reloj entre servidores al validar exp
+JWT_LEEWAY_SECONDS = 5
+
+EXTENSION_KEY = 'tokens'
+
+
+class TokenError(ValueError):
+    """Token ausente, mal formado, expirado o revocado"""
+
+
+class TokenDenylist:
+    """Identificadores (jti) revocados hasta su expiración y cortes de revocación por usuario"""
+
+    # Cada cuántas revocaciones se eliminan las entradas ya expiradas
+    PRUNE_EVERY = 256
+
+    def __init__(self):
+        self._tokens: Dict[str, float] = {}
+        # Corte por usuario en microsegundos: iat (segundos enteros) no distingue un token
+        # emitido en el mismo segundo, antes o después de la revocación
+        self._users: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._since_prune = 0
+
+    def revoke(self, jti: str, expires_at: float):
+        with self._lock:
+            self._tokens[jti] = expires_at
+            self._since_prune += 1
+            if self._since_prune >= self.PRUNE_EVERY:
+                self._prune(time.time())
+
+    def revoke_user(self, user_id: int, issued_before: int):
+        """Invalida todos los tokens del usuario emitidos hasta issued_before (microsegundos)"""
+        with self._lock:
+            self._users[user_id] = issued_before
+
+    def issue_stamp(self, user_id: int) -> int:
+        """Instante de emisión en microsegundos, siempre posterior al corte del usuario"""
+        now = time.time_ns() // 1000
+        cutoff = self._users.get(user_id)
+        return now if cutoff is None or now > cutoff else cutoff + 1
+
+    def is_revoked(self, jti: str, user_id: int, issued_at: int) -> bool:
+        # Lecturas de dict sin bloqueo: atómicas en CPython
+        cutoff = self._users.get(user_id)
+        return jti in self._tokens or (cutoff is not None and issued_at <= cutoff)
+
+    def _prune(self, now: float):
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        # Un corte por usuario deja de importar cuando ya expiraron todos sus refrescos
+        horizon = int((now - REFRESH_TOKEN_DAYS * 86400) * 1_000_000)
+        self._users = {user_id: cutoff for user_id, cutoff in self._users.items() if cutoff > horizon}
+        self._since_prune = 0
+
+    def __len__(self):
+        return len(self._tokens)
+
+
+class TokenService:
+    """Emite, verifica, renueva y revoca tokens de una aplicación"""
+
+    def __init__(self, secret: str, access_minutes: int = ACCESS_TOKEN_MINUTES,
+                 refresh_days: int = REFRESH_TOKEN_DAYS):
+        self.secret = secret
+        self.access_seconds = access_minutes * 60
+        self.refresh_seconds = refresh_days * 86400
+        self.denylist = TokenDenylist()
+
+    def _encode(self, claims: Dict[str, Any], lifetime: int) -> str:
+        now = int(time.time())
+        # ius: emisión en microsegundos, la que se compara con el corte de revoke_user
+        claims.update({"iat": now, "exp": now + lifetime, "jti": uuid.uuid4().hex,
+                       "ius": self.denylist.issue_stamp(int(claims["sub"]))})
+        return jwt.encode(claims, self.secret, algorithm=JWT_ALGORITHM)
+
+    def issue(self, user) -> Dict[str, Any]:
+        """
+        Emite un par de tokens para un usuario (modelo del ORM o CachedUser)
+
+        Returns:
+            Diccionario con access_token, refresh_token, token_type y expires_in
+        """
+        role = user.role
+        permissions = role.permissions if role else ()
+        access = self._encode({
+            "sub": str(user.id),
+            "typ": "access",
+            "usr": user.username,
+            "eml": user.email,
+            "adm": bool(user.is_admin),
+            "rid": role.id if role else None,
+            "rol": role.name if role else None,
+            "prm": sorted(permissions or ())
+        }, self.access_seconds)
+        refresh = self._encode({"sub": str(user.id), "typ": "refresh"}, self.refresh_seconds)
+        return {
+            "access_token": access,
+            "refresh_token": refresh,
+            "token_type": "Bearer",
+            "expires_in": self.access_seconds
+        }
+
+    def decode(self, token: str, token_type: str = 'access') -> Dict[str, Any]:
+        """
+        Verifica firma, expiración, tipo y revocación de un token
+
+        Raises:
+            TokenError: Si el token no es válido
+        """
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[JWT_ALGORITHM], leeway=JWT_LEEWAY_SECONDS,
+                                options={"require": ["exp", "iat", "jti", "sub", "ius"]})
+        except jwt.ExpiredSignatureError:
+            raise TokenError("Token expirado")
+        except jwt.InvalidTokenError:
+            raise TokenError("Token inválido")
+
+        if claims.get("typ") != token_type:
+            raise TokenError("Tipo de token incorrecto")
+        if self.denylist.is_revoked(claims["jti"], int(claims["sub"]), claims["ius"]):
+            raise TokenError("Token revocado")
+        return claims
+
+    def user_from_token(self, token: str) -> CachedUser:
+        """current_user a partir de un token de acceso, sin consultar la base de datos"""
+        claims = self.decode(token, 'access')
+        role = CachedRole(claims["rid"], claims["rol"], frozenset(claims["prm"])) if claims.get("rol") else None
+        return CachedUser(int(claims["sub"]), claims["usr"], claims.get("eml"), True, claims.get("adm", False), role)
+
+    def refresh(self, refresh_token: str) -> Dict[str, Any]:
+        """
+        Renueva el par de tokens (rotación: el refresco usado queda revocado)
+
+        Lee el usuario una vez para reflejar cambios de rol, permisos o estado
+
+        Raises:
+            TokenError: Si el token no es válido o el usuario ya no está activo
+        """
+        claims = self.decode(refresh_token, 'refresh')
+        user = User.query.options(joinedload(User.role)).filter_by(id=int(claims["sub"])).first()
+        if user is None or not user.is_active:
+            raise TokenError("Usuario inexistente o desactivado")
+        self.denylist.revoke(claims["jti"], claims["exp"])
+        return self.issue(user)
+
+    def revoke(self, token: str, token_type: str = 'access'):
+        """Revoca un token válido (los inválidos se ignoran: ya no sirven)"""
+        try:
+            claims = self.decode(token, token_type)
+        except TokenError:
+            return
+        self.denylist.revoke(claims["jti"], claims["exp"])
+
+    def revoke_user(self, user_id: int):
+        """Revoca todos los tokens emitidos hasta ahora para un usuario"""
+        self.denylist.revoke_user(user_id, time.time_ns() // 1000)
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """Token de una cabecera 'Authorization: Bearer <token>'"""
+    if authorization and authorization[:7].lower() == 'bearer ':
+        return authorization[7:].strip() or None
+    return None
+
+
+def init_tokens(app, login_manager) -> TokenService:
+    """
+    Registra el servicio de tokens y autentica las peticiones con 'Authorization: Bearer'
+
+    Usa JWT_SECRET_KEY si está definido, si no SECRET_KEY
+    """
+    service = TokenService(app.config.get('JWT_SECRET_KEY') or app.config['SECRET_KEY'])
+    app.extensions[EXTENSION_KEY] = service
+
+    @login_manager.request_loader
+    def load_user_from_request(request):
+        token = bearer_token(request.headers.get('Authorization'))
+        if token is None:
+            return None
+        try:
+            return service.user_from_token(token)
+        except TokenError:
+            return None
+
+    return service
+
+
+def get_token_service() -> Optional[TokenService]:
+    """Servicio de tokens de la aplicación activa (None si no se registró)"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get(EXTENSION_KEY)
+
+
+def revoke_user_tokens(user_id: int):
+    """Revoca los tokens de un usuario en la aplicación activa"""
+    service = get_token_service()
+    if service is not None:
+        service.revoke_user(user_id)
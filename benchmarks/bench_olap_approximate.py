@@ -0,0 +1,111 @@
+"""
+Benchmark de consultas OLAP aproximadas
+
+Compara la consulta exacta (GROUP BY sobre hechos_cosecha) con la respuesta desde la
+muestra estratificada en memoria, en una base SQLite sintética del tamaño indicado.
+También reporta qué tan seguido el valor exacto cae dentro del intervalo de confianza.
+
+Uso:
+    python benchmarks/bench_olap_approximate.py --rows 500000 --sample 20000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+
+from dashboard.olap_engine import AggregationFunction, DimensionLevel, OLAEEngine, OLAPOperation, OLAPQuery
+from dashboard.sampling import build_sample
+
+ZONES = [1, 2, 3, 4]
+YEARS = list(range(2010, 2026))
+
+
+def create_database(path: Path, rows: int, sample: int):
+    engine = create_engine(f"sqlite:///{path}")
+    rng = np.random.default_rng(0)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimzona (codigo_zona INTEGER, nombre_zona INTEGER)"))
+        conn.execute(text("CREATE TABLE dimtiempo (tiempo_id INTEGER, año INTEGER, trimestre INTEGER, mes INTEGER, fecha TEXT)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (id_finca INTEGER, codigo_zona INTEGER, codigo_variedad INTEGER, "
+                          "codigo_tiempo INTEGER, toneladas_cana_molida REAL, tch REAL)"))
+        conn.execute(text("INSERT INTO dimfinca VALUES (:i, :i, :n)"),
+                     [{"i": i, "n": f"Finca {i}"} for i in range(1, 81)])
+        conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"),
+                     [{"i": i, "n": f"CC {i:02d}"} for i in range(1, 13)])
+        conn.execute(text("INSERT INTO dimzona VALUES (:z, :z)"), [{"z": zone} for zone in ZONES])
+        conn.execute(text("INSERT INTO dimtiempo VALUES (:i, :y, 1, 1, '')"),
+                     [{"i": i, "y": year} for i, year in enumerate(YEARS, start=1)])
+        farms = rng.integers(1, 81, rows)
+        # Cada finca pertenece a una zona, como en los datos fuente
+        conn.execute(text("INSERT INTO hechos_cosecha VALUES (:f, :z, :v, :t, :ton, :tch)"), [
+            {"f": int(f), "z": ZONES[f % len(ZONES)], "v": int(v), "t": int(t), "ton": float(ton), "tch": float(tch)}
+            for f, v, t, ton, tch in zip(farms, rng.integers(1, 13, rows), rng.integers(1, len(YEARS) + 1, rows),
+                                         rng.gamma(4, 15, rows).round(2), rng.normal(100, 18, rows).round(1))])
+        stats = build_sample(conn, budget=sample, seed=1)
+    return engine, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--sample', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"⏳ Creando {args.rows} hechos y la muestra...")
+        engine, stats = create_database(Path(directory) / 'olap.db', args.rows, args.sample)
+        print(f"   Muestra: {stats['sample_rows']} filas en {stats['strata']} estratos")
+
+        olap = OLAEEngine(engine=engine)
+        # Sin refinamiento: se mide siempre la respuesta desde la muestra
+        olap._schedule_refinement = lambda *args: None
+        query = OLAPQuery(
+            operation=OLAPOperation.AGGREGATE,
+            measures=['toneladas', 'tch'],
+            dimensions=['tiempo', 'producto'],
+            dimension_levels={'tiempo': DimensionLevel.YEAR, 'producto': DimensionLevel.VARIETY},
+            filters={},
+            aggregation_functions=[AggregationFunction.SUM, AggregationFunction.AVG],
+            limit=1000,
+            approximate=True
+        )
+        olap.sample_frame()
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            approximate = olap.execute_olap_query(query)
+        approximate_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        exact_query = OLAPQuery(**{**query.__dict__, "approximate": False})
+        start = time.perf_counter()
+        exact = olap.execute_olap_query(exact_query)
+        exact_ms = (time.perf_counter() - start) * 1000
+
+        key = ('tiempo_year', 'producto_variety')
+        exact_rows = {tuple(row[k] for k in key): row for row in exact.data}
+        covered = total = 0
+        for row, intervals in zip(approximate.data, approximate.metadata["approximate"]["intervals"]):
+            for name in ('toneladas_sum', 'tch_avg'):
+                low, high = intervals[name]
+                covered += low <= exact_rows[tuple(row[k] for k in key)][name] <= high
+                total += 1
+
+        print(f"   Exacta:     {exact_ms:8.1f} ms")
+        print(f"   Aproximada: {approximate_ms:8.2f} ms  ({exact_ms / approximate_ms:.0f}x)")
+        print(f"   Cobertura del intervalo al {approximate.metadata['approximate']['confidence']:.0%}: "
+              f"{covered / total:.1%} de {total}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark de validación de entradas
+
+Compara la validación anterior (diez re.search por entrada, un patrón a la vez) con la
+de SecurityManager (expresión combinada compilada una vez y atajo para texto llano)
+sobre preguntas de chat realistas y cuerpos JSON del endpoint /api/chat.
+
+Uso:
+    python benchmarks/bench_validation.py --repeat 20000
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+
+from auth.security import SQL_PATTERNS, XSS_PATTERNS, SecurityManager, security_logger
+from server.api import EXAMPLE_QUERIES
+
+CHAT_INPUTS = EXAMPLE_QUERIES + [
+    "compara la producción de caña de la finca La Esperanza entre 2023 y 2024, por mes",
+    "¿qué variedades tuvieron un TCH mayor a 120 en la zona norte durante la zafra 2024-2025?",
+    "top 5 fincas por rendimiento (toneladas/ha) con brix promedio",
+    "dame el detalle de cosecha: finca, variedad, toneladas, brix y sacarosa del último trimestre",
+    "producción total por zona y variedad en 2025, ordenada de mayor a menor",
+]
+
+ATTACK_INPUTS = [
+    "fincas' OR '1'='1",
+    "producción; DROP TABLE hechos_cosecha --",
+    "<script>alert(1)</script>",
+    "<img src=x onerror=alert(1)>",
+]
+
+
+def legacy_check(data: str) -> bool:
+    """Validación anterior: cada patrón por separado con re.search (caché interna de re)"""
+    for pattern in SQL_PATTERNS:
+        if re.search(pattern, data, re.IGNORECASE):
+            return False
+    for pattern in XSS_PATTERNS:
+        if re.search(pattern, data, re.IGNORECASE):
+            return False
+    return True
+
+
+def new_check(manager: SecurityManager, data: str) -> bool:
+    try:
+        manager.validate_input(data)
+        return True
+    except ValueError:
+        return False
+
+
+def measure(function, inputs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in inputs:
+            function(data)
+    elapsed = time.perf_counter() - start
+    return repeat * len(inputs) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20000, help='Pasadas sobre las entradas de chat')
+    args = parser.parse_args()
+
+    manager = SecurityManager()
+    app = Flask(__name__)
+
+    # Mismo veredicto en todas las entradas (los ataques registran un evento: necesitan petición)
+    security_logger.disabled = True
+    with app.test_request_context():
+        for data in CHAT_INPUTS + ATTACK_INPUTS:
+            assert legacy_check(data) == new_check(manager, data), data
+
+    legacy = measure(legacy_check, CHAT_INPUTS, args.repeat)
+    combined = measure(lambda data: new_check(manager, data), CHAT_INPUTS, args.repeat)
+
+    bodies = [{"message": data, "session_id": "a1b2c3", "options": {"limit": 10, "chart": True}}
+              for data in CHAT_INPUTS]
+    legacy_json = measure(lambda body: legacy_check(body["message"]) and legacy_check(body["session_id"]),
+                          bodies, args.repeat // 2)
+    combined_json = measure(manager.validate_json, bodies, args.repeat // 2)
+
+    print(f"🛡️  Validación de {len(CHAT_INPUTS)} preguntas de chat x {args.repeat}")
+    print(f"   Anterior (10 re.search): {legacy:,.0f} entradas/s")
+    print(f"   Combinada:               {combined:,.0f} entradas/s  ({combined / legacy:.1f}x)")
+    print("📦 Cuerpos JSON de /api/chat")
+    print(f"   Anterior (por campo):    {legacy_json:,.0f} cuerpos/s")
+    print(f"   validate_json:           {combined_json:,.0f} cuerpos/s  ({combined_json / legacy_json:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
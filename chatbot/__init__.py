@@ -3,6 +3,12 @@ Módulo de Chatbot para SugarBI
 Incluye agente SQL con LangChain para consultas inteligentes
 """
 
-from .sql_agent import SugarBISQLAgent, SQLQueryOutputParser
-
 __all__ = ['SugarBISQLAgent', 'SQLQueryOutputParser']
+
+
+def __getattr__(name):
+    # LangChain tarda en importarse: el agente se carga solo cuando se usa
+    if name in __all__:
+        from . import sql_agent
+        return getattr(sql_agent, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,205 @@
+"""
+Pipeline asíncrono del chatbot para SugarBI
+Procesa preguntas sobre asyncio con un driver MySQL asíncrono (aiomysql), de modo que
+un solo worker pueda atender muchas consultas en curso sin bloquear hilos
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+from .sql_guard import SQLGuard, QueryGuardError
+from .responses import generate_natural_response, summarize_rows
+
+
+def to_async_url(database_url: str) -> str:
+    """Convierte una URL síncrona (mysql+pymysql) a su equivalente asíncrona (mysql+aiomysql)"""
+    for sync_prefix in ('mysql+pymysql://', 'mysql+mysqldb://', 'mysql://'):
+        if database_url.startswith(sync_prefix):
+            return 'mysql+aiomysql://' + database_url[len(sync_prefix):]
+    return database_url
+
+
+class AsyncChatPipeline:
+    """Versión asíncrona de SugarBISQLAgent.process_question"""
+
+    def __init__(self, database_url: str, sql_guard: Optional[SQLGuard] = None,
+                 sql_chain=None, pool_size: int = 10, async_engine=None, entity_index=None,
+                 intent_cache=None):
+        """
+        Inicializa el pipeline
+
+        Args:
+            database_url: URL de la base de datos (se convierte a aiomysql si es necesario)
+            sql_guard: Guardia de ejecución a usar (por defecto una nueva)
+            sql_chain: Cadena LangChain opcional para generar SQL con el LLM (se usa ainvoke)
+            pool_size: Tamaño del pool de conexiones asíncronas
+            async_engine: AsyncEngine ya construido (opcional, útil en pruebas)
+            entity_index: EntityIndex compartido para reconocer fincas, variedades y zonas (opcional)
+            intent_cache: IntentCache para memoizar intenciones (opcional)
+        """
+        if async_engine is None:
+            async_engine = create_async_engine(
+                to_async_url(database_url),
+                pool_size=pool_size,
+                pool_pre_ping=True
+            )
+        self.engine = async_engine
+        self.sql_guard = sql_guard or SQLGuard()
+        self.sql_chain = sql_chain
+        self.entity_index = entity_index
+        self.query_analyzer = UniversalQueryAnalyzer(entity_index, cache=intent_cache)
+        self.sql_generator = UniversalSQLGenerator()
+
+    async def analyze(self, question: str):
+        """Analiza la pregunta; la recarga del índice de entidades (si toca) corre fuera del event loop"""
+        if self.entity_index is not None:
+            await asyncio.to_thread(self.entity_index.refresh)
+        return self.query_analyzer.analyze_query(question)
+
+    async def generate_sql(self, question: str, intent) -> str:
+        """Genera el SQL; las llamadas al LLM se esperan sin ocupar un hilo"""
+        if self.sql_chain is not None:
+            return await self.sql_chain.ainvoke(question)
+        return self.sql_generator.generate_sql(intent)
+
+    async def process_question(self, question: str) -> Dict[str, Any]:
+        """
+        Procesa una pregunta y retorna la misma estructura que el agente síncrono
+
+        Args:
+            question: Pregunta en lenguaje natural
+
+        Returns:
+            Respuesta completa con datos, visualización, resumen y respuesta natural
+        """
+        try:
+            intent = await self.analyze(question)
+            sql_query = await self.generate_sql(question, intent)
+
+            # La configuración del gráfico solo depende de la intención: se calcula
+            # mientras la base de datos resuelve la consulta
+            visualization_task = asyncio.create_task(
+                asyncio.to_thread(self.sql_generator.get_visualization_config, intent)
+            )
+
+            try:
+                result = await self.sql_guard.execute_async(self.engine, sql_query)
+            except QueryGuardError as e:
+                visualization_task.cancel()
+                return self._error_response(f"Consulta rechazada: {e}", sql_query)
+            except Exception as e:
+                visualization_task.cancel()
+                return self._error_response(str(e), sql_query)
+
+            query_result = {
+                "data": result.rows,
+                "columns": result.columns,
+                "row_count": result.row_count
+            }
+
+            # Pasos independientes en paralelo sobre el resultado
+            visualization, summary, natural_response = await asyncio.gather(
+                visualization_task,
+                asyncio.to_thread(summarize_rows, result.rows, result.columns),
+                asyncio.to_thread(generate_natural_response, question, query_result)
+            )
+
+            return {
+                "success": True,
+                "query": question,
+                "intent": {
+                    "type": "select",
+                    "metrics": [m.value for m in intent.metrics],
+                    "dimensions": [d.value for d in intent.dimensions],
+                    "filters": intent.filters,
+                    "limit": intent.limit
+                },
+                "sql": sql_query,
+                "visualization": visualization,
+                "data": result.rows,
+                "raw_data": result.rows,
+                "row_count": result.row_count,
+                "truncated": result.truncated,
+                "summary": summary,
+                "natural_response": natural_response
+            }
+
+        except Exception as e:
+            return self._error_response(f"Error inesperado: {e}")
+
+    async def stream_question(self, question: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Procesa una pregunta entregando cada etapa en cuanto está disponible
+
+        Yields:
+            Tuplas (evento, datos) en orden: intent, rows (uno por lote), chart, text, done.
+            Ante un fallo se entrega un único evento error.
+        """
+        visualization_task = None
+        try:
+            intent = await self.analyze(question)
+            sql_query = await self.generate_sql(question, intent)
+            yield "intent", {
+                "query": question,
+                "intent": {
+                    "type": "select",
+                    "metrics": [m.value for m in intent.metrics],
+                    "dimensions": [d.value for d in intent.dimensions],
+                    "filters": intent.filters,
+                    "limit": intent.limit
+                },
+                "sql": sql_query
+            }
+
+            visualization_task = asyncio.create_task(
+                asyncio.to_thread(self.sql_generator.get_visualization_config, intent)
+            )
+
+            result = None
+            async for result, new_rows in self.sql_guard.stream_async(self.engine, sql_query):
+                if new_rows:
+                    yield "rows", {"rows": new_rows, "columns": result.columns}
+
+            yield "chart", {"visualization": await visualization_task}
+
+            query_result = {
+                "data": result.rows,
+                "columns": result.columns,
+                "row_count": result.row_count
+            }
+            summary, natural_response = await asyncio.gather(
+                asyncio.to_thread(summarize_rows, result.rows, result.columns),
+                asyncio.to_thread(generate_natural_response, question, query_result)
+            )
+            yield "text", {"natural_response": natural_response}
+
+            yield "done", {
+                "record_count": result.row_count,
+                "truncated": result.truncated,
+                "summary": summary
+            }
+
+        except QueryGuardError as e:
+            yield "error", {"error": f"Consulta rechazada: {e}"}
+        except Exception as e:
+            yield "error", {"error": str(e)}
+        finally:
+            if visualization_task is not None and not visualization_task.done():
+                visualization_task.cancel()
+
+    def _error_response(self, error: str, sql_query: Optional[str] = None) -> Dict[str, Any]:
+        response = {
+            "success": False,
+            "error": error,
+            "natural_response": f"Lo siento, hubo un error al procesar tu consulta: {error}"
+        }
+        if sql_query:
+            response["sql"] = sql_query
+        return response
+
+    async def aclose(self):
+        """Libera el pool de conexiones"""
+        await self.engine.dispose()
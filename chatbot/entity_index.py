@@ -0,0 +1,324 @@
+"""
+Índice de entidades para SugarBI
+Reconoce nombres de fincas, variedades y zonas dentro de una pregunta (con o sin tildes
+y con errores de escritura menores) y los convierte en filtros por clave subrogada
+"""
+
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from dashboard.data_version import DataVersion, resolve_engine
+
+# Consultas de carga por tipo de entidad: (clave, nombre)
+ENTITY_QUERIES = {
+    'finca': "SELECT finca_id, nombre_finca FROM dimfinca",
+    'variedad': "SELECT variedad_id, nombre_variedad FROM dimvariedad",
+    'zona': "SELECT codigo_zona, nombre_zona FROM dimzona",
+}
+
+# Nombre del filtro que produce cada tipo de entidad
+FILTER_KEYS = {
+    'finca': 'finca_id',
+    'variedad': 'variedad_id',
+    'zona': 'codigo_zona',
+}
+
+# Columna de la tabla de hechos para cada filtro de entidad
+ENTITY_FILTER_COLUMNS = {
+    'finca_id': 'h.id_finca',
+    'variedad_id': 'h.codigo_variedad',
+    'codigo_zona': 'h.codigo_zona'
+}
+
+
+def entity_condition(column: str, keys: Iterable[Any]) -> str:
+    """Condición IN sobre claves subrogadas (enteros o texto escapado)"""
+    values = []
+    for key in keys:
+        if isinstance(key, int):
+            values.append(str(key))
+        else:
+            values.append("'" + str(key).replace("\\", "\\\\").replace("'", "''") + "'")
+    return f"{column} IN ({', '.join(values)})"
+
+
+# Palabras que anteceden a un nombre numérico ("zona 3", "variedad 85")
+KIND_KEYWORDS = {
+    'finca': {'finca', 'fincas', 'hacienda', 'predio'},
+    'variedad': {'variedad', 'variedades', 'clon', 'cultivar'},
+    'zona': {'zona', 'zonas', 'region'},
+}
+
+# Palabras que por sí solas nunca son un nombre
+STOPWORDS = {
+    'a', 'al', 'como', 'con', 'cual', 'cuales', 'cuanto', 'de', 'del', 'el', 'en', 'entre',
+    'es', 'la', 'las', 'lo', 'los', 'mas', 'me', 'muestra', 'mostrar', 'o', 'para', 'por',
+    'que', 'se', 'su', 'sus', 'un', 'una', 'y', 'top', 'mejor', 'mejores', 'peor', 'peores',
+    'total', 'promedio', 'produccion', 'toneladas', 'tch', 'brix', 'sacarosa', 'rendimiento',
+    'area', 'ano', 'mes', 'grafica', 'grafico',
+} | set().union(*KIND_KEYWORDS.values())
+
+# Longitud máxima (en palabras) de una ventana candidata
+MAX_WINDOW = 5
+
+
+def fold(value: str) -> str:
+    """Normaliza un texto: minúsculas, sin tildes y solo letras, números y espacios"""
+    decomposed = unicodedata.normalize('NFKD', value.lower())
+    chars = [ch if ch.isalnum() else ' ' for ch in decomposed if not unicodedata.combining(ch)]
+    return ' '.join(''.join(chars).split())
+
+
+def _trigrams(value: str) -> Set[str]:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_distance(value: str) -> int:
+    """Errores tolerados según la longitud del término"""
+    if len(value) < 4:
+        return 0
+    if len(value) <= 7:
+        return 1
+    return 2
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> Optional[int]:
+    """
+    Distancia de edición entre a y b, o None si supera limit
+
+    Solo se evalúa la banda diagonal de ancho 2*limit+1 y se abandona en cuanto
+    toda una fila supera el límite.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    if a == b:
+        return 0
+    big = limit + 1
+    previous = [j if j <= limit else big for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [big] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost, big)
+        if min(current) > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+@dataclass
+class EntityMatch:
+    """Entidad reconocida en una pregunta"""
+    kind: str
+    key: Any
+    name: str
+    matched_text: str
+    distance: int
+
+
+@dataclass
+class _Entry:
+    kind: str
+    key: Any
+    name: str
+    folded: str
+
+
+@dataclass
+class _Table:
+    """Contenido del índice; se reemplaza completo al recargar"""
+    entries: List[_Entry] = field(default_factory=list)
+    exact: Dict[str, List[int]] = field(default_factory=dict)
+    postings: Dict[str, List[int]] = field(default_factory=dict)
+    max_tokens: int = 1
+
+
+class EntityIndex:
+    """Índice en memoria de nombres de fincas, variedades y zonas"""
+
+    def __init__(self, engine_source=None, data_version: Optional[DataVersion] = None,
+                 retry_seconds: float = 60.0):
+        """
+        Args:
+            engine_source: Engine de SQLAlchemy o función que lo retorna; si es None el
+                índice solo contiene lo agregado con add()
+            data_version: Versión de datos del ETL; por defecto se crea una sobre el mismo engine
+            retry_seconds: Espera antes de reintentar una carga fallida
+        """
+        self.engine_source = engine_source
+        self.data_version = data_version
+        if self.data_version is None and engine_source is not None:
+            self.data_version = DataVersion(engine_source)
+        self.retry_seconds = retry_seconds
+        self.generation: Optional[int] = None
+        self._table = _Table()
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._table.entries)
+
+    # ----- Construcción -----
+
+    @staticmethod
+    def _insert(table: _Table, kind: str, key: Any, name: Any):
+        folded = fold(str(name))
+        if not folded:
+            return
+        entry_id = len(table.entries)
+        table.entries.append(_Entry(kind, key, str(name), folded))
+        table.exact.setdefault(folded, []).append(entry_id)
+        for gram in _trigrams(folded):
+            table.postings.setdefault(gram, []).append(entry_id)
+        table.max_tokens = min(max(table.max_tokens, len(folded.split())), MAX_WINDOW)
+
+    def add(self, kind: str, key: Any, name: Any):
+        """Agrega una entidad y la indexa"""
+        self._insert(self._table, kind, key, name)
+
+    def load(self, rows_by_kind: Dict[str, Iterable[Tuple[Any, Any]]], generation: int = 0):
+        """Reemplaza el contenido del índice por las filas (clave, nombre) de cada tipo"""
+        table = _Table()
+        for kind, rows in rows_by_kind.items():
+            for key, name in rows:
+                if name is not None:
+                    self._insert(table, kind, key, name)
+        # Un solo intercambio de referencia: los lectores concurrentes ven la tabla vieja o la nueva
+        self._table = table
+        self.generation = generation
+
+    def refresh(self):
+        """Vuelve a cargar las dimensiones si el ETL registró una carga nueva"""
+        if self.engine_source is None:
+            return
+        generation = self.data_version.current()
+        if generation == self.generation or time.monotonic() < self._retry_at:
+            return
+        with self._lock:
+            if generation == self.generation:
+                return
+            try:
+                with resolve_engine(self.engine_source).connect() as conn:
+                    rows = {kind: conn.execute(text(sql)).fetchall() for kind, sql in ENTITY_QUERIES.items()}
+                self.load(rows, generation)
+                print(f"🔎 Índice de entidades cargado: {len(self._table.entries)} nombres (generación {generation})")
+            except Exception as e:
+                self._retry_at = time.monotonic() + self.retry_seconds
+                print(f"⚠️  No se pudo cargar el índice de entidades: {e}")
+
+    # ----- Búsqueda -----
+
+    def lookup(self, phrase: str, kinds: Optional[Set[str]] = None,
+               table: Optional[_Table] = None) -> Optional[Tuple[_Entry, int]]:
+        """
+        Busca la entidad más cercana a una frase ya normalizada
+
+        Returns:
+            Tupla (entrada, distancia) o None si ninguna está dentro del límite
+        """
+        table = table or self._table
+        for entry_id in table.exact.get(phrase, ()):
+            entry = table.entries[entry_id]
+            if kinds is None or entry.kind in kinds:
+                return entry, 0
+
+        limit = _max_distance(phrase)
+        if limit == 0:
+            return None
+
+        # Candidatos: entradas que comparten suficientes trigramas con la frase
+        grams = _trigrams(phrase)
+        required = len(grams) - 3 * limit
+        if required < 1:
+            return None
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for entry_id in table.postings.get(gram, ()):
+                counts[entry_id] += 1
+
+        best = None
+        for entry_id, shared in counts.items():
+            if shared < required:
+                continue
+            entry = table.entries[entry_id]
+            if kinds is not None and entry.kind not in kinds:
+                continue
+            distance = bounded_levenshtein(phrase, entry.folded, limit)
+            if distance is not None and (best is None or distance < best[1]):
+                best = (entry, distance)
+                if distance == 1:
+                    break
+        return best
+
+    def resolve(self, question: str) -> List[EntityMatch]:
+        """
+        Encuentra las entidades mencionadas en una pregunta
+
+        Se evalúan ventanas de palabras de la más larga a la más corta y se conserva
+        la primera coincidencia que no se solape con otra ya aceptada.
+        """
+        self.refresh()
+        table = self._table
+        if not table.entries:
+            return []
+
+        tokens = fold(question).split()
+        taken = [False] * len(tokens)
+        matches: List[EntityMatch] = []
+
+        for size in range(min(table.max_tokens, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                end = start + size
+                if any(taken[start:end]):
+                    continue
+                window = tokens[start:end]
+                if all(token in STOPWORDS for token in window):
+                    continue
+                phrase = ' '.join(window)
+
+                kinds = None
+                if phrase.isdigit():
+                    # Un número solo es un nombre si lo antecede el tipo de entidad ("zona 3")
+                    previous = tokens[start - 1] if start > 0 else ''
+                    kinds = {kind for kind, words in KIND_KEYWORDS.items() if previous in words}
+                    if not kinds:
+                        continue
+
+                found = self.lookup(phrase, kinds, table)
+                if found is None:
+                    continue
+                entry, distance = found
+                if distance:
+                    # En coincidencias aproximadas un artículo en el borde debe ser parte del nombre
+                    name_tokens = entry.folded.split()
+                    if (window[0] in STOPWORDS and window[0] != name_tokens[0]) or \
+                            (window[-1] in STOPWORDS and window[-1] != name_tokens[-1]):
+                        continue
+                for i in range(start, end):
+                    taken[i] = True
+                matches.append(EntityMatch(entry.kind, entry.key, entry.name, phrase, distance))
+
+        return matches
+
+    def to_filters(self, matches: List[EntityMatch]) -> Dict[str, List[Any]]:
+        """Convierte coincidencias en filtros por clave subrogada (finca_id, variedad_id, codigo_zona)"""
+        filters: Dict[str, List[Any]] = {}
+        for match in matches:
+            values = filters.setdefault(FILTER_KEYS[match.kind], [])
+            if match.key not in values:
+                values.append(match.key)
+        return filters
+
+    def extract_filters(self, question: str) -> Dict[str, List[Any]]:
+        """Atajo: resuelve la pregunta y retorna directamente los filtros"""
+        return self.to_filters(self.resolve(question))
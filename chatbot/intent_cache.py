@@ -0,0 +1,94 @@
+"""
+Memoización de intenciones para el chatbot de SugarBI
+Normaliza cada pregunta a una huella (fingerprint) y guarda la intención parseada en
+un LRU acotado, de modo que las preguntas repetidas no vuelvan a pasar por los regex
+"""
+
+import copy
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Signos que no cambian el parseo; el punto y la coma se conservan entre dígitos ("1.000", "2,5")
+_PUNCTUATION_RE = re.compile(r'[¿?¡!;:"()]|(?<!\d)[.,]|[.,](?!\d)')
+
+
+def fingerprint(question: str) -> str:
+    """
+    Forma canónica de una pregunta
+
+    Minúsculas, sin signos de puntuación y con los espacios colapsados. Las tildes y
+    los números se conservan tal cual: los patrones del parser los distinguen
+    ("producción" / "produccion", "1.000" / "1000" como año), y dos preguntas con la
+    misma huella deben producir la misma intención.
+    """
+    return ' '.join(_PUNCTUATION_RE.sub(' ', question.lower()).split())
+
+
+class IntentCache:
+    """LRU acotado de intenciones parseadas, seguro para varios hilos"""
+
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: Número máximo de intenciones guardadas
+        """
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_parse(self, question: str, parse: Callable[[str], Any],
+                     generation: Optional[Hashable] = None) -> Any:
+        """
+        Retorna la intención de la pregunta, parseándola solo si no está en caché
+
+        La huella solo es la clave: en un fallo se parsea la pregunta original, así la
+        caché nunca cambia el resultado. Siempre se retorna una copia porque los
+        generadores de SQL modifican la intención recibida.
+
+        Args:
+            question: Pregunta original
+            parse: Función que parsea un texto y retorna la intención
+            generation: Versión de los datos que influyen en el parseo (p. ej. índice de entidades)
+        """
+        key = (fingerprint(question), generation)
+
+        with self._lock:
+            intent = self._entries.get(key)
+            if intent is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(intent)
+            self.misses += 1
+
+        intent = parse(question)
+
+        with self._lock:
+            self._entries[key] = copy.deepcopy(intent)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return intent
+
+    def clear(self):
+        """Vacía la caché (los contadores se conservan)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -45,7 +45,15 @@ class QueryIntent:
 class QueryParser:
     """Parser de consultas en lenguaje natural"""
     
-    def __init__(self):
+    def __init__(self, entity_index=None, cache=None):
+        """
+        Args:
+            entity_index: EntityIndex opcional para reconocer nombres de fincas, variedades y zonas
+            cache: IntentCache opcional para memoizar intenciones de preguntas repetidas
+        """
+        self.entity_index = entity_index
+        self.cache = cache
+        
         # Patrones para identificar métricas
         self.metric_patterns = {
             MetricType.TONELADAS: [
@@ -131,6 +139,16 @@ class QueryParser:
         Returns:
             QueryIntent: Intención parseada
         """
+        if self.cache is None:
+            return self._parse(query)
+        generation = None
+        if self.entity_index is not None:
+            self.entity_index.refresh()
+            generation = self.entity_index.generation
+        return self.cache.get_or_parse(query, self._parse, generation)
+
+    def _parse(self, query: str) -> QueryIntent:
+        """Parseo completo con todos los patrones (sin caché)"""
         query_lower = query.lower().strip()
         
         # Detectar tipo de consulta
@@ -214,6 +232,10 @@ class QueryParser:
                     if month_name in self.month_mapping:
                         filters['mes'] = self.month_mapping[month_name]
         
+        # Filtros por entidad (finca_id, variedad_id, codigo_zona)
+        if self.entity_index is not None:
+            filters.update(self.entity_index.extract_filters(query))
+        
         return filters
 
     def _extract_limit(self, query: str) -> Optional[int]:
@@ -0,0 +1,174 @@
+"""
+Construcción de respuestas del chatbot
+Funciones puras (sin LangChain ni base de datos) para redactar la respuesta natural,
+elegir el tipo de visualización y resumir los resultados de una consulta
+"""
+
+from typing import Dict, Any, List
+
+
+def generate_natural_response(question: str, query_result: Dict[str, Any]) -> str:
+    """Genera una respuesta natural basada en los resultados"""
+    try:
+        data = query_result["data"]
+        row_count = query_result["row_count"]
+
+        if row_count == 0:
+            return "No se encontraron datos que coincidan con tu consulta."
+
+        # Detectar el tipo de consulta basado en la pregunta
+        question_lower = question.lower()
+
+        # Detectar métricas mencionadas
+        metrics_mentioned = []
+        if "tch" in question_lower:
+            metrics_mentioned.append("TCH")
+        if "brix" in question_lower:
+            metrics_mentioned.append("Brix")
+        if "sacarosa" in question_lower:
+            metrics_mentioned.append("Sacarosa")
+        if "toneladas" in question_lower or "produccion" in question_lower:
+            metrics_mentioned.append("Producción")
+
+        # Detectar dimensiones mencionadas
+        dimensions_mentioned = []
+        if "finca" in question_lower:
+            dimensions_mentioned.append("fincas")
+        if "variedad" in question_lower:
+            dimensions_mentioned.append("variedades")
+        if "zona" in question_lower or "region" in question_lower:
+            dimensions_mentioned.append("zonas")
+        if "mes" in question_lower or "año" in question_lower or "tiempo" in question_lower:
+            dimensions_mentioned.append("períodos")
+
+        # Detectar tipo de gráfico
+        chart_type = ""
+        if "circular" in question_lower or "pastel" in question_lower or "pie" in question_lower:
+            chart_type = "gráfico circular"
+        elif "barras" in question_lower or "barra" in question_lower:
+            chart_type = "gráfico de barras"
+        elif "linea" in question_lower or "tendencia" in question_lower:
+            chart_type = "gráfico de líneas"
+
+        # Construir respuesta contextualizada
+        response_parts = []
+
+        # Saludo contextual
+        if chart_type:
+            response_parts.append(f"Aquí tienes el {chart_type} que solicitaste")
+        else:
+            response_parts.append("Aquí tienes los resultados de tu consulta")
+
+        # Mencionar métricas y dimensiones
+        if metrics_mentioned and dimensions_mentioned:
+            response_parts.append(f"mostrando {', '.join(metrics_mentioned)} por {', '.join(dimensions_mentioned)}")
+        elif metrics_mentioned:
+            response_parts.append(f"mostrando {', '.join(metrics_mentioned)}")
+        elif dimensions_mentioned:
+            response_parts.append(f"agrupado por {', '.join(dimensions_mentioned)}")
+
+        # Mencionar filtros temporales
+        if "2024" in question_lower:
+            response_parts.append("para el año 2024")
+        elif "2023" in question_lower:
+            response_parts.append("para el año 2023")
+        elif "2022" in question_lower:
+            response_parts.append("para el año 2022")
+
+        # Mencionar cantidad de resultados
+        if row_count == 1:
+            response_parts.append("(1 resultado encontrado)")
+        else:
+            response_parts.append(f"({row_count} resultados encontrados)")
+
+        # Agregar información específica para consultas de ranking
+        if ("top" in question_lower or "mejor" in question_lower or "ranking" in question_lower) and data:
+            top_items = data[:3]  # Mostrar solo los primeros 3
+            top_list = []
+            for i, item in enumerate(top_items):
+                # Obtener el primer valor del diccionario (nombre)
+                first_key = list(item.keys())[0]
+                first_value = item[first_key]
+                top_list.append(f"{i+1}. {first_value}")
+
+            if top_list:
+                response_parts.append(f"\n\nLos principales son: {', '.join(top_list)}")
+
+        return ". ".join(response_parts) + "."
+
+    except Exception as e:
+        return f"Se encontraron {query_result.get('row_count', 0)} registros que coinciden con tu consulta."
+
+
+def determine_visualization_type(question: str, query_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Determina el tipo de visualización apropiada"""
+    question_lower = question.lower()
+    data = query_result["data"]
+
+    # Gráfico de barras para comparaciones
+    if any(word in question_lower for word in ["top", "mejor", "peor", "comparar", "ranking"]):
+        return {
+            "type": "bar",
+            "title": "Comparación de Resultados",
+            "x_axis": "categoria",
+            "y_axis": "valor"
+        }
+
+    # Gráfico de líneas para tendencias temporales
+    elif any(word in question_lower for word in ["tendencia", "tiempo", "año", "mes", "evolución"]):
+        return {
+            "type": "line",
+            "title": "Tendencia Temporal",
+            "x_axis": "tiempo",
+            "y_axis": "valor"
+        }
+
+    # Gráfico de pastel para distribuciones
+    elif any(word in question_lower for word in ["distribución", "porcentaje", "proporción"]):
+        return {
+            "type": "pie",
+            "title": "Distribución",
+            "label": "categoria",
+            "value": "cantidad"
+        }
+
+    # Tabla por defecto
+    else:
+        return {
+            "type": "table",
+            "title": "Resultados de la Consulta",
+            "columns": query_result["columns"]
+        }
+
+
+def summarize_rows(rows: List[Dict[str, Any]], columns: List[str]) -> Dict[str, Dict[str, float]]:
+    """Calcula conteo, mínimo, máximo y promedio de cada columna numérica"""
+    summary = {}
+    for column in columns:
+        values = [row[column] for row in rows
+                  if isinstance(row.get(column), (int, float)) and not isinstance(row.get(column), bool)]
+        if values:
+            summary[column] = {
+                "count": len(values),
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / len(values)
+            }
+    return summary
+
+
+def include_raw_data(body_value: Any, query_value: Any = None) -> bool:
+    """
+    Indica si la respuesta de chat debe incluir raw_data
+
+    Por compatibilidad se incluye salvo que el cliente lo desactive con
+    "include_raw_data": false en el cuerpo o ?raw_data=0 en la URL (el gráfico
+    ya contiene los datos graficados, así la respuesta no los duplica).
+    """
+    for value in (body_value, query_value):
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() not in ('0', 'false', 'no')
+    return True
@@ -4,7 +4,7 @@ Convierte consultas en lenguaje natural a SQL y ejecuta consultas en la base de
 """
 
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
 from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
 from langchain_community.utilities import SQLDatabase
@@ -14,8 +14,12 @@ from langchain.prompts import PromptTemplate
 from langchain.schema import BaseOutputParser
 from langchain_core.output_parsers import StrOutputParser
 from .universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+from .sql_guard import SQLGuard, QueryGuardError
+from .responses import generate_natural_response, determine_visualization_type
 from langchain_core.runnables import RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate
+from sqlalchemy import create_engine
+from dashboard.metrics import phase, record_error
 import pandas as pd
 import json
 
@@ -45,23 +49,28 @@ class SQLQueryOutputParser(BaseOutputParser):
 class SugarBISQLAgent:
     """Agente SQL especializado para SugarBI con LangChain"""
     
-    def __init__(self, database_url: str, openai_api_key: Optional[str] = None):
+    def __init__(self, database_url: str, openai_api_key: Optional[str] = None, entity_index=None,
+                 intent_cache=None):
         """
         Inicializa el agente SQL
         
         Args:
             database_url: URL de conexión a la base de datos MySQL
             openai_api_key: Clave API de OpenAI (opcional, puede usar variable de entorno)
+            entity_index: EntityIndex compartido para reconocer fincas, variedades y zonas (opcional)
+            intent_cache: IntentCache compartida para memoizar intenciones (opcional)
         """
         self.database_url = database_url
         self.openai_api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
         
         # Inicializar componentes
+        self.engine = None
+        self.sql_guard = SQLGuard()
         self.db = None
         self.llm = None
         self.agent = None
         self.query_chain = None
-        self.query_analyzer = UniversalQueryAnalyzer()
+        self.query_analyzer = UniversalQueryAnalyzer(entity_index, cache=intent_cache)
         self.sql_generator = UniversalSQLGenerator()
         
         self._setup_database()
@@ -72,7 +81,9 @@ class SugarBISQLAgent:
     def _setup_database(self):
         """Configura la conexión a la base de datos"""
         try:
-            self.db = SQLDatabase.from_uri(self.database_url)
+            # Un solo pool compartido entre LangChain y la ejecución de consultas
+            self.engine = create_engine(self.database_url, pool_pre_ping=True)
+            self.db = SQLDatabase(self.engine)
             print("✅ Conexión a base de datos establecida")
         except Exception as e:
             print(f"❌ Error conectando a la base de datos: {e}")
@@ -414,7 +425,10 @@ class SugarBISQLAgent:
     
     def execute_query(self, sql_query: str) -> Dict[str, Any]:
         """
-        Ejecuta una query SQL y retorna los resultados
+        Ejecuta una query SQL bajo la guardia de ejecución y retorna los resultados
+        
+        La consulta se valida como solo lectura, se le inyecta LIMIT y tiempo máximo,
+        se estima su costo con EXPLAIN y se transmite hasta el presupuesto de bytes.
         
         Args:
             sql_query: Query SQL a ejecutar
@@ -423,14 +437,20 @@ class SugarBISQLAgent:
             Diccionario con los resultados y metadatos
         """
         try:
-            # Ejecutar la query usando pandas
-            result_df = pd.read_sql(sql_query, self.database_url)
+            result = self.sql_guard.execute(self.engine, sql_query)
             
             return {
                 "success": True,
-                "data": result_df.to_dict('records'),
-                "columns": list(result_df.columns),
-                "row_count": len(result_df),
+                "data": result.rows,
+                "columns": result.columns,
+                "row_count": result.row_count,
+                "truncated": result.truncated,
+                "sql_query": sql_query
+            }
+        except QueryGuardError as e:
+            return {
+                "success": False,
+                "error": f"Consulta rechazada: {e}",
                 "sql_query": sql_query
             }
         except Exception as e:
@@ -454,11 +474,13 @@ class SugarBISQLAgent:
             print(f"🤖 Procesando pregunta: {question}")
             
             # Analizar la consulta usando el analizador universal
-            intent = self.query_analyzer.analyze_query(question)
+            with phase('parse'):
+                intent = self.query_analyzer.analyze_query(question)
             print(f"🎯 Intención detectada: {intent}")
             
             # Generar SQL usando el generador universal
-            sql_query = self.sql_generator.generate_sql(intent)
+            with phase('sql_generation'):
+                sql_query = self.sql_generator.generate_sql(intent)
             print(f"📝 SQL generado: {sql_query}")
             
             # Ejecutar consulta
@@ -473,7 +495,8 @@ class SugarBISQLAgent:
                 }
             
             # Generar configuración de visualización
-            visualization = self.sql_generator.get_visualization_config(intent)
+            with phase('chart'):
+                visualization = self.sql_generator.get_visualization_config(intent)
             
             # Generar respuesta natural
             natural_response = self._generate_natural_response(question, query_result)
@@ -493,108 +516,70 @@ class SugarBISQLAgent:
                 "data": query_result["data"],
                 "raw_data": query_result["data"],  # Para compatibilidad con frontend
                 "row_count": query_result["row_count"],
+                "truncated": query_result["truncated"],
                 "natural_response": natural_response
             }
             
         except Exception as e:
             print(f"❌ Error procesando pregunta: {e}")
+            record_error('sql_agent', e)
             return {
                 "success": False,
                 "error": str(e),
                 "natural_response": f"Lo siento, hubo un error inesperado: {str(e)}"
             }
     
-    def _generate_natural_response(self, question: str, query_result: Dict[str, Any]) -> str:
-        """Genera una respuesta natural basada en los resultados"""
+    def stream_question(self, question: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Procesa una pregunta entregando cada etapa en cuanto está disponible
+        
+        Args:
+            question: Pregunta en lenguaje natural
+            
+        Yields:
+            Tuplas (evento, datos) en orden: intent, rows (uno por lote), chart, text, done.
+            Ante un fallo se entrega un único evento error.
+        """
         try:
-            data = query_result["data"]
-            row_count = query_result["row_count"]
+            intent = self.query_analyzer.analyze_query(question)
+            sql_query = self.sql_generator.generate_sql(intent)
+            yield "intent", {
+                "query": question,
+                "intent": {
+                    "type": "select",
+                    "metrics": [m.value for m in intent.metrics],
+                    "dimensions": [d.value for d in intent.dimensions],
+                    "filters": intent.filters,
+                    "limit": intent.limit
+                },
+                "sql": sql_query
+            }
             
-            if row_count == 0:
-                return "No se encontraron datos que coincidan con tu consulta."
+            guarded = None
+            for guarded, new_rows in self.sql_guard.stream(self.engine, sql_query):
+                if new_rows:
+                    yield "rows", {"rows": new_rows, "columns": guarded.columns}
             
-            # Detectar el tipo de consulta basado en la pregunta
-            question_lower = question.lower()
+            yield "chart", {"visualization": self.sql_generator.get_visualization_config(intent)}
             
-            # Detectar métricas mencionadas
-            metrics_mentioned = []
-            if "tch" in question_lower:
-                metrics_mentioned.append("TCH")
-            if "brix" in question_lower:
-                metrics_mentioned.append("Brix")
-            if "sacarosa" in question_lower:
-                metrics_mentioned.append("Sacarosa")
-            if "toneladas" in question_lower or "produccion" in question_lower:
-                metrics_mentioned.append("Producción")
-            
-            # Detectar dimensiones mencionadas
-            dimensions_mentioned = []
-            if "finca" in question_lower:
-                dimensions_mentioned.append("fincas")
-            if "variedad" in question_lower:
-                dimensions_mentioned.append("variedades")
-            if "zona" in question_lower or "region" in question_lower:
-                dimensions_mentioned.append("zonas")
-            if "mes" in question_lower or "año" in question_lower or "tiempo" in question_lower:
-                dimensions_mentioned.append("períodos")
-            
-            # Detectar tipo de gráfico
-            chart_type = ""
-            if "circular" in question_lower or "pastel" in question_lower or "pie" in question_lower:
-                chart_type = "gráfico circular"
-            elif "barras" in question_lower or "barra" in question_lower:
-                chart_type = "gráfico de barras"
-            elif "linea" in question_lower or "tendencia" in question_lower:
-                chart_type = "gráfico de líneas"
-            
-            # Construir respuesta contextualizada
-            response_parts = []
-            
-            # Saludo contextual
-            if chart_type:
-                response_parts.append(f"Aquí tienes el {chart_type} que solicitaste")
-            else:
-                response_parts.append("Aquí tienes los resultados de tu consulta")
-            
-            # Mencionar métricas y dimensiones
-            if metrics_mentioned and dimensions_mentioned:
-                response_parts.append(f"mostrando {', '.join(metrics_mentioned)} por {', '.join(dimensions_mentioned)}")
-            elif metrics_mentioned:
-                response_parts.append(f"mostrando {', '.join(metrics_mentioned)}")
-            elif dimensions_mentioned:
-                response_parts.append(f"agrupado por {', '.join(dimensions_mentioned)}")
-            
-            # Mencionar filtros temporales
-            if "2024" in question_lower:
-                response_parts.append("para el año 2024")
-            elif "2023" in question_lower:
-                response_parts.append("para el año 2023")
-            elif "2022" in question_lower:
-                response_parts.append("para el año 2022")
-            
-            # Mencionar cantidad de resultados
-            if row_count == 1:
-                response_parts.append("(1 resultado encontrado)")
-            else:
-                response_parts.append(f"({row_count} resultados encontrados)")
-            
-            # Agregar información específica para consultas de ranking
-            if ("top" in question_lower or "mejor" in question_lower or "ranking" in question_lower) and data:
-                top_items = data[:3]  # Mostrar solo los primeros 3
-                top_list = []
-                for i, item in enumerate(top_items):
-                    # Obtener el primer valor del diccionario (nombre)
-                    first_key = list(item.keys())[0]
-                    first_value = item[first_key]
-                    top_list.append(f"{i+1}. {first_value}")
-                
-                if top_list:
-                    response_parts.append(f"\n\nLos principales son: {', '.join(top_list)}")
+            query_result = {
+                "data": guarded.rows,
+                "columns": guarded.columns,
+                "row_count": guarded.row_count
+            }
+            yield "text", {"natural_response": self._generate_natural_response(question, query_result)}
             
-            return ". ".join(response_parts) + "."
-                
+            yield "done", {"record_count": guarded.row_count, "truncated": guarded.truncated}
+            
+        except QueryGuardError as e:
+            yield "error", {"error": f"Consulta rechazada: {e}"}
         except Exception as e:
-            return f"Se encontraron {query_result.get('row_count', 0)} registros que coinciden con tu consulta."
+            print(f"❌ Error procesando pregunta (stream): {e}")
+            yield "error", {"error": str(e)}
+    
+    def _generate_natural_response(self, question: str, query_result: Dict[str, Any]) -> str:
+        """Genera una respuesta natural basada en los resultados"""
+        return generate_natural_response(question, query_result)
     
     def _format_top_result(self, record: Dict[str, Any]) -> str:
         """Formatea un resultado individual"""
@@ -680,43 +665,7 @@ class SugarBISQLAgent:
     
     def _determine_visualization_type(self, question: str, query_result: Dict[str, Any]) -> Dict[str, Any]:
         """Determina el tipo de visualización apropiada"""
-        question_lower = question.lower()
-        data = query_result["data"]
-        
-        # Gráfico de barras para comparaciones
-        if any(word in question_lower for word in ["top", "mejor", "peor", "comparar", "ranking"]):
-            return {
-                "type": "bar",
-                "title": "Comparación de Resultados",
-                "x_axis": "categoria",
-                "y_axis": "valor"
-            }
-        
-        # Gráfico de líneas para tendencias temporales
-        elif any(word in question_lower for word in ["tendencia", "tiempo", "año", "mes", "evolución"]):
-            return {
-                "type": "line",
-                "title": "Tendencia Temporal",
-                "x_axis": "tiempo",
-                "y_axis": "valor"
-            }
-        
-        # Gráfico de pastel para distribuciones
-        elif any(word in question_lower for word in ["distribución", "porcentaje", "proporción"]):
-            return {
-                "type": "pie",
-                "title": "Distribución",
-                "label": "categoria",
-                "value": "cantidad"
-            }
-        
-        # Tabla por defecto
-        else:
-            return {
-                "type": "table",
-                "title": "Resultados de la Consulta",
-                "columns": query_result["columns"]
-            }
+        return determine_visualization_type(question, query_result)
     
     def _analyze_intent(self, question: str) -> Dict[str, Any]:
         """Analiza la intención de la pregunta"""
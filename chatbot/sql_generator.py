@@ -6,8 +6,10 @@ Convierte QueryIntent a consultas SQL válidas
 from typing import Dict, List, Optional
 try:
     from .query_parser import QueryIntent, QueryType, MetricType, DimensionType
+    from .entity_index import ENTITY_FILTER_COLUMNS, entity_condition
 except ImportError:
     from query_parser import QueryIntent, QueryType, MetricType, DimensionType
+    from entity_index import ENTITY_FILTER_COLUMNS, entity_condition
 
 class SQLGenerator:
     """Genera consultas SQL a partir de intenciones parseadas"""
@@ -76,6 +78,14 @@ class SQLGenerator:
         else:
             return self._generate_basic_sql(intent)
 
+    def _entity_conditions(self, filters: Dict) -> List[str]:
+        """Condiciones IN para filtros de entidad (finca_id, variedad_id, codigo_zona) sobre la tabla de hechos"""
+        return [
+            entity_condition(column, filters[key])
+            for key, column in ENTITY_FILTER_COLUMNS.items()
+            if filters.get(key)
+        ]
+
     def _generate_top_ranking_sql(self, intent: QueryIntent) -> str:
         """Genera SQL para consultas de ranking (top N)"""
         try:
@@ -124,6 +134,7 @@ class SQLGenerator:
                 where_conditions.append(f"t.año = {intent.filters['año']}")
             if 'mes' in intent.filters:
                 where_conditions.append(f"t.mes = {intent.filters['mes']}")
+            where_conditions.extend(self._entity_conditions(intent.filters))
         
         # Construir GROUP BY
         group_by = f"GROUP BY {dimension['name_column']}"
@@ -178,6 +189,7 @@ class SQLGenerator:
                 where_conditions.append(f"t.año = {intent.filters['año']}")
             if 'mes' in intent.filters:
                 where_conditions.append(f"t.mes = {intent.filters['mes']}")
+            where_conditions.extend(self._entity_conditions(intent.filters))
         
         sql_parts = [
             f"SELECT {', '.join(select_parts)}",
@@ -214,6 +226,7 @@ class SQLGenerator:
         if intent.filters:
             if 'año' in intent.filters:
                 where_conditions.append(f"t.año = {intent.filters['año']}")
+            where_conditions.extend(self._entity_conditions(intent.filters))
         
         sql_parts = [
             f"SELECT {', '.join(select_parts)}",
@@ -253,6 +266,7 @@ class SQLGenerator:
                 where_conditions.append(f"t.año = {intent.filters['año']}")
             if 'mes' in intent.filters:
                 where_conditions.append(f"t.mes = {intent.filters['mes']}")
+            where_conditions.extend(self._entity_conditions(intent.filters))
         
         sql_parts = [
             f"SELECT {', '.join(select_parts)}",
@@ -0,0 +1,362 @@
+"""
+Guardia de ejecución para SQL generado
+Valida que las consultas sean de solo lectura, limita filas y tiempo de ejecución,
+estima su costo con EXPLAIN y transmite los resultados hasta un presupuesto de bytes
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from dashboard.metrics import add_rows
+
+
+class QueryGuardError(ValueError):
+    """Error lanzado cuando una consulta viola las reglas de la guardia"""
+
+
+@dataclass
+class GuardConfig:
+    """Límites aplicados a cada consulta generada"""
+    max_rows: int = 1000
+    max_execution_ms: int = 5000
+    max_result_bytes: int = 2_000_000
+    max_estimated_rows: int = 5_000_000
+    fetch_size: int = 200
+
+    @classmethod
+    def from_env(cls) -> 'GuardConfig':
+        """Crea la configuración a partir de variables de entorno"""
+        return cls(
+            max_rows=int(os.getenv('SQL_MAX_ROWS', cls.max_rows)),
+            max_execution_ms=int(os.getenv('SQL_MAX_EXECUTION_MS', cls.max_execution_ms)),
+            max_result_bytes=int(os.getenv('SQL_MAX_RESULT_BYTES', cls.max_result_bytes)),
+            max_estimated_rows=int(os.getenv('SQL_MAX_ESTIMATED_ROWS', cls.max_estimated_rows)),
+            fetch_size=int(os.getenv('SQL_FETCH_SIZE', cls.fetch_size)),
+        )
+
+
+@dataclass
+class GuardedResult:
+    """Resultado de una consulta ejecutada bajo la guardia"""
+    sql: str
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    truncated: bool = False
+    truncated_reason: Optional[str] = None
+    estimated_rows: Optional[int] = None
+    result_bytes: int = 0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+
+# Palabras clave que no pueden aparecer en una consulta de solo lectura
+FORBIDDEN_KEYWORDS = (
+    'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'MERGE', 'UPSERT',
+    'DROP', 'ALTER', 'CREATE', 'TRUNCATE', 'RENAME',
+    'GRANT', 'REVOKE', 'LOCK', 'UNLOCK', 'CALL', 'EXEC', 'EXECUTE',
+    'HANDLER', 'LOAD', 'SET', 'INTO', 'OUTFILE', 'DUMPFILE', 'SHUTDOWN', 'KILL'
+)
+
+# REPLACE(...) también es la función de texto: solo se rechaza como sentencia (sin paréntesis)
+_KEYWORD_PATTERNS = {'REPLACE': r'REPLACE(?!\s*\()'}
+_FORBIDDEN_RE = re.compile(
+    r'\b(' + '|'.join(_KEYWORD_PATTERNS.get(keyword, keyword) for keyword in FORBIDDEN_KEYWORDS) + r')\b',
+    re.IGNORECASE
+)
+# CHARACTER SET / CHARSET en CONVERT(... USING ...) y CAST(... CHARACTER SET ...) no son un SET de variables
+_CHARACTER_SET_RE = re.compile(r'\bCHAR(?:ACTER)?\s+SET\b', re.IGNORECASE)
+_LOCKING_RE = re.compile(r'\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b', re.IGNORECASE)
+_LEADING_RE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_TRAILING_LIMIT_RE = re.compile(
+    r'\bLIMIT\s+(\d+)(?:\s*,\s*(\d+)|\s+OFFSET\s+(\d+))?\s*$', re.IGNORECASE
+)
+
+
+def _scan(sql: str) -> Tuple[str, str]:
+    """
+    Recorre la consulta una sola vez eliminando comentarios
+
+    Returns:
+        Tupla (sql_limpio, sql_enmascarado). En la versión enmascarada el contenido de
+        literales e identificadores entre comillas se reemplaza por espacios, de modo
+        que las búsquedas de palabras clave no se confundan con datos del usuario.
+    """
+    clean = []
+    masked = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        nxt = sql[i + 1] if i + 1 < n else ''
+        if ch in ("'", '"', '`'):
+            quote = ch
+            j = i + 1
+            while j < n:
+                if sql[j] == '\\' and quote != '`':
+                    j += 2
+                    continue
+                if sql[j] == quote:
+                    if j + 1 < n and sql[j + 1] == quote:
+                        j += 2
+                        continue
+                    break
+                j += 1
+            literal = sql[i:j + 1]
+            clean.append(literal)
+            masked.append(quote + ' ' * max(len(literal) - 2, 0) + (quote if len(literal) > 1 else ''))
+            i = j + 1
+        elif ch == '-' and nxt == '-' or ch == '#':
+            while i < n and sql[i] != '\n':
+                i += 1
+        elif ch == '/' and nxt == '*':
+            end = sql.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            clean.append(' ')
+            masked.append(' ')
+        else:
+            clean.append(ch)
+            masked.append(ch)
+            i += 1
+    return ''.join(clean), ''.join(masked)
+
+
+def _top_level_select(masked: str) -> Optional[int]:
+    """Posición del primer SELECT fuera de paréntesis (bloque principal de la consulta)"""
+    depth = 0
+    for match in re.finditer(r'[()]|\bSELECT\b', masked, re.IGNORECASE):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0:
+            return match.start()
+    return None
+
+
+def _to_native(value: Any) -> Any:
+    """Convierte tipos del driver a tipos serializables"""
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _estimate_size(row: Tuple) -> int:
+    """Tamaño aproximado en bytes de una fila serializada"""
+    return sum(len(str(value)) + 4 for value in row) + 2
+
+
+class SQLGuard:
+    """Ejecuta SQL generado con límites de seguridad y recursos"""
+
+    def __init__(self, config: Optional[GuardConfig] = None):
+        self.config = config or GuardConfig.from_env()
+
+    def prepare(self, sql_query: str, dialect: str = 'mysql') -> str:
+        """
+        Valida y reescribe una consulta antes de ejecutarla
+
+        Args:
+            sql_query: Consulta SQL generada
+            dialect: Dialecto de la base de datos destino
+
+        Returns:
+            Consulta de solo lectura con LIMIT y, en MySQL, hint de tiempo máximo
+        """
+        if not sql_query or not sql_query.strip():
+            raise QueryGuardError("Consulta vacía")
+
+        clean, masked = _scan(sql_query)
+
+        # Una sola sentencia, con punto y coma final opcional
+        statements = [part for part in masked.split(';') if part.strip()]
+        if len(statements) != 1:
+            raise QueryGuardError("Solo se permite una sentencia SQL por consulta")
+        end = len(masked.rstrip().rstrip(';').rstrip())
+        clean, masked = clean[:end], masked[:end]
+
+        if not _LEADING_RE.match(masked):
+            raise QueryGuardError("Solo se permiten consultas SELECT")
+
+        forbidden = _FORBIDDEN_RE.search(_CHARACTER_SET_RE.sub(' ', masked))
+        if forbidden:
+            raise QueryGuardError(f"Palabra clave no permitida en consulta de lectura: {forbidden.group(1).upper()}")
+        if _LOCKING_RE.search(masked):
+            raise QueryGuardError("No se permiten lecturas con bloqueo")
+
+        select_pos = _top_level_select(masked)
+        if select_pos is None:
+            raise QueryGuardError("No se encontró el bloque SELECT principal")
+
+        # Pedir una fila extra para poder reportar truncamiento
+        cap = self.config.max_rows + 1
+        limit_match = _TRAILING_LIMIT_RE.search(masked)
+        if limit_match:
+            if limit_match.group(2) is not None:
+                offset, count = int(limit_match.group(1)), int(limit_match.group(2))
+            else:
+                count, offset = int(limit_match.group(1)), int(limit_match.group(3) or 0)
+            if count > cap:
+                replacement = f"LIMIT {cap} OFFSET {offset}" if offset else f"LIMIT {cap}"
+                clean = clean[:limit_match.start()] + replacement
+        else:
+            clean = f"{clean}\nLIMIT {cap}"
+
+        if dialect == 'mysql':
+            insert_at = select_pos + len('SELECT')
+            hint = f" /*+ MAX_EXECUTION_TIME({self.config.max_execution_ms}) */"
+            clean = clean[:insert_at] + hint + clean[insert_at:]
+
+        return clean
+
+    def estimate_rows(self, connection, sql_query: str) -> Optional[int]:
+        """
+        Estima las filas examinadas usando EXPLAIN (solo MySQL)
+
+        Returns:
+            Número estimado de filas o None si el dialecto no lo soporta
+        """
+        if connection.dialect.name != 'mysql':
+            return None
+        result = connection.execute(text(f"EXPLAIN {sql_query}"))
+        keys = [key.lower() for key in result.keys()]
+        if 'rows' not in keys:
+            return None
+        rows_idx = keys.index('rows')
+        filtered_idx = keys.index('filtered') if 'filtered' in keys else None
+
+        # En un plan de nested-loop las filas examinadas crecen como el producto de cada paso
+        estimate = 1.0
+        for plan_row in result.fetchall():
+            rows = plan_row[rows_idx] or 1
+            filtered = plan_row[filtered_idx] if filtered_idx is not None else None
+            factor = float(rows) * (float(filtered) / 100.0 if filtered else 1.0)
+            estimate *= max(factor, 1.0)
+        return int(estimate)
+
+    def _check_estimate(self, estimated: Optional[int]):
+        """Rechaza planes cuyo costo estimado supera el presupuesto"""
+        if estimated is not None and estimated > self.config.max_estimated_rows:
+            raise QueryGuardError(
+                f"Consulta demasiado costosa: ~{estimated} filas examinadas "
+                f"(máximo {self.config.max_estimated_rows})"
+            )
+
+    def _collect(self, guarded: GuardedResult, batch) -> bool:
+        """
+        Agrega un lote de filas respetando los límites de filas y bytes
+
+        Returns:
+            True si se puede seguir leyendo, False si el resultado quedó truncado
+        """
+        for row in batch:
+            if len(guarded.rows) >= self.config.max_rows:
+                guarded.truncated = True
+                guarded.truncated_reason = 'max_rows'
+                return False
+            size = _estimate_size(row)
+            if guarded.result_bytes + size > self.config.max_result_bytes:
+                guarded.truncated = True
+                guarded.truncated_reason = 'max_result_bytes'
+                return False
+            guarded.result_bytes += size
+            guarded.rows.append({col: _to_native(val) for col, val in zip(guarded.columns, row)})
+        return True
+
+    def stream(self, engine, sql_query: str) -> Iterator[Tuple[GuardedResult, List[Dict[str, Any]]]]:
+        """
+        Valida, estima y ejecuta una consulta entregando las filas lote a lote
+
+        Args:
+            engine: Engine de SQLAlchemy
+            sql_query: Consulta SQL generada
+
+        Yields:
+            Tupla (resultado_acumulado, filas_nuevas). Si la consulta no retorna filas
+            se entrega una única tupla con la lista vacía.
+        """
+        guarded_sql = self.prepare(sql_query, engine.dialect.name)
+
+        with engine.connect() as connection:
+            estimated = self.estimate_rows(connection, guarded_sql)
+            self._check_estimate(estimated)
+
+            result = connection.execution_options(stream_results=True).execute(text(guarded_sql))
+            guarded = GuardedResult(sql=guarded_sql, columns=list(result.keys()), rows=[],
+                                    estimated_rows=estimated)
+            try:
+                while True:
+                    batch = result.fetchmany(self.config.fetch_size)
+                    if not batch:
+                        break
+                    add_rows(len(batch))
+                    start = len(guarded.rows)
+                    keep_reading = self._collect(guarded, batch)
+                    if len(guarded.rows) > start:
+                        yield guarded, guarded.rows[start:]
+                    if not keep_reading:
+                        break
+                if not guarded.rows:
+                    yield guarded, []
+            finally:
+                result.close()
+
+    def execute(self, engine, sql_query: str) -> GuardedResult:
+        """
+        Valida, estima y ejecuta una consulta transmitiendo filas por lotes
+
+        Args:
+            engine: Engine de SQLAlchemy
+            sql_query: Consulta SQL generada
+
+        Returns:
+            GuardedResult con filas convertidas a tipos nativos de Python
+        """
+        guarded = None
+        for guarded, _ in self.stream(engine, sql_query):
+            pass
+        return guarded
+
+    async def stream_async(self, async_engine, sql_query: str) -> AsyncIterator[Tuple[GuardedResult, List[Dict[str, Any]]]]:
+        """
+        Variante asíncrona de stream para un AsyncEngine (p. ej. mysql+aiomysql)
+
+        El hilo del event loop nunca se bloquea esperando a la base de datos.
+        """
+        guarded_sql = self.prepare(sql_query, async_engine.dialect.name)
+
+        async with async_engine.connect() as connection:
+            estimated = await connection.run_sync(self.estimate_rows, guarded_sql)
+            self._check_estimate(estimated)
+
+            result = await connection.stream(text(guarded_sql))
+            guarded = GuardedResult(sql=guarded_sql, columns=list(result.keys()), rows=[],
+                                    estimated_rows=estimated)
+            try:
+                async for batch in result.partitions(self.config.fetch_size):
+                    add_rows(len(batch))
+                    start = len(guarded.rows)
+                    keep_reading = self._collect(guarded, batch)
+                    if len(guarded.rows) > start:
+                        yield guarded, guarded.rows[start:]
+                    if not keep_reading:
+                        break
+                if not guarded.rows:
+                    yield guarded, []
+            finally:
+                await result.close()
+
+    async def execute_async(self, async_engine, sql_query: str) -> GuardedResult:
+        """Variante asíncrona de execute para un AsyncEngine"""
+        guarded = None
+        async for guarded, _ in self.stream_async(async_engine, sql_query):
+            pass
+        return guarded
@@ -0,0 +1,49 @@
+"""
+Utilidades de streaming para el chatbot
+Formatea eventos Server-Sent Events (SSE) para que el frontend pueda renderizar
+la respuesta por etapas: intención y SQL, filas, gráfico y texto
+"""
+
+from typing import Any, Optional
+
+from dashboard.chart_cache import dumps_with_raw
+
+# Tipo MIME de los eventos SSE
+EVENT_STREAM_MIMETYPE = 'text/event-stream'
+
+# Cabeceras para que proxies (p. ej. nginx) no acumulen la respuesta
+EVENT_STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """
+    Serializa un evento SSE
+
+    Args:
+        event: Nombre del evento (intent, rows, chart, text, done, error)
+        data: Contenido serializable a JSON (puede incluir RawJSON ya serializado)
+
+    Returns:
+        Bloque de texto listo para escribir en la respuesta
+    """
+    payload = dumps_with_raw(data).decode('utf-8')
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def wants_event_stream(accept: Optional[str], stream_param: Optional[str]) -> bool:
+    """
+    Determina si el cliente pidió la respuesta como stream SSE
+
+    Args:
+        accept: Valor de la cabecera Accept
+        stream_param: Valor del parámetro de consulta ?stream=
+
+    Returns:
+        True si se debe responder con text/event-stream
+    """
+    if stream_param is not None and stream_param.lower() in ('1', 'true', 'yes', 'si', 'sí'):
+        return True
+    return bool(accept) and EVENT_STREAM_MIMETYPE in accept
@@ -8,6 +8,8 @@ from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+from .entity_index import ENTITY_FILTER_COLUMNS, entity_condition
+
 class MetricType(Enum):
     TCH = "tch"
     BRIX = "brix"
@@ -44,11 +46,21 @@ class QueryIntent:
     limit: int
     order_by: Optional[str] = None
     order_direction: str = "DESC"
+    # Granularidad del eje de tiempo: "month" (año y mes) o "year" (pedida explícitamente por año)
+    time_grain: str = "month"
 
 class UniversalQueryAnalyzer:
     """Analizador universal de consultas para SugarBI"""
     
-    def __init__(self):
+    def __init__(self, entity_index=None, cache=None):
+        """
+        Args:
+            entity_index: EntityIndex opcional para reconocer nombres de fincas, variedades y zonas
+            cache: IntentCache opcional para memoizar intenciones de preguntas repetidas
+        """
+        self.entity_index = entity_index
+        self.cache = cache
+        
         self.metric_patterns = {
             MetricType.TCH: [r'\btch\b', r'toneladas.*hectarea', r'productividad'],
             MetricType.BRIX: [r'\bbrix\b', r'contenido.*azucar', r'dulzor'],
@@ -64,6 +76,10 @@ class UniversalQueryAnalyzer:
             DimensionType.TIEMPO: [r'\baño\b', r'\bmes\b', r'\btiempo\b', r'\bfecha\b', r'\btemporal\b']
         }
         
+        # Granularidad del tiempo: por año solo si se pide así y no se menciona el mes
+        self.year_grain_pattern = re.compile(r'\bpor\s+a[ñn]os?\b|\bcada\s+a[ñn]o\b|\banual(es)?\b|\ba[ñn]o\s+(a|tras|por)\s+a[ñn]o\b')
+        self.month_grain_pattern = re.compile(r'\bmes(es)?\b|\bmensual(es|mente)?\b')
+        
         self.chart_patterns = {
             ChartType.PIE: [r'\bcircular\b', r'\bpastel\b', r'\bpie\b', r'\bdistribucion\b', r'\bproporcion\b'],
             ChartType.LINE: [r'\btendencia\b', r'\bevolucion\b', r'\btemporal\b', r'\blinea\b', r'\bgrafica.*linea\b'],
@@ -79,7 +95,17 @@ class UniversalQueryAnalyzer:
         }
     
     def analyze_query(self, query: str) -> QueryIntent:
-        """Analiza una consulta y determina la intención"""
+        """Analiza una consulta y determina la intención (memoizada si hay caché)"""
+        if self.cache is None:
+            return self._analyze(query)
+        generation = None
+        if self.entity_index is not None:
+            self.entity_index.refresh()
+            generation = self.entity_index.generation
+        return self.cache.get_or_parse(query, self._analyze, generation)
+    
+    def _analyze(self, query: str) -> QueryIntent:
+        """Análisis completo con todos los patrones (sin caché)"""
         query_lower = query.lower()
         
         # Detectar métricas
@@ -103,6 +129,10 @@ class UniversalQueryAnalyzer:
         # Detectar ordenamiento
         order_by, order_direction = self._detect_ordering(query_lower, metrics, dimensions)
         
+        # Detectar granularidad del tiempo
+        time_grain = "year" if (self.year_grain_pattern.search(query_lower)
+                                and not self.month_grain_pattern.search(query_lower)) else "month"
+        
         return QueryIntent(
             metrics=metrics,
             dimensions=dimensions,
@@ -111,7 +141,8 @@ class UniversalQueryAnalyzer:
             filters=filters,
             limit=limit,
             order_by=order_by,
-            order_direction=order_direction
+            order_direction=order_direction,
+            time_grain=time_grain
         )
     
     def _detect_metrics(self, query: str) -> List[MetricType]:
@@ -175,6 +206,10 @@ class UniversalQueryAnalyzer:
         if quarter_match:
             filters['trimestre'] = int(quarter_match.group(1))
         
+        # Filtros por entidad (finca_id, variedad_id, codigo_zona)
+        if self.entity_index is not None:
+            filters.update(self.entity_index.extract_filters(query))
+        
         return filters
     
     def _detect_limit(self, query: str) -> int:
@@ -262,24 +297,40 @@ class UniversalSQLGenerator:
             AggregationType.MIN: "MIN"
         }
     
+    @staticmethod
+    def series_dimension(intent: QueryIntent) -> Optional[DimensionType]:
+        """
+        Dimensión que separa las series cuando la consulta cruza el tiempo por año con otra
+        dimensión (p. ej. TCH por variedad por año: una serie por variedad); None si no aplica.
+        Las consultas mensuales conservan año y mes en el eje y su LIMIT
+        """
+        if DimensionType.TIEMPO not in intent.dimensions or intent.time_grain != "year":
+            return None
+        others = [d for d in intent.dimensions if d != DimensionType.TIEMPO]
+        return others[0] if len(others) == 1 else None
+    
     def generate_sql(self, intent: QueryIntent) -> str:
         """Genera SQL basado en la intención de la consulta"""
         
         # Construir SELECT
         select_parts = []
         group_by_parts = []
+        series = self.series_dimension(intent)
         
         # Agregar dimensiones
         for dimension in intent.dimensions:
             table_info = self.dimension_tables[dimension]
             if dimension == DimensionType.TIEMPO:
-                select_parts.append(table_info[3])  # t.anio, t.mes
-                group_by_parts.append(table_info[3])
+                # En consultas multi-serie el eje X es el año; si no, año y mes
+                time_columns = "t.anio" if series else table_info[3]
+                select_parts.append(time_columns)
+                group_by_parts.append(time_columns)
             else:
                 select_parts.append(f"{table_info[1]}.{table_info[3].split('.')[1]}")
                 group_by_parts.append(f"{table_info[1]}.{table_info[3].split('.')[1]}")
         
         # Agregar métricas con agregación
+        metric_names = []
         for metric in intent.metrics:
             column = self.metric_columns[metric]
             agg_func = self.aggregation_functions[intent.aggregation]
@@ -290,29 +341,27 @@ class UniversalSQLGenerator:
             else:
                 metric_name = f"{intent.aggregation.value}_{metric.value}"
             select_parts.append(f"{agg_func}({column}) as {metric_name}")
+            metric_names.append(metric_name)
         
-        # Construir WHERE y asegurar dimensiones necesarias
+        # Construir WHERE y asegurar las tablas necesarias (sin modificar la intención,
+        # que luego usa get_visualization_config)
         where_conditions = []
+        join_dimensions = list(intent.dimensions)
         for key, value in intent.filters.items():
-            if key == 'anio':
-                # Asegurar que se incluya la tabla dimtiempo si se filtra por año
-                if DimensionType.TIEMPO not in intent.dimensions:
-                    intent.dimensions.append(DimensionType.TIEMPO)
-                where_conditions.append(f"t.anio = {value}")
-            elif key == 'mes':
-                if DimensionType.TIEMPO not in intent.dimensions:
-                    intent.dimensions.append(DimensionType.TIEMPO)
-                where_conditions.append(f"t.mes = {value}")
-            elif key == 'trimestre':
-                if DimensionType.TIEMPO not in intent.dimensions:
-                    intent.dimensions.append(DimensionType.TIEMPO)
-                where_conditions.append(f"t.trimestre = {value}")
+            if key in ('anio', 'mes', 'trimestre'):
+                # Asegurar que se incluya la tabla dimtiempo si se filtra por tiempo
+                if DimensionType.TIEMPO not in join_dimensions:
+                    join_dimensions.append(DimensionType.TIEMPO)
+                where_conditions.append(f"t.{key} = {value}")
+            elif key in ENTITY_FILTER_COLUMNS:
+                # Filtro sobre la clave de la tabla de hechos: no requiere JOIN adicional
+                where_conditions.append(entity_condition(ENTITY_FILTER_COLUMNS[key], value))
         
         # Construir FROM y JOINs (después de asegurar todas las dimensiones)
         from_clause = "FROM hechos_cosecha h"
         join_clauses = []
         
-        for dimension in intent.dimensions:
+        for dimension in join_dimensions:
             table_info = self.dimension_tables[dimension]
             join_clauses.append(f"JOIN {table_info[0]} {table_info[1]} ON {table_info[2]}")
         
@@ -323,11 +372,30 @@ class UniversalSQLGenerator:
         
         # Construir ORDER BY
         order_by_clause = ""
-        if intent.order_by:
+        if series:
+            # Multi-serie: orden cronológico y sin LIMIT, que cortaría series a la mitad
+            # (el SQLGuard sigue acotando el total de filas)
+            order_by_clause = f"ORDER BY t.anio, {self.dimension_tables[series][3]}"
+        elif intent.order_by:
             order_by_clause = f"ORDER BY {intent.order_by} {intent.order_direction}"
         
         # Construir LIMIT
-        limit_clause = f"LIMIT {intent.limit}" if intent.limit else ""
+        limit_clause = f"LIMIT {intent.limit}" if intent.limit and not series else ""
+        
+        # Gráfico de pastel sobre una dimensión: top-N y "Otros" se resuelven en la base de datos
+        if (intent.chart_type == ChartType.PIE and len(intent.dimensions) == 1
+                and intent.dimensions[0] != DimensionType.TIEMPO and metric_names):
+            inner_sql = "\n".join(filter(None, [
+                f"SELECT {', '.join(select_parts)}",
+                from_clause,
+                *join_clauses,
+                where_clause,
+                group_by_clause
+            ]))
+            label_column = group_by_parts[0].split('.')[-1]
+            return self._top_n_with_others_sql(inner_sql, label_column, metric_names,
+                                               intent.order_by or metric_names[0], intent.limit or 10,
+                                               intent.aggregation)
         
         # Ensamblar SQL
         sql_parts = [
@@ -342,6 +410,39 @@ class UniversalSQLGenerator:
         
         return "\n".join(filter(None, sql_parts)) + ";"
     
+    def _top_n_with_others_sql(self, inner_sql: str, label_column: str, metric_names: List[str],
+                               order_metric: str, top: int, aggregation: AggregationType) -> str:
+        """
+        Envuelve una consulta agrupada para retornar las top categorías más una fila "Otros"
+        
+        Usa ROW_NUMBER() (MySQL 8+) para clasificar y agrega el resto en el mismo viaje,
+        de modo que nunca se transfieren filas que solo terminarían sumadas en una porción.
+        Para promedios, "Otros" es el promedio de los promedios del resto.
+        """
+        rest_func = "AVG" if aggregation == AggregationType.AVG else "SUM"
+        if order_metric not in metric_names:
+            order_metric = metric_names[0]
+        metrics_sql = ",\n       ".join(
+            f"CASE WHEN MIN(rn) <= {top} THEN MAX({name}) ELSE {rest_func}({name}) END AS {name}"
+            for name in metric_names
+        )
+        return (
+            f"WITH base AS (\n{inner_sql}\n),\n"
+            f"ranked AS (\n"
+            f"SELECT base.*, ROW_NUMBER() OVER (ORDER BY {order_metric} DESC) AS rn\n"
+            f"FROM base\n"
+            f"),\n"
+            f"bucketed AS (\n"
+            f"SELECT ranked.*, CASE WHEN rn <= {top} THEN {label_column} ELSE 'Otros' END AS categoria\n"
+            f"FROM ranked\n"
+            f")\n"
+            f"SELECT categoria AS {label_column},\n"
+            f"       {metrics_sql}\n"
+            f"FROM bucketed\n"
+            f"GROUP BY categoria\n"
+            f"ORDER BY MIN(rn);"
+        )
+    
     def get_visualization_config(self, intent: QueryIntent) -> Dict[str, any]:
         """Genera configuración de visualización basada en la intención"""
         
@@ -366,10 +467,24 @@ class UniversalSQLGenerator:
         else:
             data_column = "valor"
         
-        return {
+        config = {
             "type": chart_type,
             "title": f"Análisis de {primary_metric.value if intent.metrics else 'Datos'}",
             "x_axis": label_column,
             "y_axis": data_column,
             "columns": [label_column, data_column]
         }
+        
+        # Tiempo cruzado con otra dimensión: un dataset por valor de esa dimensión
+        series = self.series_dimension(intent)
+        if series:
+            series_column = f"nombre_{series.value}"
+            config.update({
+                "x_axis": "anio",
+                "series": series_column,
+                "columns": ["anio", series_column, data_column]
+            })
+            if intent.chart_type in (ChartType.PIE, ChartType.TABLE):
+                config["type"] = ChartType.LINE.value
+        
+        return config
@@ -38,6 +38,8 @@ class SecurityConfig:
     RATE_LIMIT_DEFAULT = os.getenv('RATE_LIMIT_DEFAULT', '1000 per hour, 100 per minute')
     RATE_LIMIT_LOGIN = os.getenv('RATE_LIMIT_LOGIN', '5 per minute')
     RATE_LIMIT_API = os.getenv('RATE_LIMIT_API', '100 per hour')
+    # Contadores compartidos entre workers: 'memory://' (un proceso) o 'redis://host:6379/0'
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')
     
     # CORS Configuration
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:5001,http://127.0.0.1:5001,http://localhost:5173,http://127.0.0.1:5173').split(',')
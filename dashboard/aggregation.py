@@ -0,0 +1,173 @@
+"""
+Núcleo de agregación en memoria para SugarBI
+Calcula por grupo suma, conteo, mínimo, máximo, promedio, varianza, desviación estándar,
+mediana y cuantiles exactos de varias medidas sobre arreglos columnares de NumPy. Cada
+medida se ordena una sola vez por (grupo, valor): de ese orden salen los extremos (primer
+y último valor de cada grupo) y los cuantiles (posiciones dentro del grupo), y la suma y
+el segundo momento centrado salen de np.bincount, sin recorrer filas en Python.
+
+Lo usa el motor OLAP cuando la base de datos no tiene funciones de ventana (MySQL 5.7) o
+cuando se pide con OLAP_AGGREGATION_MODE=memory. La varianza es poblacional, igual que
+VARIANCE() y STDDEV() de MySQL, y los cuantiles interpolan linealmente entre los dos
+valores vecinos (como numpy.quantile)
+"""
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Funciones que calcula aggregate (nombres de AggregationFunction del motor OLAP)
+FUNCTIONS = ('sum', 'count', 'min', 'max', 'avg', 'variance', 'std', 'median')
+
+
+def quantile_label(q: float) -> str:
+    """Sufijo de columna de un cuantil: 0.25 -> 'p25', 0.975 -> 'p97_5'"""
+    return 'p' + f"{q * 100:g}".replace('.', '_')
+
+
+def factorize(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Códigos enteros y etiquetas ordenadas de una columna (None/NaN es una etiqueta más, al final)"""
+    import pandas as pd
+
+    codes, labels = pd.factorize(column, sort=True, use_na_sentinel=False)
+    labels = np.asarray(labels, dtype=object)
+    labels[pd.isna(labels)] = None
+    return codes, labels
+
+
+def combine_codes(coded: Sequence[Tuple[np.ndarray, np.ndarray]],
+                  n_rows: int = 0) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Código de grupo de cada fila a partir de columnas ya codificadas con factorize
+
+    Args:
+        coded: (códigos, etiquetas) de cada columna que define el grupo
+        n_rows: Filas cuando no hay columnas (todas quedan en un solo grupo)
+
+    Returns:
+        Tupla (códigos de fila en 0..n_grupos-1, etiquetas de cada columna por grupo);
+        solo hay grupos para las combinaciones presentes
+    """
+    if not coded:
+        return np.zeros(n_rows, dtype=np.intp), []
+
+    shape = tuple(max(len(labels), 1) for _, labels in coded)
+    combined = np.ravel_multi_index(tuple(codes for codes, _ in coded), shape)
+    unique, codes = np.unique(combined, return_inverse=True)
+    positions = np.unravel_index(unique, shape)
+    return codes.reshape(-1), [labels[position] for (_, labels), position in zip(coded, positions)]
+
+
+def group_codes(label_columns: Sequence[np.ndarray], n_rows: int = 0) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Código de grupo de cada fila a partir de una o varias columnas de etiquetas
+
+    Args:
+        label_columns: Columnas (arreglos de objetos) que definen el grupo
+        n_rows: Filas cuando no hay columnas (todas quedan en un solo grupo)
+
+    Returns:
+        Tupla (códigos de fila en 0..n_grupos-1, etiquetas de cada columna por grupo)
+    """
+    return combine_codes([factorize(column) for column in label_columns], n_rows)
+
+
+def aggregate(codes: np.ndarray, n_groups: int, values: np.ndarray, functions: Iterable[str],
+              quantiles: Iterable[float] = ()) -> Dict[str, np.ndarray]:
+    """
+    Agrega una medida por grupo
+
+    Args:
+        codes: Código de grupo de cada fila
+        n_groups: Cantidad de grupos
+        values: Valores de la medida (float; NaN = nulo, no cuenta)
+        functions: Nombres de FUNCTIONS a calcular
+        quantiles: Cuantiles adicionales entre 0 y 1
+
+    Returns:
+        Diccionario nombre -> arreglo de n_groups valores (NaN en grupos sin datos);
+        los cuantiles usan quantile_label como nombre
+
+    Raises:
+        ValueError: Si se pide una función desconocida o un cuantil fuera de [0, 1]
+    """
+    functions = list(functions)
+    quantiles = list(quantiles)
+    unknown = [name for name in functions if name not in FUNCTIONS]
+    if unknown:
+        raise ValueError(f"Funciones de agregación desconocidas: {', '.join(unknown)}")
+    if any(not 0 <= q <= 1 for q in quantiles):
+        raise ValueError("Los cuantiles deben estar entre 0 y 1")
+
+    present = ~np.isnan(values)
+    group, x = codes[present], values[present]
+    counts = np.bincount(group, minlength=n_groups)
+    empty = counts == 0
+    safe_counts = np.where(empty, 1, counts)
+    results: Dict[str, np.ndarray] = {}
+
+    def masked(array: np.ndarray) -> np.ndarray:
+        return np.where(empty, np.nan, array)
+
+    sums = np.bincount(group, weights=x, minlength=n_groups)
+    if 'sum' in functions:
+        results['sum'] = masked(sums)
+    if 'count' in functions:
+        results['count'] = counts.astype(np.float64)
+    mean = sums / safe_counts
+    if 'avg' in functions:
+        results['avg'] = masked(mean)
+    if 'variance' in functions or 'std' in functions:
+        # Segundo momento centrado en la media del grupo: estable aunque los valores sean grandes
+        deviation = x - mean[group]
+        variance = np.bincount(group, weights=deviation * deviation, minlength=n_groups) / safe_counts
+        if 'variance' in functions:
+            results['variance'] = masked(variance)
+        if 'std' in functions:
+            results['std'] = masked(np.sqrt(variance))
+
+    order_needed = {'min', 'max', 'median'} & set(functions) or quantiles
+    if order_needed:
+        # Un solo ordenamiento por (grupo, valor); cada grupo ocupa un tramo contiguo
+        order = np.lexsort((x, group))
+        ordered = x[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        first = np.minimum(starts, max(len(ordered) - 1, 0))
+
+        def at(offsets: np.ndarray) -> np.ndarray:
+            if not len(ordered):
+                return np.full(n_groups, np.nan)
+            return ordered[np.minimum(first + offsets, len(ordered) - 1)]
+
+        def quantile(q: float) -> np.ndarray:
+            position = (safe_counts - 1) * q
+            low = np.floor(position).astype(np.intp)
+            high = np.ceil(position).astype(np.intp)
+            low_values, high_values = at(low), at(high)
+            return masked(low_values + (position - low) * (high_values - low_values))
+
+        if 'min' in functions:
+            results['min'] = masked(at(np.zeros(n_groups, dtype=np.intp)))
+        if 'max' in functions:
+            results['max'] = masked(at(safe_counts - 1))
+        if 'median' in functions:
+            results['median'] = quantile(0.5)
+        for q in quantiles:
+            results[quantile_label(q)] = quantile(q)
+    return results
+
+
+def aggregate_measures(codes: np.ndarray, n_groups: int, measures: Dict[str, np.ndarray],
+                       functions: Iterable[str], quantiles: Iterable[float] = ()) -> Dict[str, np.ndarray]:
+    """
+    Agrega varias medidas con las mismas funciones
+
+    Returns:
+        Diccionario '<medida>_<función>' -> arreglo por grupo
+    """
+    functions, quantiles = list(functions), list(quantiles)
+    columns: Dict[str, np.ndarray] = {}
+    for measure, values in measures.items():
+        for name, result in aggregate(codes, n_groups, values, functions, quantiles).items():
+            columns[f"{measure}_{name}"] = result
+    return columns
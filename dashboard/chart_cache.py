@@ -0,0 +1,125 @@
+"""
+Caché de gráficos para SugarBI
+Guarda la configuración de Chart.js ya serializada (bytes JSON) indexada por la huella
+del resultado, el tipo de gráfico y los ejes, e inserta esos bytes en las respuestas
+sin volver a decodificarlos
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class RawJSON:
+    """Fragmento JSON ya serializado que se inserta tal cual en una respuesta"""
+    __slots__ = ('payload',)
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    def __repr__(self) -> str:
+        return f"RawJSON({len(self.payload)} bytes)"
+
+
+def result_fingerprint(rows: List[Dict[str, Any]]) -> str:
+    """Huella estable de un resultado (filas y columnas en orden)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(rows, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def dumps_with_raw(obj: Any, **kwargs) -> bytes:
+    """
+    Serializa obj a JSON (UTF-8) insertando el contenido de cada RawJSON sin re-serializarlo
+
+    Args:
+        obj: Estructura con dicts, listas y valores JSON; puede contener RawJSON
+        **kwargs: Opciones adicionales para json.dumps (p. ej. indent); sin indent la salida es compacta
+
+    Returns:
+        Bytes JSON listos para enviar
+    """
+    fragments: Dict[str, bytes] = {}
+    prefix = f"__rawjson_{uuid.uuid4().hex}_"
+
+    def replace(value):
+        if isinstance(value, RawJSON):
+            token = f"{prefix}{len(fragments)}"
+            fragments[token] = value.payload
+            return token
+        if isinstance(value, dict):
+            return {key: replace(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [replace(item) for item in value]
+        return value
+
+    kwargs.setdefault('ensure_ascii', False)
+    if kwargs.get('indent') is None:
+        kwargs.setdefault('separators', (',', ':'))
+    kwargs.setdefault('default', str)
+    body = json.dumps(replace(obj), **kwargs).encode('utf-8')
+    for token, payload in fragments.items():
+        body = body.replace(f'"{token}"'.encode('utf-8'), payload, 1)
+    return body
+
+
+class ChartCache:
+    """LRU acotado de gráficos serializados, seguro para varios hilos"""
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: Número máximo de gráficos guardados
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Retorna el valor en caché o lo construye con build() y lo guarda"""
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
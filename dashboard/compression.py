@@ -0,0 +1,113 @@
+"""
+Compresión de respuestas para SugarBI
+Negocia gzip o brotli según Accept-Encoding y comprime las respuestas de texto que
+superan un tamaño mínimo. brotli es opcional: si no está instalado solo se usa gzip
+"""
+
+import gzip
+import os
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Respuestas más pequeñas no compensan el costo de comprimir
+DEFAULT_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+DEFAULT_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+DEFAULT_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+# Tipos de contenido que vale la pena comprimir (SSE queda fuera: se transmite por partes)
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'text/html', 'text/css',
+    'text/plain', 'text/csv', 'image/svg+xml',
+}
+
+# Sufijo del ETag por codificación: cada variante es una representación distinta
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+
+def available_encodings() -> Iterable[str]:
+    """Codificaciones soportadas en orden de preferencia del servidor"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Elige la codificación a partir de la cabecera Accept-Encoding
+
+    Respeta los valores q (q=0 excluye) y, a igual q, prefiere brotli sobre gzip.
+
+    Returns:
+        'br', 'gzip' o None si el cliente no acepta ninguna
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Comprime body con la codificación indicada"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=DEFAULT_BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0: la misma entrada produce los mismos bytes (útil para cachés y ETag)
+        return gzip.compress(body, compresslevel=DEFAULT_GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Codificación no soportada: {encoding}")
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and (mimetype in COMPRESSIBLE_MIMETYPES or mimetype.endswith('+json'))
+
+
+def init_compression(app, min_size: int = DEFAULT_MIN_SIZE):
+    """
+    Registra la compresión de respuestas en una aplicación Flask
+
+    No toca respuestas en streaming, ya codificadas, con estado distinto de 2xx,
+    de tipo no textual o menores que min_size.
+    """
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or not 200 <= response.status_code < 300 or response.status_code == 204
+                or 'Content-Encoding' in response.headers
+                or not is_compressible(response.mimetype)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        return response
+
+    return compress_response
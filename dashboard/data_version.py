@@ -0,0 +1,77 @@
+"""
+Versión de los datos del Data Mart para SugarBI
+Cada ejecución del ETL registra una carga en la tabla etl_cargas; el id de la última
+carga funciona como número de generación para invalidar índices y cachés en memoria
+"""
+
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from sqlalchemy import text
+
+# Consulta de la última carga registrada por el ETL
+LATEST_LOAD_SQL = "SELECT MAX(id) FROM etl_cargas"
+
+
+def resolve_engine(source: Union[Callable, object]):
+    """Acepta un Engine o una función que lo retorna (p. ej. lambda: db.engine)"""
+    return source() if callable(source) else source
+
+
+def register_load(connection, fact_rows: int) -> None:
+    """
+    Registra una carga del ETL (llamar al final de etls/cargar_datos.py)
+
+    Args:
+        connection: Conexión de SQLAlchemy dentro de una transacción
+        fact_rows: Número de registros cargados en la tabla de hechos
+    """
+    connection.execute(
+        text("INSERT INTO etl_cargas (registros_hechos) VALUES (:rows)"),
+        {"rows": int(fact_rows)}
+    )
+
+
+class DataVersion:
+    """Generación actual de los datos, consultada a la base de datos como máximo cada ttl segundos"""
+
+    def __init__(self, engine_source, ttl_seconds: float = 30.0):
+        """
+        Args:
+            engine_source: Engine de SQLAlchemy o función que lo retorna
+            ttl_seconds: Tiempo durante el cual se reutiliza la última lectura
+        """
+        self.engine_source = engine_source
+        self.ttl_seconds = ttl_seconds
+        self._generation: int = 0
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        """
+        Retorna la generación de datos vigente
+
+        Si la tabla no existe o la base de datos no responde se conserva el último
+        valor conocido (0 al inicio), de modo que los consumidores nunca fallan por esto.
+        """
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.ttl_seconds:
+            return self._generation
+
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.ttl_seconds:
+                return self._generation
+            try:
+                with resolve_engine(self.engine_source).connect() as conn:
+                    latest = conn.execute(text(LATEST_LOAD_SQL)).scalar()
+                self._generation = int(latest or 0)
+            except Exception as e:
+                print(f"⚠️  No se pudo leer la versión de datos: {e}")
+            self._checked_at = now
+        return self._generation
+
+    def invalidate(self):
+        """Fuerza una nueva lectura en la próxima llamada a current()"""
+        with self._lock:
+            self._checked_at = None
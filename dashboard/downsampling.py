@@ -0,0 +1,115 @@
+"""
+Reducción de series para gráficos de SugarBI
+Implementa LTTB (Largest-Triangle-Three-Buckets) y min/max por buckets con NumPy.
+Ambos retornan los índices de los puntos a conservar, de modo que las etiquetas
+se recortan igual que los valores.
+"""
+
+import numpy as np
+
+
+def _as_array(values) -> np.ndarray:
+    """Convierte valores (con posibles None) a float64; los faltantes quedan como NaN"""
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def lttb_indices(values, threshold: int) -> np.ndarray:
+    """
+    Selecciona threshold puntos con LTTB conservando la forma visual de la serie
+
+    El eje X es la posición del punto (las etiquetas de los gráficos son categorías
+    ordenadas). Siempre se conservan el primer y el último punto.
+
+    Args:
+        values: Valores de la serie
+        threshold: Número de puntos deseado (mínimo 3)
+
+    Returns:
+        Índices ordenados de los puntos seleccionados
+    """
+    y = np.nan_to_num(_as_array(values))
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    # Límites de los threshold-2 buckets interiores
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Promedio del bucket siguiente (o el último punto)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        if next_end <= next_start:
+            next_end = next_start + 1
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # Área del triángulo (punto anterior, candidato, promedio siguiente)
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def minmax_indices(values, threshold: int) -> np.ndarray:
+    """
+    Selecciona el mínimo y el máximo de cada bucket (preserva todos los picos)
+
+    Args:
+        values: Valores de la serie
+        threshold: Número máximo de puntos (se usan threshold // 2 buckets)
+
+    Returns:
+        Índices ordenados y sin duplicados de los puntos seleccionados
+    """
+    y = _as_array(values)
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+
+    # Los faltantes nunca ganan: +inf para el mínimo y -inf para el máximo
+    missing = np.isnan(grid)
+    low = np.argmin(np.where(missing, np.inf, grid), axis=1)
+    high = np.argmax(np.where(missing, -np.inf, grid), axis=1)
+
+    offsets = np.arange(buckets) * size
+    indices = np.unique(np.concatenate([offsets + low, offsets + high]))
+    return indices[indices < n]
+
+
+DOWNSAMPLERS = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+def downsample(labels, values, threshold: int, method: str = 'lttb'):
+    """
+    Reduce una serie a lo sumo threshold puntos
+
+    Returns:
+        Tupla (labels, values) reducidas; si la serie ya cabe se retorna sin cambios
+    """
+    if threshold is None or len(values) <= threshold:
+        return labels, values
+    try:
+        sampler = DOWNSAMPLERS[method]
+    except KeyError:
+        raise ValueError(f"Método de reducción no soportado: {method}")
+    indices = sampler(values, threshold)
+    return [labels[i] for i in indices], [values[i] for i in indices]
@@ -0,0 +1,114 @@
+"""
+Caché HTTP para los endpoints de lectura de SugarBI
+Las respuestas de dimensiones y estadísticas solo cambian cuando el ETL registra una
+carga nueva, así que su ETag se deriva de la generación de datos (DataVersion). Con eso
+se responde 304 Not Modified sin ejecutar la vista y se guardan los bytes ya renderizados,
+también en sus variantes comprimidas
+"""
+
+import hashlib
+import os
+from functools import wraps
+from typing import Callable, Dict
+
+from flask import Response, make_response, request
+
+from dashboard.chart_cache import ChartCache
+from dashboard.compression import DEFAULT_MIN_SIZE, ETAG_SUFFIXES, compress, is_compressible, negotiate_encoding
+from dashboard.data_version import DataVersion
+
+# Segundos que el navegador o el proxy pueden reutilizar una respuesta sin revalidarla
+DEFAULT_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 60))
+
+
+def generation_etag(generation: int, resource: str) -> str:
+    """ETag de un recurso para una generación de datos"""
+    digest = hashlib.blake2b(resource.encode('utf-8'), digest_size=6).hexdigest()
+    return f"g{generation}-{digest}"
+
+
+class ResponseCache:
+    """Respuestas renderizadas indexadas por recurso y generación de datos"""
+
+    def __init__(self, data_version: DataVersion, max_entries: int = 256, max_age: int = DEFAULT_MAX_AGE):
+        """
+        Args:
+            data_version: Generación de datos del ETL (de ella se derivan los ETag)
+            max_entries: Respuestas guardadas como máximo (LRU)
+            max_age: Valor de max-age en Cache-Control
+        """
+        self.data_version = data_version
+        self.max_age = max_age
+        self.entries = ChartCache(max_entries)
+        self.not_modified = 0
+
+    def _headers(self, response: Response, etag: str, public: bool):
+        response.set_etag(etag)
+        scope = 'public' if public else 'private'
+        response.headers['Cache-Control'] = f"{scope}, max-age={self.max_age}, must-revalidate"
+        response.vary.add('Accept-Encoding')
+
+    @staticmethod
+    def _variant(entry: Dict, encoding: str) -> bytes:
+        """Cuerpo en la codificación pedida; cada variante se comprime una sola vez"""
+        body = entry.get(encoding)
+        if body is None:
+            body = compress(entry['identity'], encoding)
+            entry[encoding] = body
+        return body
+
+    def cached(self, public: bool = True) -> Callable:
+        """
+        Decorador para vistas GET cuyo resultado depende solo de los datos cargados
+
+        - Si el If-None-Match del cliente coincide con el ETag vigente responde 304.
+        - Si los bytes ya están en caché los retorna sin ejecutar la vista.
+        - Solo se guardan respuestas 200; los errores nunca se cachean.
+        - Cada variante comprimida (gzip/br) se genera una sola vez y queda en la entrada.
+
+        Args:
+            public: False para endpoints con autenticación (Cache-Control: private)
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                resource = request.full_path
+                generation = self.data_version.current()
+                encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+                etag = generation_etag(generation, resource)
+                # Cada variante comprimida tiene su propio ETag; cualquiera de las dos sigue vigente
+                candidates = [etag + ETAG_SUFFIXES[encoding], etag] if encoding else [etag]
+
+                for candidate in candidates:
+                    if request.if_none_match.contains(candidate):
+                        self.not_modified += 1
+                        response = Response(status=304)
+                        self._headers(response, candidate, public)
+                        return response
+
+                key = (resource, generation)
+                entry = self.entries.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.direct_passthrough:
+                        return response
+                    entry = {'identity': response.get_data(), 'mimetype': response.mimetype}
+                    self.entries.put(key, entry)
+
+                identity = entry['identity']
+                if encoding and len(identity) >= DEFAULT_MIN_SIZE and is_compressible(entry['mimetype']):
+                    response = Response(self._variant(entry, encoding), mimetype=entry['mimetype'])
+                    response.headers['Content-Encoding'] = encoding
+                    etag = candidates[0]
+                else:
+                    response = Response(identity, mimetype=entry['mimetype'])
+                self._headers(response, etag, public)
+                return response
+            return wrapper
+        return decorator
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de la caché de respuestas"""
+        stats = self.entries.stats()
+        stats["not_modified"] = self.not_modified
+        return stats
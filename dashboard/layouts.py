@@ -0,0 +1,226 @@
+"""
+Layouts de dashboard para SugarBI
+Define los paneles de cada dashboard (consulta y gráfico) y los ejecuta en paralelo
+sobre el pool de conexiones compartido, midiendo el tiempo de cada panel
+"""
+
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from chatbot.sql_guard import SQLGuard
+from dashboard.chart_cache import RawJSON, result_fingerprint
+from dashboard.data_version import resolve_engine
+from dashboard.visualization_engine import ChartConfig, ChartType, VisualizationEngine
+
+
+@dataclass
+class PanelSpec:
+    """Panel de un dashboard: una consulta agregada y cómo graficarla"""
+    id: str
+    title: str
+    sql: str
+    chart_type: ChartType
+    x_axis: str
+    y_axis: str
+    series: Optional[str] = None
+    width: int = 1  # Columnas del grid que ocupa el panel
+
+
+# Dashboards disponibles en /api/dashboard/<name>
+DASHBOARD_LAYOUTS: Dict[str, Dict[str, Any]] = {
+    'general': {
+        'title': 'Dashboard SugarBI',
+        'columns': 2,
+        'panels': [
+            PanelSpec(
+                'produccion_anual', 'Producción por año',
+                """SELECT t.anio, SUM(h.toneladas_cana_molida) AS total_toneladas
+                FROM hechos_cosecha h
+                JOIN dimtiempo t ON t.tiempo_id = h.codigo_tiempo
+                GROUP BY t.anio
+                ORDER BY t.anio""",
+                ChartType.LINE, 'anio', 'total_toneladas', width=2
+            ),
+            PanelSpec(
+                'top_fincas', 'Top 10 fincas por producción',
+                """SELECT f.nombre_finca, SUM(h.toneladas_cana_molida) AS total_toneladas
+                FROM hechos_cosecha h
+                JOIN dimfinca f ON f.finca_id = h.id_finca
+                GROUP BY f.nombre_finca
+                ORDER BY total_toneladas DESC
+                LIMIT 10""",
+                ChartType.BAR, 'nombre_finca', 'total_toneladas'
+            ),
+            PanelSpec(
+                'produccion_zona', 'Producción por zona',
+                """SELECT z.nombre_zona, SUM(h.toneladas_cana_molida) AS total_toneladas
+                FROM hechos_cosecha h
+                JOIN dimzona z ON z.codigo_zona = h.codigo_zona
+                GROUP BY z.nombre_zona
+                ORDER BY total_toneladas DESC""",
+                ChartType.PIE, 'nombre_zona', 'total_toneladas'
+            ),
+            PanelSpec(
+                'tch_variedad_anio', 'TCH promedio por variedad y año',
+                """SELECT t.anio, v.nombre_variedad, AVG(h.tch) AS promedio_tch
+                FROM hechos_cosecha h
+                JOIN dimvariedad v ON v.variedad_id = h.codigo_variedad
+                JOIN dimtiempo t ON t.tiempo_id = h.codigo_tiempo
+                GROUP BY t.anio, v.nombre_variedad
+                ORDER BY t.anio, v.nombre_variedad""",
+                ChartType.LINE, 'anio', 'promedio_tch', series='nombre_variedad', width=2
+            ),
+        ]
+    },
+    'calidad': {
+        'title': 'Calidad de la caña',
+        'columns': 2,
+        'panels': [
+            PanelSpec(
+                'brix_variedad', 'Brix promedio por variedad',
+                """SELECT v.nombre_variedad, AVG(h.brix) AS promedio_brix
+                FROM hechos_cosecha h
+                JOIN dimvariedad v ON v.variedad_id = h.codigo_variedad
+                GROUP BY v.nombre_variedad
+                ORDER BY promedio_brix DESC""",
+                ChartType.BAR, 'nombre_variedad', 'promedio_brix'
+            ),
+            PanelSpec(
+                'sacarosa_variedad', 'Sacarosa promedio por variedad',
+                """SELECT v.nombre_variedad, AVG(h.sacarosa) AS promedio_sacarosa
+                FROM hechos_cosecha h
+                JOIN dimvariedad v ON v.variedad_id = h.codigo_variedad
+                GROUP BY v.nombre_variedad
+                ORDER BY promedio_sacarosa DESC""",
+                ChartType.BAR, 'nombre_variedad', 'promedio_sacarosa'
+            ),
+            PanelSpec(
+                'tch_zona', 'TCH promedio por zona',
+                """SELECT z.nombre_zona, AVG(h.tch) AS promedio_tch
+                FROM hechos_cosecha h
+                JOIN dimzona z ON z.codigo_zona = h.codigo_zona
+                GROUP BY z.nombre_zona
+                ORDER BY promedio_tch DESC""",
+                ChartType.BAR, 'nombre_zona', 'promedio_tch'
+            ),
+            PanelSpec(
+                'brix_anual', 'Brix promedio por año',
+                """SELECT t.anio, AVG(h.brix) AS promedio_brix
+                FROM hechos_cosecha h
+                JOIN dimtiempo t ON t.tiempo_id = h.codigo_tiempo
+                GROUP BY t.anio
+                ORDER BY t.anio""",
+                ChartType.LINE, 'anio', 'promedio_brix'
+            ),
+        ]
+    },
+}
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class DashboardRunner:
+    """Ejecuta los paneles de un dashboard en paralelo y compone el layout"""
+
+    def __init__(self, engine_source, viz_engine: VisualizationEngine,
+                 sql_guard: Optional[SQLGuard] = None, max_workers: Optional[int] = None,
+                 layouts: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        Args:
+            engine_source: Engine de SQLAlchemy o función que lo retorna (se comparte su pool)
+            viz_engine: Motor de visualizaciones (y su caché de gráficos)
+            sql_guard: Guardia de ejecución; por defecto se configura desde el entorno
+            max_workers: Paneles simultáneos; no debería superar el tamaño del pool de conexiones
+            layouts: Dashboards disponibles; por defecto DASHBOARD_LAYOUTS
+        """
+        self.engine_source = engine_source
+        self.viz_engine = viz_engine
+        self.sql_guard = sql_guard or SQLGuard()
+        self.layouts = layouts if layouts is not None else DASHBOARD_LAYOUTS
+        workers = max_workers or int(os.getenv('DASHBOARD_WORKERS', 4))
+        # Pool persistente: crear hilos por petición costaría más que algunos paneles
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-panel')
+
+    def render_panel(self, panel: PanelSpec) -> Dict[str, Any]:
+        """
+        Ejecuta la consulta de un panel y construye su gráfico
+
+        Un panel que falla retorna success=False sin afectar a los demás.
+        """
+        start = time.perf_counter()
+        result: Dict[str, Any] = {"id": panel.id, "title": panel.title, "width": panel.width}
+        try:
+            guarded = self.sql_guard.execute(resolve_engine(self.engine_source), panel.sql)
+            query_ms = _elapsed_ms(start)
+
+            render_start = time.perf_counter()
+            config = ChartConfig(
+                chart_type=panel.chart_type,
+                title=panel.title,
+                x_axis=panel.x_axis,
+                y_axis=panel.y_axis,
+                data=guarded.rows,
+                series=panel.series,
+                data_hash=result_fingerprint(guarded.rows)
+            )
+            visualization = RawJSON(self.viz_engine.create_visualization_json(config))
+
+            result.update({
+                "success": True,
+                "visualization": visualization,
+                "rows": guarded.row_count,
+                "truncated": guarded.truncated,
+                "timing": {"query_ms": query_ms, "render_ms": _elapsed_ms(render_start),
+                           "total_ms": _elapsed_ms(start)}
+            })
+        except Exception as e:
+            print(f"⚠️  Error en panel {panel.id}: {e}")
+            result.update({
+                "success": False,
+                "error": str(e),
+                "timing": {"total_ms": _elapsed_ms(start)}
+            })
+        return result
+
+    def render(self, name: str) -> Dict[str, Any]:
+        """
+        Construye un dashboard completo
+
+        Args:
+            name: Nombre del dashboard (clave de layouts)
+
+        Returns:
+            Layout con los paneles en el orden definido; cada panel incluye sus tiempos
+
+        Raises:
+            KeyError: Si el dashboard no existe
+        """
+        layout = self.layouts[name]
+        start = time.perf_counter()
+        # Cada panel corre en una copia del contexto: sus consultas cuentan para la petición
+        futures = [self._executor.submit(contextvars.copy_context().run, self.render_panel, panel)
+                   for panel in layout['panels']]
+        panels = [future.result() for future in futures]
+
+        dashboard = self.viz_engine.create_dashboard_layout(
+            panels, title=layout.get('title', 'Dashboard SugarBI'), columns=layout.get('columns', 2)
+        )
+        timings = [(panel["timing"]["total_ms"], panel["id"]) for panel in panels]
+        dashboard.update({
+            "name": name,
+            "timing": {
+                "total_ms": _elapsed_ms(start),
+                "slowest_panel": max(timings)[1] if timings else None
+            }
+        })
+        return dashboard
+
+    def shutdown(self):
+        """Detiene el pool de hilos"""
+        self._executor.shutdown(wait=False)
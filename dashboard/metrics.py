@@ -0,0 +1,377 @@
+"""
+Instrumentación de rendimiento de SugarBI
+Mide cada petición y sus fases (parse, generación de SQL, base de datos, gráfico y
+serialización), cuenta las idas a la base de datos y las filas leídas, y expone los
+histogramas en formato de texto de Prometheus en /metrics. Las peticiones lentas se
+registran con su SQL y parámetros en el logger 'sugarbi.performance'
+
+Las métricas son por proceso: con varios workers de gunicorn cada uno expone las suyas
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Límites de los histogramas
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# Peticiones que superan este tiempo se registran con su SQL
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 1000))
+# Sentencias guardadas por petición para el registro de lentas (acota la memoria)
+MAX_CAPTURED_STATEMENTS = 20
+# Parámetros cuyo nombre sugiere un secreto se ocultan en el registro
+SENSITIVE_PARAM = re.compile(r'pass|token|secret|hash', re.IGNORECASE)
+
+logger = logging.getLogger('sugarbi.performance')
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(name, '')) for name in self.labelnames), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_number(value)}"
+
+
+class Histogram:
+    """Histograma acumulativo con límites fijos y etiquetas"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            # [conteo por límite..., suma, total]
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels.get(name, '')) for name in self.labelnames))
+        return int(series[-1]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += series[index]
+                le = f'le="{_format_number(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_number(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(series[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_number(series[-1])}"
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = SECONDS_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def render(self) -> str:
+        """Métricas en formato de texto de Prometheus (versión 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'sugarbi_request_duration_seconds', 'Duración de las peticiones HTTP', ('method', 'endpoint', 'status'))
+PHASE_SECONDS = REGISTRY.histogram(
+    'sugarbi_request_phase_seconds', 'Tiempo por fase dentro de una petición', ('phase',))
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'sugarbi_db_query_duration_seconds', 'Duración de cada sentencia SQL')
+DB_ROUND_TRIPS = REGISTRY.histogram(
+    'sugarbi_db_round_trips_per_request', 'Sentencias SQL ejecutadas por petición', buckets=ROUND_TRIP_BUCKETS)
+DB_ROWS = REGISTRY.histogram(
+    'sugarbi_db_rows_per_request', 'Filas leídas de la base de datos por petición', buckets=ROW_BUCKETS)
+SLOW_REQUESTS = REGISTRY.counter(
+    'sugarbi_slow_requests', 'Peticiones que superaron SLOW_REQUEST_MS', ('endpoint',))
+ERRORS = REGISTRY.counter(
+    'sugarbi_errors', 'Errores capturados por componente', ('component',))
+
+
+class RequestMetrics:
+    """Tiempos y contadores de una petición (compartidos con los hilos que la atienden)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.round_trips = 0
+        self.rows = 0
+        self.statements: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add_phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_query(self, statement: str, parameters: Any, seconds: float):
+        with self._lock:
+            self.round_trips += 1
+            self.phases['db'] = self.phases.get('db', 0.0) + seconds
+            if len(self.statements) < MAX_CAPTURED_STATEMENTS:
+                self.statements.append({
+                    "sql": ' '.join(statement.split())[:1000],
+                    "params": _redact(parameters),
+                    "ms": round(seconds * 1000, 2)
+                })
+
+    def add_rows(self, count: int):
+        with self._lock:
+            self.rows += count
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('sugarbi_request_metrics', default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    """Métricas de la petición en curso (None fuera de una petición)"""
+    return _current.get()
+
+
+def _redact(parameters: Any) -> Any:
+    """Parámetros de una sentencia aptos para el registro (sin secretos, acotados)"""
+    if isinstance(parameters, dict):
+        return {key: '***' if SENSITIVE_PARAM.search(str(key)) else repr(value)[:200]
+                for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], dict):
+            # executemany: basta con las primeras filas
+            return [_redact(row) for row in parameters[:3]]
+        return [repr(value)[:200] for value in parameters[:20]]
+    return repr(parameters)[:200]
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Mide una fase de la petición en curso
+
+    Dentro de una petición el tiempo se acumula y se observa al terminarla (una muestra
+    por petición y fase); fuera de una petición se observa de inmediato.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.add_phase(name, elapsed)
+        else:
+            PHASE_SECONDS.observe(elapsed, phase=name)
+
+
+def add_rows(count: int):
+    """Suma filas leídas a la petición en curso"""
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.add_rows(count)
+
+
+def record_error(component: str, error: BaseException):
+    """Cuenta un error capturado y lo registra con su traceback"""
+    ERRORS.inc(component=component)
+    logger.error("Error en %s: %s", component, error, exc_info=error)
+
+
+def start_request() -> contextvars.Token:
+    """Abre la medición de una petición; retorna el token para cerrarla con finish_request"""
+    return _current.set(RequestMetrics())
+
+
+def finish_request(token: contextvars.Token, method: str, endpoint: str, status: int,
+                   path: str = '', slow_ms: float = SLOW_REQUEST_MS) -> Optional[RequestMetrics]:
+    """Observa los histogramas de la petición y registra las lentas"""
+    request_metrics = _current.get()
+    _current.reset(token)
+    if request_metrics is None:
+        return None
+
+    total = request_metrics.elapsed()
+    REQUEST_SECONDS.observe(total, method=method, endpoint=endpoint, status=status)
+    for name, seconds in request_metrics.phases.items():
+        PHASE_SECONDS.observe(seconds, phase=name)
+    DB_ROUND_TRIPS.observe(request_metrics.round_trips)
+    DB_ROWS.observe(request_metrics.rows)
+
+    if total * 1000 >= slow_ms:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        logger.warning("Petición lenta %s", json.dumps({
+            "method": method,
+            "path": path,
+            "endpoint": endpoint,
+            "status": status,
+            "total_ms": round(total * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in request_metrics.phases.items()},
+            "db_round_trips": request_metrics.round_trips,
+            "rows": request_metrics.rows,
+            "statements": request_metrics.statements
+        }, ensure_ascii=False, default=str))
+    return request_metrics
+
+
+_hooks_installed = False
+
+
+def install_sql_hooks():
+    """
+    Mide todas las sentencias SQL del proceso (cualquier engine de SQLAlchemy)
+
+    Cada sentencia suma una ida a la base de datos y su duración a la fase 'db' de la
+    petición en curso.
+    """
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sugarbi_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('sugarbi_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.add_query(statement, parameters, elapsed)
+
+    _hooks_installed = True
+
+
+def init_metrics(app, slow_ms: float = SLOW_REQUEST_MS):
+    """
+    Registra la instrumentación en una aplicación Flask y expone GET /metrics
+
+    Si METRICS_TOKEN está definido, /metrics exige 'Authorization: Bearer <token>'.
+    Cada respuesta incluye Server-Timing con las fases medidas hasta ese momento.
+    """
+    from flask import Response, g, request
+
+    install_sql_hooks()
+    metrics_token = os.getenv('METRICS_TOKEN')
+
+    @app.before_request
+    def start_metrics():
+        g.metrics_token = start_request()
+
+    @app.after_request
+    def server_timing(response):
+        request_metrics = current()
+        if request_metrics is not None:
+            g.metrics_status = response.status_code
+            timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in request_metrics.phases.items()]
+            timings.append(f"total;dur={request_metrics.elapsed() * 1000:.1f}")
+            response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.teardown_request
+    def finish_metrics(error=None):
+        token = g.pop('metrics_token', None)
+        if token is None:
+            return
+        status = g.pop('metrics_status', 500 if error else 200)
+        endpoint = request.url_rule.endpoint if request.url_rule else 'sin_ruta'
+        try:
+            finish_request(token, request.method, endpoint, status, request.path, slow_ms)
+        except ValueError:
+            # El token pertenece a otro contexto (respuesta en streaming): solo se descarta
+            pass
+
+    def metrics_view():
+        if metrics_token and request.headers.get('Authorization') != f"Bearer {metrics_token}":
+            return Response('no autorizado\n', status=401, mimetype='text/plain')
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    return metrics_view
@@ -5,13 +5,28 @@ Implementa operaciones multidimensionales: drill-down, roll-up, slice, dice, piv
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine, text
-from typing import Dict, List, Any, Optional, Union
-from dataclasses import dataclass
+from sqlalchemy import create_engine, inspect, text
+from typing import Dict, List, Any, Optional, Tuple, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
 from enum import Enum
+import os
+import threading
 import time
 import json
 
+try:
+    from .aggregation import aggregate_measures, combine_codes, factorize, group_codes, quantile_label
+    from .metrics import add_rows, record_error
+    from .sampling import (OLAP_APPROXIMATE_CONFIDENCE, SAMPLE_TABLE, SampleFrame, confidence_bounds,
+                           estimate, z_score)
+except ImportError:
+    from aggregation import aggregate_measures, combine_codes, factorize, group_codes, quantile_label
+    from metrics import add_rows, record_error
+    from sampling import (OLAP_APPROXIMATE_CONFIDENCE, SAMPLE_TABLE, SampleFrame, confidence_bounds,
+                          estimate, z_score)
+
 class OLAPOperation(Enum):
     """Operaciones OLAP disponibles"""
     AGGREGATE = "aggregate"
@@ -59,6 +74,10 @@ class OLAPQuery:
     limit: int = 100
     sort_by: Optional[str] = None
     pivot_dimension: Optional[str] = None
+    # Cuantiles adicionales de cada medida (0.9 -> columna <medida>_p90)
+    quantiles: List[float] = field(default_factory=list)
+    # Responder desde la muestra estratificada (dashboard/sampling.py) y refinar en segundo plano
+    approximate: bool = False
 
 @dataclass
 class OLAPResult:
@@ -72,13 +91,106 @@ class OLAPResult:
     metadata: Dict[str, Any]
     error: Optional[str] = None
 
+# Alias de cada tabla de dimensión y condición de su JOIN con hechos_cosecha
+TABLE_ALIASES = {"dimtiempo": "t", "dimfinca": "f", "dimvariedad": "v", "dimzona": "z"}
+JOIN_CONDITIONS = {
+    "tiempo": "h.codigo_tiempo = {a}.tiempo_id",
+    "geografia": "h.id_finca = {a}.finca_id",
+    "producto": "h.codigo_variedad = {a}.variedad_id"
+}
+
+# Columna de cada filtro y si su valor es texto
+FILTER_COLUMNS = {
+    "año": ("t.año", False),
+    "mes": ("t.mes", False),
+    "zona": ("f.nombre_zona", True),
+    "finca": ("f.nombre_finca", True),
+    "variedad": ("v.nombre_variedad", True)
+}
+
+# Función SQL de cada agregación directa (MEDIAN usa funciones de ventana; VARIANCE y STD
+# son las poblacionales de MySQL y en otros motores se calculan sobre la media de ventana)
+SQL_AGGREGATES = {
+    AggregationFunction.SUM: "SUM",
+    AggregationFunction.AVG: "AVG",
+    AggregationFunction.MAX: "MAX",
+    AggregationFunction.MIN: "MIN",
+    AggregationFunction.COUNT: "COUNT",
+    AggregationFunction.STD: "STDDEV",
+    AggregationFunction.VARIANCE: "VARIANCE"
+}
+# Agregaciones que necesitan el orden de los valores dentro del grupo
+ORDER_AGGREGATES = (AggregationFunction.MEDIAN,)
+# Agregaciones de dispersión que fuera de MySQL se calculan con la media de ventana
+MOMENT_AGGREGATES = (AggregationFunction.VARIANCE, AggregationFunction.STD)
+
+# 'auto': funciones de ventana si la base de datos las tiene, si no en memoria;
+# 'sql' o 'memory' fuerzan un camino para mediana, varianza y cuantiles
+OLAP_AGGREGATION_MODE = os.getenv('OLAP_AGGREGATION_MODE', 'auto')
+
+# Agregaciones que se estiman desde la muestra con intervalo de confianza
+APPROXIMATE_AGGREGATES = (AggregationFunction.SUM, AggregationFunction.AVG, AggregationFunction.COUNT)
+# Resultados exactos de consultas aproximadas que se conservan para la siguiente petición
+OLAP_REFINEMENT_CACHE_SIZE = int(os.getenv('OLAP_REFINEMENT_CACHE_SIZE', 256))
+# Hilos que calculan en segundo plano los resultados exactos
+OLAP_REFINEMENT_WORKERS = int(os.getenv('OLAP_REFINEMENT_WORKERS', 1))
+
+# Agregaciones que admite el pivot (sus totales se derivan de suma, conteo o extremos por celda)
+PIVOT_AGGREGATES = (AggregationFunction.SUM, AggregationFunction.AVG, AggregationFunction.COUNT,
+                    AggregationFunction.MAX, AggregationFunction.MIN)
+
+# Miembros máximos de la dimensión columna para pivotear en SQL (una expresión CASE por miembro)
+OLAP_SQL_PIVOT_MAX_COLUMNS = int(os.getenv('OLAP_SQL_PIVOT_MAX_COLUMNS', 64))
+# Segundos que se reutilizan los miembros de una dimensión (también se invalidan con cada carga del ETL)
+OLAP_DIMENSION_CACHE_SECONDS = float(os.getenv('OLAP_DIMENSION_CACHE_SECONDS', 600))
+
+
+def _sql_literal(value: Any) -> str:
+    """Literal SQL de un miembro de dimensión (números sin comillas, texto escapado)"""
+    if isinstance(value, (bool, np.bool_)):
+        return str(int(value))
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return repr(value.item() if hasattr(value, 'item') else value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _json_matrix(values: np.ndarray) -> List[Any]:
+    """Matriz o vector de floats a listas de Python, con None en lugar de NaN"""
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+def _json_scalar(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
 class OLAEEngine:
     """Motor OLAP para operaciones multidimensionales"""
     
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url)
+    def __init__(self, database_url: Optional[str] = None, engine=None, data_version=None):
+        """
+        Args:
+            database_url: URI de la base de datos (se crea un engine propio)
+            engine: Engine existente; tiene prioridad para compartir su pool de conexiones
+            data_version: DataVersion del Data Mart; una carga nueva invalida la caché de dimensiones
+        """
+        self.engine = engine if engine is not None else create_engine(database_url)
+        self.data_version = data_version
         self.dimension_mappings = self._initialize_dimension_mappings()
         self.measure_mappings = self._initialize_measure_mappings()
+        self._window_functions: Optional[bool] = None
+        # (dimensión, nivel) -> (generación de datos, instante de carga, miembros)
+        self._dimension_cache: Dict[Tuple[str, DimensionLevel], Tuple[int, float, List[Any]]] = {}
+        # Muestra estratificada en memoria: (generación de datos, muestra o None si no existe)
+        self._sample: Optional[Tuple[int, Optional[SampleFrame]]] = None
+        self._sample_lock = threading.Lock()
+        # Consulta -> (generación de datos, resultado exacto); las pendientes se calculan en _executor
+        self._refinements: 'OrderedDict[str, Tuple[int, OLAPResult]]' = OrderedDict()
+        self._pending: set = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
         
     def _initialize_dimension_mappings(self) -> Dict[str, Dict[str, str]]:
         """Inicializa mapeos de dimensiones a tablas y columnas"""
@@ -126,6 +238,9 @@ class OLAEEngine:
         start_time = time.time()
         
         try:
+            if query.approximate:
+                return self._execute_approximate(query, start_time)
+
             # Generar SQL basado en la operación
             if query.operation == OLAPOperation.AGGREGATE:
                 sql_query = self._generate_aggregate_query(query)
@@ -138,25 +253,47 @@ class OLAEEngine:
             elif query.operation == OLAPOperation.DICE:
                 sql_query = self._generate_dice_query(query)
             elif query.operation == OLAPOperation.PIVOT:
+                if query.pivot_dimension:
+                    pivot = self.execute_pivot(query)
+                    return OLAPResult(
+                        success=True,
+                        data=[],
+                        record_count=pivot["total_rows"],
+                        execution_time=time.time() - start_time,
+                        operation=query.operation.value,
+                        sql_query=pivot["sql_query"],
+                        metadata={
+                            "dimensions": query.dimensions,
+                            "measures": query.measures,
+                            "aggregation_functions": [f.value for f in query.aggregation_functions],
+                            "filters": query.filters,
+                            "pivot": pivot
+                        }
+                    )
                 sql_query = self._generate_pivot_query(query)
             else:
                 raise ValueError(f"Operación OLAP no soportada: {query.operation}")
             
-            # Ejecutar consulta
-            df = pd.read_sql(sql_query, self.engine)
-            
-            # Convertir a formato de diccionarios
-            data = df.to_dict('records')
-            
-            # Convertir tipos numpy a nativos de Python
-            for record in data:
-                for key, value in record.items():
-                    if pd.isna(value):
-                        record[key] = None
-                    elif isinstance(value, (np.integer, np.int64)):
-                        record[key] = int(value)
-                    elif isinstance(value, (np.floating, np.float64)):
-                        record[key] = float(value)
+            if self._use_memory_aggregation(query):
+                # Sin funciones de ventana: mediana, varianza y cuantiles en el núcleo columnar
+                data, sql_query = self._aggregate_in_memory(query)
+            else:
+                # Ejecutar consulta
+                df = pd.read_sql(sql_query, self.engine)
+                add_rows(len(df))
+                
+                # Convertir a formato de diccionarios
+                data = df.to_dict('records')
+                
+                # Convertir tipos numpy a nativos de Python
+                for record in data:
+                    for key, value in record.items():
+                        if pd.isna(value):
+                            record[key] = None
+                        elif isinstance(value, (np.integer, np.int64)):
+                            record[key] = int(value)
+                        elif isinstance(value, (np.floating, np.float64)):
+                            record[key] = float(value)
             
             execution_time = time.time() - start_time
             
@@ -171,6 +308,7 @@ class OLAEEngine:
                     "dimensions": query.dimensions,
                     "measures": query.measures,
                     "aggregation_functions": [f.value for f in query.aggregation_functions],
+                    "quantiles": query.quantiles,
                     "filters": query.filters
                 }
             )
@@ -188,121 +326,143 @@ class OLAEEngine:
                 error=str(e)
             )
     
-    def _generate_aggregate_query(self, query: OLAPQuery) -> str:
-        """Genera consulta SQL para operación de agregación"""
-        # Construir SELECT con dimensiones y medidas
-        select_parts = []
-        
-        # Agregar dimensiones
-        for dimension in query.dimensions:
-            if dimension in self.dimension_mappings:
-                level = query.dimension_levels.get(dimension, DimensionLevel.YEAR)
-                column = self.dimension_mappings[dimension]["levels"][level]
-                
-                # Usar alias consistente
-                if dimension == "tiempo":
-                    table_alias = "t"
-                elif dimension == "geografia":
-                    table_alias = "f"
-                elif dimension == "producto":
-                    table_alias = "v"
-                else:
-                    table_alias = dimension[0]
-                    
-                select_parts.append(f"{table_alias}.{column} as {dimension}_{level.value}")
-        
-        # Agregar medidas con funciones de agregación
-        for measure in query.measures:
-            if measure in self.measure_mappings:
-                column = self.measure_mappings[measure]
-                for agg_func in query.aggregation_functions:
-                    if agg_func == AggregationFunction.SUM:
-                        select_parts.append(f"SUM(h.{column}) as {measure}_sum")
-                    elif agg_func == AggregationFunction.AVG:
-                        select_parts.append(f"AVG(h.{column}) as {measure}_avg")
-                    elif agg_func == AggregationFunction.MAX:
-                        select_parts.append(f"MAX(h.{column}) as {measure}_max")
-                    elif agg_func == AggregationFunction.MIN:
-                        select_parts.append(f"MIN(h.{column}) as {measure}_min")
-                    elif agg_func == AggregationFunction.COUNT:
-                        select_parts.append(f"COUNT(h.{column}) as {measure}_count")
-                    elif agg_func == AggregationFunction.STD:
-                        select_parts.append(f"STDDEV(h.{column}) as {measure}_std")
-        
-        # Construir FROM y JOINs
-        from_clause = "FROM hechos_cosecha h"
+    def _dimension_alias(self, dimension: str) -> str:
+        """Alias de la tabla de una dimensión en las consultas (t, f, v)"""
+        return TABLE_ALIASES.get(self.dimension_mappings[dimension]["table"], dimension[0])
+
+    def _dimension_column(self, dimension: str, level: DimensionLevel) -> str:
+        """Columna calificada de una dimensión en un nivel (p. ej. t.año)"""
+        return f"{self._dimension_alias(dimension)}.{self.dimension_mappings[dimension]['levels'][level]}"
+
+    def _join_clauses(self, dimensions: List[str]) -> Tuple[List[str], set]:
+        """JOINs de las dimensiones con la tabla de hechos (sin repetir tablas) y alias usados"""
         join_clauses = []
         used_aliases = set()
-        
-        for dimension in query.dimensions:
+        for dimension in dimensions:
             if dimension in self.dimension_mappings:
                 table = self.dimension_mappings[dimension]["table"]
-                join_key = self.dimension_mappings[dimension]["join_key"]
-                
-                # Crear alias único para cada tabla
-                if table == "dimtiempo":
-                    table_alias = "t"
-                elif table == "dimfinca":
-                    table_alias = "f"
-                elif table == "dimvariedad":
-                    table_alias = "v"
-                elif table == "dimzona":
-                    table_alias = "z"
-                else:
-                    table_alias = dimension[0]
-                
+                table_alias = self._dimension_alias(dimension)
                 # Evitar JOINs duplicados
-                if table_alias not in used_aliases:
-                    if dimension == "tiempo":
-                        join_clauses.append(f"JOIN {table} {table_alias} ON h.codigo_tiempo = {table_alias}.tiempo_id")
-                    elif dimension == "geografia":
-                        join_clauses.append(f"JOIN {table} {table_alias} ON h.id_finca = {table_alias}.finca_id")
-                    elif dimension == "producto":
-                        join_clauses.append(f"JOIN {table} {table_alias} ON h.codigo_variedad = {table_alias}.variedad_id")
+                if table_alias not in used_aliases and dimension in JOIN_CONDITIONS:
+                    join_clauses.append(f"JOIN {table} {table_alias} ON {JOIN_CONDITIONS[dimension].format(a=table_alias)}")
                     used_aliases.add(table_alias)
-        
-        # Construir WHERE con filtros
+        return join_clauses, used_aliases
+
+    @staticmethod
+    def _filter_clauses(filters: Dict[str, Any], used_aliases: set) -> List[str]:
+        """Condiciones WHERE de los filtros (solo los de tablas incluidas en la consulta)"""
         where_clauses = []
-        for key, value in query.filters.items():
-            if key == "año":
-                # Solo agregar filtro de año si la tabla de tiempo está incluida
-                if "t" in used_aliases:
-                    where_clauses.append(f"t.año = {value}")
-            elif key == "mes":
-                # Solo agregar filtro de mes si la tabla de tiempo está incluida
-                if "t" in used_aliases:
-                    where_clauses.append(f"t.mes = {value}")
-            elif key == "zona":
-                # Solo agregar filtro de zona si la tabla de finca está incluida
-                if "f" in used_aliases:
-                    where_clauses.append(f"f.nombre_zona = '{value}'")
-            elif key == "finca":
-                # Solo agregar filtro de finca si la tabla de finca está incluida
-                if "f" in used_aliases:
-                    where_clauses.append(f"f.nombre_finca = '{value}'")
-            elif key == "variedad":
-                # Solo agregar filtro de variedad si la tabla de variedad está incluida
-                if "v" in used_aliases:
-                    where_clauses.append(f"v.nombre_variedad = '{value}'")
-        
-        # Construir GROUP BY
+        for key, value in filters.items():
+            if key in FILTER_COLUMNS:
+                column, quoted = FILTER_COLUMNS[key]
+                if column.split('.')[0] in used_aliases:
+                    where_clauses.append(f"{column} = '{value}'" if quoted else f"{column} = {value}")
+        return where_clauses
+
+    def _is_mysql(self) -> bool:
+        return self.engine.dialect.name in ('mysql', 'mariadb')
+
+    def supports_window_functions(self) -> bool:
+        """Si la base de datos tiene funciones de ventana (MySQL 8, MariaDB 10.2, SQLite 3.25)"""
+        if self._window_functions is None:
+            dialect = self.engine.dialect.name
+            if dialect in ('mysql', 'mariadb'):
+                with self.engine.connect() as connection:
+                    version = connection.dialect.server_version_info or (0,)
+                    is_mariadb = getattr(connection.dialect, 'is_mariadb', False)
+                self._window_functions = version >= ((10, 2) if is_mariadb else (8, 0))
+            elif dialect == 'sqlite':
+                import sqlite3
+                self._window_functions = sqlite3.sqlite_version_info >= (3, 25)
+            else:
+                self._window_functions = True
+        return self._window_functions
+
+    def _needs_window(self, query: OLAPQuery) -> bool:
+        """Si la consulta pide agregaciones que en SQL requieren funciones de ventana"""
+        functions = set(query.aggregation_functions)
+        return bool(query.quantiles) or bool(functions & set(ORDER_AGGREGATES)) or \
+            (not self._is_mysql() and bool(functions & set(MOMENT_AGGREGATES)))
+
+    def _use_memory_aggregation(self, query: OLAPQuery) -> bool:
+        """Si mediana, varianza y cuantiles se calculan en memoria en vez de en SQL"""
+        if not self._needs_window(query) or OLAP_AGGREGATION_MODE == 'sql':
+            return False
+        return OLAP_AGGREGATION_MODE == 'memory' or not self.supports_window_functions()
+
+    @staticmethod
+    def _quantile_sql(q: float, x: str, r: str, n: str) -> str:
+        """
+        Cuantil exacto con interpolación lineal a partir del número de fila (r) y el conteo (n)
+
+        La posición es q·(n-1): la fila baja cumple r-1 <= pos < r y la alta r-2 < pos <= r-1
+        """
+        position = f"{q!r} * ({n} - 1)"
+        low = f"{r} - 1 <= {position} AND {position} < {r}"
+        high = f"{r} - 2 < {position} AND {position} <= {r} - 1"
+        return (f"MAX(CASE WHEN {low} THEN {x} END) + (MAX(CASE WHEN {high} THEN {x} END) - "
+                f"MAX(CASE WHEN {low} THEN {x} END)) * MAX(CASE WHEN {low} THEN {position} - ({r} - 1) END)")
+
+    def _generate_aggregate_query(self, query: OLAPQuery) -> str:
+        """
+        Genera consulta SQL para operación de agregación
+
+        Todas las medidas y funciones salen de una sola consulta. Mediana y cuantiles (y,
+        fuera de MySQL, varianza y desviación) usan una subconsulta con funciones de ventana:
+        número de fila ordenado por valor, conteo y media por grupo, en la misma pasada
+        """
+        # Construir SELECT con dimensiones y medidas
+        select_parts = []
         group_by_parts = []
+        windowed = self._needs_window(query)
+        native = self._is_mysql()
+        
+        # Agregar dimensiones (alias consistente: dimensión_nivel)
+        dimension_columns = []
         for dimension in query.dimensions:
             if dimension in self.dimension_mappings:
                 level = query.dimension_levels.get(dimension, DimensionLevel.YEAR)
-                column = self.dimension_mappings[dimension]["levels"][level]
-                
-                # Usar alias consistente
-                if dimension == "tiempo":
-                    table_alias = "t"
-                elif dimension == "geografia":
-                    table_alias = "f"
-                elif dimension == "producto":
-                    table_alias = "v"
+                column = self._dimension_column(dimension, level)
+                dimension_columns.append(column)
+                source = f"w.g{len(dimension_columns) - 1}" if windowed else column
+                select_parts.append(f"{source} as {dimension}_{level.value}")
+                group_by_parts.append(source)
+        
+        # Columnas de la subconsulta con ventanas: valor, fila en orden, conteo y media por grupo
+        partition = f"PARTITION BY {', '.join(dimension_columns)}" if dimension_columns else ""
+        inner_parts = [f"{column} AS g{index}" for index, column in enumerate(dimension_columns)]
+        
+        # Agregar medidas con funciones de agregación
+        for index, measure in enumerate(query.measures):
+            if measure not in self.measure_mappings:
+                continue
+            column = f"h.{self.measure_mappings[measure]}"
+            if windowed:
+                inner_parts += [
+                    f"{column} AS x{index}",
+                    f"ROW_NUMBER() OVER ({partition} ORDER BY {column} IS NULL, {column}) AS r{index}",
+                    f"COUNT({column}) OVER ({partition}) AS n{index}",
+                    f"AVG({column}) OVER ({partition}) AS a{index}"
+                ]
+            x, r, n, a = (f"w.x{index}", f"w.r{index}", f"w.n{index}", f"w.a{index}") if windowed \
+                else (column, None, None, None)
+            for agg_func in query.aggregation_functions:
+                alias = f"{measure}_{agg_func.value}"
+                if agg_func in MOMENT_AGGREGATES and not native:
+                    variance = f"AVG(({x} - {a}) * ({x} - {a}))"
+                    expression = variance if agg_func == AggregationFunction.VARIANCE else f"SQRT({variance})"
+                elif agg_func in SQL_AGGREGATES:
+                    expression = f"{SQL_AGGREGATES[agg_func]}({x})"
+                elif agg_func == AggregationFunction.MEDIAN:
+                    expression = self._quantile_sql(0.5, x, r, n)
                 else:
-                    table_alias = dimension[0]
-                    
-                group_by_parts.append(f"{table_alias}.{column}")
+                    continue
+                select_parts.append(f"{expression} as {alias}")
+            for q in query.quantiles:
+                select_parts.append(f"{self._quantile_sql(q, x, r, n)} as {measure}_{quantile_label(q)}")
+        
+        join_clauses, used_aliases = self._join_clauses(query.dimensions)
+        where_clauses = self._filter_clauses(query.filters, used_aliases)
         
         # Construir ORDER BY
         order_by = ""
@@ -310,14 +470,13 @@ class OLAEEngine:
             order_by = f"ORDER BY {query.sort_by} DESC"
         
         # Construir consulta completa
-        sql_parts = [
-            f"SELECT {', '.join(select_parts)}",
-            from_clause,
-            *join_clauses
-        ]
-        
+        from_parts = ["FROM hechos_cosecha h", *join_clauses]
         if where_clauses:
-            sql_parts.append(f"WHERE {' AND '.join(where_clauses)}")
+            from_parts.append(f"WHERE {' AND '.join(where_clauses)}")
+        if windowed:
+            from_parts = [f"FROM (SELECT {', '.join(inner_parts)} {' '.join(from_parts)}) w"]
+        
+        sql_parts = [f"SELECT {', '.join(select_parts)}", *from_parts]
         
         if group_by_parts:
             sql_parts.append(f"GROUP BY {', '.join(group_by_parts)}")
@@ -329,6 +488,277 @@ class OLAEEngine:
         
         return " ".join(sql_parts)
     
+    def _aggregate_in_memory(self, query: OLAPQuery) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Agregación con el núcleo columnar (dashboard/aggregation.py) para bases sin funciones de ventana
+
+        Trae las filas de hechos filtradas (dimensiones y medidas) y calcula todas las
+        funciones y cuantiles de todas las medidas en una pasada por medida
+
+        Returns:
+            Tupla (registros con las mismas columnas que la consulta SQL, SQL ejecutado)
+        """
+        dimensions = [(d, query.dimension_levels.get(d, DimensionLevel.YEAR))
+                      for d in query.dimensions if d in self.dimension_mappings]
+        measures = [m for m in query.measures if m in self.measure_mappings]
+        columns = [self._dimension_column(d, level) for d, level in dimensions]
+        columns += [f"h.{self.measure_mappings[m]}" for m in measures]
+        join_clauses, used_aliases = self._join_clauses(query.dimensions)
+        where_clauses = self._filter_clauses(query.filters, used_aliases)
+        sql_query = " ".join([f"SELECT {', '.join(columns)}", "FROM hechos_cosecha h", *join_clauses]
+                             + ([f"WHERE {' AND '.join(where_clauses)}"] if where_clauses else []))
+        matrix = self._fetch_columns(sql_query, len(columns))
+
+        codes, labels = group_codes([matrix[:, index] for index in range(len(dimensions))], len(matrix))
+        n_groups = len(labels[0]) if labels else (1 if len(matrix) else 0)
+        results = aggregate_measures(
+            codes, n_groups,
+            {m: np.array(matrix[:, len(dimensions) + index], dtype=np.float64) for index, m in enumerate(measures)},
+            [f.value for f in query.aggregation_functions], query.quantiles)
+
+        output = {f"{d}_{level.value}": column for (d, level), column in zip(dimensions, labels)}
+        for measure in measures:
+            for agg_func in query.aggregation_functions:
+                output[f"{measure}_{agg_func.value}"] = results[f"{measure}_{agg_func.value}"]
+            for q in query.quantiles:
+                output[f"{measure}_{quantile_label(q)}"] = results[f"{measure}_{quantile_label(q)}"]
+
+        records, _ = self._output_records(output, n_groups, query)
+        return records, sql_query
+
+    @staticmethod
+    def _output_records(output: Dict[str, np.ndarray], n_groups: int,
+                        query: OLAPQuery) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Registros de columnas agregadas en memoria, ordenados por sort_by y truncados a limit
+
+        Returns:
+            Tupla (registros, grupo de cada registro)
+        """
+        names = list(output)
+        order = np.arange(n_groups)
+        if query.sort_by in output:
+            key = np.array(output[query.sort_by], dtype=np.float64)
+            # Descendente con los nulos al final, como ORDER BY ... DESC en MySQL
+            order = np.lexsort((-np.nan_to_num(key, nan=-np.inf),))
+        order = order[:query.limit]
+        # Columna por columna a listas de Python (NaN -> None) y después a registros
+        columns = []
+        for name in names:
+            column = np.asarray(output[name])[order]
+            values = column.tolist()
+            if column.dtype.kind == 'f':
+                values = [None if value != value else value for value in values]
+            columns.append(values)
+        records = [dict(zip(names, row)) for row in zip(*columns)] if names else [{} for _ in order]
+        return records, order
+
+    # ----- Consultas aproximadas -----
+
+    def _generation(self) -> int:
+        """Generación vigente de los datos (0 sin DataVersion)"""
+        return self.data_version.current() if self.data_version is not None else 0
+
+    def sample_frame(self) -> Optional[SampleFrame]:
+        """
+        Muestra estratificada en memoria, cargada una vez por generación de datos
+
+        Returns:
+            La muestra, o None si el ETL todavía no creó hechos_cosecha_muestra
+        """
+        generation = self._generation()
+        entry = self._sample
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+        with self._sample_lock:
+            entry = self._sample
+            if entry is None or entry[0] != generation:
+                entry = self._sample = (generation, self._load_sample())
+        return entry[1]
+
+    def _load_sample(self) -> Optional[SampleFrame]:
+        """Lee la muestra con todas las columnas de dimensiones, filtros y medidas que existan"""
+        inspector = inspect(self.engine)
+        if not inspector.has_table(SAMPLE_TABLE):
+            return None
+        existing = {"h": {c["name"] for c in inspector.get_columns(SAMPLE_TABLE)}}
+        for dimension, mapping in self.dimension_mappings.items():
+            if inspector.has_table(mapping["table"]):
+                existing[self._dimension_alias(dimension)] = {c["name"] for c in inspector.get_columns(mapping["table"])}
+        dimensions = [d for d, mapping in self.dimension_mappings.items() if self._dimension_alias(d) in existing]
+
+        candidates = [self._dimension_column(d, level) for d in dimensions for level in self.dimension_mappings[d]["levels"]]
+        candidates += [column for column, _ in FILTER_COLUMNS.values()]
+        candidates += [f"h.{column}" for column in self.measure_mappings.values()]
+        names = []
+        for column in candidates:
+            alias, name = column.split('.', 1)
+            if name in existing.get(alias, ()) and column not in names:
+                names.append(column)
+
+        join_clauses, _ = self._join_clauses(dimensions)
+        sql_query = " ".join([f"SELECT {', '.join(names + ['h.estrato', 'h.estrato_filas', 'h.estrato_muestra'])}",
+                              f"FROM {SAMPLE_TABLE} h", *join_clauses])
+        return SampleFrame.from_matrix(names, self._fetch_columns(sql_query, len(names) + 3))
+
+    def _approximation_unsupported(self, query: OLAPQuery, frame: Optional[SampleFrame]) -> Optional[str]:
+        """Motivo por el que una consulta no se puede responder desde la muestra (None si se puede)"""
+        if frame is None:
+            return f"la tabla {SAMPLE_TABLE} no existe"
+        if query.operation == OLAPOperation.PIVOT:
+            return "el pivot no se aproxima"
+        if query.quantiles or any(f not in APPROXIMATE_AGGREGATES for f in query.aggregation_functions):
+            return "solo se aproximan sum, avg y count"
+        _, used_aliases = self._join_clauses(query.dimensions)
+        needed = [self._dimension_column(d, query.dimension_levels.get(d, DimensionLevel.YEAR))
+                  for d in query.dimensions if d in self.dimension_mappings]
+        needed += [f"h.{self.measure_mappings[m]}" for m in query.measures if m in self.measure_mappings]
+        needed += [FILTER_COLUMNS[key][0] for key in query.filters
+                   if key in FILTER_COLUMNS and FILTER_COLUMNS[key][0].split('.')[0] in used_aliases]
+        missing = [column for column in needed if column not in frame.columns and column not in frame.coded]
+        if missing:
+            return f"la muestra no tiene {', '.join(missing)}"
+        return None
+
+    def _execute_approximate(self, query: OLAPQuery, start_time: float) -> OLAPResult:
+        """
+        Responde una consulta desde la muestra estratificada, con intervalos de confianza
+
+        Si el resultado exacto de la misma consulta ya se calculó en segundo plano (en la
+        generación de datos vigente) se retorna ese; si no, se estima desde la muestra y se
+        encola el cálculo exacto. Las consultas que no se pueden aproximar se ejecutan exactas.
+        metadata["approximate"] indica cuál fue el caso
+        """
+        exact_query = replace(query, approximate=False)
+        generation = self._generation()
+        key = self._refinement_key(exact_query)
+        with self._lock:
+            refined = self._refinements.get(key)
+        if refined is not None and refined[0] == generation:
+            result = refined[1]
+            return replace(result, execution_time=time.time() - start_time, metadata={
+                **result.metadata, "approximate": {"exact": True, "refinement": "ready"}})
+
+        frame = self.sample_frame()
+        reason = self._approximation_unsupported(query, frame)
+        if reason is not None:
+            result = self.execute_olap_query(exact_query)
+            result.metadata["approximate"] = {"exact": True, "reason": reason}
+            return result
+
+        dimensions = [(d, query.dimension_levels.get(d, DimensionLevel.YEAR))
+                      for d in query.dimensions if d in self.dimension_mappings]
+        measures = [m for m in query.measures if m in self.measure_mappings]
+        _, used_aliases = self._join_clauses(query.dimensions)
+
+        # Filas de la muestra que cumplen los filtros (los mismos que aplicaría el SQL exacto);
+        # la comparación se hace sobre las etiquetas distintas y se expande con los códigos
+        keep = np.ones(frame.rows, dtype=bool)
+        for name, value in query.filters.items():
+            if name in FILTER_COLUMNS and FILTER_COLUMNS[name][0].split('.')[0] in used_aliases:
+                column, quoted = FILTER_COLUMNS[name]
+                codes, labels = frame.coded[column]
+                if quoted:
+                    match = labels.astype(str) == str(value)
+                else:
+                    match = np.asarray(pd.to_numeric(labels, errors='coerce'), dtype=np.float64) == float(value)
+                keep &= match[codes]
+        rows = np.flatnonzero(keep)
+
+        codes, labels = combine_codes([(frame.coded[self._dimension_column(d, level)][0][rows],
+                                        frame.coded[self._dimension_column(d, level)][1])
+                                       for d, level in dimensions], len(rows))
+        n_groups = len(labels[0]) if labels else (1 if len(rows) else 0)
+        output = {f"{d}_{level.value}": column for (d, level), column in zip(dimensions, labels)}
+        errors: Dict[str, np.ndarray] = {}
+        functions = [f.value for f in query.aggregation_functions]
+        for measure in measures:
+            values = frame.columns[f"h.{self.measure_mappings[measure]}"][rows]
+            estimates = estimate(frame, rows, codes, n_groups, values, functions)
+            for name in functions:
+                output[f"{measure}_{name}"], errors[f"{measure}_{name}"] = estimates[name]
+
+        data, order = self._output_records(output, n_groups, query)
+        z = z_score()
+        bounds = {name: confidence_bounds(output[name][order], error[order], z) for name, error in errors.items()}
+        intervals = [{name: column[index] for name, column in bounds.items()} for index in range(len(data))]
+        self._schedule_refinement(key, generation, exact_query)
+
+        return OLAPResult(
+            success=True,
+            data=data,
+            record_count=len(data),
+            execution_time=time.time() - start_time,
+            operation=query.operation.value,
+            sql_query="",
+            metadata={
+                "dimensions": query.dimensions,
+                "measures": query.measures,
+                "aggregation_functions": functions,
+                "quantiles": query.quantiles,
+                "filters": query.filters,
+                "approximate": {
+                    "exact": False,
+                    "confidence": OLAP_APPROXIMATE_CONFIDENCE,
+                    "sample_rows": frame.rows,
+                    "matched_rows": int(len(rows)),
+                    "intervals": intervals,
+                    "refinement": "pending"
+                }
+            }
+        )
+
+    @staticmethod
+    def _refinement_key(query: OLAPQuery) -> str:
+        return json.dumps(asdict(query), sort_keys=True, ensure_ascii=False,
+                          default=lambda value: value.value if isinstance(value, Enum) else str(value))
+
+    def _schedule_refinement(self, key: str, generation: int, query: OLAPQuery):
+        """Encola el cálculo exacto de una consulta (una sola vez aunque se repita)"""
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=OLAP_REFINEMENT_WORKERS,
+                                                    thread_name_prefix='olap-refine')
+            executor = self._executor
+        executor.submit(self._refine, key, generation, query)
+
+    def _refine(self, key: str, generation: int, query: OLAPQuery):
+        try:
+            result = self.execute_olap_query(query)
+            if not result.success:
+                raise RuntimeError(result.error)
+            with self._lock:
+                self._refinements[key] = (generation, result)
+                self._refinements.move_to_end(key)
+                while len(self._refinements) > OLAP_REFINEMENT_CACHE_SIZE:
+                    self._refinements.popitem(last=False)
+        except Exception as e:
+            # En el hilo de fondo nadie espera el resultado: se cuenta en /metrics y se registra
+            record_error('olap_refinement', e)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def after_fork(self):
+        """Descarta el pool de refinamiento heredado del proceso maestro (sus hilos no existen en el hijo)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+
+    def shutdown(self):
+        """Detiene el pool de refinamiento sin esperar los cálculos en curso"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
     def _generate_drill_down_query(self, query: OLAPQuery) -> str:
         """Genera consulta SQL para drill-down (mayor detalle)"""
         # Para drill-down, agregamos más dimensiones o bajamos de nivel
@@ -375,52 +805,227 @@ class OLAEEngine:
         """Retorna funciones de agregación disponibles"""
         return [func.value for func in AggregationFunction]
     
+    def dimension_members(self, dimension: str, level: DimensionLevel, load: bool = True) -> Optional[List[Any]]:
+        """
+        Miembros (valores distintos) de una dimensión en un nivel, desde la caché de dimensiones
+
+        Args:
+            dimension: Nombre de la dimensión (tiempo, geografia, producto)
+            level: Nivel de la dimensión
+            load: Consultar la tabla de dimensión si no están en caché
+
+        Returns:
+            Lista ordenada de miembros, o None si load es False y no están en caché
+        """
+        key = (dimension, level)
+        generation = self._generation()
+        entry = self._dimension_cache.get(key)
+        if entry is not None and entry[0] == generation and time.monotonic() - entry[1] < OLAP_DIMENSION_CACHE_SECONDS:
+            return entry[2]
+        if not load:
+            return None
+
+        mapping = self.dimension_mappings[dimension]
+        column = mapping["levels"][level]
+        with self.engine.connect() as connection:
+            members = [row[0] for row in connection.execute(
+                text(f"SELECT DISTINCT {column} FROM {mapping['table']} ORDER BY {column}"))]
+        self._dimension_cache[key] = (generation, time.monotonic(), members)
+        return members
+
     def get_dimension_values(self, dimension: str, level: DimensionLevel) -> List[Dict[str, Any]]:
         """Retorna valores únicos para una dimensión y nivel específicos"""
         try:
             if dimension not in self.dimension_mappings:
                 return []
-            
-            mapping = self.dimension_mappings[dimension]
-            table = mapping["table"]
-            column = mapping["levels"][level]
-            
-            query = f"SELECT DISTINCT {column} as value FROM {table} ORDER BY {column}"
-            df = pd.read_sql(query, self.engine)
-            
-            return df.to_dict('records')
+            return [{"value": value} for value in self.dimension_members(dimension, level)]
             
         except Exception as e:
             print(f"Error obteniendo valores de dimensión: {e}")
             return []
     
+    def _level(self, query: OLAPQuery, dimension: str) -> DimensionLevel:
+        """Nivel pedido para una dimensión, o el primero de la dimensión"""
+        return query.dimension_levels.get(dimension) or next(iter(self.dimension_mappings[dimension]["levels"]))
+
+    def _fetch_columns(self, sql_query: str, width: int) -> np.ndarray:
+        """Ejecuta una consulta y retorna sus filas como matriz de objetos (filas × columnas), sin DataFrame"""
+        with self.engine.connect() as connection:
+            records = connection.execute(text(sql_query)).fetchall()
+        add_rows(len(records))
+        matrix = np.empty((len(records), width), dtype=object)
+        if records:
+            matrix[:] = [tuple(record) for record in records]
+        return matrix
+
+    def execute_pivot(self, query: OLAPQuery) -> Dict[str, Any]:
+        """
+        Tabla dinámica: filas = query.dimensions sin pivot_dimension; columnas = miembros de pivot_dimension
+
+        Si los miembros de la dimensión columna están en la caché de dimensiones (y no son más
+        de OLAP_SQL_PIVOT_MAX_COLUMNS) el pivot se resuelve en SQL con agregación condicional,
+        una columna por miembro. Si no, se agrupa por (filas, columna) en SQL y la matriz se
+        arma en NumPy con una suma dispersa sobre códigos enteros. Los dos caminos llenan la
+        misma suma y conteo por celda, de donde salen los totales exactos (también de promedios).
+        Se usa la primera medida y la primera función de agregación de la consulta
+
+        Returns:
+            Diccionario con rows, columns, data, row_totals, column_totals, grand_total,
+            total_rows, total_columns, truncated, method ('sql' o 'numpy') y sql_query
+
+        Raises:
+            ValueError: Si faltan dimensiones o la medida, o la agregación no se puede pivotear
+        """
+        col_dimension = query.pivot_dimension
+        if col_dimension not in self.dimension_mappings:
+            raise ValueError(f"Dimensión de pivote desconocida: {col_dimension}")
+        row_dimensions = [d for d in query.dimensions if d in self.dimension_mappings and d != col_dimension]
+        if not row_dimensions:
+            raise ValueError("El pivot requiere al menos una dimensión de filas además de pivot_dimension")
+        measure = next((m for m in query.measures if m in self.measure_mappings), None)
+        if measure is None:
+            raise ValueError("El pivot requiere una medida válida")
+        aggregation = query.aggregation_functions[0] if query.aggregation_functions else AggregationFunction.SUM
+        if aggregation not in PIVOT_AGGREGATES:
+            raise ValueError(f"Agregación no soportada en pivot: {aggregation.value}")
+
+        measure_column = f"h.{self.measure_mappings[measure]}"
+        row_columns = [self._dimension_column(d, self._level(query, d)) for d in row_dimensions]
+        col_level = self._level(query, col_dimension)
+        col_column = self._dimension_column(col_dimension, col_level)
+        join_clauses, used_aliases = self._join_clauses(row_dimensions + [col_dimension])
+        where_clauses = self._filter_clauses(query.filters, used_aliases)
+        body = " ".join(["FROM hechos_cosecha h", *join_clauses]
+                        + ([f"WHERE {' AND '.join(where_clauses)}"] if where_clauses else []))
+        # Función que se aplica por celda: SUM sirve para suma, promedio (con el conteo) y conteo
+        cell_function = {AggregationFunction.MAX: "MAX", AggregationFunction.MIN: "MIN"}.get(aggregation, "SUM")
+        n_row_dims = len(row_columns)
+
+        members = self.dimension_members(col_dimension, col_level, load=False)
+        if members is not None and 0 < len(members) <= OLAP_SQL_PIVOT_MAX_COLUMNS:
+            method = "sql"
+            cells = []
+            for index, member in enumerate(members):
+                condition = f"{col_column} IS NULL" if member is None else f"{col_column} = {_sql_literal(member)}"
+                cells.append(f"{cell_function}(CASE WHEN {condition} THEN {measure_column} END) AS v{index}")
+                cells.append(f"COUNT(CASE WHEN {condition} THEN {measure_column} END) AS n{index}")
+            sql_query = (f"SELECT {', '.join(row_columns)}, {', '.join(cells)} {body} "
+                         f"GROUP BY {', '.join(row_columns)}")
+            matrix = self._fetch_columns(sql_query, n_row_dims + 2 * len(members))
+            # Formato ancho a largo: una entrada (fila, miembro) por celda
+            n_members = len(members)
+            labels = np.repeat(matrix[:, :n_row_dims], n_members, axis=0)
+            col_values = np.tile(np.array(members + [None], dtype=object)[:-1], len(matrix))
+            values = np.array(matrix[:, n_row_dims::2].ravel(), dtype=np.float64)
+            counts = np.array(matrix[:, n_row_dims + 1::2].ravel(), dtype=np.float64)
+        else:
+            method = "numpy"
+            sql_query = (f"SELECT {', '.join(row_columns)}, {col_column}, {cell_function}({measure_column}), "
+                         f"COUNT({measure_column}) {body} GROUP BY {', '.join(row_columns)}, {col_column}")
+            matrix = self._fetch_columns(sql_query, n_row_dims + 3)
+            labels = matrix[:, :n_row_dims]
+            col_values = matrix[:, n_row_dims]
+            values = np.array(matrix[:, n_row_dims + 1], dtype=np.float64)
+            counts = np.array(matrix[:, n_row_dims + 2], dtype=np.float64)
+
+        pivot = self._assemble_pivot(labels, col_values, values, counts, aggregation, query.limit)
+        pivot.update({
+            "row_dimensions": [f"{d}_{self._level(query, d).value}" for d in row_dimensions],
+            "column_dimension": f"{col_dimension}_{col_level.value}",
+            "measure": measure,
+            "aggregation": aggregation.value,
+            "method": method,
+            "sql_query": sql_query
+        })
+        return pivot
+
+    @staticmethod
+    def _assemble_pivot(labels: np.ndarray, col_values: np.ndarray, values: np.ndarray, counts: np.ndarray,
+                        aggregation: AggregationFunction, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Arma la matriz de un pivot a partir de celdas sueltas (pueden repetirse)
+
+        Args:
+            labels: Etiquetas de fila, matriz (celdas × dimensiones de fila)
+            col_values: Miembro de la dimensión columna de cada celda
+            values: Suma (o máximo/mínimo) de la medida en cada celda; NaN si no hay datos
+            counts: Valores no nulos de la medida en cada celda
+            aggregation: SUM, AVG, COUNT, MAX o MIN
+            limit: Filas máximas en la respuesta (los totales cubren todas)
+        """
+        # Códigos de fila: combinación de las dimensiones de fila (dashboard/aggregation.py)
+        if len(labels):
+            row_codes, row_labels = group_codes([labels[:, index] for index in range(labels.shape[1])])
+            rows = row_labels[0].tolist() if len(row_labels) == 1 else [list(key) for key in zip(*row_labels)]
+            col_codes, col_labels = factorize(col_values)
+        else:
+            rows, row_codes, col_codes, col_labels = [], np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.array([], dtype=object)
+
+        shape = (len(rows), len(col_labels))
+        cell = (row_codes, col_codes)
+        count_grid = np.zeros(shape)
+        np.add.at(count_grid, cell, counts)
+        if aggregation in (AggregationFunction.MAX, AggregationFunction.MIN):
+            reducer = np.fmax if aggregation == AggregationFunction.MAX else np.fmin
+            grid = np.full(shape, np.nan)
+            reducer.at(grid, cell, values)
+            row_totals = reducer.reduce(grid, axis=1) if shape[1] else np.full(shape[0], np.nan)
+            col_totals = reducer.reduce(grid, axis=0) if shape[0] else np.full(shape[1], np.nan)
+            grand_total = reducer.reduce(grid.ravel()) if grid.size else np.nan
+        else:
+            sum_grid = np.zeros(shape)
+            np.add.at(sum_grid, cell, np.nan_to_num(values))
+            totals = count_grid if aggregation == AggregationFunction.COUNT else sum_grid
+            row_totals, col_totals, grand_total = totals.sum(axis=1), totals.sum(axis=0), totals.sum()
+            if aggregation == AggregationFunction.AVG:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    grid = np.where(count_grid > 0, sum_grid / count_grid, np.nan)
+                    row_totals = row_totals / count_grid.sum(axis=1)
+                    col_totals = col_totals / count_grid.sum(axis=0)
+                    grand_total = grand_total / count_grid.sum() if count_grid.sum() else np.nan
+            else:
+                grid = totals
+
+        # Miembros sin datos en el resultado (el camino SQL trae todos los de la dimensión)
+        present = count_grid.sum(axis=0) > 0
+        if not present.all():
+            grid, col_totals, col_labels = grid[:, present], col_totals[present], col_labels[present]
+
+        # Filas antes de truncar: total_rows y record_count reportan el resultado completo
+        total_rows = len(rows)
+        truncated = limit is not None and total_rows > limit
+        if truncated:
+            rows, grid, row_totals = rows[:limit], grid[:limit], row_totals[:limit]
+
+        return {
+            "rows": list(rows),
+            "columns": col_labels.tolist(),
+            "data": _json_matrix(grid),
+            "row_totals": _json_matrix(row_totals),
+            "column_totals": _json_matrix(col_totals),
+            "grand_total": _json_scalar(grand_total),
+            "total_rows": total_rows,
+            "total_columns": len(col_labels),
+            "truncated": truncated
+        }
+
     def create_pivot_table(self, data: List[Dict[str, Any]], 
                           row_dimension: str, 
                           col_dimension: str, 
                           measure: str) -> Dict[str, Any]:
-        """Crea tabla dinámica a partir de datos"""
+        """
+        Crea tabla dinámica (suma, con totales) a partir de registros ya consultados
+
+        Para pivotear sobre la base de datos sin pasar por registros, usar execute_pivot
+        """
         try:
-            df = pd.DataFrame(data)
-            
-            # Crear tabla dinámica
-            pivot_table = df.pivot_table(
-                index=row_dimension,
-                columns=col_dimension,
-                values=measure,
-                aggfunc='sum',
-                fill_value=0
-            )
-            
-            # Convertir a formato JSON
-            result = {
-                "rows": pivot_table.index.tolist(),
-                "columns": pivot_table.columns.tolist(),
-                "data": pivot_table.values.tolist(),
-                "total_rows": len(pivot_table.index),
-                "total_columns": len(pivot_table.columns)
-            }
-            
-            return result
+            labels = np.empty((len(data), 1), dtype=object)
+            labels[:, 0] = [record.get(row_dimension) for record in data]
+            col_values = np.array([record.get(col_dimension) for record in data] + [None], dtype=object)[:-1]
+            values = pd.to_numeric(pd.Series([record.get(measure) for record in data], dtype=object),
+                                   errors='coerce').to_numpy(dtype=np.float64)
+            return self._assemble_pivot(labels, col_values, values, (~np.isnan(values)).astype(np.float64),
+                                        AggregationFunction.SUM)
             
         except Exception as e:
             return {"error": str(e)}
@@ -477,6 +1082,17 @@ class OLAEEngine:
                 "measures": ["brix", "sacarosa"],
                 "aggregation_functions": ["avg", "max", "min"],
                 "filters": {"año": 2025}
+            },
+            {
+                "name": "Dispersión de TCH por Variedad",
+                "description": "Mediana, desviación estándar y percentiles de TCH y Brix por variedad",
+                "operation": "aggregate",
+                "dimensions": ["producto"],
+                "dimension_levels": {"producto": "variety"},
+                "measures": ["tch", "brix"],
+                "aggregation_functions": ["median", "std"],
+                "quantiles": [0.1, 0.9],
+                "filters": {"año": 2025}
             }
         ]
 
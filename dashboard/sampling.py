@@ -0,0 +1,212 @@
+"""
+Muestra estratificada de hechos_cosecha para consultas OLAP aproximadas
+El ETL guarda en hechos_cosecha_muestra una muestra aleatoria simple dentro de cada
+estrato (codigo_zona × año), con el tamaño de su estrato en la tabla de hechos (estrato_filas)
+y en la muestra (estrato_muestra). El motor OLAP la carga en memoria una vez por
+generación de datos y responde sumas, conteos y promedios desde ella, con intervalos
+de confianza del estimador estratificado; el resultado exacto se calcula después.
+
+Estimadores (por grupo g, con z_i el valor de la fila si pertenece al grupo y cumple
+los filtros, 0 si no):
+    total     T = Σ_h (N_h / n_h) Σ_{i∈h} z_i
+    varianza  V = Σ_h N_h² (1 - n_h/N_h) s²_h / n_h,   s²_h = varianza muestral de z en h
+    promedio  R = T_y / T_x (razón), linealizado con z_i = (y_i - R) / T_x
+"""
+
+import os
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+try:
+    from .aggregation import factorize, group_codes
+except ImportError:
+    from aggregation import factorize, group_codes
+
+SAMPLE_TABLE = 'hechos_cosecha_muestra'
+# Filas de la muestra completa (se reparten entre estratos en proporción a su tamaño)
+OLAP_SAMPLE_ROWS = int(os.getenv('OLAP_SAMPLE_ROWS', 20000))
+# Filas mínimas por estrato: con menos, la varianza del estrato no se puede estimar bien
+OLAP_SAMPLE_MIN_PER_STRATUM = int(os.getenv('OLAP_SAMPLE_MIN_PER_STRATUM', 30))
+# Nivel de confianza de los intervalos
+OLAP_APPROXIMATE_CONFIDENCE = float(os.getenv('OLAP_APPROXIMATE_CONFIDENCE', 0.95))
+
+
+def allocate(stratum_sizes: np.ndarray, budget: int, minimum: int) -> np.ndarray:
+    """
+    Filas de muestra por estrato: proporcional al tamaño, con un mínimo y sin superar el estrato
+
+    Args:
+        stratum_sizes: Filas de cada estrato en la tabla de hechos
+        budget: Filas totales de la muestra
+        minimum: Filas mínimas por estrato
+    """
+    sizes = np.asarray(stratum_sizes, dtype=np.int64)
+    total = sizes.sum()
+    if total <= budget:
+        return sizes.copy()
+    proportional = np.floor(sizes * (budget / total)).astype(np.int64)
+    return np.minimum(sizes, np.maximum(proportional, minimum))
+
+
+def build_sample(connection, budget: int = OLAP_SAMPLE_ROWS, minimum: int = OLAP_SAMPLE_MIN_PER_STRATUM,
+                 seed: Optional[int] = None) -> Dict[str, int]:
+    """
+    Reconstruye hechos_cosecha_muestra (llamar desde el ETL después de cargar los hechos)
+
+    Args:
+        connection: Conexión de SQLAlchemy dentro de una transacción
+        budget: Filas totales de la muestra
+        minimum: Filas mínimas por estrato
+        seed: Semilla del muestreo (None = aleatoria)
+
+    Returns:
+        Filas de la tabla de hechos, de la muestra y número de estratos
+    """
+    import pandas as pd
+
+    # La zona está en la tabla de hechos (codigo_zona); el año sale de dimtiempo
+    facts = pd.read_sql(text(
+        "SELECT h.*, t.año AS estrato_año FROM hechos_cosecha h "
+        "LEFT JOIN dimtiempo t ON h.codigo_tiempo = t.tiempo_id"
+    ), connection)
+    strata, labels = group_codes([facts['codigo_zona'].to_numpy(dtype=object),
+                                  facts['estrato_año'].to_numpy(dtype=object)])
+    sizes = np.bincount(strata, minlength=len(labels[0])).astype(np.int64)
+    take = allocate(sizes, budget, minimum)
+
+    # Permutación aleatoria dentro de cada estrato: se quedan las primeras take[h] filas
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(strata)), strata))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1])) if len(sizes) else sizes
+    rank = np.empty(len(strata), dtype=np.int64)
+    rank[order] = np.arange(len(strata)) - np.repeat(starts, sizes)
+    selected = rank < take[strata]
+
+    sample = facts.loc[selected].drop(columns=['estrato_año'])
+    sample['estrato'] = strata[selected]
+    sample['estrato_filas'] = sizes[strata[selected]]
+    sample['estrato_muestra'] = take[strata[selected]]
+    sample.to_sql(SAMPLE_TABLE, con=connection, if_exists='replace', index=False)
+    return {"fact_rows": int(len(facts)), "sample_rows": int(len(sample)), "strata": int(len(sizes))}
+
+
+class SampleFrame:
+    """
+    Muestra cargada en memoria, estrato de cada fila y tamaños de los estratos
+
+    Las medidas (h.*) se guardan como float y las columnas de dimensiones y filtros ya
+    codificadas (códigos, etiquetas), para agrupar y filtrar sin volver a factorizar
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], coded: Dict[str, Tuple[np.ndarray, np.ndarray]],
+                 strata: np.ndarray, population: np.ndarray, sampled: np.ndarray):
+        """
+        Args:
+            columns: Medida calificada (h.tch, ...) -> valores por fila de la muestra (NaN = nulo)
+            coded: Columna de dimensión o filtro (t.año, f.nombre_zona, ...) -> (códigos, etiquetas)
+            strata: Estrato de cada fila (0..H-1)
+            population: Filas de cada estrato en la tabla de hechos (N_h)
+            sampled: Filas de cada estrato en la muestra (n_h)
+        """
+        self.columns = columns
+        self.coded = coded
+        self.strata = strata
+        self.population = population
+        self.sampled = sampled
+
+    @property
+    def rows(self) -> int:
+        return len(self.strata)
+
+    @classmethod
+    def from_matrix(cls, names: List[str], matrix: np.ndarray) -> 'SampleFrame':
+        """Arma la muestra desde una matriz con las columnas names seguidas de estrato, N_h y n_h"""
+        strata = np.asarray(matrix[:, -3], dtype=np.int64) if len(matrix) else np.zeros(0, dtype=np.int64)
+        n_strata = int(strata.max()) + 1 if len(strata) else 0
+        population = np.zeros(n_strata)
+        sampled = np.zeros(n_strata)
+        population[strata] = np.asarray(matrix[:, -2], dtype=np.float64)
+        sampled[strata] = np.asarray(matrix[:, -1], dtype=np.float64)
+        columns, coded = {}, {}
+        for index, name in enumerate(names):
+            if name.startswith('h.'):
+                columns[name] = np.array(matrix[:, index], dtype=np.float64)
+            else:
+                coded[name] = factorize(matrix[:, index])
+        return cls(columns, coded, strata, population, sampled)
+
+
+def estimate(frame: SampleFrame, rows: np.ndarray, codes: np.ndarray, n_groups: int,
+             values: np.ndarray, functions: List[str]) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Estima sum, count y avg de una medida por grupo con su error estándar
+
+    Args:
+        frame: Muestra en memoria
+        rows: Índices de las filas de la muestra que cumplen los filtros
+        codes: Grupo de cada una de esas filas
+        n_groups: Cantidad de grupos
+        values: Valores de la medida en esas filas (NaN = nulo)
+        functions: Subconjunto de 'sum', 'count' y 'avg'
+
+    Returns:
+        Diccionario función -> (estimación, error estándar) por grupo
+    """
+    n_strata = len(frame.population)
+    present = ~np.isnan(values)
+    cell = codes[present] * n_strata + frame.strata[rows][present]
+    n_cells = n_groups * n_strata
+    y = values[present]
+
+    population = np.tile(frame.population, n_groups)
+    sampled = np.tile(frame.sampled, n_groups)
+    weight = population / np.maximum(sampled, 1)
+    # N_h² (1 - f_h) / n_h / (n_h - 1): estratos censados o de una sola fila no aportan varianza
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(sampled > 1, population ** 2 * (1 - sampled / np.maximum(population, 1))
+                          / sampled / (sampled - 1), 0.0)
+
+    def total(s1: np.ndarray, s2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        estimate_ = (weight * s1).reshape(n_groups, n_strata).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread = np.where(sampled > 0, s2 - s1 * s1 / np.maximum(sampled, 1), 0.0)
+        variance = (factor * np.maximum(spread, 0.0)).reshape(n_groups, n_strata).sum(axis=1)
+        return estimate_, np.sqrt(variance)
+
+    counts = np.bincount(cell, minlength=n_cells).astype(np.float64)
+    count_total, count_error = total(counts, counts)
+    sum_1 = np.bincount(cell, weights=y, minlength=n_cells)
+    sum_2 = np.bincount(cell, weights=y * y, minlength=n_cells)
+    sum_total, sum_error = total(sum_1, sum_2)
+    empty = count_total == 0
+    results: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    if 'count' in functions:
+        results['count'] = (count_total, count_error)
+    if 'sum' in functions:
+        results['sum'] = (np.where(empty, np.nan, sum_total), np.where(empty, np.nan, sum_error))
+    if 'avg' in functions:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(empty, np.nan, sum_total / np.where(empty, 1, count_total))
+            # Σz y Σz² de la variable linealizada z = (y - R) / T_x en cada celda grupo × estrato
+            r = np.repeat(ratio, n_strata)
+            t = np.repeat(np.where(empty, 1, count_total), n_strata)
+            z_1 = (sum_1 - r * counts) / t
+            z_2 = (sum_2 - 2 * r * sum_1 + r * r * counts) / (t * t)
+        _, ratio_error = total(np.nan_to_num(z_1), np.nan_to_num(z_2))
+        results['avg'] = (ratio, np.where(empty, np.nan, ratio_error))
+    return results
+
+
+def z_score(confidence: float = OLAP_APPROXIMATE_CONFIDENCE) -> float:
+    """Cuantil normal del intervalo bilateral (1.96 para 95 %)"""
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def confidence_bounds(values: np.ndarray, errors: np.ndarray, z: float) -> List[Optional[List[float]]]:
+    """Intervalos [bajo, alto] por grupo, o None donde la estimación no existe"""
+    low = (values - z * errors).tolist()
+    high = (values + z * errors).tolist()
+    return [None if a != a or b != b else [a, b] for a, b in zip(low, high)]
@@ -4,10 +4,35 @@ Genera gráficos y visualizaciones basadas en datos de consultas
 """
 
 import json
-from typing import Dict, List, Any, Optional
+import warnings
+from datetime import datetime
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+try:
+    from .downsampling import downsample, lttb_indices
+    from .chart_cache import ChartCache, result_fingerprint
+    from .metrics import phase
+except ImportError:
+    from downsampling import downsample, lttb_indices
+    from chart_cache import ChartCache, result_fingerprint
+    from metrics import phase
+
+# Máximo de puntos por serie en gráficos de línea y área antes de reducir
+DEFAULT_MAX_POINTS = 500
+
+# Máximo de categorías visibles antes de agrupar el resto en "Otros"
+DEFAULT_MAX_BARS = 25
+DEFAULT_MAX_SLICES = 10
+
+# Máximo de series (datasets) en gráficos multi-serie antes de agrupar en "Otros"
+DEFAULT_MAX_SERIES = 12
+
+# Etiqueta de la categoría que agrupa el resto
+OTHERS_LABEL = "Otros"
+
 class ChartType(Enum):
     """Tipos de gráficos disponibles"""
     BAR = "bar"
@@ -31,11 +56,31 @@ class ChartConfig:
     height: int = 400
     show_legend: bool = True
     show_grid: bool = True
+    data_hash: Optional[str] = None  # Huella de data ya calculada (ver chart_cache.result_fingerprint)
+    series: Optional[str] = None  # Columna que separa los datasets (p. ej. nombre_variedad por año)
 
 class VisualizationEngine:
     """Motor principal para generar visualizaciones"""
     
-    def __init__(self):
+    def __init__(self, max_points: Optional[int] = DEFAULT_MAX_POINTS, downsample_method: str = 'lttb',
+                 max_bars: Optional[int] = DEFAULT_MAX_BARS, max_slices: Optional[int] = DEFAULT_MAX_SLICES,
+                 cache: Optional[ChartCache] = None, max_series: Optional[int] = DEFAULT_MAX_SERIES):
+        """
+        Args:
+            max_points: Presupuesto de puntos por serie en líneas y áreas (None desactiva la reducción)
+            downsample_method: 'lttb' (forma visual) o 'minmax' (conserva todos los picos)
+            max_bars: Barras visibles antes de agrupar el resto en "Otros" (None desactiva)
+            max_slices: Porciones visibles en gráficos de pastel antes de agrupar en "Otros"
+            cache: ChartCache opcional para reutilizar gráficos ya serializados
+            max_series: Datasets visibles en gráficos multi-serie antes de agrupar en "Otros"
+        """
+        self.max_points = max_points
+        self.downsample_method = downsample_method
+        self.max_bars = max_bars
+        self.max_slices = max_slices
+        self.cache = cache
+        self.max_series = max_series
+        
         self.chart_templates = {
             ChartType.BAR: self._create_bar_chart,
             ChartType.LINE: self._create_line_chart,
@@ -50,6 +95,51 @@ class VisualizationEngine:
             "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"
         ]
 
+    def _palette(self, count: int, colors: Optional[List[str]] = None) -> List[str]:
+        """Colores para count categorías, repitiendo la paleta si hace falta"""
+        base = colors or self.default_colors
+        return [base[i % len(base)] for i in range(count)]
+
+    def _top_n_with_others(self, labels: List[str], values: List[Any], y_column: str,
+                           max_categories: Optional[int]) -> Tuple[List[str], List[Any], Optional[Dict[str, Any]]]:
+        """
+        Conserva las max_categories-1 categorías de mayor valor y agrupa el resto en "Otros"
+        
+        La selección usa np.argpartition (O(n)); las categorías conservadas mantienen el
+        orden de entrada (el del ORDER BY de la consulta: cronológico, ascendente, ...).
+        Para métricas promedio "Otros" es la media del resto; para las demás, la suma.
+        
+        Returns:
+            Tupla (labels, values, grouping) donde grouping describe la agrupación o es None
+        """
+        if max_categories is None or len(values) <= max_categories:
+            return labels, values, None
+        
+        # Valores de texto (p. ej. decimales como cadenas) se convierten; los no numéricos quedan en NaN
+        import pandas as pd
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+        if np.isnan(numbers).all():
+            # Columna sin valores numéricos: no hay ranking posible, se grafica tal cual
+            return labels, values, None
+        keep = max_categories - 1
+        ranking = np.where(np.isnan(numbers), -np.inf, numbers)
+        top = np.argpartition(-ranking, keep - 1)[:keep]
+        top = np.sort(top)
+        
+        rest = np.ones(len(numbers), dtype=bool)
+        rest[top] = False
+        rest_values = numbers[rest]
+        if y_column.lower().startswith(('promedio', 'avg')):
+            others = float(np.nanmean(rest_values)) if np.any(~np.isnan(rest_values)) else None
+        else:
+            others = float(np.nansum(rest_values))
+        
+        return (
+            [labels[i] for i in top] + [OTHERS_LABEL],
+            [values[i] for i in top] + [others],
+            {"label": OTHERS_LABEL, "grouped_categories": int(rest.sum()), "total_categories": len(values)}
+        )
+
     def create_visualization(self, config: ChartConfig) -> Dict[str, Any]:
         """
         Crea una visualización basada en la configuración
@@ -60,11 +150,174 @@ class VisualizationEngine:
         Returns:
             Dict con la configuración del gráfico para Chart.js
         """
+        if config.series and config.chart_type in (ChartType.BAR, ChartType.LINE, ChartType.AREA):
+            return self._create_multi_series_chart(config)
         if config.chart_type in self.chart_templates:
             return self.chart_templates[config.chart_type](config)
         else:
             raise ValueError(f"Tipo de gráfico no soportado: {config.chart_type}")
 
+    def create_visualization_json(self, config: ChartConfig) -> bytes:
+        """
+        Igual que create_visualization pero retorna la configuración serializada (JSON UTF-8)
+        
+        Con caché, el resultado se reutiliza mientras no cambien los datos (por su huella),
+        el tipo de gráfico, los ejes ni las opciones de presentación.
+        """
+        def build() -> bytes:
+            with phase('chart'):
+                chart = self.create_visualization(config)
+                return json.dumps(chart, ensure_ascii=False, default=str, separators=(',', ':')).encode('utf-8')
+        
+        if self.cache is None:
+            return build()
+        
+        key = (
+            'chart',
+            config.data_hash or result_fingerprint(config.data),
+            config.chart_type.value,
+            config.x_axis,
+            config.y_axis,
+            config.title,
+            tuple(config.colors or ()),
+            config.width,
+            config.height,
+            config.show_legend,
+            config.show_grid,
+            config.series
+        )
+        return self.cache.get_or_build(key, build)
+
+    def pivot_series(self, data: List[Dict[str, Any]], x_column: str, series_column: str,
+                     y_column: str) -> Tuple[List[Any], List[Any], np.ndarray]:
+        """
+        Reorganiza un resultado agrupado (x, serie, valor) en una matriz serie × x
+        
+        La codificación de categorías usa pd.factorize y la matriz se llena con np.add.at,
+        sin recorrer las filas en Python. Si un par (x, serie) aparece varias veces se suman
+        los valores (o se promedian para métricas promedio). Los huecos quedan en NaN.
+        
+        Returns:
+            Tupla (x_labels, series_labels, grid) con grid de forma (n_series, n_x)
+        """
+        # pandas solo se necesita para gráficos multiserie: se importa al primer uso
+        import pandas as pd
+
+        frame = pd.DataFrame.from_records(data, columns=[x_column, series_column, y_column])
+        x_values = frame[x_column]
+        x_codes, x_labels = pd.factorize(x_values, sort=pd.api.types.is_numeric_dtype(x_values))
+        series_codes, series_labels = pd.factorize(frame[series_column])
+        values = pd.to_numeric(frame[y_column], errors='coerce').to_numpy(dtype=np.float64)
+        
+        present = ~np.isnan(values) & (x_codes >= 0) & (series_codes >= 0)
+        shape = (len(series_labels), len(x_labels))
+        totals = np.zeros(shape)
+        counts = np.zeros(shape)
+        np.add.at(totals, (series_codes[present], x_codes[present]), values[present])
+        np.add.at(counts, (series_codes[present], x_codes[present]), 1)
+        
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if y_column.lower().startswith(('promedio', 'avg')):
+                grid = totals / counts
+            else:
+                grid = np.where(counts > 0, totals, np.nan)
+        return list(x_labels), list(series_labels), grid
+
+    def _create_multi_series_chart(self, config: ChartConfig) -> Dict[str, Any]:
+        """Crea un gráfico de barras, líneas o área con un dataset por valor de config.series"""
+        chart_type = "bar" if config.chart_type == ChartType.BAR else "line"
+        if not config.data:
+            return {"type": chart_type, "data": {"labels": [], "datasets": []}}
+        
+        x_labels, series_labels, grid = self.pivot_series(config.data, config.x_axis, config.series, config.y_axis)
+        
+        # Demasiadas series: se conservan las de mayor total y el resto se agrupa en "Otros"
+        grouping = None
+        if self.max_series is not None and len(series_labels) > self.max_series:
+            keep = self.max_series - 1
+            ranking = np.nansum(grid, axis=1)
+            top = np.argpartition(-ranking, keep - 1)[:keep]
+            top = np.sort(top)
+            rest = np.ones(len(series_labels), dtype=bool)
+            rest[top] = False
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)  # columnas sin valores en nanmean
+                if config.y_axis.lower().startswith(('promedio', 'avg')):
+                    others = np.nanmean(grid[rest], axis=0)
+                else:
+                    others = np.where(np.isnan(grid[rest]).all(axis=0), np.nan, np.nansum(grid[rest], axis=0))
+            grouping = {"label": OTHERS_LABEL, "grouped_series": int(rest.sum()), "total_series": len(series_labels)}
+            series_labels = [series_labels[i] for i in top] + [OTHERS_LABEL]
+            grid = np.vstack([grid[top], others])
+        
+        # Eje X demasiado largo: se reduce siguiendo la forma de la serie agregada
+        downsampling = None
+        if self.max_points is not None and len(x_labels) > self.max_points:
+            indices = lttb_indices(np.nansum(grid, axis=0), self.max_points)
+            downsampling = {"method": "lttb", "original_points": len(x_labels), "points": len(indices)}
+            x_labels = [x_labels[i] for i in indices]
+            grid = grid[:, indices]
+        
+        colors = self._palette(len(series_labels), config.colors)
+        fill = config.chart_type == ChartType.AREA
+        datasets = []
+        for i, name in enumerate(series_labels):
+            row = grid[i]
+            dataset = {
+                "label": str(name),
+                "data": np.where(np.isnan(row), None, row).tolist(),
+                "borderColor": colors[i],
+                "backgroundColor": colors[i] if chart_type == "bar" else colors[i] + ("40" if fill else "20")
+            }
+            if chart_type == "bar":
+                dataset["borderWidth"] = 1
+            else:
+                dataset.update({"fill": fill, "tension": 0.1, "spanGaps": True})
+            datasets.append(dataset)
+        
+        chart = {
+            "type": chart_type,
+            "data": {
+                "labels": [str(label) for label in x_labels],
+                "datasets": datasets
+            },
+            "options": {
+                "responsive": True,
+                "plugins": {
+                    "title": {
+                        "display": True,
+                        "text": config.title
+                    },
+                    "legend": {
+                        "display": config.show_legend
+                    }
+                },
+                "scales": {
+                    "y": {
+                        "beginAtZero": True,
+                        "title": {
+                            "display": True,
+                            "text": config.y_axis.replace('_', ' ').title()
+                        },
+                        "grid": {
+                            "display": config.show_grid
+                        }
+                    },
+                    "x": {
+                        "grid": {
+                            "display": config.show_grid
+                        }
+                    }
+                }
+            }
+        }
+        
+        if grouping:
+            chart["grouping"] = grouping
+        if downsampling:
+            chart["downsampling"] = downsampling
+        return chart
+
     def _create_bar_chart(self, config: ChartConfig) -> Dict[str, Any]:
         """Crea configuración para gráfico de barras"""
         if not config.data:
@@ -85,16 +338,18 @@ class VisualizationEngine:
         
         labels = [str(item[x_column]) for item in config.data]
         values = [item[y_column] for item in config.data]
+        labels, values, grouping = self._top_n_with_others(labels, values, y_column, self.max_bars)
+        colors = self._palette(len(values), config.colors)
         
-        return {
+        chart = {
             "type": "bar",
             "data": {
                 "labels": labels,
                 "datasets": [{
                     "label": y_column.replace('_', ' ').title(),
                     "data": values,
-                    "backgroundColor": config.colors or self.default_colors[:len(values)],
-                    "borderColor": config.colors or self.default_colors[:len(values)],
+                    "backgroundColor": colors,
+                    "borderColor": colors,
                     "borderWidth": 1
                 }]
             },
@@ -124,13 +379,38 @@ class VisualizationEngine:
                 }
             }
         }
+        
+        if grouping:
+            chart["grouping"] = grouping
+        return chart
 
-    def _create_line_chart(self, config: ChartConfig) -> Dict[str, Any]:
-        """Crea configuración para gráfico de líneas"""
+    def _series_points(self, config: ChartConfig) -> Tuple[List[str], List[Any], Optional[Dict[str, Any]]]:
+        """
+        Extrae etiquetas y valores de una serie, reducidos al presupuesto de puntos
+        
+        Returns:
+            Tupla (labels, values, downsampling) donde downsampling describe la reducción
+            aplicada o es None si la serie cabía completa
+        """
         labels = [str(item[config.x_axis]) for item in config.data]
         values = [item[config.y_axis] for item in config.data]
         
-        return {
+        if self.max_points is None or len(values) <= self.max_points:
+            return labels, values, None
+        
+        original_points = len(values)
+        labels, values = downsample(labels, values, self.max_points, self.downsample_method)
+        return labels, values, {
+            "method": self.downsample_method,
+            "original_points": original_points,
+            "points": len(values)
+        }
+
+    def _create_line_chart(self, config: ChartConfig) -> Dict[str, Any]:
+        """Crea configuración para gráfico de líneas"""
+        labels, values, downsampling = self._series_points(config)
+        
+        chart = {
             "type": "line",
             "data": {
                 "labels": labels,
@@ -169,6 +449,10 @@ class VisualizationEngine:
                 }
             }
         }
+        
+        if downsampling:
+            chart["downsampling"] = downsampling
+        return chart
 
     def _create_pie_chart(self, config: ChartConfig) -> Dict[str, Any]:
         """Crea configuración para gráfico de pastel"""
@@ -190,14 +474,15 @@ class VisualizationEngine:
         
         labels = [str(item[x_column]) for item in config.data]
         values = [item[y_column] for item in config.data]
+        labels, values, grouping = self._top_n_with_others(labels, values, y_column, self.max_slices)
         
-        return {
+        chart = {
             "type": "pie",
             "data": {
                 "labels": labels,
                 "datasets": [{
                     "data": values,
-                    "backgroundColor": config.colors or self.default_colors[:len(values)],
+                    "backgroundColor": self._palette(len(values), config.colors),
                     "borderColor": "#fff",
                     "borderWidth": 2
                 }]
@@ -216,13 +501,16 @@ class VisualizationEngine:
                 }
             }
         }
+        
+        if grouping:
+            chart["grouping"] = grouping
+        return chart
 
     def _create_area_chart(self, config: ChartConfig) -> Dict[str, Any]:
         """Crea configuración para gráfico de área"""
-        labels = [str(item[config.x_axis]) for item in config.data]
-        values = [item[config.y_axis] for item in config.data]
+        labels, values, downsampling = self._series_points(config)
         
-        return {
+        chart = {
             "type": "line",
             "data": {
                 "labels": labels,
@@ -261,6 +549,10 @@ class VisualizationEngine:
                 }
             }
         }
+        
+        if downsampling:
+            chart["downsampling"] = downsampling
+        return chart
 
     def _create_table(self, config: ChartConfig) -> Dict[str, Any]:
         """Crea configuración para tabla de datos"""
@@ -271,7 +563,8 @@ class VisualizationEngine:
             "columns": list(config.data[0].keys()) if config.data else []
         }
 
-    def suggest_chart_type(self, data: List[Dict[str, Any]], x_axis: str, y_axis: str) -> ChartType:
+    def suggest_chart_type(self, data: List[Dict[str, Any]], x_axis: str, y_axis: str,
+                           data_hash: Optional[str] = None) -> ChartType:
         """
         Sugiere el tipo de gráfico más apropiado basado en los datos
         
@@ -279,10 +572,18 @@ class VisualizationEngine:
             data: Datos a visualizar
             x_axis: Columna del eje X (puede ser el nombre de la dimensión)
             y_axis: Columna del eje Y (puede ser el nombre de la métrica)
+            data_hash: Huella de data ya calculada (opcional, evita recalcularla)
             
         Returns:
             ChartType sugerido
         """
+        if self.cache is None or not data:
+            return self._suggest_chart_type(data, x_axis, y_axis)
+        key = ('suggest', data_hash or result_fingerprint(data), x_axis, y_axis)
+        return self.cache.get_or_build(key, lambda: self._suggest_chart_type(data, x_axis, y_axis))
+
+    def _suggest_chart_type(self, data: List[Dict[str, Any]], x_axis: str, y_axis: str) -> ChartType:
+        """Sugerencia sin caché: inspecciona columnas y cantidad de filas"""
         if not data:
             return ChartType.TABLE
         
@@ -342,22 +643,25 @@ class VisualizationEngine:
         
         return None
 
-    def create_dashboard_layout(self, visualizations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def create_dashboard_layout(self, visualizations: List[Dict[str, Any]], title: str = "Dashboard SugarBI",
+                                columns: int = 2) -> Dict[str, Any]:
         """
         Crea un layout de dashboard con múltiples visualizaciones
         
         Args:
-            visualizations: Lista de configuraciones de gráficos
+            visualizations: Lista de configuraciones de gráficos (o paneles ya construidos)
+            title: Título del dashboard
+            columns: Columnas del grid
             
         Returns:
             Dict con el layout del dashboard
         """
         return {
             "layout": "grid",
-            "columns": 2,
+            "columns": columns,
             "visualizations": visualizations,
-            "title": "Dashboard SugarBI",
-            "timestamp": "2025-09-06"
+            "title": title,
+            "timestamp": datetime.now().isoformat(timespec='seconds')
         }
 
 # Ejemplo de uso
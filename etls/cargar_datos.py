@@ -2,8 +2,14 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 import os
 import configparser
+import sys
 from pathlib import Path
 
+# Agregar el directorio raíz al path para importar módulos del proyecto
+sys.path.append(str(Path(__file__).parent.parent))
+from dashboard.data_version import register_load
+from dashboard.sampling import build_sample
+
 # --- 1. CONFIGURACIÓN Y CONEXIÓN ---
 print("Iniciando Proceso ETL...")
 
@@ -176,4 +182,25 @@ try:
 except Exception as e:
     print(f"Error cargando tabla de hechos: {e}")
 
-print("\n--- ¡Proceso ETL completado con éxito! ---")
\ No newline at end of file
+# --- 3.1 MUESTRA ESTRATIFICADA ---
+# Muestra por zona y año para las consultas OLAP aproximadas (approximate=true); se
+# reconstruye antes de registrar la carga para que la nueva generación ya la encuentre
+print("\nConstruyendo muestra estratificada...")
+try:
+    with engine.begin() as conn:
+        muestra = build_sample(conn)
+    print(f"✅ {muestra['sample_rows']} de {muestra['fact_rows']} registros en {muestra['strata']} estratos")
+except Exception as e:
+    print(f"⚠️  Error construyendo la muestra: {e}")
+
+# --- 4. REGISTRAR LA CARGA ---
+# La aplicación detecta la nueva generación y recarga el índice de entidades y sus cachés
+print("\nRegistrando carga...")
+try:
+    with engine.begin() as conn:
+        register_load(conn, len(tabla_hechos))
+    print("✅ Carga registrada")
+except Exception as e:
+    print(f"⚠️  Error registrando la carga: {e}")
+
+print("\n--- ¡Proceso ETL completado con éxito! ---")
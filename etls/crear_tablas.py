@@ -82,6 +82,17 @@ CREATE TABLE IF NOT EXISTS hechos_cosecha (
 );
 """
 
+# Crear tabla de registro de cargas del ETL
+# El id de la última carga es la "generación" de los datos: la aplicación la consulta
+# para recargar índices y cachés en memoria cuando cambian los datos
+create_etl_cargas = """
+CREATE TABLE IF NOT EXISTS etl_cargas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fecha_carga DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    registros_hechos INT NOT NULL DEFAULT 0
+);
+"""
+
 # Ejecutar las consultas de creación
 try:
     with engine.connect() as conn:
@@ -100,6 +111,9 @@ try:
         conn.execute(text(create_hechos_cosecha))
         print("✅ Tabla Hechos_Cosecha creada/verificada")
         
+        conn.execute(text(create_etl_cargas))
+        print("✅ Tabla ETL_Cargas creada/verificada")
+        
         conn.commit()
         
 except Exception as e:
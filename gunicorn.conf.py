@@ -0,0 +1,74 @@
+"""
+Configuración de gunicorn para SugarBI en producción
+
+Uso:
+    gunicorn --config gunicorn.conf.py                       # WSGI (wsgi:app), workers gthread
+    SUGARBI_SERVER=asgi gunicorn --config gunicorn.conf.py   # ASGI (asgi:application) con uvicorn
+
+Todos los valores se pueden ajustar con variables de entorno GUNICORN_*.
+"""
+
+import multiprocessing
+import os
+
+_cpus = multiprocessing.cpu_count()
+_asgi = os.getenv('SUGARBI_SERVER', 'wsgi').lower() == 'asgi'
+
+wsgi_app = 'asgi:application' if _asgi else 'wsgi:app'
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:5001')
+
+# Workers e hilos
+# Las consultas pasan la mayor parte del tiempo esperando a MySQL, así que cada worker
+# atiende varias peticiones con hilos (gthread). Con ASGI la concurrencia la da el event loop.
+# Conexiones a MySQL ≈ workers × (threads + DASHBOARD_WORKERS): ajustar DB_POOL_SIZE en consecuencia.
+worker_class = 'uvicorn.workers.UvicornWorker' if _asgi else 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', _cpus + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Conexiones
+# keepalive mayor que 2s evita reabrir conexiones detrás de Nginx; timeout cubre SQL_MAX_EXECUTION_MS
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Reciclaje gradual de workers: el jitter evita que todos se reinicien a la vez
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# La aplicación se importa y se calienta una vez en el maestro (wsgi.py); los workers la heredan
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+proc_name = 'sugarbi'
+
+
+def _services(server):
+    """Servicios de la aplicación precargada, o None si aún no se cargó"""
+    if not server.cfg.preload_app:
+        return None
+    target = server.app.wsgi()
+    flask_app = getattr(target, 'flask_app', target)
+    extensions = getattr(flask_app, 'extensions', {})
+    return extensions.get('sugarbi')
+
+
+def post_fork(server, worker):
+    """Cada worker abre sus propias conexiones y vuelve a crear sus hilos"""
+    services = _services(server)
+    if services is not None:
+        services.after_fork()
+
+
+def worker_exit(server, worker):
+    """Cierra hilos y conexiones del worker que termina (reciclaje o apagado)"""
+    services = _services(server)
+    if services is not None:
+        services.shutdown()
+
+
+def when_ready(server):
+    server.log.info(
+        "SugarBI listo: %s workers %s × %s hilos en %s", workers, worker_class, threads, bind
+    )
@@ -0,0 +1,128 @@
+"""
+SugarBI - Fábrica de la aplicación Flask
+Reemplaza las tres aplicaciones duplicadas (app_unified.py, web/app.py y api/app.py) por
+una sola fábrica con blueprints. Solo se importan los blueprints pedidos, y las
+dependencias pesadas (pandas, NumPy, LangChain) se cargan en la primera petición que
+las necesita para que el arranque de cada worker sea rápido
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from flask import Flask, jsonify
+from werkzeug.utils import import_string
+
+# Blueprints disponibles: nombre -> ruta de importación (se importan solo si se registran)
+BLUEPRINTS: Dict[str, str] = {
+    'api': 'server.api:bp',
+    'chat': 'server.chat:bp',
+    'olap': 'server.olap:bp',
+    'auth': 'server.auth:bp',
+    'web': 'server.web:bp',
+    'spa': 'server.web:spa_bp',
+}
+
+# Sondas /health/live y /health/ready: se registran en todas las aplicaciones
+HEALTH_BLUEPRINT = 'server.health:bp'
+
+# Aplicación completa con las páginas del dashboard (web/app.py)
+DEFAULT_BLUEPRINTS = ('api', 'chat', 'olap', 'auth', 'web')
+
+
+def create_app(blueprints: Iterable[str] = DEFAULT_BLUEPRINTS, config: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Crea una aplicación Flask de SugarBI
+
+    Args:
+        blueprints: Nombres de BLUEPRINTS a registrar ('spa' y 'web' no deben combinarse: ambos sirven '/')
+        config: Valores que reemplazan a la configuración por defecto
+
+    Returns:
+        Aplicación configurada; app.config['STARTUP_SECONDS'] guarda lo que tardó en crearse
+
+    Raises:
+        KeyError: Si se pide un blueprint que no existe
+    """
+    start = time.perf_counter()
+    blueprints = tuple(blueprints)
+    unknown = [name for name in blueprints if name not in BLUEPRINTS]
+    if unknown:
+        raise KeyError(f"Blueprints desconocidos: {', '.join(unknown)}")
+
+    from flask_cors import CORS
+    from flask_login import LoginManager
+
+    from auth.audit_writer import init_audit_writer
+    from auth.models import db
+    from auth.permission_cache import init_permission_cache
+    from auth.retention import init_retention
+    from auth.tokens import init_tokens
+    from auth.security import security_manager
+    from dashboard.compression import init_compression
+    from dashboard.metrics import init_metrics
+    from server.config import CORS_ORIGINS, ROOT_DIR, STARTUP_BUDGET_SECONDS, default_config
+    from server.services import Services
+
+    app = Flask(__name__, root_path=str(ROOT_DIR), static_folder=None, template_folder=None)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    # JSON compacto salvo en desarrollo (Flask 3 ignora JSONIFY_PRETTYPRINT_REGULAR)
+    app.json.compact = os.getenv('FLASK_ENV', 'production') != 'development'
+    app.json.ensure_ascii = app.config['JSON_AS_ASCII']
+
+    # Inicializar extensiones
+    db.init_app(app)
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    # Sin páginas web, @login_required responde 401 en vez de redirigir
+    login_manager.login_view = 'web.login' if 'web' in blueprints else None
+    login_manager.login_message = 'Por favor, inicia sesión para acceder a esta página.'
+    login_manager.login_message_category = 'info'
+
+    # current_user sale de una caché por proceso (usuario, rol y permisos) con TTL corto
+    init_permission_cache(app, login_manager)
+    # 'Authorization: Bearer <jwt>' autentica sin sesión ni consulta a la base de datos
+    init_tokens(app, login_manager)
+
+    # Configurar CORS para permitir el frontend (con cookies de sesión)
+    CORS(app,
+         origins=CORS_ORIGINS,
+         supports_credentials=True,
+         allow_headers=['Content-Type', 'Authorization', 'X-Requested-With'],
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
+         expose_headers=['Content-Range', 'X-Content-Range'])
+
+    # Inicializar gestor de seguridad
+    security_manager.init_app(app)
+
+    # Compresión gzip/brotli negociada para respuestas de texto grandes
+    init_compression(app)
+
+    # Tiempos por petición y fase, idas a la base de datos y /metrics (Prometheus)
+    init_metrics(app)
+
+    services = app.extensions['sugarbi'] = Services(app)
+    # Auditoría en lotes desde un hilo propio (audit_log no hace commit en la petición)
+    init_audit_writer(app, services.get_engine)
+    # Purga de auditoría y tokens vencidos (hilo opcional; si no, cron con python -m auth.retention)
+    init_retention(app, services.get_engine)
+
+    app.register_blueprint(import_string(HEALTH_BLUEPRINT))
+    for name in blueprints:
+        app.register_blueprint(import_string(BLUEPRINTS[name]))
+
+    # Manejo de errores
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({"success": False, "error": "Endpoint no encontrado"}), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        return jsonify({"success": False, "error": "Error interno del servidor"}), 500
+
+    elapsed = time.perf_counter() - start
+    app.config['STARTUP_SECONDS'] = elapsed
+    if elapsed > STARTUP_BUDGET_SECONDS:
+        print(f"⚠️  Arranque lento: create_app tardó {elapsed:.2f}s (presupuesto {STARTUP_BUDGET_SECONDS:.2f}s)")
+    return app
@@ -0,0 +1,316 @@
+"""
+Blueprint api: dimensiones, hechos de cosecha, estadísticas y dashboards
+Las consultas se leen con el engine compartido de Flask-SQLAlchemy sin pasar por pandas
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from flask import Blueprint, Response, jsonify, request
+from sqlalchemy import text
+
+from auth.models import db
+from dashboard.metrics import add_rows
+from server.services import cached_response, get_services
+
+bp = Blueprint('api', __name__)
+
+# Máximo de filas por página en /api/cosecha y /api/cosecha/top
+MAX_PAGE_SIZE = 1000
+
+# Criterios de ordenamiento de /api/cosecha/top
+CRITERIOS_TOP = {
+    'toneladas': 'h.toneladas_cana_molida',
+    'tch': 'h.tch',
+    'brix': 'h.brix',
+    'sacarosa': 'h.sacarosa'
+}
+
+EXAMPLE_QUERIES = [
+    "muestra la cantidad en toneladas de caña producida del top 10 de las fincas en el 2025",
+    "¿cuáles son las 5 mejores variedades por TCH?",
+    "muestra la producción por zona en 2024",
+    "¿cuál es el promedio de brix por finca?",
+    "muestra la tendencia de producción por mes en 2025",
+    "¿cuáles son las fincas con mayor rendimiento?",
+    "muestra la distribución de producción por variedad",
+    "¿cuál es la producción total por año?"
+]
+
+
+def _native(value: Any) -> Any:
+    """Convierte tipos del driver (Decimal, fechas) a tipos serializables"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def fetch_records(sql: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Ejecuta una consulta de lectura y retorna sus filas como diccionarios
+
+    Args:
+        sql: Consulta SQL con parámetros nombrados (:nombre)
+        params: Valores de los parámetros
+
+    Returns:
+        Lista de filas con tipos nativos de Python
+    """
+    result = db.session.execute(text(sql), params or {})
+    records = [{key: _native(value) for key, value in row.items()} for row in result.mappings()]
+    add_rows(len(records))
+    return records
+
+
+def _page_size(default: int) -> int:
+    return max(1, min(request.args.get('limit', default, type=int), MAX_PAGE_SIZE))
+
+
+@bp.route('/api/')
+def api_index():
+    """Endpoint de bienvenida con el listado de recursos"""
+    return jsonify({
+        "message": "API SugarBI - Data Mart de Cosecha de Caña",
+        "version": "1.0.0",
+        "endpoints": {
+            "dimensiones": {
+                "fincas": "/api/fincas",
+                "variedades": "/api/variedades",
+                "zonas": "/api/zonas",
+                "tiempo": "/api/tiempo"
+            },
+            "hechos": {
+                "cosecha": "/api/cosecha",
+                "cosecha_top": "/api/cosecha/top",
+                "estadisticas": "/api/estadisticas"
+            },
+            "dashboards": "/api/dashboard/<name>"
+        }
+    })
+
+# ===== ENDPOINTS DE DIMENSIONES =====
+
+@bp.route('/api/fincas')
+@cached_response()
+def get_fincas():
+    """Obtener lista de fincas para filtros"""
+    try:
+        fincas = fetch_records("SELECT finca_id, codigo_finca, nombre_finca FROM dimfinca ORDER BY nombre_finca")
+        return jsonify({"success": True, "data": fincas, "total": len(fincas)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/variedades')
+@cached_response()
+def get_variedades():
+    """Obtener lista de variedades para filtros"""
+    try:
+        variedades = fetch_records("SELECT variedad_id, nombre_variedad FROM dimvariedad ORDER BY nombre_variedad")
+        return jsonify({"success": True, "data": variedades, "total": len(variedades)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/zonas')
+@cached_response()
+def get_zonas():
+    """Obtener lista de zonas para filtros"""
+    try:
+        zonas = fetch_records("SELECT codigo_zona, nombre_zona FROM dimzona ORDER BY codigo_zona")
+        return jsonify({"success": True, "data": zonas, "total": len(zonas)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/tiempo')
+@cached_response()
+def get_tiempo():
+    """Obtener lista de períodos de tiempo para filtros"""
+    try:
+        tiempo = fetch_records("""
+        SELECT DISTINCT tiempo_id, fecha, año, mes, nombre_mes, trimestre
+        FROM dimtiempo
+        ORDER BY año DESC, mes ASC
+        """)
+        return jsonify({"success": True, "data": tiempo, "total": len(tiempo)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ===== ENDPOINTS DE HECHOS =====
+
+@bp.route('/api/cosecha')
+def get_cosecha():
+    """Obtener datos de cosecha con filtros opcionales y paginación"""
+    try:
+        filtros = {
+            'finca_id': ('h.id_finca', request.args.get('finca_id')),
+            'variedad_id': ('h.codigo_variedad', request.args.get('variedad_id')),
+            'zona_id': ('h.codigo_zona', request.args.get('zona_id')),
+            'año': ('t.año', request.args.get('año')),
+            'mes': ('t.mes', request.args.get('mes')),
+        }
+        limit = _page_size(100)
+        offset = max(0, request.args.get('offset', 0, type=int))
+
+        query = """
+        SELECT
+            h.id_hecho,
+            f.nombre_finca,
+            v.nombre_variedad,
+            z.nombre_zona,
+            t.año,
+            t.mes,
+            t.nombre_mes,
+            h.toneladas_cana_molida,
+            h.tch,
+            h.area_cosechada,
+            h.brix,
+            h.sacarosa,
+            h.rendimiento_teorico
+        FROM hechos_cosecha h
+        JOIN dimfinca f ON h.id_finca = f.finca_id
+        JOIN dimvariedad v ON h.codigo_variedad = v.variedad_id
+        JOIN dimzona z ON h.codigo_zona = z.codigo_zona
+        JOIN dimtiempo t ON h.codigo_tiempo = t.tiempo_id
+        WHERE 1=1
+        """
+        # Los nombres de parámetro no llevan ñ para que el driver los acepte
+        params = {}
+        for index, (name, (column, value)) in enumerate(filtros.items()):
+            if value:
+                query += f" AND {column} = :f{index}"
+                params[f"f{index}"] = value
+        query += " ORDER BY h.toneladas_cana_molida DESC LIMIT :limit OFFSET :offset"
+        params.update({"limit": limit, "offset": offset})
+
+        records = fetch_records(query, params)
+        return jsonify({
+            "success": True,
+            "data": records,
+            "total": len(records),
+            "filters": {name: value for name, (_, value) in filtros.items()},
+            "pagination": {"limit": limit, "offset": offset}
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/cosecha/top')
+def get_top_cosechas():
+    """Obtener top cosechas por diferentes criterios (toneladas, tch, brix, sacarosa)"""
+    try:
+        criterio = request.args.get('criterio', 'toneladas')
+        if criterio not in CRITERIOS_TOP:
+            return jsonify({"success": False, "error": "Criterio no válido"}), 400
+
+        records = fetch_records(f"""
+        SELECT
+            f.nombre_finca,
+            v.nombre_variedad,
+            z.nombre_zona,
+            t.año,
+            t.mes,
+            h.toneladas_cana_molida,
+            h.tch,
+            h.brix,
+            h.sacarosa,
+            h.rendimiento_teorico
+        FROM hechos_cosecha h
+        JOIN dimfinca f ON h.id_finca = f.finca_id
+        JOIN dimvariedad v ON h.codigo_variedad = v.variedad_id
+        JOIN dimzona z ON h.codigo_zona = z.codigo_zona
+        JOIN dimtiempo t ON h.codigo_tiempo = t.tiempo_id
+        ORDER BY {CRITERIOS_TOP[criterio]} DESC
+        LIMIT :limit
+        """, {"limit": _page_size(10)})
+
+        return jsonify({
+            "success": True,
+            "data": records,
+            "criterio": criterio,
+            "total": len(records)
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/estadisticas')
+@cached_response()
+def get_estadisticas():
+    """Obtener estadísticas generales del data mart"""
+    try:
+        # Total de registros por tabla
+        stats = {}
+        for table in ['dimfinca', 'dimvariedad', 'dimzona', 'dimtiempo', 'hechos_cosecha']:
+            stats[f"total_{table}"] = int(db.session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar())
+
+        # Estadísticas de cosecha
+        row = fetch_records("""
+        SELECT
+            COUNT(*) as total_cosechas,
+            SUM(toneladas_cana_molida) as total_toneladas,
+            AVG(tch) as promedio_tch,
+            AVG(brix) as promedio_brix,
+            AVG(sacarosa) as promedio_sacarosa,
+            MIN(t.año) as año_inicio,
+            MAX(t.año) as año_fin
+        FROM hechos_cosecha h
+        JOIN dimtiempo t ON h.codigo_tiempo = t.tiempo_id
+        """)[0]
+        stats.update({
+            'total_cosechas': int(row['total_cosechas'] or 0),
+            'total_toneladas': row['total_toneladas'] or 0,
+            'promedio_tch': row['promedio_tch'] or 0,
+            'promedio_brix': row['promedio_brix'] or 0,
+            'promedio_sacarosa': row['promedio_sacarosa'] or 0,
+            'año_inicio': row['año_inicio'],
+            'año_fin': row['año_fin']
+        })
+
+        return jsonify({"success": True, "data": stats})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# ===== DASHBOARDS =====
+
+@bp.route('/api/dashboard/<name>')
+def get_dashboard(name):
+    """
+    Construye un dashboard completo en una sola respuesta
+
+    Las consultas de los paneles se ejecutan en paralelo; cada panel incluye sus
+    tiempos (query_ms, render_ms, total_ms) para detectar los lentos.
+    """
+    from dashboard.chart_cache import dumps_with_raw
+    from dashboard.layouts import DASHBOARD_LAYOUTS
+
+    if name not in DASHBOARD_LAYOUTS:
+        return jsonify({
+            "success": False,
+            "error": f"Dashboard no encontrado: {name}",
+            "available": list(DASHBOARD_LAYOUTS)
+        }), 404
+    try:
+        dashboard = get_services().dashboard_runner.render(name)
+        return Response(dumps_with_raw({
+            "success": True,
+            "data": dashboard
+        }), mimetype='application/json')
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/examples')
+@cached_response()
+def get_example_queries():
+    """Retorna ejemplos de consultas que se pueden hacer"""
+    return jsonify({
+        "success": True,
+        "data": {
+            "examples": EXAMPLE_QUERIES
+        }
+    })
@@ -0,0 +1,164 @@
+"""
+Aplicación ASGI de SugarBI
+Con CHAT_ENGINE='agent' atiende POST /api/chat con el pipeline asíncrono (misma respuesta,
+límite de /api/* y métricas que la ruta Flask); el motor 'parser', que no tiene versión
+asíncrona, y el resto de rutas pasan a la aplicación Flask envuelta
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from auth.rate_limit import EXTENSION_KEY as RATE_LIMIT_KEY, TOO_MANY_REQUESTS_MESSAGE
+from chatbot.async_pipeline import AsyncChatPipeline
+from chatbot.intent_cache import IntentCache
+from chatbot.responses import include_raw_data
+from chatbot.streaming import sse_event, wants_event_stream, EVENT_STREAM_HEADERS
+from dashboard.chart_cache import dumps_with_raw
+from dashboard.compression import DEFAULT_MIN_SIZE, compress, negotiate_encoding
+from dashboard.metrics import finish_request, record_error, start_request
+from server.chat import agent_response
+from server.services import get_services
+
+# Tamaño máximo aceptado para el cuerpo de una consulta de chat
+MAX_BODY_BYTES = 64 * 1024
+# Endpoint con el que se registran las métricas (el mismo de la ruta Flask)
+CHAT_ENDPOINT = 'chat.process_chat_query'
+
+
+class SugarBIASGI:
+    """Aplicación ASGI: chat asíncrono más la aplicación Flask envuelta"""
+
+    def __init__(self, wsgi_app, database_url: str, entity_index=None):
+        self.flask_app = wsgi_app
+        self.wsgi = WsgiToAsgi(wsgi_app)
+        self.database_url = database_url
+        self.entity_index = entity_index
+        self.pipeline = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if (scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST'
+                and self.flask_app.config.get('CHAT_ENGINE') == 'agent'):
+            await self._chat(scope, receive, send)
+            return
+        await self.wsgi(scope, receive, send)
+
+    def get_pipeline(self) -> AsyncChatPipeline:
+        """Crea el pipeline bajo demanda (el pool se construye dentro del event loop)"""
+        if self.pipeline is None:
+            self.pipeline = AsyncChatPipeline(
+                self.database_url,
+                entity_index=self.entity_index,
+                intent_cache=IntentCache(int(os.getenv('INTENT_CACHE_SIZE', 1024)))
+            )
+        return self.pipeline
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Cachés y pool calientes antes de aceptar tráfico (ver /health/ready)
+                services = get_services(self.flask_app)
+                if not services.warm_state['ready']:
+                    await asyncio.to_thread(services.warm_up)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.pipeline is not None:
+                    await self.pipeline.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive) -> bytes:
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                raise ValueError("Cuerpo de la petición demasiado grande")
+            more_body = message.get('more_body', False)
+        return body
+
+    async def _chat(self, scope, receive, send):
+        """Equivalente asíncrono de /api/chat (motor 'agent'): el worker no se bloquea durante la consulta"""
+        token = start_request()
+        status = 500
+        try:
+            status = await self._handle_chat(scope, receive, send)
+        except Exception as e:
+            record_error('chat', e)
+            raise
+        finally:
+            finish_request(token, scope['method'], CHAT_ENDPOINT, status, scope['path'])
+
+    async def _handle_chat(self, scope, receive, send) -> int:
+        """Atiende la petición y retorna el estado HTTP enviado"""
+        # Mismo presupuesto que /api/* en Flask (la clave es la IP del cliente, como get_remote_address)
+        limiter = self.flask_app.extensions.get(RATE_LIMIT_KEY)
+        if limiter is not None:
+            client = (scope.get('client') or ('127.0.0.1',))[0]
+            retry_after = await asyncio.to_thread(limiter.hit, 'api', client)
+            if retry_after is not None:
+                return await self._send_json(send, 429, {"success": False, "error": TOO_MANY_REQUESTS_MESSAGE},
+                                             extra_headers=[(b'retry-after', str(retry_after).encode())])
+
+        try:
+            payload = json.loads(await self._read_body(receive) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("se esperaba un objeto JSON")
+            query = str(payload.get('query', '')).strip()
+        except ValueError as e:
+            return await self._send_json(send, 400, {"success": False, "error": f"Petición inválida: {str(e)}"})
+
+        if not query:
+            return await self._send_json(send, 400, {"success": False, "error": "Consulta vacía"})
+
+        headers = dict(scope.get('headers') or [])
+        params = parse_qs(scope.get('query_string', b'').decode())
+        encoding = negotiate_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        if wants_event_stream(headers.get(b'accept', b'').decode('latin-1'), params.get('stream', [None])[0]):
+            await self._stream_chat(query, send)
+            return 200
+
+        result = await self.get_pipeline().process_question(query)
+        # Misma forma de respuesta que la ruta Flask con el motor 'agent'
+        response_data, status = agent_response(
+            result, include_raw_data(payload.get('include_raw_data'), params.get('raw_data', [None])[0]))
+        return await self._send_json(send, status, response_data, encoding)
+
+    async def _stream_chat(self, query: str, send):
+        """Envía la respuesta como eventos SSE a medida que cada etapa termina"""
+        response_headers = [(b'content-type', b'text/event-stream; charset=utf-8')]
+        response_headers += [(name.lower().encode(), value.encode()) for name, value in EVENT_STREAM_HEADERS.items()]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+        async for event, payload in self.get_pipeline().stream_question(query):
+            await send({
+                'type': 'http.response.body',
+                'body': sse_event(event, payload).encode('utf-8'),
+                'more_body': True
+            })
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def _send_json(self, send, status: int, body: Dict[str, Any], encoding: Optional[str] = None,
+                         extra_headers: Optional[List[Tuple[bytes, bytes]]] = None) -> int:
+        content = dumps_with_raw(body)
+        headers = [(b'content-type', b'application/json; charset=utf-8'), (b'vary', b'Accept-Encoding')]
+        headers += extra_headers or []
+        if encoding and len(content) >= DEFAULT_MIN_SIZE:
+            content = compress(content, encoding)
+            headers.append((b'content-encoding', encoding.encode()))
+        headers.append((b'content-length', str(len(content)).encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+        return status
@@ -0,0 +1,482 @@
+"""
+Blueprint auth: autenticación JSON para el frontend React y clientes de la API
+Las páginas de login y registro con formularios están en el blueprint web
+"""
+
+from flask import Blueprint, Flask, jsonify, redirect, request
+from flask_login import current_user, login_required, login_user, logout_user
+
+from auth.hashing import HashingBusyError
+from auth.login import INACTIVE, INVALID, LOCKED, NOT_FOUND, authenticate, record_login
+from auth.models import Role, SessionToken, User, db
+from auth.permission_cache import invalidate_user
+from auth.retention import audit_log_page
+from auth.security import require_permission, security_manager
+from auth.tokens import TokenError, bearer_token, get_token_service
+
+bp = Blueprint('auth', __name__, url_prefix='/auth')
+
+
+def user_to_dict(user, detailed: bool = False):
+    """Datos públicos de un usuario"""
+    data = {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "role": user.role.name if user.role else None
+    }
+    if detailed:
+        data.update({
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_active": user.is_active
+        })
+    return data
+
+
+def _busy_response():
+    """503 cuando el pool de hash está saturado (pico de logins)"""
+    response = jsonify({
+        "success": False,
+        "error": "Demasiados inicios de sesión simultáneos. Intenta de nuevo en unos segundos."
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def default_role() -> Role:
+    """Rol asignado a los usuarios nuevos (viewer); se crea si no existe"""
+    role = Role.query.filter_by(name='viewer').first()
+    if not role:
+        role = Role(
+            name='viewer',
+            description='Usuario con permisos de solo lectura',
+            permissions=['data.read', 'analytics.read']
+        )
+        db.session.add(role)
+        db.session.flush()
+    return role
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """Login con los campos del formulario (username, password, remember_me)"""
+    if current_user.is_authenticated:
+        return redirect('/')
+
+    if request.method != 'POST':
+        return jsonify({"success": False, "error": "Método no permitido"}), 405
+
+    try:
+        username = request.form.get('username')
+        password = request.form.get('password')
+        remember_me = request.form.get('remember_me') == 'on'
+
+        if not username or not password:
+            return jsonify({
+                "success": False,
+                "error": "Por favor completa todos los campos"
+            }), 400
+
+        attempt = authenticate(username, password)
+        user = attempt.user
+
+        if attempt.reason in (INVALID, NOT_FOUND):
+            if user:
+                security_manager.log_security_event('FAILED_LOGIN', {
+                    'username': username,
+                    'reason': attempt.reason
+                }, user.id)
+
+            return jsonify({
+                "success": False,
+                "error": "Usuario o contraseña inválidos"
+            }), 401
+
+        # Verificar si la cuenta está bloqueada
+        if attempt.reason == LOCKED:
+            security_manager.log_security_event('BLOCKED_LOGIN_ATTEMPT', {
+                'username': username,
+                'reason': attempt.reason
+            }, user.id)
+            return jsonify({
+                "success": False,
+                "error": "Cuenta bloqueada temporalmente. Intenta más tarde."
+            }), 403
+
+        # Verificar si el usuario está activo
+        if attempt.reason == INACTIVE:
+            security_manager.log_security_event('INACTIVE_LOGIN_ATTEMPT', {
+                'username': username,
+                'reason': attempt.reason
+            }, user.id)
+            return jsonify({
+                "success": False,
+                "error": "Cuenta desactivada. Contacta al administrador."
+            }), 403
+
+        # Login exitoso: intentos y último login en un solo commit
+        # (los datos de la respuesta se leen antes para no recargar el usuario tras el commit)
+        user_data = user_to_dict(user)
+        login_user(user, remember=remember_me)
+        record_login(user)
+
+        # Registrar evento de seguridad
+        security_manager.log_security_event('SUCCESSFUL_LOGIN', {
+            'username': user_data['username'],
+            'ip_address': request.remote_addr
+        }, user_data['id'])
+
+        return jsonify({
+            "success": True,
+            "message": f"¡Bienvenido, {user_data['username']}!",
+            "user": user_data
+        })
+
+    except HashingBusyError:
+        return _busy_response()
+    except Exception as e:
+        db.session.rollback()
+        security_manager.log_security_event('LOGIN_ERROR', {
+            'error': str(e),
+            'username': request.form.get('username', '')
+        })
+        return jsonify({
+            "success": False,
+            "error": "Error interno del servidor. Intenta más tarde."
+        }), 500
+
+
+@bp.route('/logout', methods=['POST'])
+@login_required
+def logout():
+    """Cerrar sesión y borrar las filas de session_tokens del usuario"""
+    username = current_user.username
+
+    # Filas de session_tokens que quedan de versiones anteriores (ya no se crean por login)
+    SessionToken.query.filter_by(user_id=current_user.id).delete()
+    db.session.commit()
+    invalidate_user(current_user.id)
+
+    security_manager.log_security_event('LOGOUT', {
+        'username': username
+    }, current_user.id)
+
+    logout_user()
+    return jsonify({
+        "success": True,
+        "message": "Has cerrado sesión correctamente."
+    })
+
+
+@bp.route('/register', methods=['POST'])
+def register():
+    """Registro de usuarios (JSON)"""
+    if current_user.is_authenticated:
+        return jsonify({
+            "success": False,
+            "error": "Ya hay una sesión activa"
+        }), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        username = data.get('username')
+        email = data.get('email')
+        password = data.get('password')
+
+        if not all([username, email, password]):
+            return jsonify({
+                "success": False,
+                "error": "Todos los campos son requeridos"
+            }), 400
+
+        # Verificar si el usuario ya existe
+        if User.query.filter_by(username=username).first():
+            return jsonify({
+                "success": False,
+                "error": "El nombre de usuario ya está en uso."
+            }), 400
+
+        if User.query.filter_by(email=email).first():
+            return jsonify({
+                "success": False,
+                "error": "El email ya está registrado."
+            }), 400
+
+        user = User(
+            username=username,
+            email=email,
+            first_name=data.get('first_name', ''),
+            last_name=data.get('last_name', ''),
+            is_active=True
+        )
+        user.set_password(password)
+        user.role_id = default_role().id
+
+        db.session.add(user)
+        db.session.commit()
+
+        security_manager.log_security_event('USER_REGISTERED', {
+            'username': user.username,
+            'email': user.email
+        }, user.id)
+
+        return jsonify({
+            "success": True,
+            "message": "¡Registro exitoso! Ya puedes iniciar sesión."
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        security_manager.log_security_event('REGISTRATION_ERROR', {
+            'error': str(e),
+            'username': data.get('username', '')
+        })
+        return jsonify({
+            "success": False,
+            "error": "Error al crear la cuenta. Intenta más tarde."
+        }), 500
+
+
+@bp.route('/me')
+@login_required
+def get_current_user():
+    """Obtener información del usuario actual"""
+    return jsonify({
+        "success": True,
+        "user": user_to_dict(current_user, detailed=True)
+    })
+
+# ===== ENDPOINTS DE AUTENTICACIÓN API (JSON) =====
+
+@bp.route('/api/login', methods=['POST'])
+def api_login():
+    """Endpoint de login para API"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username')
+        password = data.get('password')
+
+        if not username or not password:
+            return jsonify({
+                "success": False,
+                "error": "Username y password son requeridos"
+            }), 400
+
+        attempt = authenticate(username, password)
+        if attempt.ok:
+            user_data = user_to_dict(attempt.user)
+            login_user(attempt.user, remember=True)
+            db.session.commit()
+            return jsonify({
+                "success": True,
+                "message": "Login exitoso",
+                "user": user_data
+            })
+        return jsonify({
+            "success": False,
+            "error": "Credenciales inválidas"
+        }), 401
+
+    except HashingBusyError:
+        return _busy_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/logout', methods=['POST'])
+@login_required
+def api_logout():
+    """Endpoint de logout para API"""
+    try:
+        invalidate_user(current_user.id)
+        logout_user()
+        return jsonify({
+            "success": True,
+            "message": "Logout exitoso"
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/user/me')
+def api_user_me():
+    """Obtener información del usuario actual (sin sesión responde success=False)"""
+    if current_user.is_authenticated:
+        return jsonify({
+            "success": True,
+            "user": user_to_dict(current_user)
+        })
+    return jsonify({
+        "success": False,
+        "error": "No hay sesión activa"
+    })
+
+# ===== TOKENS DE ACCESO (JWT SIN ESTADO) =====
+
+def _token_error(message, status=401):
+    return jsonify({"success": False, "error": message}), status
+
+
+@bp.route('/api/token', methods=['POST'])
+def api_token():
+    """
+    Emite un token de acceso (corto, con rol y permisos) y uno de refresco
+
+    Ejemplo de request:
+    {
+        "username": "analista",
+        "password": "..."
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    password = data.get('password')
+    if not username or not password:
+        return _token_error("Username y password son requeridos", 400)
+
+    try:
+        attempt = authenticate(username, password)
+        if not attempt.ok:
+            if attempt.user:
+                security_manager.log_security_event('API_FAILED_LOGIN', {
+                    'username': username,
+                    'reason': attempt.reason
+                }, attempt.user.id)
+            return _token_error("Credenciales inválidas")
+
+        user_data = user_to_dict(attempt.user)
+        tokens = get_token_service().issue(attempt.user)
+        record_login(attempt.user)
+        return jsonify({"success": True, **tokens, "user": user_data})
+
+    except HashingBusyError:
+        return _busy_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/token/refresh', methods=['POST'])
+def api_token_refresh():
+    """Renueva el par de tokens con un token de refresco (el usado queda revocado)"""
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not refresh_token:
+        return _token_error("refresh_token es requerido", 400)
+    try:
+        return jsonify({"success": True, **get_token_service().refresh(refresh_token)})
+    except TokenError as e:
+        return _token_error(str(e))
+
+
+@bp.route('/api/token/revoke', methods=['POST'])
+def api_token_revoke():
+    """Revoca el token de acceso de la cabecera Authorization y, si se envía, el de refresco"""
+    service = get_token_service()
+    access_token = bearer_token(request.headers.get('Authorization'))
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not access_token and not refresh_token:
+        return _token_error("Se requiere un token", 400)
+    if access_token:
+        service.revoke(access_token, 'access')
+    if refresh_token:
+        service.revoke(refresh_token, 'refresh')
+    return jsonify({"success": True, "message": "Token revocado"})
+
+
+@bp.route('/api/verify-token', methods=['POST'])
+def api_verify_token():
+    """Verifica un token de acceso sin consultar la base de datos"""
+    token = (request.get_json(silent=True) or {}).get('token') or bearer_token(request.headers.get('Authorization'))
+    if not token:
+        return jsonify({"valid": False, "error": "Token requerido"}), 400
+    try:
+        user = get_token_service().user_from_token(token)
+    except TokenError as e:
+        return jsonify({"valid": False, "error": str(e)}), 401
+    return jsonify({"valid": True, "user": user_to_dict(user)})
+
+# ===== AUDITORÍA =====
+
+# Filas máximas por página del visor
+AUDIT_LOG_MAX_PER_PAGE = 200
+
+
+def audit_log_to_dict(log):
+    """Fila de auditoría para el visor"""
+    return {
+        "id": log.id,
+        "user_id": log.user_id,
+        "action": log.action,
+        "resource": log.resource,
+        "details": log.details,
+        "ip_address": log.ip_address,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None
+    }
+
+
+@bp.route('/api/audit-logs')
+@require_permission('system.admin')
+def api_audit_logs():
+    """Logs de auditoría, del más reciente al más antiguo (paginación por llave: ?cursor=<next_cursor>)"""
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), AUDIT_LOG_MAX_PER_PAGE))
+    try:
+        logs, next_cursor = audit_log_page(request.args.get('cursor'), per_page=per_page,
+                                           user_id=request.args.get('user_id', type=int))
+    except ValueError:
+        return jsonify({"success": False, "error": "Cursor inválido"}), 400
+    return jsonify({
+        "success": True,
+        "data": [audit_log_to_dict(log) for log in logs],
+        "next_cursor": next_cursor
+    })
+
+# ===== INICIALIZACIÓN =====
+
+def create_tables(app: Flask):
+    """Crear tablas de autenticación, roles por defecto y el usuario admin si no existen"""
+    with app.app_context():
+        try:
+            db.create_all()
+
+            if not Role.query.filter_by(name='admin').first():
+                db.session.add(Role(
+                    name='admin',
+                    description='Administrador del sistema',
+                    permissions=['user.create', 'user.read', 'user.update', 'user.delete',
+                                 'role.create', 'role.read', 'role.update', 'role.delete',
+                                 'data.read', 'data.write', 'data.delete',
+                                 'analytics.read', 'analytics.write', 'system.admin']
+                ))
+
+            if not Role.query.filter_by(name='analyst').first():
+                db.session.add(Role(
+                    name='analyst',
+                    description='Analista de datos',
+                    permissions=['data.read', 'analytics.read', 'analytics.write']
+                ))
+
+            default_role()
+
+            # Crear usuario administrador por defecto si no existe
+            if not User.query.filter_by(username='admin').first():
+                admin_user = User(
+                    username='admin',
+                    email='admin@sugarbi.com',
+                    first_name='Administrador',
+                    last_name='Sistema',
+                    is_active=True,
+                    is_admin=True
+                )
+                admin_user.set_password('admin123')  # Cambiar en producción
+                db.session.flush()
+                admin_user.role_id = Role.query.filter_by(name='admin').first().id
+                db.session.add(admin_user)
+
+            db.session.commit()
+            print("✅ Tablas de autenticación creadas/actualizadas correctamente")
+
+        except Exception as e:
+            print(f"❌ Error al crear tablas: {str(e)}")
+            db.session.rollback()
@@ -0,0 +1,334 @@
+"""
+Blueprint chat: consultas en lenguaje natural, parseo y visualizaciones
+El motor se elige con CHAT_ENGINE: 'parser' (QueryParser + SQLGuard, sin dependencias
+pesadas) o 'agent' (agente SQL con LangChain, que se importa en la primera consulta)
+"""
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from auth.models import db
+from auth.security import require_auth
+from chatbot.responses import generate_natural_response, include_raw_data
+from chatbot.streaming import EVENT_STREAM_HEADERS, EVENT_STREAM_MIMETYPE, sse_event, wants_event_stream
+from dashboard.chart_cache import RawJSON, dumps_with_raw, result_fingerprint
+from dashboard.metrics import phase, record_error
+from server.services import get_services
+
+bp = Blueprint('chat', __name__)
+
+
+def build_chat_visualization(query, intent, data_for_viz):
+    """
+    Determina columnas y tipo de gráfico y construye la visualización de una consulta
+
+    Args:
+        query: Texto de la consulta original
+        intent: Intención parseada
+        data_for_viz: Filas de resultado (tipos nativos de Python)
+
+    Returns:
+        RawJSON con la configuración de Chart.js ya serializada (memoizada por huella del resultado)
+    """
+    from dashboard.visualization_engine import ChartConfig
+
+    viz_engine = get_services().viz_engine
+    available_columns = list(data_for_viz[0].keys()) if data_for_viz else []
+
+    # Encontrar columna X (dimensión)
+    x_column = None
+    for col in available_columns:
+        if intent.dimension.value.lower() in col.lower() or any(keyword in col.lower() for keyword in ['nombre', 'finca', 'variedad', 'zona']):
+            x_column = col
+            break
+
+    # Encontrar columna Y (métrica)
+    y_column = None
+    for col in available_columns:
+        if intent.metric.value.lower() in col.lower() or any(keyword in col.lower() for keyword in ['total', 'promedio', 'sum', 'avg']):
+            y_column = col
+            break
+
+    # Si no se encuentran, usar las primeras columnas apropiadas
+    if not x_column:
+        x_column = available_columns[0] if available_columns else "columna_x"
+    if not y_column:
+        y_column = available_columns[1] if len(available_columns) > 1 else available_columns[0] if available_columns else "columna_y"
+
+    # La huella del resultado se calcula una sola vez para ambas búsquedas en caché
+    data_hash = result_fingerprint(data_for_viz)
+    chart_type = viz_engine.suggest_chart_type(data_for_viz, x_column, y_column, data_hash=data_hash)
+
+    chart_config = ChartConfig(
+        chart_type=chart_type,
+        title=f"Consulta: {query}",
+        x_axis=x_column,
+        y_axis=y_column,
+        data=data_for_viz,
+        data_hash=data_hash
+    )
+    return RawJSON(viz_engine.create_visualization_json(chart_config))
+
+
+def intent_to_dict(intent):
+    """Representación serializable de la intención parseada"""
+    return {
+        "type": intent.query_type.value,
+        "metric": intent.metric.value,
+        "dimension": intent.dimension.value,
+        "filters": intent.filters,
+        "limit": intent.limit
+    }
+
+
+def stream_chat_events(query):
+    """
+    Genera los eventos SSE de /api/chat en el orden en que están disponibles:
+    intent (intención y SQL), rows (lotes de filas), chart, text y done
+    """
+    from chatbot.sql_guard import QueryGuardError
+
+    services = get_services()
+    try:
+        intent = services.query_parser.parse(query)
+        sql_query = services.sql_generator.generate_sql(intent)
+        yield sse_event('intent', {"query": query, "intent": intent_to_dict(intent), "sql": sql_query})
+
+        guarded = None
+        for guarded, new_rows in services.sql_guard.stream(db.engine, sql_query):
+            if new_rows:
+                yield sse_event('rows', {"rows": new_rows, "columns": guarded.columns})
+
+        if not guarded.rows:
+            yield sse_event('error', {"error": "No se encontraron datos para la consulta"})
+            return
+
+        yield sse_event('chart', {"visualization": build_chat_visualization(query, intent, guarded.rows)})
+
+        natural_response = generate_natural_response(query, {
+            "data": guarded.rows,
+            "columns": guarded.columns,
+            "row_count": guarded.row_count
+        })
+        yield sse_event('text', {"natural_response": natural_response})
+
+        yield sse_event('done', {
+            "record_count": guarded.row_count,
+            "truncated": guarded.truncated
+        })
+
+    except QueryGuardError as e:
+        yield sse_event('error', {"error": f"Consulta rechazada: {str(e)}"})
+    except Exception as e:
+        record_error('chat_stream', e)
+        yield sse_event('error', {"error": str(e)})
+
+
+def _event_stream(events):
+    return Response(stream_with_context(events), mimetype=EVENT_STREAM_MIMETYPE, headers=EVENT_STREAM_HEADERS)
+
+
+def _chat_with_parser(query, data):
+    """Pipeline QueryParser -> SQLGenerator -> SQLGuard"""
+    from chatbot.sql_guard import QueryGuardError
+
+    if wants_event_stream(request.headers.get('Accept'), request.args.get('stream')):
+        return _event_stream(stream_chat_events(query))
+
+    services = get_services()
+    with phase('parse'):
+        intent = services.query_parser.parse(query)
+    with phase('sql_generation'):
+        sql_query = services.sql_generator.generate_sql(intent)
+
+    # Ejecutar consulta bajo la guardia (solo lectura, LIMIT, tiempo y bytes acotados)
+    try:
+        guarded = services.sql_guard.execute(db.engine, sql_query)
+    except QueryGuardError as e:
+        return jsonify({"success": False, "error": f"Consulta rechazada: {str(e)}"}), 400
+    except Exception as e:
+        record_error('chat_sql', e)
+        return jsonify({"success": False, "error": f"Error ejecutando consulta: {str(e)}"}), 500
+
+    if not guarded.rows:
+        return jsonify({"success": False, "error": "No se encontraron datos para la consulta"}), 404
+
+    response_data = {
+        "success": True,
+        "data": {
+            "query": query,
+            "intent": intent_to_dict(intent),
+            "sql": sql_query,
+            "visualization": build_chat_visualization(query, intent, guarded.rows),
+            "raw_data": guarded.rows,
+            "record_count": guarded.row_count,
+            "truncated": guarded.truncated
+        }
+    }
+    if not include_raw_data(data.get('include_raw_data'), request.args.get('raw_data')):
+        del response_data["data"]["raw_data"]
+    # La visualización ya viene serializada: se inserta sin volver a codificarla
+    with phase('serialization'):
+        body = dumps_with_raw(response_data)
+    return Response(body, mimetype='application/json')
+
+
+def agent_response(result, raw_data: bool):
+    """
+    Cuerpo y estado HTTP de /api/chat con el motor 'agent' (también los usa server/asgi.py)
+
+    Args:
+        result: Resultado de process_question del agente o del pipeline asíncrono
+        raw_data: Si se incluyen las filas (raw_data) en la respuesta
+
+    Returns:
+        Tupla (cuerpo, estado)
+    """
+    if not result["success"]:
+        return {
+            "success": False,
+            "error": result.get("error", "Error desconocido"),
+            "natural_response": result.get("natural_response", "Lo siento, hubo un error al procesar tu consulta.")
+        }, 500
+
+    response_data = {
+        "success": True,
+        "query": result["query"],
+        "intent": result["intent"],
+        "sql": result["sql"],
+        "visualization": result["visualization"],
+        "raw_data": result["data"],
+        "record_count": result["row_count"],
+        "truncated": result.get("truncated", False),
+        "natural_response": result["natural_response"]
+    }
+    if not raw_data:
+        del response_data["raw_data"]
+    return response_data, 200
+
+
+def _chat_with_agent(query, data):
+    """Agente SQL con LangChain (convierte lenguaje natural a SQL)"""
+    sql_agent = get_services().get_sql_agent()
+    if not sql_agent:
+        return jsonify({"success": False, "error": "Error inicializando agente SQL"}), 500
+
+    if wants_event_stream(request.headers.get('Accept'), request.args.get('stream')):
+        return _event_stream(sse_event(event, payload) for event, payload in sql_agent.stream_question(query))
+
+    result = sql_agent.process_question(query)
+    response_data, status = agent_response(
+        result, include_raw_data(data.get('include_raw_data'), request.args.get('raw_data')))
+    with phase('serialization'):
+        return jsonify(response_data), status
+
+
+@bp.route('/api/chat', methods=['POST'])
+def process_chat_query():
+    """
+    Procesa consultas del chatbot y retorna visualizaciones (JSON completo o stream SSE)
+
+    Ejemplo de request:
+    {
+        "query": "¿cuáles son las 5 mejores variedades por TCH?"
+    }
+    """
+    try:
+        data = request.get_json(force=True)
+        query = data.get('query', '').strip()
+
+        if not query:
+            return jsonify({"success": False, "error": "Consulta vacía"}), 400
+
+        if current_app.config['CHAT_ENGINE'] == 'agent':
+            return _chat_with_agent(query, data)
+        return _chat_with_parser(query, data)
+
+    except Exception as e:
+        record_error('chat', e)
+        return jsonify({
+            "success": False,
+            "error": f"Error interno: {str(e)}",
+            "natural_response": "Lo siento, hubo un error inesperado. Por favor, inténtalo de nuevo."
+        }), 500
+
+
+@bp.route('/api/query/parse', methods=['POST'])
+@require_auth
+def parse_query_only():
+    """Solo parsea la consulta sin ejecutar SQL"""
+    try:
+        data = request.get_json()
+        query = data.get('query', '').strip()
+
+        if not query:
+            return jsonify({"success": False, "error": "Consulta vacía"}), 400
+
+        services = get_services()
+        intent = services.query_parser.parse(query)
+        sql_query = services.sql_generator.generate_sql(intent)
+
+        intent_data = intent_to_dict(intent)
+        intent_data["time_period"] = intent.time_period
+        return jsonify({
+            "success": True,
+            "data": {
+                "query": query,
+                "intent": intent_data,
+                "sql": sql_query
+            }
+        })
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/visualization/create', methods=['POST'])
+@require_auth
+def create_visualization():
+    """Crea una visualización a partir de datos"""
+    from dashboard.visualization_engine import ChartConfig, ChartType
+
+    try:
+        data = request.get_json()
+
+        chart_config = ChartConfig(
+            chart_type=ChartType(data.get('chart_type', 'bar')),
+            title=data.get('title', 'Gráfico'),
+            x_axis=data.get('x_axis', ''),
+            y_axis=data.get('y_axis', ''),
+            data=data.get('data', []),
+            colors=data.get('colors'),
+            series=data.get('series')
+        )
+
+        visualization = RawJSON(get_services().viz_engine.create_visualization_json(chart_config))
+
+        return Response(dumps_with_raw({
+            "success": True,
+            "data": {
+                "visualization": visualization
+            }
+        }), mimetype='application/json')
+
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/chat/cache-stats')
+@require_auth
+def get_intent_cache_stats():
+    """Retorna los contadores de las cachés (intenciones, gráficos y respuestas HTTP)"""
+    services = get_services()
+    return jsonify({
+        "success": True,
+        "data": {
+            "query_parser": services.intent_cache.stats(),
+            "universal_analyzer": services.agent_intent_cache.stats(),
+            "charts": services.viz_engine.cache.stats(),
+            "responses": services.response_cache.stats(),
+            "permissions": current_app.extensions['permission_cache'].stats(),
+            "audit": current_app.extensions['audit_writer'].stats(),
+            "rate_limits": current_app.extensions['rate_limiter'].stats()
+            if 'rate_limiter' in current_app.extensions else None
+        }
+    })
@@ -0,0 +1,88 @@
+"""
+Configuración de la aplicación Flask de SugarBI
+Reúne en un solo lugar lo que antes repetían app_unified.py, web/app.py y api/app.py
+"""
+
+import configparser
+import os
+import secrets
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Presupuesto de arranque: importar el paquete y crear la aplicación no debe superar esto
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', 1.5))
+
+# Orígenes del frontend (Vite, React y la propia aplicación)
+CORS_ORIGINS = ['http://localhost:3000', 'http://localhost:5173', 'http://localhost:5000', 'http://localhost:5001']
+
+
+def database_uri() -> str:
+    """
+    URI del data mart: DATABASE_URL si está definida, si no config/config.ini
+
+    Returns:
+        URI de SQLAlchemy (mysql+pymysql)
+    """
+    if os.getenv('DATABASE_URL'):
+        return os.environ['DATABASE_URL']
+    config = configparser.ConfigParser()
+    config.read(ROOT_DIR / 'config' / 'config.ini', encoding='utf-8')
+    db_config = config['mysql']
+    return (
+        f"mysql+pymysql://{db_config['user']}:{db_config['password']}"
+        f"@{db_config['host']}:{db_config['port']}/{db_config['database']}"
+    )
+
+
+def engine_options() -> Dict[str, Any]:
+    """
+    Opciones del pool de conexiones de Flask-SQLAlchemy
+
+    pool_pre_ping descarta conexiones que MySQL cerró por wait_timeout y pool_recycle
+    las renueva antes de que ocurra. DB_POOL_SIZE debería cubrir los hilos de cada
+    worker más DASHBOARD_WORKERS.
+    """
+    options: Dict[str, Any] = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if os.getenv('DB_POOL_SIZE'):
+        options['pool_size'] = int(os.environ['DB_POOL_SIZE'])
+        options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    return options
+
+
+def default_config() -> Dict[str, Any]:
+    """Configuración base de Flask; create_app la combina con la que recibe"""
+    from config.security_config import SecurityConfig
+
+    return {
+        # Con varios workers la clave debe venir del entorno para compartir sesiones
+        'SECRET_KEY': os.getenv('SECRET_KEY') or secrets.token_hex(32),
+        # Firma de los tokens de acceso (auth/tokens.py); sin definir se usa SECRET_KEY
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY'),
+        'SESSION_COOKIE_SECURE': os.getenv('SESSION_COOKIE_SECURE', 'False').lower() == 'true',
+        'SESSION_COOKIE_HTTPONLY': True,
+        'SESSION_COOKIE_SAMESITE': 'Lax',
+        'PERMANENT_SESSION_LIFETIME': 3600,
+        'SQLALCHEMY_DATABASE_URI': database_uri(),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(),
+        'JSON_AS_ASCII': False,
+        # Límites de peticiones (auth/rate_limit.py), compartidos entre workers vía RATE_LIMIT_STORAGE_URL
+        'RATELIMIT_ENABLED': SecurityConfig.RATE_LIMIT_ENABLED,
+        'RATE_LIMIT_STORAGE_URL': SecurityConfig.RATE_LIMIT_STORAGE_URL,
+        'RATE_LIMIT_DEFAULT': SecurityConfig.RATE_LIMIT_DEFAULT,
+        'RATE_LIMIT_LOGIN': SecurityConfig.RATE_LIMIT_LOGIN,
+        'RATE_LIMIT_API': SecurityConfig.RATE_LIMIT_API,
+        # Registro de eventos de seguridad (auth/security.py)
+        'SECURITY_LOG_FILE': SecurityConfig.SECURITY_LOG_FILE,
+        # Segundos entre purgas de auditoría y tokens dentro de la aplicación (0: con cron)
+        'RETENTION_INTERVAL_SECONDS': int(os.getenv('RETENTION_INTERVAL_SECONDS', 0)),
+        # Motor del chat: 'parser' (QueryParser + SQLGuard) o 'agent' (LangChain)
+        'CHAT_ENGINE': os.getenv('CHAT_ENGINE', 'parser'),
+        # Carpeta del build de React que sirve el blueprint spa
+        'FRONTEND_DIST': os.getenv('FRONTEND_DIST', str(ROOT_DIR.parent / 'sugarBI-frontend' / 'dist')),
+    }
@@ -0,0 +1,54 @@
+"""
+Blueprint health: sondas de vida y disponibilidad para el balanceador u orquestador
+- /health/live: el proceso responde (no toca la base de datos)
+- /health/ready: cachés calientes y base de datos accesible; 503 mientras no lo estén
+"""
+
+from flask import Blueprint, current_app, jsonify
+
+from server.services import get_services
+
+bp = Blueprint('health', __name__, url_prefix='/health')
+
+
+@bp.route('/live')
+def live():
+    """Sonda de vida"""
+    return jsonify({"success": True, "status": "alive"})
+
+
+@bp.route('/ready')
+def ready():
+    """
+    Sonda de disponibilidad
+
+    Si la aplicación no se calentó al arrancar (servidor de desarrollo) se calienta en la
+    primera llamada. Luego solo se verifica que el pool siga entregando conexiones.
+    """
+    services = get_services()
+    state = services.warm_state
+    if not state["ready"]:
+        state = services.warm_up()
+
+    database_ok = True
+    try:
+        services.ping()
+    except Exception as e:
+        database_ok = False
+        print(f"⚠️  /health/ready: base de datos no disponible: {e}")
+
+    ready = state["ready"] and database_ok
+    status = 200 if ready else 503
+    response = jsonify({
+        "success": ready,
+        "status": "ready" if ready else "warming",
+        "database": database_ok,
+        "warm_up": state,
+        "startup_seconds": round(current_app.config.get('STARTUP_SECONDS', 0.0), 3),
+        "entity_index": {
+            "entries": len(services.entity_index),
+            "generation": services.entity_index.generation
+        }
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response, status
@@ -0,0 +1,145 @@
+"""
+Blueprint olap: consultas multidimensionales y tablas dinámicas (ver docs/OLAP_GUIDE.md)
+El motor OLAP usa pandas, así que se importa en la primera petición de este blueprint
+"""
+
+from typing import Any, Dict
+
+from flask import Blueprint, jsonify, request
+
+from auth.security import require_auth
+from server.services import cached_response, get_services
+
+bp = Blueprint('olap', __name__, url_prefix='/api/olap')
+
+
+def parse_olap_query(data: Dict[str, Any]):
+    """
+    Convierte el cuerpo JSON de /api/olap/query en un OLAPQuery
+
+    Raises:
+        ValueError: Si la operación, un nivel o una función de agregación no existen,
+            o si un cuantil está fuera de [0, 1]
+    """
+    from dashboard.olap_engine import AggregationFunction, DimensionLevel, OLAPOperation, OLAPQuery
+
+    measures = data.get('measures') or []
+    if not measures:
+        raise ValueError("Se requiere al menos una medida")
+    quantiles = [float(q) for q in data.get('quantiles') or []]
+    if any(not 0 <= q <= 1 for q in quantiles):
+        raise ValueError("Los cuantiles deben estar entre 0 y 1")
+    return OLAPQuery(
+        operation=OLAPOperation(data.get('operation', 'aggregate')),
+        measures=measures,
+        dimensions=data.get('dimensions') or [],
+        dimension_levels={
+            dimension: DimensionLevel(level)
+            for dimension, level in (data.get('dimension_levels') or {}).items()
+        },
+        filters=data.get('filters') or {},
+        aggregation_functions=[AggregationFunction(name) for name in data.get('aggregation_functions') or ['sum']],
+        limit=int(data.get('limit', 100)),
+        sort_by=data.get('sort_by'),
+        pivot_dimension=data.get('pivot_dimension'),
+        quantiles=quantiles,
+        approximate=data.get('approximate') in (True, 1, 'true', '1')
+    )
+
+
+@bp.route('/query', methods=['POST'])
+@require_auth
+def olap_query():
+    """Ejecuta una consulta OLAP (aggregate, drill_down, roll_up, slice, dice, pivot)"""
+    try:
+        query = parse_olap_query(request.get_json(force=True) or {})
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": f"Consulta OLAP inválida: {str(e)}"}), 400
+
+    result = get_services().olap_engine.execute_olap_query(query)
+    if not result.success:
+        return jsonify({"success": False, "error": result.error}), 500
+
+    return jsonify({
+        "success": True,
+        "data": {
+            "operation": result.operation,
+            "records": result.data,
+            "metadata": result.metadata,
+            "sql_query": result.sql_query,
+            "execution_time": result.execution_time,
+            "record_count": result.record_count
+        }
+    })
+
+
+@bp.route('/pivot', methods=['POST'])
+@require_auth
+def olap_pivot():
+    """
+    Tabla dinámica con totales
+
+    Con una consulta OLAP (dimensions, pivot_dimension, measures) el pivot se calcula sobre
+    la base de datos; con 'data' (registros ya consultados) se pivotean esos registros
+    """
+    data = request.get_json(force=True) or {}
+    engine = get_services().olap_engine
+
+    if 'data' not in data:
+        try:
+            query = parse_olap_query({**data, 'operation': 'pivot'})
+            return jsonify({"success": True, "data": engine.execute_pivot(query)})
+        except (TypeError, ValueError) as e:
+            return jsonify({"success": False, "error": f"Pivot inválido: {str(e)}"}), 400
+
+    required = ('data', 'row_dimension', 'col_dimension', 'measure')
+    missing = [field for field in required if not data.get(field)]
+    if missing:
+        return jsonify({"success": False, "error": f"Campos requeridos: {', '.join(missing)}"}), 400
+
+    pivot = engine.create_pivot_table(
+        data['data'], data['row_dimension'], data['col_dimension'], data['measure']
+    )
+    if 'error' in pivot:
+        return jsonify({"success": False, "error": pivot['error']}), 400
+    return jsonify({"success": True, "data": pivot})
+
+
+@bp.route('/dimensions')
+@cached_response()
+def olap_dimensions():
+    """Dimensiones del cubo y sus niveles"""
+    dimensions = get_services().olap_engine.get_available_dimensions()
+    return jsonify({
+        "success": True,
+        "data": {
+            "dimensions": dimensions["dimensions"],
+            "dimension_levels": dimensions["levels"]
+        }
+    })
+
+
+@bp.route('/measures')
+@cached_response()
+def olap_measures():
+    """Medidas y funciones de agregación disponibles"""
+    olap_engine = get_services().olap_engine
+    return jsonify({
+        "success": True,
+        "data": {
+            "measures": olap_engine.get_available_measures(),
+            "aggregation_functions": olap_engine.get_available_aggregations()
+        }
+    })
+
+
+@bp.route('/examples')
+@cached_response()
+def olap_examples():
+    """Ejemplos de consultas OLAP predefinidas"""
+    return jsonify({
+        "success": True,
+        "data": {
+            "examples": get_services().olap_engine.get_olap_examples()
+        }
+    })
@@ -0,0 +1,241 @@
+"""
+Componentes compartidos de la aplicación
+Cada componente se crea la primera vez que una petición lo usa: así el arranque no
+importa pandas, NumPy ni LangChain, y cada aplicación creada con create_app tiene
+sus propias cachés
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import text
+
+from auth.hashing import password_hasher
+from auth.models import db
+from auth.security import restart_security_logging, stop_security_logging
+from chatbot.entity_index import EntityIndex
+from chatbot.intent_cache import IntentCache
+from dashboard.http_cache import ResponseCache
+
+
+class _Lazy:
+    """Propiedad que construye su valor una sola vez, aun con peticiones concurrentes"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__.get(self.name)
+        if value is None:
+            with instance._lock:
+                value = instance.__dict__.get(self.name)
+                if value is None:
+                    value = self.factory(instance)
+                    instance.__dict__[self.name] = value
+        return value
+
+
+class Services:
+    """Componentes de una aplicación (motor de BD, cachés, parsers, motores de gráficos)"""
+
+    def __init__(self, app: Flask):
+        self.app = app
+        self._lock = threading.RLock()
+        # Livianos: se crean al arrancar porque los decoradores de caché los necesitan
+        # El índice de entidades se carga en la primera consulta y se recarga cuando el ETL registra una carga nueva
+        self.entity_index = EntityIndex(self.get_engine)
+        self.response_cache = ResponseCache(self.entity_index.data_version)
+        # Estado del calentamiento que reporta /health/ready
+        self.warm_state: Dict[str, Any] = {"ready": False, "steps": {}, "warmed_at": None}
+
+    def get_engine(self):
+        """Engine de Flask-SQLAlchemy (un solo pool), accesible también fuera de una petición"""
+        with self.app.app_context():
+            return db.engine
+
+    @_Lazy
+    def intent_cache(self) -> IntentCache:
+        return IntentCache(int(os.getenv('INTENT_CACHE_SIZE', 1024)))
+
+    @_Lazy
+    def agent_intent_cache(self) -> IntentCache:
+        # Caché separada: el analizador universal produce intenciones distintas a QueryParser
+        return IntentCache(int(os.getenv('INTENT_CACHE_SIZE', 1024)))
+
+    @_Lazy
+    def query_parser(self):
+        from chatbot.query_parser import QueryParser
+        return QueryParser(self.entity_index, cache=self.intent_cache)
+
+    @_Lazy
+    def sql_generator(self):
+        from chatbot.sql_generator import SQLGenerator
+        return SQLGenerator()
+
+    @_Lazy
+    def sql_guard(self):
+        from chatbot.sql_guard import SQLGuard
+        return SQLGuard()
+
+    @_Lazy
+    def viz_engine(self):
+        from dashboard.chart_cache import ChartCache
+        from dashboard.visualization_engine import VisualizationEngine
+        return VisualizationEngine(
+            max_points=int(os.getenv('CHART_MAX_POINTS', 500)),
+            cache=ChartCache(int(os.getenv('CHART_CACHE_SIZE', 256)))
+        )
+
+    @_Lazy
+    def dashboard_runner(self):
+        # Los paneles de /api/dashboard/<name> comparten el pool de conexiones de la aplicación
+        from dashboard.layouts import DashboardRunner
+        return DashboardRunner(self.get_engine, self.viz_engine, sql_guard=self.sql_guard)
+
+    @_Lazy
+    def olap_engine(self):
+        from dashboard.olap_engine import OLAEEngine
+        return OLAEEngine(engine=self.get_engine(), data_version=self.entity_index.data_version)
+
+    @_Lazy
+    def sql_agent(self):
+        """Agente SQL con LangChain (la importación de LangChain ocurre aquí)"""
+        from chatbot.sql_agent import SugarBISQLAgent
+        return SugarBISQLAgent(
+            self.app.config['SQLALCHEMY_DATABASE_URI'],
+            os.getenv('OPENAI_API_KEY'),
+            entity_index=self.entity_index,
+            intent_cache=self.agent_intent_cache
+        )
+
+    def get_sql_agent(self):
+        """Agente SQL o None si no se pudo inicializar"""
+        try:
+            return self.sql_agent
+        except Exception as e:
+            print(f"Error inicializando agente SQL: {e}")
+            return None
+
+    # ----- Ciclo de vida en servidores de producción -----
+
+    def _warm_step(self, name: str, step) -> bool:
+        start = time.perf_counter()
+        try:
+            step()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+            print(f"⚠️  Calentamiento '{name}' falló: {e}")
+        result = {"ok": ok, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        if error:
+            result["error"] = error
+        self.warm_state["steps"][name] = result
+        return ok
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Prepara la aplicación antes de recibir tráfico
+
+        Abre el pool de conexiones, carga el índice de entidades y construye los
+        componentes que usan los blueprints registrados. Con preload_app de gunicorn
+        se ejecuta una vez en el proceso maestro y los workers heredan el resultado.
+        El agente LangChain no se precarga: abre sus propias conexiones y cuentas externas.
+
+        Returns:
+            Estado del calentamiento (ready y duración de cada paso)
+        """
+        blueprints = self.app.blueprints
+        steps = [('database', self.ping), ('entity_index', self._load_entity_index)]
+        if 'chat' in blueprints:
+            steps.append(('chat', lambda: (self.query_parser, self.sql_generator, self.sql_guard, self.viz_engine)))
+        if 'api' in blueprints:
+            steps.append(('charts', lambda: self.viz_engine))
+        if 'olap' in blueprints:
+            steps.append(('olap', lambda: self.olap_engine))
+            # La muestra de consultas aproximadas se lee una vez aquí, no en la primera consulta
+            steps.append(('olap_sample', lambda: self.olap_engine.sample_frame()))
+
+        self.warm_state["steps"] = {}
+        results = [self._warm_step(name, step) for name, step in steps]
+        self.warm_state.update({"ready": all(results), "warmed_at": datetime.now().isoformat()})
+        return self.warm_state
+
+    def _load_entity_index(self):
+        self.entity_index.refresh()
+        if self.entity_index.generation is None:
+            raise RuntimeError("índice de entidades sin cargar")
+
+    def ping(self):
+        """Verifica que la base de datos responde (usa una conexión del pool)"""
+        with self.get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def after_fork(self):
+        """
+        Reinicia en un worker recién creado lo que no se hereda del proceso maestro
+
+        Las conexiones abiertas antes del fork no deben compartirse entre procesos, y los
+        hilos del pool de paneles no existen en el proceso hijo.
+        """
+        self._lock = threading.RLock()
+        self.get_engine().dispose(close=False)
+        self.__dict__.pop('dashboard_runner', None)
+        olap_engine = self.__dict__.get('olap_engine')
+        if olap_engine is not None:
+            olap_engine.after_fork()
+        password_hasher.after_fork()
+        self.app.extensions['audit_writer'].after_fork()
+        self.app.extensions['retention'].after_fork()
+        limiter = self.app.extensions.get('rate_limiter')
+        if limiter is not None:
+            limiter.after_fork()
+        restart_security_logging()
+
+    def shutdown(self):
+        """Libera hilos y conexiones al terminar un worker"""
+        runner = self.__dict__.pop('dashboard_runner', None)
+        if runner is not None:
+            runner.shutdown()
+        olap_engine = self.__dict__.get('olap_engine')
+        if olap_engine is not None:
+            olap_engine.shutdown()
+        password_hasher.shutdown()
+        self.app.extensions['audit_writer'].flush()
+        self.app.extensions['retention'].stop()
+        stop_security_logging()
+        self.get_engine().dispose()
+
+
+def get_services(app: Optional[Flask] = None) -> Services:
+    """Servicios de la aplicación indicada o de la aplicación activa"""
+    return (app or current_app).extensions['sugarbi']
+
+
+def cached_response(public: bool = True):
+    """
+    Versión diferida de ResponseCache.cached para usar en blueprints
+
+    La caché pertenece a la aplicación, que todavía no existe cuando se definen las rutas.
+    """
+    def decorator(view):
+        wrapped = {}
+
+        def wrapper(*args, **kwargs):
+            cache = get_services().response_cache
+            handler = wrapped.get(id(cache))
+            if handler is None:
+                handler = wrapped[id(cache)] = cache.cached(public)(view)
+            return handler(*args, **kwargs)
+
+        wrapper.__name__ = view.__name__
+        wrapper.__doc__ = view.__doc__
+        return wrapper
+    return decorator
@@ -0,0 +1,231 @@
+"""
+Blueprints web y spa
+- web: páginas del dashboard con plantillas Jinja (web/templates) y login con formularios
+- spa: sirve el build de React (sugarBI-frontend/dist) con fallback a index.html
+"""
+
+import os
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, send_from_directory, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+
+from auth.hashing import HashingBusyError
+from auth.login import INACTIVE, INVALID, LOCKED, NOT_FOUND, authenticate, record_login
+from auth.models import SessionToken, User, db
+from auth.permission_cache import invalidate_user
+from auth.security import security_manager
+from server.auth import default_role
+from server.config import ROOT_DIR
+
+bp = Blueprint('web', __name__, template_folder=str(ROOT_DIR / 'web' / 'templates'))
+
+spa_bp = Blueprint('spa', __name__)
+
+# ===== PÁGINAS =====
+
+@bp.route('/')
+def index():
+    """Página principal del dashboard"""
+    return render_template('index_clean.html')
+
+
+@bp.route('/chatbot')
+def chatbot_page():
+    """Página del chatbot"""
+    return render_template('chatbot_clean.html')
+
+
+@bp.route('/dashboard')
+def dashboard_page():
+    """Página del dashboard"""
+    return render_template('dashboard_clean.html')
+
+
+@bp.route('/dashboard-alternativo')
+def dashboard_alternativo():
+    """Dashboard integrado con chatbot y visualizaciones"""
+    return render_template('dashboard_alternativo_clean.html')
+
+
+@bp.route('/olap')
+@login_required
+def olap_dashboard():
+    """Dashboard OLAP para análisis multidimensional"""
+    return render_template('olap_dashboard.html')
+
+
+@bp.route('/olap-interactive')
+@login_required
+def olap_interactive():
+    """Dashboard OLAP interactivo"""
+    return render_template('olap_interactive.html')
+
+
+@bp.route('/olap-analytics')
+@login_required
+def olap_analytics():
+    """Dashboard OLAP con análisis avanzado"""
+    return render_template('olap_analytics.html')
+
+# ===== AUTENTICACIÓN CON FORMULARIOS =====
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """Página de login"""
+    if current_user.is_authenticated:
+        return redirect(url_for('web.index'))
+
+    if request.method == 'POST':
+        try:
+            username = request.form.get('username')
+            password = request.form.get('password')
+            remember_me = request.form.get('remember_me') == 'on'
+
+            if not username or not password:
+                flash('Por favor completa todos los campos', 'error')
+                return render_template('auth/login_simple.html')
+
+            attempt = authenticate(username, password)
+            user = attempt.user
+
+            if attempt.reason in (INVALID, NOT_FOUND):
+                security_manager.log_security_event('FAILED_LOGIN', {
+                    'username': username,
+                    'reason': attempt.reason
+                }, user.id if user else None)
+
+                flash('Usuario o contraseña inválidos', 'error')
+                return render_template('auth/login_simple.html')
+
+            # Verificar si la cuenta está bloqueada
+            if attempt.reason == LOCKED:
+                security_manager.log_security_event('BLOCKED_LOGIN_ATTEMPT', {
+                    'username': username,
+                    'reason': attempt.reason
+                }, user.id)
+                flash('Cuenta bloqueada temporalmente. Intenta más tarde.', 'error')
+                return render_template('auth/login_simple.html')
+
+            # Verificar si el usuario está activo
+            if attempt.reason == INACTIVE:
+                security_manager.log_security_event('INACTIVE_LOGIN_ATTEMPT', {
+                    'username': username,
+                    'reason': attempt.reason
+                }, user.id)
+                flash('Cuenta desactivada. Contacta al administrador.', 'error')
+                return render_template('auth/login_simple.html')
+
+            # Login exitoso: intentos y último login en un solo commit
+            user_id, username = user.id, user.username
+            login_user(user, remember=remember_me)
+            record_login(user)
+
+            # Registrar evento de seguridad
+            security_manager.log_security_event('SUCCESSFUL_LOGIN', {
+                'username': username,
+                'ip_address': request.remote_addr
+            }, user_id)
+
+            flash(f'¡Bienvenido, {username}!', 'success')
+
+            # Redirigir a la página solicitada o al dashboard
+            next_page = request.args.get('next')
+            if not next_page or not next_page.startswith('/'):
+                next_page = url_for('web.index')
+            return redirect(next_page)
+
+        except HashingBusyError:
+            flash('Demasiados inicios de sesión simultáneos. Intenta de nuevo en unos segundos.', 'error')
+        except Exception as e:
+            db.session.rollback()
+            flash('Error interno del servidor. Intenta más tarde.', 'error')
+            security_manager.log_security_event('LOGIN_ERROR', {
+                'error': str(e),
+                'username': request.form.get('username', '')
+            })
+
+    return render_template('auth/login_simple.html')
+
+
+@bp.route('/logout')
+@login_required
+def logout():
+    """Cerrar sesión"""
+    username = current_user.username
+
+    # Filas de session_tokens que quedan de versiones anteriores (ya no se crean por login)
+    SessionToken.query.filter_by(user_id=current_user.id).delete()
+    db.session.commit()
+    invalidate_user(current_user.id)
+
+    security_manager.log_security_event('LOGOUT', {
+        'username': username
+    }, current_user.id)
+
+    logout_user()
+    flash('Has cerrado sesión correctamente.', 'info')
+    return redirect(url_for('web.login'))
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    """Página de registro"""
+    from auth.forms import RegisterForm
+
+    if current_user.is_authenticated:
+        return redirect(url_for('web.index'))
+
+    form = RegisterForm()
+
+    if form.validate_on_submit():
+        try:
+            # Verificar si el usuario ya existe
+            if User.query.filter_by(username=form.username.data).first():
+                flash('El nombre de usuario ya está en uso.', 'error')
+                return render_template('auth/register.html', form=form)
+
+            if User.query.filter_by(email=form.email.data).first():
+                flash('El email ya está registrado.', 'error')
+                return render_template('auth/register.html', form=form)
+
+            user = User(
+                username=form.username.data,
+                email=form.email.data,
+                first_name=form.first_name.data,
+                last_name=form.last_name.data,
+                is_active=True
+            )
+            user.set_password(form.password.data)
+            user.role_id = default_role().id
+
+            db.session.add(user)
+            db.session.commit()
+
+            security_manager.log_security_event('USER_REGISTERED', {
+                'username': user.username,
+                'email': user.email
+            }, user.id)
+
+            flash('¡Registro exitoso! Ya puedes iniciar sesión.', 'success')
+            return redirect(url_for('web.login'))
+
+        except Exception as e:
+            db.session.rollback()
+            flash('Error al crear la cuenta. Intenta más tarde.', 'error')
+            security_manager.log_security_event('REGISTRATION_ERROR', {
+                'error': str(e),
+                'username': form.username.data
+            })
+
+    return render_template('auth/register.html', form=form)
+
+# ===== FRONTEND REACT =====
+
+@spa_bp.route('/', defaults={'path': ''})
+@spa_bp.route('/<path:path>')
+def serve_react(path):
+    """Servir archivos estáticos de React; las rutas desconocidas reciben index.html (React Router)"""
+    dist = current_app.config['FRONTEND_DIST']
+    if path and os.path.isfile(os.path.join(dist, path)):
+        return send_from_directory(dist, path)
+    return send_from_directory(dist, 'index.html')
@@ -0,0 +1,30 @@
+"""
+Fixtures compartidas: aplicaciones de prueba sobre sqlite en tmp_path
+"""
+
+import pytest
+
+from auth.hashing import password_hasher
+from server import create_app
+from server.auth import create_tables
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Fábrica de aplicaciones en modo de prueba (base sqlite en tmp_path si no se indica otra)"""
+    def make(blueprints, database_uri=None, **config):
+        return create_app(blueprints, config={
+            'SQLALCHEMY_DATABASE_URI': database_uri or f"sqlite:///{tmp_path / 'auth.db'}",
+            'TESTING': True,
+            **config
+        })
+    return make
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    """Aplicación con el blueprint auth, tablas creadas y hash de contraseñas rápido"""
+    monkeypatch.setattr(password_hasher, 'rounds', 4)
+    app = make_app(('auth',), RATELIMIT_ENABLED=False)
+    create_tables(app)
+    return app
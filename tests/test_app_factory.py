@@ -0,0 +1,69 @@
+"""
+Pruebas de la fábrica de la aplicación: arranque sin dependencias pesadas y blueprints
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from server import create_app
+from server.config import STARTUP_BUDGET_SECONDS
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from server import create_app
+app = create_app(config={'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+print(json.dumps({
+    'seconds': time.perf_counter() - start,
+    'loaded': [name for name in ('pandas', 'numpy', 'langchain', 'langchain_openai') if name in sys.modules],
+}))
+"""
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    database_uri = f"sqlite:///{tmp_path / 'datamart.db'}"
+    with create_engine(database_uri).begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (id_hecho INTEGER, tch NUMERIC)"))
+        conn.execute(text("INSERT INTO dimfinca VALUES (1, 'F1', 'La Esperanza'), (2, 'F2', 'El Trapiche')"))
+    return make_app(('api',), database_uri)
+
+
+def test_arranque_sin_dependencias_pesadas_y_dentro_del_presupuesto():
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', STARTUP_SCRIPT],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    startup = json.loads(output.strip().splitlines()[-1])
+
+    assert startup['loaded'] == []
+    assert startup['seconds'] < STARTUP_BUDGET_SECONDS
+
+
+def test_blueprint_api_sin_pandas(app):
+    client = app.test_client()
+    response = client.get('/api/fincas')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['total'] == 2
+    assert [finca['nombre_finca'] for finca in body['data']] == ['El Trapiche', 'La Esperanza']
+    # Sin el blueprint chat sus rutas no existen
+    assert client.post('/api/chat', json={'query': 'hola'}).status_code == 404
+
+
+def test_cada_aplicacion_tiene_sus_propios_servicios(app, make_app):
+    other = make_app(('api',), 'sqlite://')
+
+    assert app.extensions['sugarbi'] is not other.extensions['sugarbi']
+    assert app.extensions['sugarbi'].response_cache is not other.extensions['sugarbi'].response_cache
+    with pytest.raises(KeyError):
+        create_app(('api', 'inexistente'))
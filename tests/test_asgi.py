@@ -0,0 +1,91 @@
+"""
+Pruebas del punto de entrada ASGI: motor del chat, forma de la respuesta, límites y métricas
+"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard import metrics
+from server.asgi import CHAT_ENDPOINT, SugarBIASGI
+
+
+@pytest.fixture
+def database(tmp_path):
+    pytest.importorskip("aiosqlite")
+    path = tmp_path / 'datamart.db'
+    with create_engine(f"sqlite:///{path}").begin() as conn:
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE dimzona (codigo_zona INTEGER, nombre_zona TEXT)"))
+        conn.execute(text("CREATE TABLE dimtiempo (tiempo_id INTEGER, año INTEGER, mes INTEGER)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (codigo_variedad INTEGER, id_finca INTEGER, codigo_zona INTEGER, "
+                          "codigo_tiempo INTEGER, toneladas_cana_molida REAL)"))
+        conn.execute(text("INSERT INTO dimzona VALUES (1, 'Norte')"))
+        conn.execute(text("INSERT INTO dimtiempo VALUES (1, 2024, 1)"))
+        for i in range(4):
+            conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"), {"i": i, "n": f"V{i}"})
+            conn.execute(text("INSERT INTO dimfinca VALUES (:i, :i, :n)"), {"i": i, "n": f"F{i}"})
+            conn.execute(text("INSERT INTO hechos_cosecha VALUES (:i, :i, 1, 1, :t)"), {"i": i, "t": 10.0 * i})
+    return path
+
+
+def _post_chat(application, query):
+    """POST /api/chat a la aplicación ASGI; retorna (estado, cabeceras, cuerpo)"""
+    content = json.dumps({'query': query}).encode()
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat', 'raw_path': b'/api/chat',
+             'root_path': '', 'scheme': 'http', 'query_string': b'', 'http_version': '1.1',
+             'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(content)).encode()),
+                         (b'host', b'localhost')],
+             'client': ('10.0.0.7', 5000), 'server': ('localhost', 80)}
+    messages = [{'type': 'http.request', 'body': content, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await application(scope, receive, send)
+        if application.pipeline is not None:
+            await application.pipeline.aclose()
+
+    asyncio.run(run())
+    start = sent[0]
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return start['status'], dict(start['headers']), json.loads(body)
+
+
+def test_motor_agent_misma_respuesta_limite_y_metricas(make_app, database):
+    app = make_app(('api', 'chat'), f"sqlite:///{database}", CHAT_ENGINE='agent', RATE_LIMIT_API='2 per minute')
+    application = SugarBIASGI(app, f"sqlite+aiosqlite:///{database}")
+    before = metrics.REQUEST_SECONDS.count(method='POST', endpoint=CHAT_ENDPOINT, status=200)
+
+    status, _, body = _post_chat(application, "distribucion de produccion por variedad top 3")
+
+    assert status == 200
+    # Las mismas claves que la ruta Flask con el motor 'agent'
+    assert set(body) == {"success", "query", "intent", "sql", "visualization", "raw_data", "record_count",
+                         "truncated", "natural_response"}
+    assert metrics.REQUEST_SECONDS.count(method='POST', endpoint=CHAT_ENDPOINT, status=200) == before + 1
+
+    # El presupuesto de /api/* es el mismo que aplica Flask
+    assert _post_chat(application, "produccion por variedad")[0] == 200
+    status, headers, body = _post_chat(application, "produccion por variedad")
+    assert status == 429 and b'retry-after' in headers and body["success"] is False
+
+
+def test_motor_parser_lo_atiende_flask(make_app, database):
+    app = make_app(('api', 'chat'), f"sqlite:///{database}", CHAT_ENGINE='parser')
+    application = SugarBIASGI(app, f"sqlite+aiosqlite:///{database}")
+
+    status, headers, body = _post_chat(application, "distribucion de produccion por variedad top 3")
+
+    assert application.pipeline is None
+    # Server-Timing lo agrega la instrumentación de Flask
+    assert b'server-timing' in headers
+    assert status == 200 and body["success"] is True and "sql" in body["data"]
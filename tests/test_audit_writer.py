@@ -0,0 +1,59 @@
+"""
+Pruebas del escritor de auditoría por lotes
+"""
+
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from auth.audit_writer import AuditWriter
+from auth.models import AuditLog
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+    AuditLog.__table__.create(engine)
+    return engine
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM audit_logs")).scalar()
+
+
+def test_agrupa_filas_en_lotes_y_vacia_al_terminar(tmp_path):
+    engine = _engine(tmp_path)
+    writer = AuditWriter(lambda: engine, batch_size=3, flush_interval=30)
+
+    for index in range(7):
+        assert writer.submit(1, 'DATA_READ', 'api', details={'n': index}, ip_address='10.0.0.1')
+    writer.flush()
+
+    stats = writer.stats()
+    assert _count(engine) == 7
+    assert stats['written'] == 7 and stats['batches'] == 3 and stats['dropped'] == 0
+
+
+def test_intervalo_de_escritura_y_descarte_con_cola_llena(tmp_path):
+    engine = _engine(tmp_path)
+    release = threading.Event()
+
+    def slow_engine():
+        release.wait(5)
+        return engine
+
+    writer = AuditWriter(slow_engine, batch_size=1, flush_interval=0.05, max_queue=1)
+    writer.submit(1, 'LOGIN')
+    # El hilo toma la primera fila y queda esperando al engine
+    deadline = time.monotonic() + 2
+    while writer.stats()['queued'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert writer.submit(1, 'LOGIN')
+    assert not writer.submit(1, 'LOGIN')
+    release.set()
+    writer.flush()
+
+    assert _count(engine) == 2
+    assert writer.stats()['dropped'] == 1
@@ -0,0 +1,61 @@
+"""
+Pruebas del dashboard con paneles en paralelo
+"""
+
+import json
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from chatbot.sql_guard import GuardConfig, SQLGuard
+from dashboard.chart_cache import dumps_with_raw
+from dashboard.layouts import DashboardRunner, PanelSpec
+from dashboard.visualization_engine import ChartType, VisualizationEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'datamart.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE cosecha (anio INTEGER, variedad TEXT, finca TEXT, tch REAL)"))
+        conn.execute(text("INSERT INTO cosecha VALUES (:anio, :variedad, :finca, :tch)"), [
+            {"anio": 2020 + i % 3, "variedad": f"V{i % 2}", "finca": f"F{i % 4}", "tch": 80.0 + i}
+            for i in range(12)
+        ])
+    return engine
+
+
+def test_paneles_en_paralelo_con_tiempos_y_errores_aislados(engine):
+    threads = set()
+
+    class SpyGuard(SQLGuard):
+        def execute(self, engine, sql_query):
+            threads.add(threading.current_thread().name)
+            return super().execute(engine, sql_query)
+
+    layouts = {"prueba": {"title": "Prueba", "columns": 2, "panels": [
+        PanelSpec("fincas", "Fincas", "SELECT finca AS nombre_finca, SUM(tch) AS total_tch FROM cosecha GROUP BY finca",
+                  ChartType.BAR, "nombre_finca", "total_tch"),
+        PanelSpec("series", "TCH por variedad",
+                  "SELECT anio, variedad, AVG(tch) AS promedio_tch FROM cosecha GROUP BY anio, variedad",
+                  ChartType.LINE, "anio", "promedio_tch", series="variedad", width=2),
+        PanelSpec("roto", "Roto", "SELECT columna_inexistente FROM cosecha", ChartType.BAR, "x", "y"),
+    ]}}
+    runner = DashboardRunner(engine, VisualizationEngine(), sql_guard=SpyGuard(GuardConfig()),
+                             max_workers=3, layouts=layouts)
+    try:
+        dashboard = json.loads(dumps_with_raw(runner.render("prueba")))
+    finally:
+        runner.shutdown()
+
+    assert all(name.startswith("dashboard-panel") for name in threads)
+    panels = dashboard["visualizations"]
+    assert [p["id"] for p in panels] == ["fincas", "series", "roto"]
+    assert panels[0]["success"] and panels[0]["visualization"]["type"] == "bar"
+    assert len(panels[1]["visualization"]["data"]["datasets"]) == 2
+    assert set(panels[0]["timing"]) == {"query_ms", "render_ms", "total_ms"}
+    assert not panels[2]["success"] and "error" in panels[2]
+    assert dashboard["title"] == "Prueba" and dashboard["timing"]["slowest_panel"] in {"fincas", "series", "roto"}
+    with pytest.raises(KeyError):
+        runner.render("inexistente")
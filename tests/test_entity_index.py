@@ -0,0 +1,86 @@
+"""
+Pruebas del índice de entidades (fincas, variedades y zonas)
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from chatbot.entity_index import EntityIndex, bounded_levenshtein, fold
+from chatbot.query_parser import QueryParser
+from chatbot.sql_generator import SQLGenerator
+from chatbot.universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+from dashboard.data_version import DataVersion, register_load
+
+
+@pytest.fixture
+def index():
+    index = EntityIndex()
+    index.load({
+        'finca': [(1, 'La Esperanza'), (2, 'San José'), (3, 'El Porvenir')],
+        'variedad': [(10, 'CC 85-92'), (11, 'CC 01-1940')],
+        'zona': [(3, 3), (7, 7)],
+    })
+    return index
+
+
+def test_fold_quita_tildes_y_signos():
+    assert fold("¿Producción de la finca SAN JOSÉ?") == "produccion de la finca san jose"
+
+
+def test_levenshtein_acotado():
+    assert bounded_levenshtein("esperanza", "esperansa", 2) == 1
+    assert bounded_levenshtein("esperanza", "porvenir", 2) is None
+
+
+def test_resuelve_nombres_exactos_y_con_errores(index):
+    assert index.extract_filters("producción de la finca La Esperanza") == {'finca_id': [1]}
+    assert index.extract_filters("toneladas de san jose y la esperansa") == {'finca_id': [2, 1]}
+    assert index.extract_filters("tch de la variedad cc 85-92") == {'variedad_id': [10]}
+
+
+def test_numeros_solo_con_palabra_clave(index):
+    assert index.extract_filters("top 3 fincas en 2025") == {}
+    assert index.extract_filters("producción en la zona 7") == {'codigo_zona': [7]}
+
+
+def test_resolucion_rapida(index):
+    for i in range(500):
+        index.add('finca', 100 + i, f"Hacienda Santa Rosa {i}")
+    started = time.perf_counter()
+    for _ in range(100):
+        index.resolve("muestra la producción de la finca el porvenr en marzo de 2024")
+    assert (time.perf_counter() - started) / 100 < 0.005
+
+
+def test_filtros_llegan_al_sql(index):
+    intent = QueryParser(index).parse("top 5 variedades de la finca La Esperanza")
+    assert intent.filters['finca_id'] == [1]
+    assert "h.id_finca IN (1)" in SQLGenerator().generate_sql(intent)
+
+    intent = UniversalQueryAnalyzer(index).analyze_query("promedio de tch en la zona 3 y la finca san jose")
+    sql = UniversalSQLGenerator().generate_sql(intent)
+    assert "h.codigo_zona IN (3)" in sql and "h.id_finca IN (2)" in sql
+
+
+def test_recarga_cuando_el_etl_registra_una_carga(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sugarbi.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimzona (codigo_zona INTEGER, nombre_zona TEXT)"))
+        conn.execute(text("CREATE TABLE etl_cargas (id INTEGER PRIMARY KEY, registros_hechos INTEGER)"))
+        conn.execute(text("INSERT INTO dimfinca VALUES (1, 'La Esperanza')"))
+        register_load(conn, 10)
+
+    version = DataVersion(engine, ttl_seconds=0)
+    index = EntityIndex(engine, version)
+    assert index.extract_filters("finca la esperanza") == {'finca_id': [1]}
+    assert index.generation == 1
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO dimfinca VALUES (2, 'Miraflores')"))
+        register_load(conn, 12)
+    assert index.extract_filters("finca miraflores") == {'finca_id': [2]}
+    assert index.generation == 2
@@ -0,0 +1,105 @@
+"""
+Pruebas de la caché HTTP con ETag por generación de datos
+"""
+
+from flask import Flask, jsonify
+
+from dashboard.http_cache import ResponseCache
+
+
+class _Version:
+    """Generación de datos controlada por la prueba"""
+
+    def __init__(self):
+        self.generation = 1
+
+    def current(self):
+        return self.generation
+
+
+def test_etag_304_y_bytes_cacheados_por_generacion():
+    version = _Version()
+    cache = ResponseCache(version, max_age=120)
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/api/fincas')
+    @cache.cached()
+    def fincas():
+        calls.append(1)
+        return jsonify({"success": True, "data": [{"nombre_finca": "La Esperanza"}]})
+
+    @app.route('/api/roto')
+    @cache.cached()
+    def roto():
+        calls.append(1)
+        return jsonify({"success": False}), 500
+
+    client = app.test_client()
+    first = client.get('/api/fincas')
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'public, max-age=120, must-revalidate'
+    etag = first.headers['ETag']
+
+    assert client.get('/api/fincas').get_data() == first.get_data()
+    not_modified = client.get('/api/fincas', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.headers['ETag'] == etag
+    assert len(calls) == 1
+
+    # Consulta distinta o carga nueva del ETL: otro ETag y la vista se vuelve a ejecutar
+    assert client.get('/api/fincas?orden=desc').headers['ETag'] != etag
+    version.generation = 2
+    renewed = client.get('/api/fincas', headers={'If-None-Match': etag})
+    assert renewed.status_code == 200 and renewed.headers['ETag'] != etag
+    assert len(calls) == 3
+
+    # Los errores no se cachean
+    client.get('/api/roto')
+    client.get('/api/roto')
+    assert len(calls) == 5 and cache.stats()["not_modified"] == 1
+
+
+def test_compresion_negociada_con_umbral_y_variantes_precomprimidas():
+    import gzip
+
+    from dashboard.compression import init_compression, negotiate_encoding
+
+    assert negotiate_encoding("gzip;q=0.5, identity") == "gzip"
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding(None) is None
+
+    cache = ResponseCache(_Version())
+    app = Flask(__name__)
+    init_compression(app, min_size=200)
+    calls = []
+
+    @app.route('/api/cosecha')
+    def cosecha():
+        return jsonify([{"nombre_finca": f"F{i}", "toneladas": i} for i in range(100)])
+
+    @app.route('/api/pequeno')
+    def pequeno():
+        return jsonify({"ok": True})
+
+    @app.route('/api/variedades')
+    @cache.cached()
+    def variedades():
+        calls.append(1)
+        return jsonify([{"nombre_variedad": f"CC {i}"} for i in range(200)])
+
+    client = app.test_client()
+    large = client.get('/api/cosecha', headers={'Accept-Encoding': 'gzip'})
+    assert large.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in large.headers['Vary']
+    assert gzip.decompress(large.get_data())[:2] == b'[{'
+    assert b'\n ' not in gzip.decompress(large.get_data())  # JSON compacto
+    assert 'Content-Encoding' not in client.get('/api/pequeno', headers={'Accept-Encoding': 'gzip'}).headers
+
+    plain = client.get('/api/variedades')
+    zipped = client.get('/api/variedades', headers={'Accept-Encoding': 'gzip'})
+    again = client.get('/api/variedades', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers and zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert again.get_data() == zipped.get_data() and len(calls) == 1
+    assert zipped.headers['ETag'] != plain.headers['ETag']
+    revalidated = client.get('/api/variedades', headers={'Accept-Encoding': 'gzip',
+                                                         'If-None-Match': zipped.headers['ETag']})
+    assert revalidated.status_code == 304
@@ -0,0 +1,64 @@
+"""
+Pruebas de la memoización de intenciones del chatbot
+"""
+
+import pytest
+
+from chatbot.entity_index import EntityIndex
+from chatbot.intent_cache import IntentCache, fingerprint
+from chatbot.query_parser import QueryParser
+from chatbot.universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+
+
+def test_fingerprint_normaliza_variantes():
+    assert fingerprint("¿Cuáles son las 5 mejores variedades por TCH?") == \
+        fingerprint("  cuáles son las 5 MEJORES variedades,  por tch ")
+    assert fingerprint("¿Producción del año 2025?") == "producción del año 2025"
+    # Los números y las tildes se conservan: el parser los distingue
+    assert fingerprint("más de 1.000 toneladas y 2,50 de brix.") == "más de 1.000 toneladas y 2,50 de brix"
+
+
+@pytest.mark.parametrize("question", [
+    "fincas con más de 1.000 toneladas en 2024",
+    "top 05 fincas por tch en 2,50 de brix",
+    "producción por mes en 2023",
+    "¿Cuál es la producción de 2025?",
+])
+def test_cache_no_cambia_el_resultado(question):
+    parser, analyzer = QueryParser(cache=IntentCache()), UniversalQueryAnalyzer(cache=IntentCache())
+    for _ in range(2):  # fallo y acierto
+        assert parser.parse(question) == QueryParser().parse(question)
+        assert analyzer.analyze_query(question) == UniversalQueryAnalyzer().analyze_query(question)
+    assert parser.parse("fincas con más de 1.000 toneladas en 2024").filters.get('año') == 2024
+
+
+def test_aciertos_fallos_y_desalojos():
+    cache = IntentCache(max_size=2)
+    parser = QueryParser(cache=cache)
+    parser.parse("top 10 fincas por tch")
+    parser.parse("Top 10 fincas por TCH?")
+    parser.parse("promedio de brix por zona")
+    parser.parse("tendencia de producción por mes")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 3, 1, 2)
+
+
+def test_retorna_copias_independientes():
+    cache = IntentCache()
+    analyzer = UniversalQueryAnalyzer(cache=cache)
+    first = analyzer.analyze_query("promedio de tch por finca en 2024")
+    UniversalSQLGenerator().generate_sql(first)  # agrega la dimensión tiempo a la intención
+    second = analyzer.analyze_query("promedio de tch por finca en 2024")
+    assert [d.value for d in second.dimensions] == ["finca"]
+
+
+def test_clave_incluye_generacion_del_indice():
+    index = EntityIndex()
+    index.load({'finca': [(1, 'La Esperanza')]}, generation=1)
+    cache = IntentCache()
+    parser = QueryParser(index, cache=cache)
+    assert parser.parse("producción de la finca san josé").filters == {}
+
+    index.load({'finca': [(1, 'La Esperanza'), (2, 'San José')]}, generation=2)
+    assert parser.parse("producción de la finca san josé").filters == {'finca_id': [2]}
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,117 @@
+"""
+Pruebas del flujo de login (un commit por intento, rol cargado, rehash) y de la caché de permisos
+"""
+
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from auth.hashing import HashingBusyError, PasswordHasher
+from auth.models import Role, User, db
+
+
+def _count_commits(app):
+    commits = []
+    with app.app_context():
+        event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+    return commits
+
+
+def test_login_correcto_en_un_solo_commit(app):
+    commits = _count_commits(app)
+
+    response = app.test_client().post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+
+    assert response.status_code == 200
+    assert response.get_json()['user']['role'] == 'admin'
+    assert len(commits) == 1
+
+
+def test_login_fallido_cuenta_el_intento_en_un_commit(app):
+    commits = _count_commits(app)
+
+    response = app.test_client().post('/auth/login', data={'username': 'admin', 'password': 'otra'})
+
+    assert response.status_code == 401
+    assert len(commits) == 1
+    with app.app_context():
+        assert User.query.filter_by(username='admin').one().login_attempts == 1
+
+
+def test_hash_heredado_se_actualiza_en_el_login(app):
+    with app.app_context():
+        user = User.query.filter_by(username='admin').one()
+        user.password_hash = generate_password_hash('admin123')
+        db.session.commit()
+
+    response = app.test_client().post('/auth/api/login', json={'username': 'admin', 'password': 'admin123'})
+
+    assert response.status_code == 200
+    with app.app_context():
+        assert User.query.filter_by(username='admin').one().password_hash.startswith('$2b$04$')
+
+
+def test_hasher_acotado_y_contrasenas_largas():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+    long_password = 'ñ' * 100
+    stored = hasher.hash(long_password)
+
+    assert hasher.verify(long_password, stored)
+    assert not hasher.verify('ñ' * 99, stored)
+    assert hasher.needs_rehash(stored) is False
+    assert PasswordHasher(rounds=5).needs_rehash(stored)
+
+    busy = PasswordHasher(rounds=4, max_pending=1)
+    busy._slots.acquire()
+    with pytest.raises(HashingBusyError):
+        busy.verify('x', stored)
+    hasher.shutdown()
+
+
+def test_peticiones_autenticadas_usan_la_cache_de_permisos(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+    assert client.get('/auth/me').status_code == 200
+    assert client.get('/auth/me').status_code == 200
+
+    assert sum('FROM users' in statement for statement in statements) == 1
+    with app.app_context():
+        cached = app.extensions['permission_cache'].get_user(1)
+        assert cached.has_permission('system.admin') and cached.role.name == 'admin'
+
+
+def test_usuario_desactivado_pierde_la_sesion_al_confirmar(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert client.get('/auth/me').status_code == 200
+    # El login solo cambia campos no cacheados (último acceso, intentos): no invalida
+    assert app.extensions['permission_cache'].invalidations == 0
+
+    with app.app_context():
+        user = User.query.filter_by(username='admin').one()
+        user.is_active = False
+        db.session.commit()
+
+    assert client.get('/auth/me').status_code == 401
+
+
+def test_cambio_de_permisos_del_rol_invalida_cache_y_tokens(app):
+    client = app.test_client()
+    access = client.post('/auth/api/token', json={'username': 'admin', 'password': 'admin123'}).get_json()['access_token']
+    headers = {'Authorization': f"Bearer {access}"}
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+    assert client.get('/auth/me').status_code == 200
+    assert client.get('/auth/me', headers=headers).status_code == 200
+
+    with app.app_context():
+        role = Role.query.filter_by(name='admin').one()
+        role.permissions = ['data.read']
+        db.session.commit()
+        assert app.extensions['permission_cache'].get_user(1).permissions == frozenset({'data.read'})
+
+    assert app.test_client().get('/auth/me', headers=headers).status_code == 401
@@ -0,0 +1,67 @@
+"""
+Pruebas de la instrumentación de rendimiento y del endpoint /metrics
+"""
+
+import json
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard import metrics
+from dashboard.metrics import MetricsRegistry, phase
+
+
+@pytest.fixture
+def app(tmp_path, make_app):
+    uri = f"sqlite:///{tmp_path / 'datamart.db'}"
+    with create_engine(uri).begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("INSERT INTO dimfinca VALUES (1, 'F1', 'La Esperanza'), (2, 'F2', 'El Porvenir')"))
+    return make_app(('api',), uri)
+
+
+def test_metrics_expone_peticiones_idas_y_filas(app):
+    client = app.test_client()
+    before = metrics.DB_ROUND_TRIPS.count()
+
+    response = client.get('/api/fincas')
+    assert response.status_code == 200
+    assert 'db;dur=' in response.headers['Server-Timing']
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE sugarbi_request_duration_seconds histogram' in body
+    assert 'sugarbi_request_duration_seconds_count{method="GET",endpoint="api.get_fincas",status="200"}' in body
+    assert 'sugarbi_db_rows_per_request_bucket{le="10"}' in body
+    assert metrics.DB_ROUND_TRIPS.count() > before
+
+
+def test_peticion_lenta_registra_sql_sin_secretos(app, caplog, monkeypatch):
+    request_metrics = metrics.RequestMetrics()
+    request_metrics.add_query("SELECT * FROM usuarios WHERE password_hash = :password_hash",
+                              {"password_hash": "x", "username": "ana"}, 0.002)
+    token = metrics._current.set(request_metrics)
+
+    with caplog.at_level(logging.WARNING, logger='sugarbi.performance'):
+        metrics.finish_request(token, 'POST', 'auth.login', 200, '/auth/login', slow_ms=0)
+
+    record = json.loads(caplog.records[-1].getMessage().split(' ', 2)[2])
+    assert record['db_round_trips'] == 1
+    assert record['statements'][0]['params'] == {"password_hash": "***", "username": "'ana'"}
+
+
+def test_histograma_acumula_y_fase_fuera_de_peticion():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('prueba_seconds', 'Prueba', buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert 'prueba_seconds_bucket{le="0.1"} 1.0' in lines
+    assert 'prueba_seconds_bucket{le="+Inf"} 2.0' in lines
+    assert 'prueba_seconds_count 2.0' in lines
+
+    before = metrics.PHASE_SECONDS.count(phase='prueba')
+    with phase('prueba'):
+        pass
+    assert metrics.PHASE_SECONDS.count(phase='prueba') == before + 1
@@ -0,0 +1,90 @@
+"""
+Pruebas de mediana, varianza y cuantiles OLAP (funciones de ventana en SQL y núcleo NumPy)
+"""
+
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+import dashboard.olap_engine as olap_engine
+from dashboard.aggregation import aggregate, group_codes
+from dashboard.olap_engine import (AggregationFunction, DimensionLevel, OLAEEngine, OLAPOperation,
+                                   OLAPQuery)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'olap.db'}")
+    rng = random.Random(11)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (codigo_variedad INTEGER, toneladas_cana_molida REAL, tch REAL)"))
+        for variedad_id, name in [(1, 'CC 85-92'), (2, 'CC 01-1940'), (3, 'RB 73-2223')]:
+            conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"), {"i": variedad_id, "n": name})
+        for _ in range(150):
+            conn.execute(text("INSERT INTO hechos_cosecha VALUES (:v, :ton, :tch)"),
+                         {"v": rng.randint(1, 3), "ton": round(rng.uniform(10, 100), 2),
+                          "tch": rng.choice([None, round(rng.uniform(60, 140), 1)])})
+    return engine
+
+
+def _query():
+    return OLAPQuery(
+        operation=OLAPOperation.AGGREGATE,
+        measures=['toneladas', 'tch'],
+        dimensions=['producto'],
+        dimension_levels={'producto': DimensionLevel.VARIETY},
+        filters={},
+        aggregation_functions=[AggregationFunction.SUM, AggregationFunction.COUNT, AggregationFunction.MEDIAN,
+                               AggregationFunction.VARIANCE, AggregationFunction.STD, AggregationFunction.MIN],
+        sort_by='toneladas_sum',
+        quantiles=[0.1, 0.975]
+    )
+
+
+def test_nucleo_coincide_con_numpy():
+    rng = np.random.default_rng(3)
+    groups = rng.choice(np.array(['a', 'b', 'c'], dtype=object), 500)
+    values = rng.normal(100, 15, 500)
+    values[rng.random(500) < 0.1] = np.nan
+    codes, labels = group_codes([groups])
+    result = aggregate(codes, len(labels[0]), values, ['median', 'variance', 'std', 'min', 'max'], [0.25, 0.9])
+
+    for index, label in enumerate(labels[0]):
+        x = values[(groups == label) & ~np.isnan(values)]
+        assert result['median'][index] == pytest.approx(np.median(x))
+        assert result['variance'][index] == pytest.approx(np.var(x))
+        assert result['std'][index] == pytest.approx(np.std(x))
+        assert result['p25'][index] == pytest.approx(np.quantile(x, 0.25))
+        assert result['p90'][index] == pytest.approx(np.quantile(x, 0.9))
+        assert (result['min'][index], result['max'][index]) == (x.min(), x.max())
+
+
+def test_sql_con_ventanas_y_memoria_coinciden(engine, monkeypatch):
+    olap = OLAEEngine(engine=engine)
+    assert olap.supports_window_functions()
+    sql_result = olap.execute_olap_query(_query())
+    monkeypatch.setattr(olap_engine, 'OLAP_AGGREGATION_MODE', 'memory')
+    memory_result = olap.execute_olap_query(_query())
+
+    assert sql_result.success and memory_result.success
+    assert 'OVER' in sql_result.sql_query and 'OVER' not in memory_result.sql_query
+    assert len(sql_result.data) == len(memory_result.data) == 3
+    for sql_row, memory_row in zip(sql_result.data, memory_result.data):
+        assert set(sql_row) == set(memory_row)
+        assert sql_row['producto_variety'] == memory_row['producto_variety']
+        for key in ('toneladas_median', 'tch_variance', 'tch_std', 'tch_p10', 'tch_p97_5', 'tch_count', 'tch_min'):
+            assert sql_row[key] == pytest.approx(memory_row[key])
+
+
+def test_memoria_sin_dimensiones_agrupa_todo(engine, monkeypatch):
+    monkeypatch.setattr(olap_engine, 'OLAP_AGGREGATION_MODE', 'memory')
+    query = _query()
+    query.dimensions, query.sort_by = [], None
+    result = OLAEEngine(engine=engine).execute_olap_query(query)
+
+    assert result.success and len(result.data) == 1
+    with engine.connect() as conn:
+        assert result.data[0]['tch_count'] == conn.execute(text("SELECT COUNT(tch) FROM hechos_cosecha")).scalar()
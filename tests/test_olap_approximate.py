@@ -0,0 +1,145 @@
+"""
+Pruebas de las consultas OLAP aproximadas (muestra estratificada e intervalos de confianza)
+"""
+
+import random
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard import metrics
+from dashboard.olap_engine import (AggregationFunction, DimensionLevel, OLAEEngine, OLAPOperation,
+                                   OLAPQuery, OLAPResult)
+from dashboard.sampling import build_sample
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # Mismo esquema que escribe el ETL (etls/cargar_datos.py): la zona está en la tabla de hechos
+    engine = create_engine(f"sqlite:///{tmp_path / 'olap.db'}")
+    rng = random.Random(5)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimzona (codigo_zona INTEGER, nombre_zona INTEGER)"))
+        conn.execute(text("CREATE TABLE dimtiempo (tiempo_id INTEGER, fecha TEXT, año INTEGER, mes INTEGER, "
+                          "nombre_mes TEXT, trimestre INTEGER)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (codigo_tiempo INTEGER, codigo_zona INTEGER, codigo_variedad INTEGER, "
+                          "id_finca INTEGER, toneladas_cana_molida REAL, tch REAL, area_cosechada REAL, brix REAL, "
+                          "sacarosa REAL, rendimiento_teorico REAL)"))
+        for finca_id, name in [(1, 'La Esperanza'), (2, 'El Paraíso'), (3, 'San José')]:
+            conn.execute(text("INSERT INTO dimfinca VALUES (:i, :c, :n)"), {"i": finca_id, "c": str(finca_id), "n": name})
+        for variedad_id, name in [(1, 'CC 85-92'), (2, 'CC 01-1940')]:
+            conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"), {"i": variedad_id, "n": name})
+        for zone in (10, 20):
+            conn.execute(text("INSERT INTO dimzona VALUES (:z, :z)"), {"z": zone})
+        for tiempo_id, year in enumerate((2023, 2024, 2025), start=1):
+            conn.execute(text("INSERT INTO dimtiempo VALUES (:i, '', :y, 1, 'enero', 1)"), {"i": tiempo_id, "y": year})
+        conn.execute(text("INSERT INTO hechos_cosecha VALUES (:t, :z, :v, :f, :ton, :tch, NULL, NULL, NULL, NULL)"), [
+            {"t": rng.randint(1, 3), "z": rng.choice((10, 20)), "v": rng.randint(1, 2), "f": rng.randint(1, 3),
+             "ton": round(rng.uniform(10, 100), 2), "tch": rng.choice([None, round(rng.uniform(60, 140), 1)])}
+            for _ in range(3000)])
+    return engine
+
+
+def _query(**overrides):
+    query = dict(
+        operation=OLAPOperation.AGGREGATE,
+        measures=['toneladas', 'tch'],
+        dimensions=['tiempo', 'producto'],
+        dimension_levels={'tiempo': DimensionLevel.YEAR, 'producto': DimensionLevel.VARIETY},
+        filters={'finca': ['La Esperanza', 'El Paraíso']},
+        aggregation_functions=[AggregationFunction.SUM, AggregationFunction.AVG, AggregationFunction.COUNT],
+        sort_by='toneladas_sum',
+        approximate=True
+    )
+    query.update(overrides)
+    return OLAPQuery(**query)
+
+
+def _by_group(result):
+    return {(row['tiempo_year'], row['producto_variety']): row for row in result.data}
+
+
+def test_muestra_completa_coincide_con_exacto(engine):
+    with engine.begin() as conn:
+        stats = build_sample(conn, budget=10 ** 6, seed=1)
+    # Estratos: 2 zonas (codigo_zona) × 3 años
+    assert stats["sample_rows"] == stats["fact_rows"] == 3000 and stats["strata"] == 6
+
+    olap = OLAEEngine(engine=engine)
+    approximate = olap.execute_olap_query(_query())
+    exact = olap.execute_olap_query(_query(approximate=False))
+    olap.shutdown()
+
+    assert approximate.metadata["approximate"]["exact"] is False
+    exact_rows = _by_group(exact)
+    for (group, row), intervals in zip(_by_group(approximate).items(), approximate.metadata["approximate"]["intervals"]):
+        for key in ('toneladas_sum', 'tch_avg', 'tch_count'):
+            assert row[key] == pytest.approx(exact_rows[group][key])
+            # Estratos censados: sin incertidumbre
+            assert intervals[key][1] - intervals[key][0] == pytest.approx(0, abs=1e-6)
+
+
+def test_muestra_parcial_con_intervalos_y_refinamiento(engine):
+    with engine.begin() as conn:
+        stats = build_sample(conn, budget=600, minimum=30, seed=3)
+    assert stats["sample_rows"] < stats["fact_rows"]
+
+    olap = OLAEEngine(engine=engine)
+    approximate = olap.execute_olap_query(_query())
+    info = approximate.metadata["approximate"]
+    assert approximate.success and info["exact"] is False and info["refinement"] == "pending"
+    assert info["sample_rows"] == stats["sample_rows"]
+
+    exact = olap.execute_olap_query(_query(approximate=False))
+    exact_rows = _by_group(exact)
+    covered = total = 0
+    for (group, row), intervals in zip(_by_group(approximate).items(), info["intervals"]):
+        for key in ('toneladas_sum', 'tch_avg', 'tch_count'):
+            low, high = intervals[key]
+            assert low < row[key] < high
+            covered += low <= exact_rows[group][key] <= high
+            total += 1
+    assert covered / total >= 0.8
+
+    # El resultado exacto calculado en segundo plano responde la misma consulta después
+    deadline = time.time() + 5
+    while olap._pending and time.time() < deadline:
+        time.sleep(0.01)
+    refined = olap.execute_olap_query(_query())
+    olap.shutdown()
+    assert refined.metadata["approximate"] == {"exact": True, "refinement": "ready"}
+    assert refined.data == exact.data
+
+
+def test_sin_muestra_o_no_aproximable_ejecuta_exacto(engine):
+    olap = OLAEEngine(engine=engine)
+    result = olap.execute_olap_query(_query())
+    assert result.success and result.metadata["approximate"]["exact"] is True
+    assert "no existe" in result.metadata["approximate"]["reason"]
+
+    with engine.begin() as conn:
+        build_sample(conn, budget=600, seed=3)
+    olap = OLAEEngine(engine=engine)
+    median = olap.execute_olap_query(_query(aggregation_functions=[AggregationFunction.MEDIAN], sort_by=None))
+    assert median.success and median.metadata["approximate"]["exact"] is True
+    assert "sum, avg y count" in median.metadata["approximate"]["reason"]
+
+    # dimfinca del ETL no tiene zona: esa consulta se responde exacta con el motivo
+    by_zone = olap.execute_olap_query(_query(dimensions=['geografia'], filters={},
+                                             dimension_levels={'geografia': DimensionLevel.ZONE}))
+    assert by_zone.metadata["approximate"]["reason"] == "la muestra no tiene f.zona"
+
+
+def test_refinamiento_fallido_se_cuenta_en_metricas(engine, monkeypatch):
+    olap = OLAEEngine(engine=engine)
+    monkeypatch.setattr(olap, 'execute_olap_query', lambda query: OLAPResult(
+        success=False, data=[], record_count=0, execution_time=0.0, operation='aggregate', sql_query='',
+        metadata={}, error="tabla bloqueada"))
+    before = metrics.ERRORS.value(component='olap_refinement')
+    olap._pending.add('clave')
+    olap._refine('clave', 0, _query(approximate=False))
+    assert metrics.ERRORS.value(component='olap_refinement') == before + 1
+    assert not olap._pending and not olap._refinements
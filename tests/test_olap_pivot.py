@@ -0,0 +1,108 @@
+"""
+Pruebas del pivot OLAP (agregación condicional en SQL y suma dispersa en NumPy)
+"""
+
+import random
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard.olap_engine import (AggregationFunction, DimensionLevel, OLAEEngine, OLAPOperation,
+                                   OLAPQuery)
+
+FINCAS = [(1, 'La Esperanza', 'Norte'), (2, 'El Paraíso', 'Norte'), (3, "San José", 'Sur')]
+VARIEDADES = [(1, 'CC 85-92'), (2, 'CC 01-1940'), (3, 'RB 73-2223')]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'olap.db'}")
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, nombre_finca TEXT, zona TEXT, nombre_zona TEXT)"))
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimtiempo (tiempo_id INTEGER, año INTEGER, trimestre INTEGER, mes INTEGER, fecha TEXT)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (id_finca INTEGER, codigo_variedad INTEGER, codigo_tiempo INTEGER, "
+                          "toneladas_cana_molida REAL, tch REAL)"))
+        for finca_id, name, zone in FINCAS:
+            conn.execute(text("INSERT INTO dimfinca VALUES (:i, :n, :z, :z)"), {"i": finca_id, "n": name, "z": zone})
+        for variedad_id, name in VARIEDADES:
+            conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"), {"i": variedad_id, "n": name})
+        for tiempo_id, year in enumerate((2023, 2024, 2025), start=1):
+            conn.execute(text("INSERT INTO dimtiempo VALUES (:i, :y, 1, 1, '')"), {"i": tiempo_id, "y": year})
+        for _ in range(200):
+            # La variedad 3 nunca aparece en 2023 ni en la finca 3: columnas y celdas vacías
+            finca, variedad, tiempo = rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3)
+            if variedad == 3 and finca == 3:
+                continue
+            conn.execute(text("INSERT INTO hechos_cosecha VALUES (:f, :v, :t, :ton, :tch)"),
+                         {"f": finca, "v": variedad, "t": tiempo, "ton": round(rng.uniform(10, 100), 2),
+                          "tch": rng.choice([None, round(rng.uniform(60, 140), 1)])})
+    return engine
+
+
+def _query(aggregation):
+    return OLAPQuery(
+        operation=OLAPOperation.PIVOT,
+        measures=['tch'],
+        dimensions=['geografia', 'producto'],
+        dimension_levels={'geografia': DimensionLevel.FARM, 'producto': DimensionLevel.VARIETY},
+        filters={},
+        aggregation_functions=[aggregation],
+        pivot_dimension='producto'
+    )
+
+
+@pytest.mark.parametrize("aggregation", [AggregationFunction.SUM, AggregationFunction.AVG,
+                                         AggregationFunction.COUNT, AggregationFunction.MAX])
+def test_pivot_sql_y_numpy_coinciden(engine, aggregation):
+    olap = OLAEEngine(engine=engine)
+    numpy_pivot = olap.execute_pivot(_query(aggregation))
+    olap.dimension_members('producto', DimensionLevel.VARIETY)
+    sql_pivot = olap.execute_pivot(_query(aggregation))
+
+    assert numpy_pivot["method"] == "numpy" and sql_pivot["method"] == "sql"
+    assert sql_pivot["rows"] == numpy_pivot["rows"] and sql_pivot["columns"] == numpy_pivot["columns"]
+    for key in ("data", "row_totals", "column_totals", "grand_total"):
+        np.testing.assert_allclose(np.array(sql_pivot[key], dtype=float), np.array(numpy_pivot[key], dtype=float))
+
+
+def test_pivot_totales_iguales_a_la_agregacion_directa(engine):
+    pivot = OLAEEngine(engine=engine).execute_pivot(_query(AggregationFunction.AVG))
+
+    with engine.connect() as conn:
+        expected_total = conn.execute(text("SELECT AVG(tch) FROM hechos_cosecha")).scalar()
+        by_farm = dict(conn.execute(text(
+            "SELECT f.nombre_finca, AVG(h.tch) FROM hechos_cosecha h JOIN dimfinca f ON h.id_finca = f.finca_id "
+            "GROUP BY f.nombre_finca")).all())
+
+    assert pivot["grand_total"] == pytest.approx(expected_total)
+    assert dict(zip(pivot["rows"], pivot["row_totals"])) == pytest.approx(by_farm)
+    # San José no tiene la variedad RB 73-2223: celda vacía en un promedio
+    assert pivot["data"][pivot["rows"].index("San José")][pivot["columns"].index('RB 73-2223')] is None
+
+
+def test_create_pivot_table_desde_registros():
+    records = [
+        {"zona": "Norte", "año": 2024, "toneladas": 10},
+        {"zona": "Norte", "año": 2024, "toneladas": 5},
+        {"zona": "Sur", "año": 2025, "toneladas": 7},
+    ]
+
+    pivot = OLAEEngine(engine=create_engine("sqlite://")).create_pivot_table(records, "zona", "año", "toneladas")
+
+    assert pivot["rows"] == ["Norte", "Sur"] and pivot["columns"] == [2024, 2025]
+    assert pivot["data"] == [[15.0, 0.0], [0.0, 7.0]]
+    assert pivot["row_totals"] == [15.0, 7.0] and pivot["column_totals"] == [15.0, 7.0]
+    assert pivot["grand_total"] == 22.0
+
+
+def test_pivot_truncado_reporta_filas_totales(engine):
+    query = _query(AggregationFunction.SUM)
+    query.limit = 2
+    result = OLAEEngine(engine=engine).execute_olap_query(query)
+    pivot = result.metadata["pivot"]
+
+    assert pivot["truncated"] and len(pivot["rows"]) == 2
+    assert pivot["total_rows"] == result.record_count == 3
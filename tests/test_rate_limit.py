@@ -0,0 +1,51 @@
+"""
+Pruebas del limitador de peticiones con contadores compartidos
+"""
+
+from limits import parse_many
+
+from auth.rate_limit import MemoryBackend, RateLimiter
+
+
+class CountingBackend(MemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def incr(self, key, amount, expiry):
+        self.calls += 1
+        return super().incr(key, amount, expiry)
+
+
+def test_varios_workers_comparten_el_limite():
+    backend = MemoryBackend()
+    limits = parse_many('100 per minute')
+    workers = [RateLimiter(backend) for _ in range(4)]
+
+    admitted = sum(workers[i % 4].hit('api', '10.0.0.1', limits) is None for i in range(400))
+
+    # Los permisos que un worker no gastó se pierden, pero nunca se supera el límite
+    assert 90 <= admitted <= 100
+
+
+def test_los_lotes_evitan_ir_al_backend_en_cada_peticion():
+    backend = CountingBackend()
+    limiter = RateLimiter(backend, lease=20, lease_share=8)
+    limits = parse_many('1000 per hour')
+
+    for _ in range(200):
+        assert limiter.hit('default', '10.0.0.1', limits) is None
+
+    assert backend.calls < 20
+
+
+def test_limite_de_login_responde_429(make_app):
+    app = make_app(('auth',), RATE_LIMIT_LOGIN='2 per minute')
+    client = app.test_client()
+
+    statuses = [client.post('/auth/login', data={'username': 'nadie', 'password': 'x'}).status_code
+                for _ in range(3)]
+
+    assert 429 not in statuses[:2] and statuses[2] == 429
+    assert client.get('/health/live').status_code == 200
+    assert client.get('/auth/me').status_code != 429
@@ -0,0 +1,78 @@
+"""
+Pruebas de la retención de auditoría y tokens y de la paginación por llave
+"""
+
+from datetime import date, datetime, timedelta
+
+from auth.models import AuditLog, SessionToken, User, db
+from auth.retention import RetentionJob, audit_log_page, monthly_partitions
+from server.services import get_services
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def test_purga_en_lotes_auditoria_vieja_y_tokens_vencidos(app):
+    with app.app_context():
+        admin_id = User.query.filter_by(username='admin').first().id
+        db.session.add_all([AuditLog(user_id=admin_id, action='OLD', timestamp=NOW - timedelta(days=400 + i))
+                            for i in range(25)])
+        db.session.add_all([AuditLog(user_id=admin_id, action='NEW', timestamp=NOW - timedelta(days=i))
+                            for i in range(5)])
+        db.session.add_all([SessionToken(token=f"t{i}", user_id=admin_id, expires_at=NOW - timedelta(days=2 + i))
+                            for i in range(7)])
+        db.session.add(SessionToken(token='vigente', user_id=admin_id, expires_at=NOW + timedelta(days=1)))
+        db.session.commit()
+
+        job = RetentionJob(get_services(app).get_engine, audit_days=365, batch_size=10)
+        summary = job.run_once(NOW)
+
+        assert summary["audit_rows"] == 25 and summary["tokens"] == 7
+        assert {log.action for log in AuditLog.query.all()} == {'NEW'}
+        assert [token.token for token in SessionToken.query.all()] == ['vigente']
+
+
+def test_paginacion_por_llave_recorre_todo_sin_repetir(app):
+    with app.app_context():
+        # Marcas de tiempo repetidas: el id desempata
+        db.session.add_all([AuditLog(action=f"A{i}", timestamp=NOW - timedelta(minutes=i // 3)) for i in range(23)])
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = audit_log_page(cursor, per_page=5)
+            seen.extend(rows)
+            if cursor is None:
+                break
+
+        assert len(seen) == len({row.id for row in seen}) == 23
+        assert [(r.timestamp, r.id) for r in seen] == sorted(((r.timestamp, r.id) for r in seen), reverse=True)
+
+
+def test_visor_de_auditoria_en_la_api(app):
+    with app.app_context():
+        db.session.add_all([AuditLog(action=f"A{i}", timestamp=NOW - timedelta(minutes=i)) for i in range(7)])
+        db.session.commit()
+    client = app.test_client()
+    assert client.get('/auth/api/audit-logs').status_code == 401
+    client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+
+    actions, cursor = [], None
+    while True:
+        body = client.get('/auth/api/audit-logs', query_string={'per_page': 3, 'cursor': cursor or ''}).get_json()
+        actions.extend(row['action'] for row in body['data'] if row['action'].startswith('A'))
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+
+    assert actions == [f"A{i}" for i in range(7)]
+    assert client.get('/auth/api/audit-logs', query_string={'cursor': 'x|y'}).status_code == 400
+
+
+def test_particiones_mensuales():
+    clauses = monthly_partitions(date(2025, 11, 20), date(2026, 1, 1))
+
+    assert clauses == [
+        "PARTITION p202511 VALUES LESS THAN (TO_DAYS('2025-12-01'))",
+        "PARTITION p202512 VALUES LESS THAN (TO_DAYS('2026-01-01'))",
+        "PARTITION p202601 VALUES LESS THAN (TO_DAYS('2026-02-01'))",
+    ]
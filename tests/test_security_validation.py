@@ -0,0 +1,65 @@
+"""
+Pruebas de la validación de entradas de SecurityManager
+"""
+
+import re
+
+import bleach
+import pytest
+from flask import Flask
+
+from auth.security import HTML_ALLOWED_TAGS, SQL_PATTERNS, XSS_PATTERNS, SecurityManager
+
+INPUTS = [
+    "¿cuáles son las 5 mejores variedades por TCH?",
+    "muestra la producción por zona en 2024",
+    "top 5 fincas por rendimiento (toneladas/ha)",
+    "condición = buena",
+    "select de fincas",
+    "fincas' OR 'a'='a'",
+    "zona 1 OR 1=1",
+    "producción -- comentario",
+    "<script>alert(1)</script>",
+    "javascript:alert(1)",
+    "<iframe src=x>",
+]
+
+
+@pytest.fixture
+def manager():
+    app = Flask(__name__)
+    with app.test_request_context():
+        yield SecurityManager()
+
+
+def _legacy_verdict(data):
+    for pattern in SQL_PATTERNS:
+        if re.search(pattern, data, re.IGNORECASE):
+            return "Input contiene patrones sospechosos"
+    for pattern in XSS_PATTERNS:
+        if re.search(pattern, data, re.IGNORECASE):
+            return "Input contiene patrones XSS"
+    return None
+
+
+@pytest.mark.parametrize("data", INPUTS)
+def test_mismo_veredicto_que_los_patrones_sueltos(manager, data):
+    try:
+        manager.validate_input(data)
+        verdict = None
+    except ValueError as e:
+        verdict = str(e)
+    assert verdict == _legacy_verdict(data)
+
+
+def test_html_sin_caracteres_especiales_no_cambia(manager):
+    for data in ["texto <b>negrita</b> &amp; más", "texto llano con 5 > 3", "solo texto"]:
+        expected = bleach.clean(data, tags=HTML_ALLOWED_TAGS, strip=True).strip()
+        assert manager.validate_input(data, 'html') == expected
+
+
+def test_validate_json_indica_el_campo(manager):
+    body = {"message": "producción por zona", "options": {"filters": ["norte", "<script>x</script>"]}}
+    with pytest.raises(ValueError, match=r"\$\.options\.filters\[1\]"):
+        manager.validate_json(body)
+    assert manager.validate_json({"message": "producción", "limit": 10}) == {"message": "producción", "limit": 10}
@@ -0,0 +1,102 @@
+"""
+Pruebas del perfil de producción: calentamiento, sondas de salud y gunicorn
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from server.services import get_services
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'datamart.db'}"
+    with create_engine(uri).begin() as conn:
+        conn.execute(text("CREATE TABLE dimfinca (finca_id INTEGER, codigo_finca TEXT, nombre_finca TEXT)"))
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE dimzona (codigo_zona TEXT, nombre_zona TEXT)"))
+        conn.execute(text("INSERT INTO dimfinca VALUES (1, 'F1', 'La Esperanza')"))
+    return uri
+
+
+def test_ready_calienta_caches_y_pool(database_uri, make_app):
+    app = make_app(('api',), database_uri)
+    client = app.test_client()
+
+    assert client.get('/health/live').status_code == 200
+    response = client.get('/health/ready')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'ready'
+    assert set(body['warm_up']['steps']) == {'database', 'entity_index', 'charts'}
+    assert body['entity_index']['entries'] == 1
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_ready_503_sin_base_de_datos(tmp_path, make_app):
+    missing = tmp_path / 'no-existe' / 'datamart.db'
+    app = make_app(('api',), f"sqlite:///{missing}")
+
+    response = app.test_client().get('/health/ready')
+
+    assert response.status_code == 503
+    assert response.get_json()['warm_up']['steps']['database']['ok'] is False
+
+
+def test_after_fork_descarta_conexiones_y_pool_de_paneles(database_uri, make_app):
+    app = make_app(('api',), database_uri)
+    services = get_services(app)
+    services.warm_up()
+    runner = services.dashboard_runner
+
+    services.after_fork()
+
+    assert services.dashboard_runner is not runner
+    services.ping()
+    services.shutdown()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_gunicorn_sirve_con_la_configuracion_del_proyecto(database_uri):
+    pytest.importorskip('gunicorn')
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_uri, GUNICORN_BIND=f"127.0.0.1:{port}",
+               GUNICORN_WORKERS='2', GUNICORN_THREADS='2', SUGARBI_BLUEPRINTS='api')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        body = None
+        deadline = time.monotonic() + 20
+        while body is None and time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=2) as response:
+                    body = json.loads(response.read())
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+
+        assert body is not None and body['status'] == 'ready'
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/fincas", timeout=2) as response:
+            assert json.loads(response.read())['total'] == 1
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
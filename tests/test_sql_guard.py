@@ -0,0 +1,123 @@
+"""
+Pruebas de la guardia de ejecución de SQL generado
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from chatbot.sql_guard import GuardConfig, QueryGuardError, SQLGuard
+
+
+@pytest.fixture
+def guard():
+    return SQLGuard(GuardConfig(max_rows=5, max_execution_ms=1500, max_result_bytes=10_000))
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE hechos_cosecha (id INTEGER, nombre TEXT, toneladas REAL)"))
+        for i in range(50):
+            conn.execute(text("INSERT INTO hechos_cosecha VALUES (:i, :n, :t)"),
+                         {"i": i, "n": f"Finca {i}", "t": i * 10.5})
+    return engine
+
+
+def test_inyecta_limit_y_hint_mysql(guard):
+    sql = guard.prepare("SELECT * FROM hechos_cosecha;")
+    assert sql.startswith("SELECT /*+ MAX_EXECUTION_TIME(1500) */")
+    assert sql.rstrip().endswith("LIMIT 6")
+
+
+def test_reduce_limit_excesivo_y_respeta_menor(guard):
+    assert guard.prepare("SELECT id FROM t LIMIT 500", 'sqlite').endswith("LIMIT 6")
+    assert guard.prepare("SELECT id FROM t LIMIT 3", 'sqlite').endswith("LIMIT 3")
+    assert guard.prepare("SELECT id FROM t LIMIT 10, 900", 'sqlite').endswith("LIMIT 6 OFFSET 10")
+
+
+def test_hint_en_bloque_principal_de_cte(guard):
+    sql = guard.prepare("WITH base AS (SELECT id FROM t) SELECT id FROM base")
+    assert "(SELECT id FROM t)" in sql
+    assert "SELECT /*+ MAX_EXECUTION_TIME(1500) */ id FROM base" in sql
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM hechos_cosecha",
+    "SELECT 1; DROP TABLE users",
+    "SELECT * FROM t INTO OUTFILE '/tmp/x'",
+    "SELECT * FROM t FOR UPDATE",
+    "UPDATE users SET is_admin = 1",
+    "WITH x AS (SELECT 1) REPLACE INTO t SELECT * FROM x",
+    "",
+])
+def test_rechaza_sentencias_no_lectura(guard, sql):
+    with pytest.raises(QueryGuardError):
+        guard.prepare(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT REPLACE(nombre_finca, 'a', 'b') FROM dimfinca",
+    "SELECT CONVERT(nombre_finca USING utf8mb4) FROM dimfinca",
+    "SELECT CAST(nombre_finca AS CHAR CHARACTER SET utf8mb4) FROM dimfinca",
+])
+def test_funciones_de_texto_en_lecturas_se_permiten(guard, sql):
+    assert guard.prepare(sql).endswith("LIMIT 6")
+
+
+def test_literales_y_comentarios_no_confunden_validacion(guard):
+    sql = guard.prepare("SELECT nombre FROM dimfinca WHERE nombre = 'DROP; --x' -- comentario")
+    assert "'DROP; --x'" in sql
+    assert "comentario" not in sql
+
+
+def test_trunca_por_filas(guard, engine):
+    result = guard.execute(engine, "SELECT * FROM hechos_cosecha ORDER BY id")
+    assert result.row_count == 5
+    assert result.truncated and result.truncated_reason == 'max_rows'
+    assert result.rows[0] == {"id": 0, "nombre": "Finca 0", "toneladas": 0.0}
+
+
+def test_trunca_por_presupuesto_de_bytes(engine):
+    guard = SQLGuard(GuardConfig(max_rows=100, max_result_bytes=120, fetch_size=7))
+    result = guard.execute(engine, "SELECT * FROM hechos_cosecha")
+    assert 0 < result.row_count < 50
+    assert result.truncated_reason == 'max_result_bytes'
+    assert result.result_bytes <= 120
+
+
+def test_ejecucion_asincrona_transmite_por_particiones(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from chatbot.async_pipeline import to_async_url
+
+    assert to_async_url("mysql+pymysql://u:p@h:3306/sugarbi") == "mysql+aiomysql://u:p@h:3306/sugarbi"
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'sugarbi.db'}")
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE hechos_cosecha (id INTEGER, toneladas REAL)"))
+            for i in range(20):
+                await conn.execute(text("INSERT INTO hechos_cosecha VALUES (:i, :t)"), {"i": i, "t": i * 2.0})
+        guard = SQLGuard(GuardConfig(max_rows=8, fetch_size=3))
+        try:
+            return await guard.execute_async(engine, "SELECT * FROM hechos_cosecha ORDER BY id")
+        finally:
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    assert result.row_count == 8
+    assert result.truncated_reason == 'max_rows'
+    assert result.rows[-1] == {"id": 7, "toneladas": 14.0}
+
+
+def test_stream_entrega_lotes_incrementales(engine):
+    guard = SQLGuard(GuardConfig(max_rows=10, fetch_size=4))
+    batches = [len(new_rows) for _, new_rows in guard.stream(engine, "SELECT id FROM hechos_cosecha")]
+    assert batches == [4, 4, 2]
+
+    vacio = list(guard.stream(engine, "SELECT id FROM hechos_cosecha WHERE id < 0"))
+    assert len(vacio) == 1 and vacio[0][1] == [] and vacio[0][0].columns == ["id"]
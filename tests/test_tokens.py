@@ -0,0 +1,72 @@
+"""
+Pruebas de los tokens de acceso sin estado: verificación sin base de datos, refresco y revocación
+"""
+
+import time
+
+import pytest
+from sqlalchemy import event
+
+from auth.models import SessionToken, db
+from auth.tokens import TokenError, TokenService
+
+
+def _tokens(client):
+    response = client.post('/auth/api/token', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_token_de_acceso_autentica_sin_consultar_la_base(app):
+    client = app.test_client()
+    tokens = _tokens(client)
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+    response = client.get('/auth/me', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+
+    assert response.status_code == 200
+    assert response.get_json()['user']['role'] == 'admin'
+    assert statements == []
+    with app.app_context():
+        assert SessionToken.query.count() == 0
+
+
+def test_refresco_rota_y_revocacion(app):
+    client = app.test_client()
+    tokens = _tokens(client)
+
+    renewed = client.post('/auth/api/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert renewed.status_code == 200
+    # El refresco usado queda revocado
+    reused = client.post('/auth/api/token/refresh', json={'refresh_token': tokens['refresh_token']})
+    assert reused.status_code == 401
+
+    access = renewed.get_json()['access_token']
+    headers = {'Authorization': f"Bearer {access}"}
+    assert client.post('/auth/api/verify-token', json={'token': access}).get_json()['valid'] is True
+    assert client.post('/auth/api/token/revoke', headers=headers).status_code == 200
+    assert client.get('/auth/me', headers=headers).status_code == 401
+
+
+def test_verificacion_en_microsegundos_y_revocacion_por_usuario():
+    service = TokenService('clave-de-prueba-' * 4)
+
+    class Usuario:
+        id, username, email, is_admin, role = 7, 'ana', 'ana@sugarbi.com', False, None
+
+    access = service.issue(Usuario())['access_token']
+    start = time.perf_counter()
+    for _ in range(1000):
+        service.user_from_token(access)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+    service.revoke_user(7)
+    with pytest.raises(TokenError):
+        service.user_from_token(access)
+    # Un token emitido justo después de la revocación (mismo segundo) sí vale
+    assert service.user_from_token(service.issue(Usuario())['access_token']).id == 7
+    with pytest.raises(TokenError):
+        TokenService('otra-clave-de-prueba-' * 4).user_from_token(access)
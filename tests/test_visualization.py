@@ -0,0 +1,155 @@
+"""
+Pruebas del motor de visualizaciones
+"""
+
+import numpy as np
+
+from dashboard.downsampling import lttb_indices, minmax_indices
+from dashboard.visualization_engine import ChartConfig, ChartType, VisualizationEngine
+
+
+def _serie(n):
+    values = np.sin(np.linspace(0, 20, n)).round(4).tolist()
+    values[n // 3] = 50.0  # pico aislado
+    return [{"periodo": f"p{i}", "total_toneladas": v} for i, v in enumerate(values)]
+
+
+def test_lttb_conserva_extremos_y_picos():
+    values = [row["total_toneladas"] for row in _serie(10_000)]
+    indices = lttb_indices(values, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9_999
+    assert 10_000 // 3 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_minmax_conserva_minimos_y_maximos_con_faltantes():
+    values = [None if i % 7 == 0 else float(i % 50) for i in range(1_000)]
+    values[500] = -99.0
+    indices = minmax_indices(values, 100)
+    assert len(indices) <= 100
+    assert 500 in indices
+    assert all(values[i] is not None for i in indices)
+
+
+def test_linea_se_reduce_al_presupuesto():
+    engine = VisualizationEngine(max_points=300)
+    config = ChartConfig(ChartType.LINE, "Serie", "periodo", "total_toneladas", _serie(20_000))
+    chart = engine.create_visualization(config)
+    assert len(chart["data"]["labels"]) == len(chart["data"]["datasets"][0]["data"]) == 300
+    assert chart["downsampling"] == {"method": "lttb", "original_points": 20_000, "points": 300}
+    assert 50.0 in chart["data"]["datasets"][0]["data"]
+
+
+def test_serie_pequena_no_se_modifica():
+    engine = VisualizationEngine(max_points=300)
+    chart = engine.create_visualization(ChartConfig(ChartType.AREA, "Serie", "periodo", "total_toneladas", _serie(30)))
+    assert len(chart["data"]["labels"]) == 30
+    assert "downsampling" not in chart
+
+
+def test_barras_y_pastel_agrupan_en_otros():
+    engine = VisualizationEngine(max_bars=5, max_slices=4)
+    data = [{"nombre_finca": f"F{i}", "total_toneladas": float(i)} for i in range(300)]
+    bar = engine.create_visualization(ChartConfig(ChartType.BAR, "Fincas", "nombre_finca", "total_toneladas", data))
+    assert bar["data"]["labels"] == ["F296", "F297", "F298", "F299", "Otros"]
+    assert bar["data"]["datasets"][0]["data"][-1] == sum(range(296))
+    assert len(bar["data"]["datasets"][0]["backgroundColor"]) == 5
+
+    promedios = [{"nombre_zona": f"Z{i}", "promedio_tch": float(i)} for i in range(10)]
+    pie = engine.create_visualization(ChartConfig(ChartType.PIE, "Zonas", "nombre_zona", "promedio_tch", promedios))
+    assert pie["data"]["datasets"][0]["data"] == [7.0, 8.0, 9.0, 3.0]
+    assert pie["grouping"]["grouped_categories"] == 7
+
+    # Las categorías conservadas mantienen el orden de la consulta (p. ej. descendente por año)
+    anios = [{"anio": str(y), "total_toneladas": v} for y, v in zip(range(2030, 2020, -1), [5, 9, 1, 7, 3, 8, 2, 6, 4, 0])]
+    bar = engine.create_visualization(ChartConfig(ChartType.BAR, "Años", "anio", "total_toneladas", anios))
+    assert bar["data"]["labels"] == ["2029", "2027", "2025", "2023", "Otros"]
+
+    # Valores de texto: los numéricos se convierten y los demás no impiden graficar
+    texto = [{"nombre_finca": f"F{i}", "total_toneladas": str(i)} for i in range(8)]
+    bar = engine.create_visualization(ChartConfig(ChartType.BAR, "Fincas", "nombre_finca", "total_toneladas", texto))
+    assert bar["data"]["labels"][:4] == ["F4", "F5", "F6", "F7"] and bar["grouping"]["grouped_categories"] == 4
+    nombres = [{"nombre_finca": f"F{i}", "variedad": f"V{i}"} for i in range(8)]
+    bar = engine.create_visualization(ChartConfig(ChartType.BAR, "Fincas", "nombre_finca", "variedad", nombres))
+    assert len(bar["data"]["labels"]) == 8
+
+
+def test_sql_de_pastel_agrupa_en_otros():
+    from sqlalchemy import create_engine, text
+
+    from chatbot.sql_guard import SQLGuard
+    from chatbot.universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+
+    intent = UniversalQueryAnalyzer().analyze_query("distribucion de produccion por variedad top 3")
+    sql = UniversalSQLGenerator().generate_sql(intent)
+
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE dimvariedad (variedad_id INTEGER, nombre_variedad TEXT)"))
+        conn.execute(text("CREATE TABLE hechos_cosecha (codigo_variedad INTEGER, toneladas_cana_molida REAL)"))
+        for i in range(8):
+            conn.execute(text("INSERT INTO dimvariedad VALUES (:i, :n)"), {"i": i, "n": f"V{i}"})
+            conn.execute(text("INSERT INTO hechos_cosecha VALUES (:i, :t)"), {"i": i, "t": 10.0 * i})
+    rows = SQLGuard().execute(engine, sql).rows
+    assert [r["nombre_variedad"] for r in rows] == ["V7", "V6", "V5", "Otros"]
+    assert rows[-1]["total_toneladas"] == 100.0
+
+
+def test_cache_reutiliza_grafico_serializado():
+    import json
+
+    from dashboard.chart_cache import ChartCache, RawJSON, dumps_with_raw
+
+    engine = VisualizationEngine(cache=ChartCache(max_entries=2))
+    data = [{"nombre_finca": f"F{i}", "total_toneladas": i * 1.5} for i in range(8)]
+    config = ChartConfig(ChartType.BAR, "Fincas", "nombre_finca", "total_toneladas", data)
+
+    first = engine.create_visualization_json(config)
+    again = engine.create_visualization_json(ChartConfig(ChartType.BAR, "Fincas", "nombre_finca", "total_toneladas",
+                                                         [dict(row) for row in data]))
+    assert again is first
+    assert json.loads(first) == engine.create_visualization(config)
+
+    engine.create_visualization_json(ChartConfig(ChartType.PIE, "Fincas", "nombre_finca", "total_toneladas", data))
+    engine.create_visualization_json(ChartConfig(ChartType.LINE, "Fincas", "nombre_finca", "total_toneladas", data))
+    stats = engine.cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 3, 1)
+
+    body = dumps_with_raw({"success": True, "data": {"visualization": RawJSON(first), "nota": "año"}})
+    assert json.loads(body)["data"]["visualization"]["type"] == "bar"
+    assert "año" in body.decode("utf-8")
+
+
+def test_multiserie_un_dataset_por_variedad():
+    from chatbot.universal_query_analyzer import UniversalQueryAnalyzer, UniversalSQLGenerator
+
+    intent = UniversalQueryAnalyzer().analyze_query("tch promedio por variedad por año")
+    generator = UniversalSQLGenerator()
+    sql = generator.generate_sql(intent)
+    assert "GROUP BY v.nombre_variedad, t.anio" in sql and "LIMIT" not in sql
+    viz = generator.get_visualization_config(intent)
+    assert (viz["x_axis"], viz["series"]) == ("anio", "nombre_variedad")
+
+    # Mensual: conserva año y mes como eje y el LIMIT
+    monthly = UniversalQueryAnalyzer().analyze_query("evolucion mensual del tch por variedad por mes en 2024")
+    monthly_sql = generator.generate_sql(monthly)
+    assert "GROUP BY v.nombre_variedad, t.anio, t.mes" in monthly_sql and "LIMIT" in monthly_sql
+    assert "series" not in generator.get_visualization_config(monthly)
+
+    rows = [{"nombre_variedad": v, "anio": y, "promedio_tch": t}
+            for y, v, t in [(2021, "CC 85-92", 110.0), (2020, "CC 85-92", 100.0),
+                            (2020, "CC 01-1940", 90.0), (2022, "CC 85-92", 120.0)]]
+    engine = VisualizationEngine(max_series=None)
+    chart = engine.create_visualization(ChartConfig(ChartType.LINE, "TCH", viz["x_axis"], viz["y_axis"], rows,
+                                                    series=viz["series"]))
+    assert chart["data"]["labels"] == ["2020", "2021", "2022"]
+    datasets = {d["label"]: d["data"] for d in chart["data"]["datasets"]}
+    assert datasets == {"CC 85-92": [100.0, 110.0, 120.0], "CC 01-1940": [90.0, None, None]}
+
+    engine.max_series = 2
+    many = rows + [{"nombre_variedad": "RB 73", "anio": 2020, "promedio_tch": 80.0}]
+    grouped = engine.create_visualization(ChartConfig(ChartType.BAR, "TCH", "anio", "promedio_tch", many,
+                                                      series="nombre_variedad"))
+    assert [d["label"] for d in grouped["data"]["datasets"]] == ["CC 85-92", "Otros"]
+    assert grouped["data"]["datasets"][1]["data"] == [85.0, None, None]
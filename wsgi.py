@@ -0,0 +1,30 @@
+"""
+SugarBI - Punto de entrada WSGI para producción
+
+Uso:
+    gunicorn --config gunicorn.conf.py
+
+SUGARBI_BLUEPRINTS elige los blueprints (por defecto la aplicación web completa) y
+SUGARBI_WARM_UP=false omite el calentamiento previo al fork.
+"""
+
+import os
+
+from server import DEFAULT_BLUEPRINTS, create_app
+from server.services import get_services
+
+
+def _blueprints():
+    names = os.getenv('SUGARBI_BLUEPRINTS')
+    if not names:
+        return DEFAULT_BLUEPRINTS
+    return tuple(name.strip() for name in names.split(',') if name.strip())
+
+
+app = create_app(_blueprints())
+
+if os.getenv('SUGARBI_WARM_UP', 'true').lower() != 'false':
+    # Con preload_app esto corre una vez en el maestro: los workers nacen con las cachés llenas
+    warm_state = get_services(app).warm_up()
+    print(f"🔥 Calentamiento {'completo' if warm_state['ready'] else 'incompleto'}: "
+          + ", ".join(f"{name} {step['ms']}ms" for name, step in warm_state['steps'].items()))